@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+冷启动报告
+- 在全新子进程中用 python -X importtime 导入各入口模块（命令行脚本、提取引擎、Django 视图），
+  统计总导入耗时和入口模块直接导入的各模块耗时
+- 检查入口模块导入后是否已经加载了应按需导入的重型库（python-docx、PyPDF2、docx2pdf、paddleocr 等）
+- 统计 extract_text_from_images.py --help 的进程耗时，以及从启动子进程到第一张图片识别完成的耗时
+  （解释器启动、导入、模型加载、第一张图片各自的耗时）
+- 各项耗时与预算（毫秒）对比，超出预算或提前加载了重型库时退出码为 1；预算可用 --budget 名称=毫秒 调整
+- 每项取 --repeat 次运行的中位数（操作系统文件缓存已预热）
+用法：
+    python benchmarks/cold_start.py
+    python benchmarks/cold_start.py --skip-ocr --budget cli_import_ms=150 --json cold_start.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WEB_ROOT = os.path.join(PROJECT_ROOT, "extract_web")
+
+# 各项预算（毫秒）：导入预算按 NumPy/python-docx 等必需库的导入耗时留出余量，
+# 用于发现新增的启动期重型导入；第一张图片的预算包含 PaddleOCR 的导入和模型加载
+DEFAULT_BUDGETS = {
+    "cli_import_ms": 250,
+    "cli_help_ms": 800,
+    "engine_import_ms": 600,
+    "web_views_import_ms": 150,
+    "first_result_ms": 20000,
+}
+
+# 入口模块导入后不应已加载的模块（只在用到的代码路径中导入）
+HEAVY_MODULES = ("docx", "lxml", "numpy", "PIL", "cv2", "bs4", "PyPDF2", "docx2pdf", "paddleocr", "paddle", "onnxruntime", "extraction_engine")
+IMPORT_TARGETS = {
+    "cli": {
+        "module": "extract_text_from_images",
+        "cwd": PROJECT_ROOT,
+        "setup": "",
+        "forbidden": HEAVY_MODULES,
+    },
+    "engine": {
+        "module": "extraction_engine",
+        "cwd": PROJECT_ROOT,
+        "setup": "",
+        # 引擎需要 NumPy；python-docx 只在 image_to_docx 中导入，OCR 库在首次识别时导入
+        "forbidden": ("docx", "lxml", "bs4", "PyPDF2", "docx2pdf", "paddleocr", "paddle", "onnxruntime"),
+    },
+    "web_views": {
+        "module": "converter.views",
+        "cwd": WEB_ROOT,
+        "setup": "import os, django; os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project_core.settings'); django.setup()",
+        "forbidden": HEAVY_MODULES,
+    },
+}
+
+
+def parse_importtime(stderr):
+    """解析 -X importtime 输出：[(模块名, 层级, 自身微秒, 累计微秒)]，按输出顺序（子模块在父模块之前）"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        if not self_us.strip().isdigit():
+            continue  # 表头行
+        name = name[1:]
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        entries.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return entries
+
+
+def direct_imports(entries, module):
+    """module 的累计导入耗时（微秒）及其直接导入的各模块 [(模块名, 累计微秒)]"""
+    for index, (name, depth, _, cumulative_us) in enumerate(entries):
+        if name != module:
+            continue
+        children = []
+        for child_name, child_depth, _, child_cumulative in reversed(entries[:index]):
+            if child_depth <= depth:
+                break
+            if child_depth == depth + 1:
+                children.append((child_name, child_cumulative))
+        return cumulative_us, sorted(children, key=lambda item: -item[1])
+    return None, []
+
+
+def measure_import(target):
+    code = (
+        f"import sys; sys.path.insert(0, {PROJECT_ROOT!r}); {target['setup']}\n"
+        f"import {target['module']}\n"
+        "import json; print(json.dumps(sorted(sys.modules)))"
+    )
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                               encoding="utf-8", errors="replace", cwd=target["cwd"])
+    if completed.returncode != 0:
+        tail = completed.stderr.strip().splitlines()[-1:] or ["unknown error"]
+        raise RuntimeError(tail[0])
+    loaded = set(json.loads(completed.stdout.strip().splitlines()[-1]))
+    total_us, children = direct_imports(parse_importtime(completed.stderr), target["module"])
+    return {
+        "import_ms": round(total_us / 1000, 1) if total_us is not None else 0.0,
+        "modules": [{"module": name, "ms": round(us / 1000, 1)} for name, us in children],
+        "eager_heavy_modules": sorted(name for name in target["forbidden"] if name in loaded),
+    }
+
+
+def measure_cli_help():
+    start_time = time.perf_counter()
+    completed = subprocess.run([sys.executable, os.path.join(PROJECT_ROOT, "extract_text_from_images.py"), "--help"],
+                               capture_output=True, text=True, cwd=PROJECT_ROOT)
+    elapsed = time.perf_counter() - start_time
+    if completed.returncode != 0:
+        raise RuntimeError((completed.stderr.strip().splitlines()[-1:] or ["unknown error"])[0])
+    return elapsed * 1000
+
+
+def run_first_result_child(spawn_time, image_path, config_path):
+    """子进程：导入引擎、加载模型并识别一张图片，输出各阶段的时间点"""
+    started = time.time()
+    sys.path.insert(0, PROJECT_ROOT)
+    from extraction_engine import ExtractionEngine
+    from utils import load_config
+
+    imported = time.time()
+    config = load_config(config_path)
+    config.update(ocr_cache_enabled=False)
+    engine = ExtractionEngine(config)
+    engine.ocr
+    model_ready = time.time()
+    result = engine.process(image_path)
+    finished = time.time()
+    print(json.dumps({
+        "interpreter_ms": round((started - spawn_time) * 1000, 1),
+        "import_ms": round((imported - started) * 1000, 1),
+        "model_init_ms": round((model_ready - imported) * 1000, 1),
+        "first_image_ms": round((finished - model_ready) * 1000, 1),
+        "first_result_ms": round((finished - spawn_time) * 1000, 1),
+        "ok": result.ok,
+    }))
+
+
+def measure_first_result(image_path, config_path):
+    command = [sys.executable, os.path.abspath(__file__), "--child-first-result", repr(time.time()),
+               "--image", image_path, "--config", config_path]
+    completed = subprocess.run(command, capture_output=True, text=True, encoding="utf-8", errors="replace", cwd=PROJECT_ROOT)
+    for line in reversed(completed.stdout.splitlines()):
+        if line.startswith("{") and completed.returncode == 0:
+            return json.loads(line)
+    raise RuntimeError(((completed.stderr or completed.stdout).strip().splitlines()[-1:] or ["unknown error"])[0])
+
+
+def median_run(measure, repeat, key):
+    """运行 repeat 次，返回 key 取中位数的那一次的结果"""
+    runs = sorted((measure() for _ in range(repeat)), key=lambda item: item[key])
+    return runs[(len(runs) - 1) // 2]
+
+
+def parse_budget(value):
+    name, _, milliseconds = value.partition("=")
+    if name not in DEFAULT_BUDGETS or not milliseconds:
+        raise argparse.ArgumentTypeError(f"expected NAME=MS with NAME in {', '.join(DEFAULT_BUDGETS)}")
+    return name, float(milliseconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start report: per-module import time, CLI --help time and time to the first OCR result, checked against a budget.")
+    parser.add_argument("--targets", nargs="+", choices=list(IMPORT_TARGETS), default=list(IMPORT_TARGETS), help="Entry modules to import (default: all).")
+    parser.add_argument("--image", default=os.path.join(PROJECT_ROOT, "his_pic", "1.jpg"), help="Image for the first-result measurement (default: his_pic/1.jpg).")
+    parser.add_argument("--config", default=os.path.join(PROJECT_ROOT, "config.yaml"), help="Config file (default: config.yaml).")
+    parser.add_argument("--skip-ocr", action="store_true", help="Skip the first-result measurement (no OCR models needed).")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement, the median is reported (default: 3).")
+    parser.add_argument("--budget", type=parse_budget, action="append", default=[], help="Override a budget, e.g. cli_import_ms=150 (repeatable).")
+    parser.add_argument("--top", type=int, default=8, help="Direct imports listed per entry module (default: 8).")
+    parser.add_argument("--json", dest="json_path", default=None, help="Also write the report to this JSON file.")
+    parser.add_argument("--child-first-result", dest="child_spawn_time", type=float, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_spawn_time is not None:
+        run_first_result_child(args.child_spawn_time, args.image, args.config)
+        return 0
+
+    repeat = max(1, args.repeat)
+    budgets = dict(DEFAULT_BUDGETS, **dict(args.budget))
+    report = {"python": sys.version.split()[0], "budgets": budgets, "imports": {}, "measurements": {}, "errors": {}}
+    for name in args.targets:
+        try:
+            result = median_run(lambda: measure_import(IMPORT_TARGETS[name]), repeat, "import_ms")
+        except Exception as e:
+            report["errors"][name] = str(e)
+            continue
+        report["imports"][name] = result
+        report["measurements"][f"{name}_import_ms"] = result["import_ms"]
+    if "cli" in args.targets:
+        try:
+            report["measurements"]["cli_help_ms"] = round(statistics.median(measure_cli_help() for _ in range(repeat)), 1)
+        except Exception as e:
+            report["errors"]["cli_help"] = str(e)
+    if not args.skip_ocr:
+        try:
+            first_result = median_run(lambda: measure_first_result(args.image, args.config), repeat, "first_result_ms")
+            report["first_result"] = first_result
+            report["measurements"]["first_result_ms"] = first_result["first_result_ms"]
+        except Exception as e:
+            report["errors"]["first_result"] = str(e)
+
+    for name, result in report["imports"].items():
+        print(f"[{name}] import {IMPORT_TARGETS[name]['module']}: {result['import_ms']:.1f} ms")
+        for item in result["modules"][:args.top]:
+            print(f"    {item['module']:<36}{item['ms']:>10.1f} ms")
+        if result["eager_heavy_modules"]:
+            print(f"    eagerly loaded: {', '.join(result['eager_heavy_modules'])}")
+    if "first_result" in report:
+        first_result = report["first_result"]
+        print(f"[first_result] {first_result['first_result_ms']:.0f} ms = interpreter {first_result['interpreter_ms']:.0f} + "
+              f"import {first_result['import_ms']:.0f} + model init {first_result['model_init_ms']:.0f} + first image {first_result['first_image_ms']:.0f}")
+    for name, error in report["errors"].items():
+        print(f"[{name}] failed: {error}")
+
+    over_budget = {name: value for name, value in report["measurements"].items() if name in budgets and value > budgets[name]}
+    eager = {name: result["eager_heavy_modules"] for name, result in report["imports"].items() if result["eager_heavy_modules"]}
+    print(f"{'measurement':<24}{'ms':>10}{'budget':>10}")
+    for name, value in report["measurements"].items():
+        print(f"{name:<24}{value:>10.1f}{budgets.get(name, float('nan')):>10.0f}{'  OVER BUDGET' if name in over_budget else ''}")
+    report["over_budget"] = over_budget
+    report["eager_heavy_modules"] = eager
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 1 if over_budget or eager or report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
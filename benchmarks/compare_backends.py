@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+OCR 推理后端对比
+- 每个后端在独立子进程中运行，分别统计启动耗时（导入 + 模型加载）、峰值内存（RSS）和吞吐量（images/sec）
+- 关闭 OCR 结果缓存，保证每张图片都真正执行推理
+用法：
+    python benchmarks/compare_backends.py --images his_pic --backends paddle onnx
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def peak_rss_mb():
+    """返回当前进程的峰值常驻内存（MB），无法获取时返回 None"""
+    try:
+        import resource
+        # Linux 下 ru_maxrss 单位为 KB，macOS 下为字节
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss / 1024 / 1024 if sys.platform == "darwin" else max_rss / 1024
+    except ImportError:
+        pass
+    try:
+        # Windows 没有 resource 模块，使用 psutil 的峰值工作集
+        import psutil
+        memory_info = psutil.Process().memory_info()
+        return getattr(memory_info, "peak_wset", memory_info.rss) / 1024 / 1024
+    except ImportError:
+        return None
+
+
+def run_child(backend, image_paths, config_path, repeat):
+    """子进程：加载指定后端并识别全部图片，以 JSON 输出测量结果"""
+    sys.path.insert(0, PROJECT_ROOT)
+    start_time = time.perf_counter()
+    from extraction_engine import ExtractionEngine
+    from utils import load_config
+
+    config = load_config(config_path)
+    config.update(ocr_backend=backend, ocr_cache_enabled=False)
+    engine = ExtractionEngine(config)
+    engine.ocr
+    engine.warm_up()
+    startup_seconds = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    line_count = 0
+    errors = 0
+    for _ in range(repeat):
+        for result in engine.iter_results(image_paths):
+            line_count += len(result.page)
+            errors += 0 if result.ok else 1
+    elapsed = time.perf_counter() - start_time
+    image_count = len(image_paths) * repeat
+    rss = peak_rss_mb()
+    print(json.dumps({
+        "backend": backend,
+        "startup_seconds": round(startup_seconds, 3),
+        "peak_rss_mb": None if rss is None else round(rss, 1),
+        "images": image_count,
+        "lines": line_count,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "images_per_second": round(image_count / elapsed, 3) if elapsed > 0 else None,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare OCR inference backends: startup time, peak RSS and images/sec.")
+    parser.add_argument("--images", default=os.path.join(PROJECT_ROOT, "his_pic"), help="Directory of JPG images to recognize.")
+    parser.add_argument("--backends", nargs="+", default=["paddle", "onnx"], help="Backends to compare (default: paddle onnx).")
+    parser.add_argument("--config", default=os.path.join(PROJECT_ROOT, "config.yaml"), help="Config file (default: config.yaml).")
+    parser.add_argument("--repeat", type=int, default=1, help="Number of passes over the images.")
+    parser.add_argument("--json", dest="json_path", default=None, help="Also write the results to this JSON file.")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    image_paths = sorted(glob.glob(os.path.join(args.images, "*.jpg")))
+    if not image_paths:
+        print(f"[ERROR] No JPG images found in {args.images}")
+        return 1
+
+    if args.child:
+        run_child(args.child, image_paths, args.config, args.repeat)
+        return 0
+
+    results = []
+    for backend in args.backends:
+        command = [sys.executable, os.path.abspath(__file__), "--child", backend,
+                   "--images", args.images, "--config", args.config, "--repeat", str(args.repeat)]
+        completed = subprocess.run(command, capture_output=True, text=True, encoding="utf-8", errors="replace", cwd=PROJECT_ROOT)
+        measurement = None
+        for line in reversed(completed.stdout.splitlines()):
+            if line.startswith("{"):
+                measurement = json.loads(line)
+                break
+        if completed.returncode != 0 or measurement is None:
+            tail = (completed.stderr or completed.stdout).strip().splitlines()[-1:] or ["unknown error"]
+            print(f"[ERROR] backend {backend} failed: {tail[0]}")
+            results.append({"backend": backend, "error": tail[0]})
+            continue
+        results.append(measurement)
+
+    print(f"{'backend':<10}{'startup(s)':>12}{'peak RSS(MB)':>14}{'images/sec':>12}{'lines':>8}{'errors':>8}")
+    for item in results:
+        if "error" in item:
+            print(f"{item['backend']:<10}  failed: {item['error']}")
+            continue
+        rss = "n/a" if item["peak_rss_mb"] is None else f"{item['peak_rss_mb']:.1f}"
+        print(f"{item['backend']:<10}{item['startup_seconds']:>12.2f}{rss:>14}{item['images_per_second']:>12.2f}"
+              f"{item['lines']:>8}{item['errors']:>8}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0 if all("error" not in item for item in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,529 @@
+# -*- coding: utf-8 -*-
+"""
+提取与转换流程基准测试
+- ocr：识别 his_pic 下的图片，以及按固定随机种子生成的测试图片（多种分辨率 × 页数），
+  统计 images/sec、单张图片耗时 p50/p95 和进程峰值内存（RSS）；关闭 OCR 结果缓存，其余按 config.yaml
+- docx：把合成的 OCR 结果按命令行脚本的方式（标题、分页、表格写入）生成并保存 DOCX
+- docx_merge：Web 端合并多个 DOCX（document_merge.merge_docx_files，即 append_document）
+- pdf_merge：Web 端合并多个 PDF（document_merge.merge_pdf_files，需要 PyPDF2，未安装时跳过）
+- 每个部分在独立子进程中运行，峰值内存互不影响；docx / 合并部分取 --repeat 次运行中最快的一次
+- 结果保存为 JSON，并与基线文件对比：吞吐量下降、耗时或内存上升超过 --threshold（比例）即视为退步，退出码为 1
+- 仓库不附带基线（结果与机器相关），在目标机器上首次运行时用 --save-baseline 记录
+用法：
+    python benchmarks/pipeline.py --save-baseline
+    python benchmarks/pipeline.py --threshold 0.15
+    python benchmarks/pipeline.py --sections docx docx_merge pdf_merge --pages 1 10 50
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "extract_web"))
+
+from compare_backends import peak_rss_mb  # noqa: E402
+
+SECTIONS = ("ocr", "docx", "docx_merge", "pdf_merge")
+DEFAULT_BASELINE = os.path.join(PROJECT_ROOT, "benchmarks", "baseline.json")
+WORDS = (
+    "invoice", "total", "amount", "date", "account", "report", "summary", "item", "quantity", "price",
+    "2023", "1,250.00", "No.", "section", "page", "balance", "customer", "address", "order", "tax",
+    "合计", "金额", "日期", "项目", "数量", "单价", "备注", "编号",
+)
+
+
+def parse_size(value):
+    width, height = (int(part) for part in value.lower().split("x"))
+    return width, height
+
+
+def percentile(values, q):
+    """线性插值的百分位数（values 非空）"""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def ascii_line(rng, min_words=3, max_words=9):
+    # 生成的图片使用 Pillow 自带字体，只含 ASCII 字符
+    return " ".join(rng.choice(WORDS[:20]) for _ in range(rng.randint(min_words, max_words)))
+
+
+# ---- 测试数据生成 ----
+
+def _load_font(size):
+    from PIL import ImageFont
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1 的默认字体不支持字号
+        return ImageFont.load_default()
+
+
+def generate_image(path, width, height, rng):
+    """生成一页扫描件样式的测试图片：上下为正文行，中间为带框线的表格"""
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    font_size = max(12, height // 70)
+    font = _load_font(font_size)
+    margin = width // 12
+    line_height = int(font_size * 1.8)
+    y = margin
+    while y < height * 0.4:
+        draw.text((margin, y), ascii_line(rng), fill="black", font=font)
+        y += line_height
+    n_rows, n_cols = 6, 4
+    cell_width = (width - 2 * margin) // n_cols
+    row_height = line_height + font_size // 2
+    for row in range(n_rows):
+        for col in range(n_cols):
+            left, top = margin + col * cell_width, y + row * row_height
+            draw.rectangle([left, top, left + cell_width, top + row_height], outline="black", width=2)
+            draw.text((left + 8, top + font_size // 4), ascii_line(rng, 1, 2), fill="black", font=font)
+    y += n_rows * row_height + line_height
+    while y < height - margin:
+        draw.text((margin, y), ascii_line(rng), fill="black", font=font)
+        y += line_height
+    image.save(path, quality=90)
+
+
+def generate_corpus(corpus_dir, resolutions, max_pages, seed):
+    """每种分辨率生成 max_pages 张图片：corpus_dir/<宽>x<高>/page_0001.jpg ..."""
+    for width, height in resolutions:
+        size_dir = os.path.join(corpus_dir, f"{width}x{height}")
+        os.makedirs(size_dir, exist_ok=True)
+        rng = random.Random(f"{seed}-{width}x{height}")
+        for page in range(1, max_pages + 1):
+            path = os.path.join(size_dir, f"page_{page:04d}.jpg")
+            if not os.path.exists(path):
+                generate_image(path, width, height, rng)
+
+
+def corpus_sets(args):
+    """OCR 测试集：[(名称, 图片路径列表)]，生成图片按页数取每种分辨率的前 N 张"""
+    sets = []
+    image_paths = sorted(glob.glob(os.path.join(args.images, "*.jpg")))
+    if image_paths:
+        sets.append((os.path.basename(os.path.normpath(args.images)), image_paths))
+    for width, height in args.resolutions:
+        size_dir = os.path.join(args.corpus_dir, f"{width}x{height}")
+        generated = sorted(glob.glob(os.path.join(size_dir, "*.jpg")))
+        for pages in args.pages:
+            sets.append((f"{width}x{height}_{pages}p", generated[:pages]))
+    return sets
+
+
+def synthetic_page(rng, line_count=40, table_rows=12, table_cols=5):
+    """合成一页 OCR 结果：正文行 + 一个带合并表头的 HTML 表格（表格模型的输出格式）"""
+    from ocr_page import OCRPage
+
+    texts, boxes = [], []
+    for index in range(line_count):
+        top = 40 + index * 36
+        texts.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 12))))
+        boxes.append([[60, top], [1100, top], [1100, top + 28], [60, top + 28]])
+    header = f'<tr><td rowspan="2">{rng.choice(WORDS)}</td><td colspan="{table_cols - 1}">{rng.choice(WORDS)}</td></tr>'
+    header += "<tr>" + "".join(f"<td>{rng.choice(WORDS)}</td>" for _ in range(table_cols - 1)) + "</tr>"
+    body = "".join(
+        "<tr>" + "".join(f"<td>{rng.choice(WORDS)} {rng.randint(1, 9999)}</td>" for _ in range(table_cols)) + "</tr>"
+        for _ in range(table_rows - 2)
+    )
+    table = {"type": "table", "bbox": [60, 800, 1100, 1200], "res": {"html": f"<html><body><table>{header}{body}</table></body></html>"}, "anchor": line_count // 2}
+    return OCRPage(boxes, [0.95] * line_count, texts, None, [table])
+
+
+def build_document(config, pages):
+    """按命令行脚本目录模式的方式组装文档：每页一个标题，页之间分页"""
+    from docx_renderer import create_document, render_layout_elements
+
+    doc = create_document(config)
+    for index, page in enumerate(pages):
+        filename = f"page_{index + 1:04d}.jpg"
+        doc.add_heading(f"Content from {filename}", level=1)
+        render_layout_elements(doc, filename, page, config.get("use_special_table_handlers", True))
+        if index < len(pages) - 1:
+            doc.add_page_break()
+    return doc
+
+
+# ---- 各部分（子进程中运行） ----
+
+def run_ocr(args):
+    start_time = time.perf_counter()
+    from extraction_engine import ExtractionEngine
+    from utils import load_config
+
+    config = load_config(args.config)
+    config.update(ocr_cache_enabled=False)
+    if args.backend:
+        config["ocr_backend"] = args.backend
+    if args.profile:
+        config["preprocess_profile"] = args.profile
+    engine = ExtractionEngine(config)
+    engine.ocr
+    engine.warm_up()
+    startup_seconds = time.perf_counter() - start_time
+
+    batched = bool(config.get("batch_recognition", False))
+    sets = {}
+    for set_name, image_paths in corpus_sets(args):
+        latencies = []
+        line_count = 0
+        errors = 0
+        start_time = time.perf_counter()
+        for _ in range(args.repeat):
+            results = engine.iter_results_batched(image_paths) if batched else engine.iter_results(image_paths)
+            for result in results:
+                latencies.append(result.elapsed)
+                line_count += len(result.page)
+                errors += 0 if result.ok else 1
+        elapsed = time.perf_counter() - start_time
+        sets[set_name] = {
+            "images": len(latencies),
+            "lines": line_count,
+            "errors": errors,
+            "seconds": round(elapsed, 3),
+            "images_per_second": round(len(latencies) / elapsed, 3) if elapsed > 0 else None,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1) if latencies else None,
+        }
+    return {
+        "backend": config.get("ocr_backend", "paddle"),
+        "preprocess_profile": config.get("preprocess_profile", "original"),
+        "batch_recognition": batched,
+        "startup_seconds": round(startup_seconds, 3),
+        "sets": sets,
+    }
+
+
+def _best_of(repeat, run):
+    """运行 repeat 次，返回总耗时最短的一次的测量结果"""
+    best = None
+    for _ in range(repeat):
+        measurement = run()
+        if best is None or measurement["seconds"] < best["seconds"]:
+            best = measurement
+    return best
+
+
+def run_docx(args):
+    from utils import load_config
+
+    config = load_config(args.config)
+    # 预热：首次渲染包含 python-docx 模板加载和表格解析模块的导入
+    build_document(config, [synthetic_page(random.Random(args.seed))])
+    runs = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for pages in args.pages:
+            rng = random.Random(f"{args.seed}-docx")
+            page_data = [synthetic_page(rng) for _ in range(pages)]
+            output_path = os.path.join(work_dir, f"{pages}p.docx")
+
+            def run():
+                start_time = time.perf_counter()
+                doc = build_document(config, page_data)
+                build_seconds = time.perf_counter() - start_time
+                start_time = time.perf_counter()
+                doc.save(output_path)
+                save_seconds = time.perf_counter() - start_time
+                return {"build_seconds": build_seconds, "save_seconds": save_seconds, "seconds": build_seconds + save_seconds}
+
+            best = _best_of(args.repeat, run)
+            runs[f"{pages}p"] = {
+                "pages": pages,
+                "build_seconds": round(best["build_seconds"], 4),
+                "save_seconds": round(best["save_seconds"], 4),
+                "seconds": round(best["seconds"], 4),
+                "pages_per_second": round(pages / best["seconds"], 2) if best["seconds"] > 0 else None,
+                "file_kb": round(os.path.getsize(output_path) / 1024, 1),
+            }
+    return {"runs": runs}
+
+
+def run_docx_merge(args):
+    from converter.document_merge import merge_docx_files
+    from utils import load_config
+
+    config = load_config(args.config)
+    runs = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        rng = random.Random(f"{args.seed}-merge")
+        source_paths = []
+        for index in range(max(args.pages)):
+            path = os.path.join(work_dir, f"part_{index + 1:04d}.docx")
+            build_document(config, [synthetic_page(rng)]).save(path)
+            source_paths.append(path)
+        for documents in args.pages:
+            output_path = os.path.join(work_dir, f"merged_{documents}.docx")
+
+            def run():
+                start_time = time.perf_counter()
+                merged_doc = merge_docx_files(source_paths[:documents])
+                merge_seconds = time.perf_counter() - start_time
+                start_time = time.perf_counter()
+                merged_doc.save(output_path)
+                save_seconds = time.perf_counter() - start_time
+                return {"merge_seconds": merge_seconds, "save_seconds": save_seconds, "seconds": merge_seconds + save_seconds}
+
+            best = _best_of(args.repeat, run)
+            runs[f"{documents}docs"] = {
+                "documents": documents,
+                "merge_seconds": round(best["merge_seconds"], 4),
+                "save_seconds": round(best["save_seconds"], 4),
+                "seconds": round(best["seconds"], 4),
+            }
+    return {"runs": runs}
+
+
+def run_pdf_merge(args):
+    try:
+        import PyPDF2  # noqa: F401
+    except ImportError:
+        return {"skipped": "PyPDF2 is not installed"}
+    from PIL import Image
+
+    from converter.document_merge import merge_pdf_files
+
+    runs = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        # 单页 PDF 由生成的测试图片转换（与 PPT 逐页导出的 PDF 一样以整页图像为主）
+        width, height = args.resolutions[0] if args.resolutions else (1240, 1754)
+        image_paths = sorted(glob.glob(os.path.join(args.corpus_dir, f"{width}x{height}", "*.jpg")))
+        source_paths = []
+        for index, image_path in enumerate(image_paths[:max(args.pages)]):
+            path = os.path.join(work_dir, f"part_{index + 1:04d}.pdf")
+            with Image.open(image_path) as image:
+                image.convert("RGB").save(path, "PDF", resolution=150)
+            source_paths.append(path)
+        for documents in args.pages:
+            output_path = os.path.join(work_dir, f"merged_{documents}.pdf")
+
+            def run():
+                start_time = time.perf_counter()
+                merge_pdf_files(source_paths[:documents], output_path)
+                return {"seconds": time.perf_counter() - start_time}
+
+            best = _best_of(args.repeat, run)
+            runs[f"{documents}docs"] = {"documents": documents, "seconds": round(best["seconds"], 4)}
+    return {"runs": runs}
+
+
+SECTION_RUNNERS = {"ocr": run_ocr, "docx": run_docx, "docx_merge": run_docx_merge, "pdf_merge": run_pdf_merge}
+
+
+def run_child(args):
+    """子进程：运行一个部分，以 JSON 输出测量结果（最后一行）"""
+    result = SECTION_RUNNERS[args.child](args)
+    rss = peak_rss_mb()
+    result["peak_rss_mb"] = None if rss is None else round(rss, 1)
+    print(json.dumps(result, ensure_ascii=False))
+
+
+def run_section(section, args):
+    command = [sys.executable, os.path.abspath(__file__), "--child", section,
+               "--images", args.images, "--config", args.config, "--corpus-dir", args.corpus_dir,
+               "--repeat", str(args.repeat), "--seed", str(args.seed),
+               "--resolutions", *[f"{width}x{height}" for width, height in args.resolutions],
+               "--pages", *[str(pages) for pages in args.pages]]
+    if args.backend:
+        command += ["--backend", args.backend]
+    if args.profile:
+        command += ["--profile", args.profile]
+    completed = subprocess.run(command, capture_output=True, text=True, encoding="utf-8", errors="replace", cwd=PROJECT_ROOT)
+    for line in reversed(completed.stdout.splitlines()):
+        if line.startswith("{") and completed.returncode == 0:
+            return json.loads(line)
+    tail = (completed.stderr or completed.stdout).strip().splitlines()[-1:] or ["unknown error"]
+    return {"error": tail[0]}
+
+
+# ---- 基线对比 ----
+
+def metric_direction(key):
+    """1 表示越大越好，-1 表示越小越好，0 表示不参与对比"""
+    if key.endswith("_per_second"):
+        return 1
+    if key.endswith("seconds") or key.endswith("_ms") or key.endswith("_mb"):
+        return -1
+    return 0
+
+
+def flatten_metrics(node, prefix=""):
+    """{"ocr/sets/his_pic/p95_ms": 值, ...}，只包含参与对比的数值指标"""
+    flat = {}
+    for key, value in node.items():
+        path = f"{prefix}/{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten_metrics(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and metric_direction(key):
+            flat[path] = value
+    return flat
+
+
+def compare_with_baseline(current, baseline, threshold, min_seconds):
+    """逐项对比当前结果与基线
+
+    Returns:
+        list: (指标路径, 基线值, 当前值, 变化比例, 是否退步)；耗时指标（秒、毫秒）在两次结果中都低于 min_seconds 时不判断退步
+    """
+    rows = []
+    baseline_metrics = flatten_metrics(baseline.get("sections", {}))
+    for path, value in flatten_metrics(current.get("sections", {})).items():
+        base = baseline_metrics.get(path)
+        if base is None or base == 0:
+            continue
+        key = path.rsplit("/", 1)[-1]
+        direction = metric_direction(key)
+        change = (value - base) / base
+        scale = 1000 if key.endswith("_ms") else 1 if key.endswith("seconds") else None
+        too_small = scale is not None and max(value, base) < min_seconds * scale
+        regressed = not too_small and (change < -threshold if direction > 0 else change > threshold)
+        rows.append((path, base, value, change, regressed))
+    return rows
+
+
+def environment_info():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=PROJECT_ROOT).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "commit": commit,
+    }
+
+
+def print_results(sections):
+    for section, result in sections.items():
+        if "error" in result:
+            print(f"[{section}] failed: {result['error']}")
+            continue
+        if "skipped" in result:
+            print(f"[{section}] skipped: {result['skipped']}")
+            continue
+        rss = "n/a" if result.get("peak_rss_mb") is None else f"{result['peak_rss_mb']:.1f} MB"
+        if section == "ocr":
+            print(f"[ocr] backend={result['backend']} profile={result['preprocess_profile']} "
+                  f"batched={result['batch_recognition']} startup={result['startup_seconds']:.2f}s peak RSS={rss}")
+            print(f"  {'set':<22}{'images':>8}{'images/sec':>12}{'p50 (ms)':>10}{'p95 (ms)':>10}{'errors':>8}")
+            for name, item in result["sets"].items():
+                ips = f"{item['images_per_second']:.2f}" if item["images_per_second"] is not None else "-"
+                p50 = f"{item['p50_ms']:.0f}" if item["p50_ms"] is not None else "-"
+                p95 = f"{item['p95_ms']:.0f}" if item["p95_ms"] is not None else "-"
+                print(f"  {name:<22}{item['images']:>8}{ips:>12}{p50:>10}{p95:>10}{item['errors']:>8}")
+            continue
+        print(f"[{section}] peak RSS={rss}")
+        for name, item in result["runs"].items():
+            details = ", ".join(f"{key}={value}" for key, value in item.items())
+            print(f"  {name:<10} {details}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OCR throughput/latency, DOCX assembly, DOCX merge and PDF merge, and compare against a baseline.")
+    parser.add_argument("--sections", nargs="+", choices=SECTIONS, default=list(SECTIONS), help="Sections to run (default: all).")
+    parser.add_argument("--images", default=os.path.join(PROJECT_ROOT, "his_pic"), help="Directory of real JPG images for the OCR section (default: his_pic).")
+    parser.add_argument("--resolutions", nargs="+", type=parse_size, default=[(1240, 1754), (2480, 3508)],
+                        help="Generated page sizes as WIDTHxHEIGHT (default: 1240x1754 2480x3508, A4 at 150/300 dpi).")
+    parser.add_argument("--pages", nargs="+", type=int, default=[1, 5],
+                        help="Page counts: generated images per OCR set, pages per DOCX, documents per merge (default: 1 5).")
+    parser.add_argument("--repeat", type=int, default=1, help="OCR passes per set; DOCX/merge runs per size, fastest reported (default: 1).")
+    parser.add_argument("--seed", type=int, default=20240601, help="Random seed for the generated corpus and synthetic OCR results.")
+    parser.add_argument("--corpus-dir", default=None, help="Keep the generated images in this directory (reused when present); default: a temporary directory.")
+    parser.add_argument("--config", default=os.path.join(PROJECT_ROOT, "config.yaml"), help="Config file (default: config.yaml).")
+    parser.add_argument("--backend", default=None, help="Override ocr_backend for the OCR section.")
+    parser.add_argument("--profile", default=None, help="Override preprocess_profile for the OCR section.")
+    parser.add_argument("--json", dest="json_path", default="benchmark_results.json", help="Where to write the results (default: benchmark_results.json).")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline results to compare against (default: benchmarks/baseline.json).")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline instead of comparing.")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change counted as a regression (default: 0.10 = 10%%).")
+    parser.add_argument("--min-seconds", type=float, default=0.05, help="Ignore timing regressions when both values are below this many seconds (default: 0.05).")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.pages = sorted(set(max(1, pages) for pages in args.pages))
+    args.repeat = max(1, args.repeat)
+
+    if args.child:
+        run_child(args)
+        return 0
+
+    temporary_corpus = args.corpus_dir is None
+    if temporary_corpus:
+        args.corpus_dir = tempfile.mkdtemp(prefix="extractdoc_bench_")
+    try:
+        if {"ocr", "pdf_merge"} & set(args.sections):
+            generate_corpus(args.corpus_dir, args.resolutions, max(args.pages), args.seed)
+        sections = {}
+        for section in SECTIONS:
+            if section in args.sections:
+                print(f"Running {section} ...", flush=True)
+                sections[section] = run_section(section, args)
+    finally:
+        if temporary_corpus:
+            shutil.rmtree(args.corpus_dir, ignore_errors=True)
+
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "environment": environment_info(),
+        "settings": {
+            "images": os.path.relpath(args.images, PROJECT_ROOT),
+            "resolutions": [f"{width}x{height}" for width, height in args.resolutions],
+            "pages": args.pages,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "sections": sections,
+    }
+    print_results(sections)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"Results written to {args.json_path}")
+
+    failed = any("error" in result for result in sections.values())
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 1 if failed else 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline on this machine to record one.")
+        return 1 if failed else 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    environment = results["environment"]
+    differences = [key for key in ("platform", "cpu_count", "python") if baseline.get("environment", {}).get(key) != environment[key]]
+    if differences:
+        print(f"[WARNING] Baseline was recorded on a different environment ({', '.join(differences)}); numbers may not be comparable.")
+    if baseline.get("settings") != results["settings"]:
+        print("[WARNING] Baseline was recorded with different settings; only metrics present in both runs are compared.")
+    rows = compare_with_baseline(results, baseline, args.threshold, args.min_seconds)
+    regressions = [row for row in rows if row[4]]
+    print(f"Compared {len(rows)} metrics with baseline from {baseline.get('created', 'unknown date')} (threshold {args.threshold:.0%}):")
+    for path, base, value, change, regressed in rows:
+        if regressed:
+            print(f"  REGRESSION  {path}: {base} -> {value} ({change:+.1%})")
+        elif change * metric_direction(path.rsplit("/", 1)[-1]) > args.threshold:
+            print(f"  improved    {path}: {base} -> {value} ({change:+.1%})")
+    print(f"{len(regressions)} regression(s).")
+    return 1 if failed or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
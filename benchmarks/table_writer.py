@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Word 表格写入耗时对比
+- legacy：逐个单元格调用 python-docx 的 table.cell(r, c) / merge()（原 add_table_from_html_to_docx 的写法）
+- xml：docx_table_writer 一次生成整张表格的行 XML
+- 表格带两行合并表头（跨列、跨行单元格），其余为普通单元格；每种写法取多次运行的最短耗时
+- legacy 写法的耗时随单元格数平方增长，超过 --legacy-max-cells 的表格默认不运行（结果中记为 null），
+  需要实测时调大该参数
+用法：
+    python benchmarks/table_writer.py --sizes 50x10 2000x20 --repeat 3
+    python benchmarks/table_writer.py --sizes 2000x20 --repeat 1 --legacy-max-cells 0
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from docx import Document  # noqa: E402
+
+from docx_table_writer import add_table_grid_to_docx  # noqa: E402
+from table_grid import TableCell, TableGrid  # noqa: E402
+
+
+def build_grid(n_rows, n_cols):
+    """构造带两行合并表头的测试表格：第一列表头跨两行，其余表头每两列合并"""
+    cells = [TableCell(0, 0, "序号", rowspan=2)]
+    for col in range(1, n_cols, 2):
+        cells.append(TableCell(0, col, f"分组{col // 2 + 1}", colspan=min(2, n_cols - col)))
+    for col in range(1, n_cols):
+        cells.append(TableCell(1, col, f"项目{col}"))
+    for row in range(2, n_rows):
+        for col in range(n_cols):
+            cells.append(TableCell(row, col, f"{row}-{col}"))
+    return TableGrid(n_rows=n_rows, n_cols=n_cols, cells=cells, header_rows=2)
+
+
+def legacy_add_table(doc, grid):
+    """原写法：python-docx 逐单元格赋值和合并"""
+    docx_table = doc.add_table(rows=grid.n_rows, cols=grid.n_cols)
+    docx_table.style = "Table Grid"
+    for cell in grid.cells:
+        docx_cell = docx_table.cell(cell.row, cell.col)
+        docx_cell.text = cell.text
+        if cell.rowspan > 1 or cell.colspan > 1:
+            docx_cell.merge(docx_table.cell(cell.row + cell.rowspan - 1, cell.col + cell.colspan - 1))
+    return docx_table
+
+
+def time_writer(writer, grid, repeat):
+    best = None
+    for _ in range(repeat):
+        doc = Document()
+        start_time = time.perf_counter()
+        writer(doc, grid)
+        elapsed = time.perf_counter() - start_time
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare DOCX table build time: python-docx cell()/merge() vs direct XML writer.")
+    parser.add_argument("--sizes", nargs="+", default=["50x10", "2000x20"], help="Table sizes as ROWSxCOLS (default: 50x10 2000x20).")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per writer and size, the fastest is reported (default: 3).")
+    parser.add_argument("--legacy-max-cells", type=int, default=5000, help="Skip the legacy writer for tables with more cells than this, 0 = never skip (default: 5000).")
+    parser.add_argument("--json", default=None, help="Optional path to write the results as JSON.")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        n_rows, n_cols = (int(value) for value in size.lower().split("x"))
+        grid = build_grid(n_rows, n_cols)
+        run_legacy = not args.legacy_max_cells or len(grid.cells) <= args.legacy_max_cells
+        legacy_seconds = time_writer(legacy_add_table, grid, args.repeat) if run_legacy else None
+        xml_seconds = time_writer(add_table_grid_to_docx, grid, args.repeat)
+        results.append({
+            "size": f"{n_rows}x{n_cols}",
+            "cells": len(grid.cells),
+            "legacy_seconds": round(legacy_seconds, 4) if legacy_seconds is not None else None,
+            "xml_seconds": round(xml_seconds, 4),
+            "speedup": round(legacy_seconds / xml_seconds, 1) if legacy_seconds is not None and xml_seconds else None,
+        })
+
+    print(f"{'size':>10} {'cells':>8} {'legacy (s)':>12} {'xml (s)':>10} {'speedup':>8}")
+    for item in results:
+        legacy = f"{item['legacy_seconds']:.4f}" if item["legacy_seconds"] is not None else "skipped"
+        speedup = f"{item['speedup']}x" if item["speedup"] is not None else "-"
+        print(f"{item['size']:>10} {item['cells']:>8} {legacy:>12} {item['xml_seconds']:>10.4f} {speedup:>8}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
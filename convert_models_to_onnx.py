@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+离线模型转换脚本：把 models/ 下的 Paddle 推理模型转换为 ONNX 格式
+- 转换 det_model_ch、rec_model_ch（以及存在时的 cls_model_ch），输出到 models/onnx/<模型目录名>.onnx
+- 依赖 paddle2onnx（pip install paddle2onnx），只需在有 Paddle 环境的机器上执行一次，
+  转换结果复制到其他机器后即可使用 ocr_backend: onnx 推理
+"""
+import argparse
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+from ocr_backends import MODEL_DIR_NAMES, onnx_model_path
+from ocr_cache import DEFAULT_MODEL_ROOT
+
+# 需要转换的模型（表格和版面模型不经过 ONNX 后端）
+CONVERTIBLE_MODELS = ("det", "rec", "cls")
+
+
+def convert_model(kind, model_root, opset_version=11, overwrite=False):
+    """调用 paddle2onnx 转换单个模型
+
+    Args:
+        kind: 模型类型（det / rec / cls）
+        model_root: 模型根目录
+        opset_version: ONNX opset 版本
+        overwrite: 目标文件已存在时是否重新转换
+
+    Returns:
+        Path or None: 转换后的 ONNX 文件路径；源模型不存在时返回 None
+
+    Raises:
+        RuntimeError: paddle2onnx 未安装、模型文件不完整或转换失败
+    """
+    model_dir = Path(model_root) / MODEL_DIR_NAMES[kind]
+    if not model_dir.is_dir():
+        return None
+    output_path = onnx_model_path(kind, model_root)
+    if output_path.exists() and not overwrite:
+        print(f"[SKIP] {output_path} already exists")
+        return output_path
+    for file_name in ("inference.pdmodel", "inference.pdiparams"):
+        if not (model_dir / file_name).exists():
+            raise RuntimeError(f"模型文件不完整，缺少 {model_dir / file_name}")
+
+    converter = shutil.which("paddle2onnx")
+    if converter is None:
+        raise RuntimeError("未找到 paddle2onnx 命令，请先执行 pip install paddle2onnx")
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    command = [
+        converter,
+        "--model_dir", str(model_dir),
+        "--model_filename", "inference.pdmodel",
+        "--params_filename", "inference.pdiparams",
+        "--save_file", str(output_path),
+        "--opset_version", str(opset_version),
+        "--enable_onnx_checker", "True",
+    ]
+    print(f"[RUN] {' '.join(command)}")
+    result = subprocess.run(command, capture_output=True, text=True, encoding="utf-8", errors="replace")
+    if result.returncode != 0 or not output_path.exists():
+        raise RuntimeError(f"{model_dir} 转换失败: {result.stderr or result.stdout}")
+    print(f"[OK] {model_dir} -> {output_path}")
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the bundled Paddle inference models to ONNX for the onnx OCR backend.")
+    parser.add_argument("--model-root", default=str(DEFAULT_MODEL_ROOT), help="Model root directory (default: models/).")
+    parser.add_argument("--opset", type=int, default=11, help="ONNX opset version (default: 11).")
+    parser.add_argument("--overwrite", action="store_true", help="Re-convert models that already have an ONNX file.")
+    args = parser.parse_args()
+
+    failed = False
+    for kind in CONVERTIBLE_MODELS:
+        try:
+            if convert_model(kind, args.model_root, args.opset, args.overwrite) is None:
+                print(f"[SKIP] {MODEL_DIR_NAMES[kind]} not found under {args.model_root}")
+        except RuntimeError as e:
+            print(f"[ERROR] {e}")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
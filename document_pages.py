@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+多页文档输入（PDF、多帧 TIFF）
+- iter_document_pages 逐页产出 DocumentPage，只记录文件路径和页码，识别到该页时才渲染；
+  500 页的文件任何时候内存中也只有一页的像素，多进程模式下工作进程收到的也只是页码，由工作进程自己渲染
+- PDF 使用 PyMuPDF（可选依赖，处理 PDF 时才导入）：已有文字层的页面直接取出文字和位置，跳过渲染和 OCR；
+  扫描页按 document_render_dpi 渲染为图片后识别
+- TIFF 使用 Pillow 逐帧解码
+- 坐标以页面的原始尺寸为准（PDF 为点，即 72 dpi；TIFF 为帧的像素），文字层和 OCR 结果使用同一坐标，
+  原生 PDF 的图片模式按此坐标叠加文字
+导入时只依赖标准库
+"""
+import importlib.util
+import logging
+import os
+from dataclasses import dataclass
+
+logger = logging.getLogger("ocr_app")
+
+PDF_EXTENSIONS = (".pdf",)
+TIFF_EXTENSIONS = (".tif", ".tiff")
+DOCUMENT_EXTENSIONS = PDF_EXTENSIONS + TIFF_EXTENSIONS
+# 只检查 PyMuPDF 是否已安装，打开 PDF 时才导入（新版模块名为 pymupdf，旧版为 fitz）
+PYMUPDF_AVAILABLE = importlib.util.find_spec("pymupdf") is not None or importlib.util.find_spec("fitz") is not None
+
+DEFAULT_RENDER_DPI = 200
+# 文字层至少有这么多个非空白字符时才视为该页已有文字，否则（如只有页码的扫描页）仍然 OCR
+DEFAULT_TEXT_MIN_CHARS = 20
+
+
+def is_document(source):
+    """是否为按页处理的多页文档路径（PDF、TIFF）"""
+    return isinstance(source, (str, os.PathLike)) and os.path.splitext(str(source))[1].lower() in DOCUMENT_EXTENSIONS
+
+
+def _import_pymupdf():
+    if not PYMUPDF_AVAILABLE:
+        raise RuntimeError("处理 PDF 需要安装 PyMuPDF（pip install pymupdf）")
+    try:
+        import pymupdf
+    except ImportError:
+        import fitz as pymupdf
+    return pymupdf
+
+
+def _open_pdf(path):
+    document = _import_pymupdf().open(path)
+    if document.needs_pass:
+        document.close()
+        raise ValueError(f"PDF 已加密，无法读取: {path}")
+    return document
+
+
+def count_pages(path):
+    """文档的页数（PDF 页数或 TIFF 帧数），不渲染任何页面"""
+    if os.path.splitext(str(path))[1].lower() in PDF_EXTENSIONS:
+        with _open_pdf(path) as document:
+            return document.page_count
+    from PIL import Image
+
+    with Image.open(path) as image:
+        return getattr(image, "n_frames", 1)
+
+
+@dataclass(frozen=True)
+class DocumentPage:
+    """多页文档中的一页：只保存路径和页码，load() 时才读取"""
+
+    path: str
+    index: int  # 从 0 开始的页码
+    page_count: int = 1
+
+    @property
+    def name(self):
+        """文档标题和日志中的名称：单页文档为文件名，多页文档为 "文件名#page=页码"（页码从 1 开始）"""
+        basename = os.path.basename(self.path)
+        return basename if self.page_count == 1 else f"{basename}#page={self.index + 1}"
+
+    @property
+    def is_pdf(self):
+        return os.path.splitext(self.path)[1].lower() in PDF_EXTENSIONS
+
+    def load(self, dpi=DEFAULT_RENDER_DPI, use_text_layer=True, min_text_chars=DEFAULT_TEXT_MIN_CHARS):
+        """读取这一页：PDF 已有文字层时只取文字，否则渲染为图片
+
+        Args:
+            dpi: PDF 页面的渲染分辨率（TIFF 按原始像素解码）
+            use_text_layer: 是否使用 PDF 的文字层
+            min_text_chars: 文字层至少有多少个非空白字符时才使用
+
+        Returns:
+            tuple: (文字层 OCRPage 或 None, RGB PIL 图片或 None, 图片像素 / 原始尺寸)；使用文字层时不渲染图片
+        """
+        if self.is_pdf:
+            with _open_pdf(self.path) as document:
+                pdf_page = document[self.index]
+                if use_text_layer:
+                    text_page = _pdf_text_layer(pdf_page, min_text_chars)
+                    if text_page is not None:
+                        return text_page, None, 1.0
+                return None, _render_pdf_page(pdf_page, dpi), dpi / 72
+        return None, _read_tiff_frame(self.path, self.index), 1.0
+
+    def render(self, dpi=DEFAULT_RENDER_DPI):
+        """渲染为 RGB PIL 图片（不使用文字层），返回 (图片, 图片像素 / 原始尺寸)"""
+        _, image, scale = self.load(dpi, use_text_layer=False)
+        return image, scale
+
+
+def iter_document_pages(path):
+    """逐页产出文档的 DocumentPage（只读取页数，不渲染）
+
+    Raises:
+        RuntimeError: PDF 但未安装 PyMuPDF
+        ValueError: PDF 已加密
+    """
+    page_count = count_pages(path)
+    for index in range(page_count):
+        yield DocumentPage(str(path), index, page_count)
+
+
+def expand_sources(paths, log=None):
+    """把图片和文档路径展开为逐页的输入：图片路径原样产出，PDF/TIFF 展开为各页的 DocumentPage
+
+    无法打开的文档记录错误后跳过。
+    """
+    log = log or logger
+    for path in paths:
+        if not is_document(path):
+            yield path
+            continue
+        try:
+            pages = list(iter_document_pages(path))
+        except Exception as e:
+            log.error(f"Cannot open document {path}: {e}")
+            continue
+        yield from pages
+
+
+def source_name(source):
+    """输入（图片路径或 DocumentPage）的名称"""
+    return source.name if isinstance(source, DocumentPage) else os.path.basename(str(source))
+
+
+def source_file(source):
+    """输入对应的文件路径（DocumentPage 为文档路径）"""
+    return source.path if isinstance(source, DocumentPage) else str(source)
+
+
+def _pdf_text_layer(pdf_page, min_text_chars):
+    """PDF 页面的文字层转换为 OCRPage（每个文字行一个文本框，置信度为 1），文字不足时返回 None"""
+    from ocr_page import OCRPage
+
+    # 文字坐标是未旋转页面的坐标，按页面旋转换算到显示（渲染）方向
+    matrix = pdf_page.rotation_matrix
+    boxes, texts = [], []
+    for block in pdf_page.get_text("dict", sort=True)["blocks"]:
+        for line in block.get("lines", ()):  # 图片块没有 lines
+            text = "".join(span["text"] for span in line["spans"]).strip()
+            if not text:
+                continue
+            x0, y0, x1, y1 = line["bbox"]
+            corners = [(x * matrix.a + y * matrix.c + matrix.e, x * matrix.b + y * matrix.d + matrix.f)
+                       for x, y in ((x0, y0), (x1, y0), (x1, y1), (x0, y1))]
+            boxes.append(corners)
+            texts.append(text)
+    if sum(len("".join(text.split())) for text in texts) < min_text_chars:
+        return None
+    return OCRPage(boxes or None, [1.0] * len(texts), texts)
+
+
+def _render_pdf_page(pdf_page, dpi):
+    from PIL import Image
+
+    pixmap = pdf_page.get_pixmap(dpi=dpi, alpha=False)
+    return Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+
+
+def _read_tiff_frame(path, index):
+    from PIL import Image, ImageOps
+
+    with Image.open(path) as tiff:
+        tiff.seek(index)
+        frame = ImageOps.exif_transpose(tiff)
+        if frame.mode.startswith("I"):
+            # 16 位灰度帧缩放到 8 位
+            frame = frame.convert("I").point(lambda value: value / 256).convert("L")
+        return frame.convert("RGB")
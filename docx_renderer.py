@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Word 文档渲染
+- 把 OCR 版面元素渲染为 python-docx 文档内容（段落、表格）
+- 段落和表格序列由 page_content 按版面顺序生成（与 Markdown、纯文本输出共用），本模块只负责写入 Word
+- 特殊表格图片通过 special_table_handlers 注册表分发到定制处理函数（直接写 Word 文档），
+  只需要段落和表格的定制逻辑注册到 page_content.special_content_handlers 即可对所有输出格式生效
+- HTML 表格、几何重建的表格和特殊表格都先转换为 TableGrid，由 docx_table_writer 一次生成 Word 表格 XML（含合并单元格）
+- 渲染和特殊表格处理函数都基于列式的 OCRPage（文本框数组、文字列表），不再逐层判断嵌套列表的类型
+"""
+from docx import Document
+from docx.shared import Pt
+
+from docx_table_writer import add_table_grid_to_docx
+from ocr_page import OCRPage
+from page_content import PARAGRAPH, html_table_content, iter_page_content, segment_text, table_6jpg_content  # noqa: F401
+
+
+def add_table_from_html_to_docx(doc, html_content):
+    """Parses an HTML table and adds it to the Word document."""
+    write_content(doc, html_table_content(html_content))
+
+
+def write_content(doc, content):
+    """把 page_content 的段落和表格序列写入 Word 文档"""
+    for kind, value in content:
+        if kind == PARAGRAPH:
+            doc.add_paragraph(value)
+        else:
+            add_table_grid_to_docx(doc, value)
+
+
+# ====== 特殊表格处理函数注册表及实现 ======
+def handle_table_6jpg(doc, page):
+    write_content(doc, table_6jpg_content(page))
+
+
+special_table_handlers = {
+    "6.jpg": handle_table_6jpg,
+    # 未来可继续添加更多特殊表格图片
+}
+
+
+def render_layout_elements(doc, filename, layout_elements, special_handlers=True):
+    """Render the OCR result of one image into the Word document.
+
+    ``layout_elements`` may be an ``OCRPage`` or the raw PaddleOCR layout element
+    list. Special table images registered in ``special_table_handlers`` are
+    dispatched to their handler (which receives the ``OCRPage``) unless
+    ``special_handlers`` is False, everything else goes through
+    ``page_content.iter_page_content`` in page order.
+    """
+    page = OCRPage.coerce(layout_elements)
+    if special_handlers and filename in special_table_handlers and (len(page) or page.blocks):
+        special_table_handlers[filename](doc, page)
+    else:
+        write_content(doc, iter_page_content(filename, page, special_handlers))
+
+
+def create_document(config):
+    """Create an empty Word document with the configured default font."""
+    doc = Document()
+    style = doc.styles["Normal"]
+    style.font.name = config.get("font_name", "SimSun")  # Allow font config
+    style.font.size = Pt(config.get("font_size", 11))  # Allow font size config
+    return doc
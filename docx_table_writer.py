@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Word 表格直接写入
+- 由 TableGrid 一次性生成整张表格的 w:tbl 行 XML（合并单元格用 w:gridSpan / w:vMerge 表示），一次解析后挂到表格下
+- python-docx 的 table.cell(r, c) 和 merge() 每次调用都要重新遍历表格网格，大表格的写入耗时随单元格数平方增长；
+  这里每个单元格只处理一次，写入耗时与单元格数成正比
+- 表头行（TableGrid.header_rows）标记为 w:tblHeader，跨页时在每页重复
+"""
+import re
+from xml.sax.saxutils import escape
+
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+
+# XML 1.0 不允许的控制字符（OCR 偶尔会识别出来），写入前去掉
+_INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _run_xml(text):
+    """单元格文字对应的段落内容：换行为 w:br，制表符为 w:tab（与 python-docx 的 cell.text 赋值一致）"""
+    if not text:
+        return ""
+    parts = []
+    for index, line in enumerate(_INVALID_XML_CHARS.sub("", text).split("\n")):
+        if index:
+            parts.append("<w:br/>")
+        for tab_index, segment in enumerate(line.split("\t")):
+            if tab_index:
+                parts.append("<w:tab/>")
+            if segment:
+                parts.append(f'<w:t xml:space="preserve">{escape(segment)}</w:t>')
+    return f"<w:r>{''.join(parts)}</w:r>"
+
+
+def _cell_xml(width, colspan, vmerge, text=""):
+    properties = f'<w:tcW w:w="{width}" w:type="dxa"/>'
+    if colspan > 1:
+        properties += f'<w:gridSpan w:val="{colspan}"/>'
+    if vmerge == "restart":
+        properties += '<w:vMerge w:val="restart"/>'
+    elif vmerge == "continue":
+        properties += "<w:vMerge/>"
+    return f"<w:tc><w:tcPr>{properties}</w:tcPr><w:p>{_run_xml(text)}</w:p></w:tc>"
+
+
+def table_rows_xml(grid, col_widths):
+    """生成表格全部行（w:tr）的 XML 片段
+
+    Args:
+        grid: TableGrid
+        col_widths: 每列宽度（twips）
+
+    Returns:
+        str: 依次拼接的 w:tr 元素
+    """
+    n_rows, n_cols = grid.n_rows, grid.n_cols
+    # owners[row][col]：覆盖该位置的单元格；同一位置被多个单元格覆盖时（不规范的 HTML）保留先出现的
+    owners = [[None] * n_cols for _ in range(n_rows)]
+    for cell in grid.cells:
+        if not (0 <= cell.row < n_rows and 0 <= cell.col < n_cols) or owners[cell.row][cell.col] is not None:
+            continue
+        row_end = min(cell.row + max(cell.rowspan, 1), n_rows)
+        col_end = cell.col + 1
+        # 向右扩展到第一个已被占用的位置为止
+        while col_end < min(cell.col + max(cell.colspan, 1), n_cols) and owners[cell.row][col_end] is None:
+            col_end += 1
+        for row in range(cell.row, row_end):
+            row_owners = owners[row]
+            if any(row_owners[col] is not None for col in range(cell.col, col_end)):
+                row_end = row
+                break
+            row_owners[cell.col:col_end] = [cell] * (col_end - cell.col)
+
+    rows_xml = []
+    header_xml = "<w:trPr><w:tblHeader/></w:trPr>"
+    for row in range(n_rows):
+        row_owners = owners[row]
+        cells_xml = []
+        col = 0
+        while col < n_cols:
+            cell = row_owners[col]
+            if cell is None:
+                cells_xml.append(_cell_xml(col_widths[col], 1, None))
+                col += 1
+                continue
+            span = 1
+            while col + span < n_cols and row_owners[col + span] is cell:
+                span += 1
+            width = sum(col_widths[col:col + span])
+            if cell.row == row:
+                spans_rows = row + 1 < n_rows and owners[row + 1][col] is cell
+                cells_xml.append(_cell_xml(width, span, "restart" if spans_rows else None, cell.text))
+            else:
+                cells_xml.append(_cell_xml(width, span, "continue"))
+            col += span
+        row_properties = header_xml if row < grid.header_rows else ""
+        rows_xml.append(f"<w:tr>{row_properties}{''.join(cells_xml)}</w:tr>")
+    return "".join(rows_xml)
+
+
+def add_table_grid_to_docx(doc, grid, style="Table Grid"):
+    """把 TableGrid 写入 Word 文档末尾
+
+    Args:
+        doc: python-docx Document
+        grid: TableGrid
+        style: 表格样式名
+
+    Returns:
+        docx.table.Table: 新建的表格
+    """
+    # 由 python-docx 创建空表格（表格属性、列宽定义和样式），行由一次解析的 XML 片段追加
+    docx_table = doc.add_table(rows=0, cols=grid.n_cols)
+    if style:
+        docx_table.style = style
+    tbl = docx_table._tbl
+    col_widths = [int(grid_col.get(qn("w:w"))) for grid_col in tbl.tblGrid.iterchildren(qn("w:gridCol"))]
+    fragment = parse_xml(f"<w:tbl {nsdecls('w')}>{table_rows_xml(grid, col_widths)}</w:tbl>")
+    tbl.extend(list(fragment))
+    return docx_table
@@ -4,38 +4,72 @@
 - 支持指定图片（如6.jpg）自动还原为带边框的Word表格，表头和数据结构与原图一致
 - 其余图片全部按普通段落输出
 - 自动分割表格与正文内容，正文不会被误放入表格
-- 新增：支持输出为PDF格式
+- 新增：支持输出为PDF格式（原生PDF输出：重排文字或原图加不可见文字层，不需要 docx2pdf / Microsoft Word）
+- 新增：支持 JSON、Markdown、纯文本输出（--format json,md,txt），可与 docx 组合，每张图片只识别一次
+- 新增：支持多页 PDF / TIFF 输入，逐页渲染和识别；已有文字层的 PDF 页面直接使用文字层，跳过 OCR
 """
 import os
 import glob
+import importlib
+import importlib.util
 import re
+import signal
 import sys 
+import time
 import argparse # 新增 argparse 用于更灵活的命令行参数处理
 from pathlib import Path # 新增 pathlib
 
+# 脚本开始时间（用于统计冷启动到第一张图片识别完成的耗时）
+SCRIPT_START_TIME = time.perf_counter()
+
 # import yaml # No longer needed here
 # import logging # No longer needed here, managed by utils
-from PIL import Image, ImageEnhance, ImageFilter
-import numpy as np  # Added
-from paddleocr import PaddleOCR
-from docx import Document
-from docx.shared import Pt
-from bs4 import BeautifulSoup  # Added
 
 # Import utility functions
 from utils import load_config, setup_logging  # Added
+# 启动时只导入轻量模块；python-docx、NumPy、Pillow、OCR 引擎等在 main() 中用到时才导入，
+# 解析参数（--help、参数错误）和不需要的功能（PDF 转换、多进程、增量清单、流式写入）不再付出导入耗时
+import metrics
+from image_preprocess import PREPROCESS_PROFILES
+from ocr_backends import OCR_BACKENDS
+
+# 保留原有函数名的导入（兼容直接从本脚本导入这些函数的调用方），首次访问时才导入所在模块
+_COMPAT_EXPORTS = {
+    "add_table_from_html_to_docx": "docx_renderer",
+    "create_document": "docx_renderer",
+    "handle_table_6jpg": "docx_renderer",
+    "render_layout_elements": "docx_renderer",
+    "segment_text": "docx_renderer",
+    "special_table_handlers": "docx_renderer",
+    "ExtractionEngine": "extraction_engine",
+    "ImageResult": "extraction_engine",
+    "extract_layout_elements": "extraction_engine",
+    "extract_text_from_image": "extraction_engine",
+}
+
+
+def __getattr__(name):
+    module_name = _COMPAT_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module_name), name)
+
+
+# 目录扫描时读取的输入文件：JPG 图片，以及逐页处理的 PDF、TIFF 文档
+INPUT_GLOB_PATTERNS = ("*.jpg", "*.pdf", "*.tif", "*.tiff")
+
+# 流式写入时当前分卷写到第 20、40、80……张图片时重新组装一次，进程被强制结束（kill -9、断电）时磁盘上仍有可打开的文档
+DEFAULT_CHECKPOINT_EVERY = 20
 
-# Global logger instance, will be initialized in main
-logger = None  # Added
+# 只检查 docx2pdf 是否已安装，转换时才导入（Windows 下会连带导入 win32com）；未安装时脚本仍可生成docx
+DOCX2PDF_AVAILABLE = importlib.util.find_spec("docx2pdf") is not None
+
+
+def convert_docx_to_pdf(docx_path, pdf_path):
+    """调用 docx2pdf 转换（首次调用时导入）"""
+    from docx2pdf import convert
+    convert(docx_path, pdf_path)
 
-# 尝试导入 docx2pdf，如果失败则记录错误，但脚本仍可生成docx
-try:
-    from docx2pdf import convert as convert_docx_to_pdf
-    DOCX2PDF_AVAILABLE = True
-except ImportError:
-    DOCX2PDF_AVAILABLE = False
-    # logger is not yet initialized here, so we can't use it.
-    # We'll log this when the script main function runs.
 
 # def load_config(config_path='config.yaml'): # Removed
 #     """Load configuration from a YAML file."""
@@ -83,221 +117,6 @@ except ImportError:
 #     logger.addHandler(console_handler)
 
 
-def add_table_from_html_to_docx(doc, html_content):
-    """Parses an HTML table and adds it to the Word document."""
-    global logger
-    soup = BeautifulSoup(html_content, "html.parser")
-    table_tag = soup.find("table")
-
-    if not table_tag:
-        if logger:
-            logger.warning(
-                "No <table> tag found in the HTML content provided for table extraction."
-            )
-        doc.add_paragraph("[Warning: Could not find table structure in provided HTML]")
-        return
-
-    html_rows = table_tag.find_all("tr")
-
-    max_cols = 0
-    for hr in html_rows:
-        cols_in_row = 0
-        for cell in hr.find_all(["td", "th"]):
-            cols_in_row += int(cell.get("colspan", 1))
-        if cols_in_row > max_cols:
-            max_cols = cols_in_row
-
-    if max_cols == 0 and not html_rows:
-        if logger:
-            logger.info("HTML table has no rows or columns.")
-        doc.add_paragraph("[Empty Table]")
-        return
-    if max_cols == 0 and html_rows:
-        if logger:
-            logger.warning(
-                "HTML table has rows but no discernible columns. Adding as simple list."
-            )
-        for r_idx, hr in enumerate(html_rows):
-            row_text_parts = [
-                cell.get_text(separator=" ", strip=True)
-                for cell in hr.find_all(["td", "th"])
-            ]
-            doc.add_paragraph(f"Row {r_idx+1}: {', '.join(row_text_parts)}")
-        return
-
-    grid = [[None for _ in range(max_cols)] for _ in range(len(html_rows))]
-    temp_rows_for_docx = []
-
-    for r_idx, hr in enumerate(html_rows):
-        current_row_for_docx = []
-        c_idx_grid = 0
-        for cell in hr.find_all(["td", "th"]):
-            while c_idx_grid < max_cols and grid[r_idx][c_idx_grid] is not None:
-                c_idx_grid += 1
-
-            if c_idx_grid >= max_cols:
-                continue
-
-            text = cell.get_text(separator="\n", strip=True)
-            colspan = int(cell.get("colspan", 1))
-            rowspan = int(cell.get("rowspan", 1))
-
-            current_row_for_docx.append(
-                {"text": text, "colspan": colspan, "rowspan": rowspan}
-            )
-
-            for i in range(rowspan):
-                for j in range(colspan):
-                    if r_idx + i < len(grid) and c_idx_grid + j < max_cols:
-                        if i == 0 and j == 0:
-                            grid[r_idx + i][c_idx_grid + j] = text
-                        else:
-                            grid[r_idx + i][c_idx_grid + j] = "MERGED_CELL_PLACEHOLDER"
-            c_idx_grid += colspan
-        temp_rows_for_docx.append(current_row_for_docx)
-
-    if not temp_rows_for_docx and not html_rows:
-        if logger:
-            logger.info("No data extracted from HTML table for docx table creation.")
-        if html_rows:
-            doc.add_paragraph("[Warning: Could not parse cells from HTML table rows]")
-        return
-
-    if not html_rows:
-        return
-
-    docx_table = doc.add_table(rows=len(html_rows), cols=max_cols)
-    docx_table.style = "Table Grid"
-
-    for r_idx, row_content in enumerate(temp_rows_for_docx):
-        c_idx_docx = 0
-        for cell_info in row_content:
-            if c_idx_docx >= max_cols:
-                break
-
-            text = cell_info["text"]
-            colspan = cell_info["colspan"]
-            rowspan = cell_info["rowspan"]
-
-            current_docx_cell = docx_table.cell(r_idx, c_idx_docx)
-            current_docx_cell.text = text
-
-            if colspan > 1 or rowspan > 1:
-                br_r = r_idx + rowspan - 1
-                br_c = c_idx_docx + colspan - 1
-                if br_r < len(html_rows) and br_c < max_cols:
-                    try:
-                        current_docx_cell.merge(docx_table.cell(br_r, br_c))
-                    except Exception as e:
-                        if logger:
-                            logger.warning(
-                                f"Could not merge cells for ({r_idx},{c_idx_docx}) to ({br_r},{br_c}): {e}"
-                            )
-                else:
-                    if logger:
-                        logger.warning(
-                            f"Merge region ({r_idx},{c_idx_docx}) to ({br_r},{br_c}) out of bounds for table ({len(html_rows)},{max_cols})."
-                        )
-
-            c_idx_docx += colspan
-
-
-def extract_layout_elements(image_path, ocr_instance):
-    """Extract layout elements (text, tables, figures) from an image."""
-    global logger
-    try:
-        # Pass the original image path directly to PaddleOCR
-        result = ocr_instance.ocr(image_path, cls=True)
-
-        if logger:
-            # Log a snippet of the raw result to understand its structure
-            logger.debug(
-                f"Raw OCR result for {image_path} (layout=True mode, no preprocessing): {str(result)[:1500]}"
-            )
-
-        if not result:
-            if logger:
-                logger.warning(f"OCR returned empty result for {image_path}.")
-            return []
-
-        if isinstance(result, list) and len(result) > 0:
-            page_elements = result[0]
-
-            if isinstance(page_elements, list):
-                if logger and page_elements:
-                    first_elem_type = (
-                        type(page_elements[0])
-                        if page_elements
-                        else "empty list (page_elements was empty)"
-                    )
-                    element_count = len(page_elements)
-                    logger.debug(
-                        f"Extracted page_elements for {image_path}. Count: {element_count}. Type of first element: {first_elem_type}. Content (first 1000 chars): {str(page_elements)[:1000]}"
-                    )
-                elif logger and not page_elements:
-                    logger.debug(
-                        f"Extracted page_elements for {image_path} is an empty list."
-                    )
-                return page_elements
-            else:
-                if logger:
-                    logger.warning(
-                        f"Expected result[0] to be a list of elements for {image_path}, but got {type(page_elements)}. Content: {str(page_elements)[:500]}"
-                    )
-                return []
-        else:
-            if logger:
-                logger.warning(
-                    f"OCR result for {image_path} is not in the expected list format or is empty. Result: {str(result)[:500]}"
-                )
-            return []
-
-    except Exception as e:
-        if logger:
-            logger.error(
-                f"Error during layout extraction from {image_path}: {e}", exc_info=True
-            )
-        return []
-
-
-def extract_text_from_image(image_path, ocr_instance):
-    """Extract text from an image using PaddleOCR."""
-    global logger  # Ensure we are using the global logger
-    try:
-        # Perform OCR on the image
-        result = ocr_instance.ocr(image_path, cls=True)
-
-        text_lines = []
-        if result and len(result) > 0 and result[0] is not None:
-            for line in result[0]:
-                if line and len(line) > 1 and line[1] and len(line[1]) > 0:
-                    text_lines.append(line[1][0])
-
-        if not text_lines:
-            if logger:  # Check if logger is initialized
-                logger.warning(f"No text detected in {image_path}")
-            else:  # Fallback if logger somehow not set, though it should be
-                print(f"Warning: No text detected in {image_path}")
-            return "No text detected in this image."
-
-        text = "\n".join(text_lines)
-        return text
-    except Exception as e:
-        if logger:  # Check if logger is initialized
-            logger.error(f"Error processing {image_path}: {e}", exc_info=True)
-        else:
-            print(f"Error processing {image_path}: {e}")
-        return f"Error processing image: {str(e)}"
-
-
-def segment_text(text):
-    """Segment the extracted text into paragraphs."""
-    paragraphs = [p.strip() for p in text.split("\n") if p.strip()]
-    if not paragraphs:
-        return [text]
-    return paragraphs
-
-
 def natural_sort_key(s):
     """Sort strings with numbers in natural order (1.jpg, 2.jpg, ..., 10.jpg)."""
     return [
@@ -305,73 +124,35 @@ def natural_sort_key(s):
     ]
 
 
-# ====== 特殊表格处理函数注册表及实现 ======
-def handle_table_6jpg(doc, layout_elements):
-    import numpy as np
-
-    # 1. 先输出"15."和"材料1"为段落
-    y_centers = [np.mean([point[1] for point in e[0]]) for e in layout_elements]
-    sorted_indices = np.argsort(y_centers)
-    top_indices = sorted_indices[:2]
-    for idx in top_indices:
-        doc.add_paragraph(layout_elements[idx][1][0])
-    # 2. 遍历OCR结果，找到"西汉""唐代""北宋"各自的索引
-    ocr_texts = [e[1][0] for e in layout_elements]
-    dynasty_indices = []
-    for dynasty in ["西汉", "唐代", "北宋"]:
-        try:
-            idx = ocr_texts.index(dynasty)
-            dynasty_indices.append(idx)
-        except ValueError:
-            pass
-    # 3. 构造表头两行
-    table = doc.add_table(rows=2 + len(dynasty_indices), cols=5)
-    table.style = "Table Grid"
-    # 第一行
-    table.cell(0, 0).text = ""
-    table.cell(0, 1).text = "南方"
-    table.cell(0, 1).merge(table.cell(0, 2))
-    table.cell(0, 3).text = "北方"
-    table.cell(0, 3).merge(table.cell(0, 4))
-    # 第二行
-    table.cell(1, 0).text = "朝代"
-    table.cell(1, 1).text = "人口（户）"
-    table.cell(1, 2).text = "占全国户口数比例"
-    table.cell(1, 3).text = "人口（户）"
-    table.cell(1, 4).text = "占全国户口数比例"
-    # 4. 依次填入三行数据
-    for row, idx in enumerate(dynasty_indices):
-        row_cells = ocr_texts[idx : idx + 6]  # 朝代+5个数据
-        for col in range(6):
-            if col < len(row_cells) and col < 6:
-                if col < 5:
-                    table.cell(2 + row, col).text = row_cells[col]
-    doc.add_paragraph()
-    # 5. 只输出表格最后一个数据单元格（如'37.1%'）之后的内容为段落
-    try:
-        last_table_idx = ocr_texts.index("37.1%")
-    except ValueError:
-        last_table_idx = (
-            max(idx + 5 for idx in dynasty_indices) if dynasty_indices else -1
-        )
-    for i, text in enumerate(ocr_texts):
-        if i > last_table_idx:
-            doc.add_paragraph(text)
+def recover_interrupted_output(output_path, config, logger):
+    """把上次中断的流式写入留下的正文片段组装为 <原文件名>_recovered.docx，避免被本次运行覆盖
 
+    Args:
+        output_path: 本次运行的 DOCX 输出路径（分卷时为分卷的基础路径）
+        config: 配置字典，用于生成与原运行相同的模板文档
+        logger: 日志记录器
+    """
+    from docx_renderer import create_document
+    from streaming_docx import BODY_SUFFIX, recover_partial_docx
 
-special_table_handlers = {
-    "6.jpg": handle_table_6jpg,
-    # 未来可继续添加更多特殊表格图片
-}
+    output_path = Path(output_path)
+    pattern = os.path.join(glob.escape(str(output_path.parent)), f"{glob.escape(output_path.stem)}*{output_path.suffix}{BODY_SUFFIX}")
+    for body_path in sorted(glob.glob(pattern)):
+        interrupted_path = Path(body_path[: -len(BODY_SUFFIX)])
+        recovered_path = interrupted_path.with_name(f"{interrupted_path.stem}_recovered{interrupted_path.suffix}")
+        try:
+            if recover_partial_docx(str(interrupted_path), create_document(config), recovered_path):
+                logger.warning(f"Recovered interrupted output '{interrupted_path}' as '{recovered_path}'")
+        except Exception as e:
+            logger.error(f"Could not recover interrupted output '{interrupted_path}': {e}", exc_info=True)
 
 
 # 所有特殊表格图片的处理逻辑都通过 special_table_handlers 字典注册，key为图片文件名，value为处理函数。
 # 6.jpg 的特殊还原逻辑已封装为 handle_table_6jpg，未来只需新增类似函数并注册即可。
 # 主循环自动分发，无需写一堆 if-else，结构清晰，易于维护和扩展。
 # #非特殊图片自动走通用表格还原逻辑。
-def main(input_path_arg=None, output_path_arg=None, output_format_arg='docx'): # Modified parameters
-    global logger  # Declare logger as global to assign the initialized logger
-
+def main(input_path_arg=None, output_path_arg=None, output_format_arg='docx', batch_recognition_arg=None, rec_batch_size_arg=None, profile_arg=None, backend_arg=None, workers_arg=None,
+         stream_arg=None, volume_size_arg=None, incremental_arg=None, pdf_engine_arg=None, pdf_mode_arg=None, text_layer_arg=None): # Modified parameters
     # Load configuration using the utility function
     config = load_config()  # Uses new function from utils
 
@@ -383,32 +164,59 @@ def main(input_path_arg=None, output_path_arg=None, output_format_arg='docx'): #
         config.get("log_file", "app.log"), logger_name
     )  # Uses new function
 
-    if not DOCX2PDF_AVAILABLE and output_format_arg == 'pdf':
-        logger.warning("docx2pdf library is not installed. PDF output will not be available. Falling back to DOCX.")
-        output_format_arg = 'docx' # Fallback to docx if library not present and PDF requested
+    # 各处理阶段的耗时按 JSON Lines 追加写入 metrics_file（为空时只在日志中输出汇总）
+    metrics.configure_jsonl(config.get("metrics_file"), source="cli")
 
-    logger.info("Script started.")
-    logger.info(f"Loaded configuration: {config}")
-    logger.info(f"Requested output format: {output_format_arg}")
+    # 可同时输出多种格式（如 "docx,json"），识别结果依次交给各个输出
+    from output_renderers import TEXT_OUTPUT_FORMATS, create_renderer, parse_output_formats
+    from pdf_renderer import PDF_MODES, pdf_options, resolve_pdf_engine
 
+    if pdf_mode_arg:
+        config["pdf_mode"] = pdf_mode_arg
     try:
-        logger.info(
-            "Initializing PaddleOCR for layout analysis (lang='ch', layout=True, use_gpu=False, show_log=False)..."
-        )
-        ocr = PaddleOCR(
-            use_angle_cls=True, lang="ch", layout=True, use_gpu=False, show_log=False
-        )
-        logger.info("PaddleOCR initialized successfully for layout analysis.")
-    except Exception as e:
-        logger.error(
-            f"Failed to initialize PaddleOCR for layout analysis: {e}", exc_info=True
-        )
+        output_formats = parse_output_formats(output_format_arg)
+        requested_pdf_engine = pdf_engine_arg or config.get("pdf_engine", "auto")
+        pdf_engine = resolve_pdf_engine(requested_pdf_engine, DOCX2PDF_AVAILABLE)
+        if config.get("pdf_mode", "text") not in PDF_MODES:
+            raise ValueError(f"不支持的 PDF 模式 '{config.get('pdf_mode')}'，可选: {', '.join(PDF_MODES)}")
+    except ValueError as e:
+        logger.error(str(e))
         return
+    if 'pdf' in output_formats and requested_pdf_engine == 'docx2pdf' and pdf_engine == 'native':
+        logger.warning("docx2pdf library is not installed. Using the native PDF renderer instead.")
+    # 原生 PDF 直接由识别结果生成；docx2pdf 方式由 DOCX 转换而来
+    native_pdf = 'pdf' in output_formats and pdf_engine == 'native'
+    # 只要求 json/md/txt/原生 PDF 时不生成 DOCX，也不导入 python-docx
+    write_docx = 'docx' in output_formats or ('pdf' in output_formats and not native_pdf)
+    text_formats = [fmt for fmt in output_formats if fmt in TEXT_OUTPUT_FORMATS] + (['pdf'] if native_pdf else [])
+
+    # 命令行指定的预处理配置、推理后端优先于配置文件（同时传给多进程模式的工作进程）
+    config_overrides = {}
+    if profile_arg:
+        config_overrides["preprocess_profile"] = profile_arg
+    if backend_arg:
+        config_overrides["ocr_backend"] = backend_arg
+    if text_layer_arg is not None:
+        config_overrides["pdf_text_layer"] = text_layer_arg
+    config.update(config_overrides)
+
+    # 目录扫描模式下可用多个进程并行识别，每个进程持有自己的 OCR 实例
+    workers = int(workers_arg or config.get("workers", 1))
+    use_worker_pool = workers > 1 and not input_path_arg
+
+    logger.info("Script started.")
+    logger.info(f"Loaded configuration: {config}")
+    logger.info(f"Requested output format: {', '.join(output_formats)}")
+
+    from extraction_engine import ExtractionEngine
+
+    engine = ExtractionEngine(config, logger)
+
+    doc = None
+    if write_docx:
+        from docx_renderer import create_document, render_layout_elements
 
-    doc = Document()
-    style = doc.styles["Normal"]
-    style.font.name = config.get("font_name", "SimSun")  # Allow font config
-    style.font.size = Pt(config.get("font_size", 11))  # Allow font size config
+        doc = create_document(config)
 
     logger.info("Using PaddleOCR for Chinese text recognition...")
 
@@ -422,11 +230,11 @@ def main(input_path_arg=None, output_path_arg=None, output_format_arg='docx'): #
         final_output_path_obj = Path(output_path_arg)
         # If PDF is requested, the intermediate docx will have the same stem
         intermediate_docx_path = str(final_output_path_obj.with_suffix('.docx'))
-        final_pdf_path = str(final_output_path_obj.with_suffix('.pdf')) if output_format_arg == 'pdf' else None
+        final_pdf_path = str(final_output_path_obj.with_suffix('.pdf')) if 'pdf' in output_formats else None
     else: # Fallback to config, assuming it's for docx by default
         intermediate_docx_path = config.get("output_filename", "extracted_text.docx")
         final_pdf_path = None # PDF conversion only if output_path_arg is explicitly for PDF
-        if output_format_arg == 'pdf':
+        if 'pdf' in output_formats:
             # If output_path_arg was not given, but PDF format is requested,
             # we derive the PDF name from the intermediate_docx_path
             final_pdf_path = str(Path(intermediate_docx_path).with_suffix('.pdf'))
@@ -442,112 +250,288 @@ def main(input_path_arg=None, output_path_arg=None, output_format_arg='docx'): #
     else:
         logger.info("No single image path provided via argument, falling back to config directory scan.")
         input_dir = config.get("input_directory", "his_pic")
-        logger.info(f"Looking for JPG images in directory: '{input_dir}'")
-        image_files_to_process = glob.glob(os.path.join(input_dir, "*.jpg"))
+        logger.info(f"Looking for JPG images and PDF/TIFF documents in directory: '{input_dir}'")
+        for pattern in INPUT_GLOB_PATTERNS:
+            image_files_to_process.extend(glob.glob(os.path.join(input_dir, pattern)))
         image_files_to_process.sort(key=natural_sort_key)
 
+    # PDF / TIFF 展开为逐页的输入（只读取页数），识别到某一页时才渲染该页
+    from document_pages import DocumentPage, expand_sources
+
+    image_files_to_process = list(expand_sources(image_files_to_process, logger))
+    document_page_count = sum(1 for source in image_files_to_process if isinstance(source, DocumentPage))
+
     if not image_files_to_process:
-        logger.warning(f"No JPG files found to process.")
+        logger.warning(f"No JPG, PDF or TIFF files found to process.")
         # If called with specific args and file not found, we would have returned already.
         # This warning now primarily covers the directory scan scenario.
         return
 
-    logger.info(f"Found {len(image_files_to_process)} image(s) to process.")
+    if document_page_count:
+        logger.info(
+            f"Found {len(image_files_to_process)} image(s) to process, including {document_page_count} page(s) "
+            f"from {len({source.path for source in image_files_to_process if isinstance(source, DocumentPage)})} PDF/TIFF document(s)."
+        )
+    else:
+        logger.info(f"Found {len(image_files_to_process)} image(s) to process.")
 
-    for image_idx, image_path in enumerate(image_files_to_process):
-        filename = os.path.basename(image_path)
-        # If processing multiple files (not from args), add heading and page break
-        if not (input_path_arg and output_path_arg):
-            doc.add_heading(f"Content from {filename}", level=1)
-        
-        logger.info(f"Processing {filename}...")
+    # 目录扫描模式下用输出文件旁的清单跳过未变化的图片，中断的运行可以从最后完成的图片继续
+    incremental = config.get("incremental", False) if incremental_arg is None else incremental_arg
+    manifest = None
+    files_to_recognize = image_files_to_process
+    if incremental and not input_path_arg:
+        from run_manifest import MANIFEST_SUFFIX, RunManifest
 
-        layout_elements = extract_layout_elements(image_path, ocr)
+        manifest = RunManifest(f"{intermediate_docx_path}{MANIFEST_SUFFIX}", engine.fingerprint, logger)
+        files_to_recognize = manifest.split(image_files_to_process)
+        logger.info(
+            f"Manifest '{manifest.path}': {manifest.reused} unchanged image(s) reused, "
+            f"{len(files_to_recognize)} new or changed image(s) to recognize."
+        )
 
-        if not layout_elements:
-            logger.warning(f"No content elements extracted from {filename}.")
-            doc.add_paragraph(f"[No content could be extracted from {filename}]\n")
-        else:
-            if filename in special_table_handlers:
-                special_table_handlers[filename](doc, layout_elements)
-            else: # Generic table/text processing
-                has_table = False
-                for element in layout_elements:
-                    if (
-                        isinstance(element, dict)
-                        and element.get("type", "").lower() == "table"
-                    ):
-                        html_content = element.get("res", {}).get("html")
-                        if html_content:
-                            logger.info(f"检测到通用表格，自动还原为Word表格: {filename}")
-                            add_table_from_html_to_docx(doc, html_content)
-                            doc.add_paragraph()
-                            has_table = True
-                if not has_table:
-                    # 没有检测到表格，按普通段落输出
-                    for element in layout_elements:
-                        if isinstance(element, dict):
-                            element_type = element.get("type", "").lower()
-                            if element_type == "text":
-                                text_content_list = element.get("res")
-                                extracted_lines = []
-                                if isinstance(text_content_list, list):
-                                    for item in text_content_list:
-                                        if isinstance(item, tuple) and len(item) == 2:
-                                            if (
-                                                isinstance(item[1], tuple)
-                                                and len(item[1]) == 2
-                                            ):
-                                                extracted_lines.append(item[1][0])
-                                            elif isinstance(item[0], str):
-                                                extracted_lines.append(item[0])
-                                        elif isinstance(item, str):
-                                            extracted_lines.append(item)
-                                elif (
-                                    isinstance(text_content_list, tuple)
-                                    and len(text_content_list) == 2
-                                    and isinstance(text_content_list[0], str)
-                                ):
-                                    extracted_lines.append(text_content_list[0])
-                                if extracted_lines:
-                                    full_text = "\n".join(extracted_lines)
-                                    paragraphs = segment_text(full_text)
-                                    for paragraph_text in paragraphs:
-                                        doc.add_paragraph(paragraph_text)
-                        elif isinstance(element, list) and len(element) == 2:
-                            text_tuple = element[1]
-                            if (
-                                isinstance(text_tuple, tuple)
-                                and len(text_tuple) == 2
-                                and isinstance(text_tuple[0], str)
-                            ):
-                                text_line = text_tuple[0]
-                                if text_line.strip():
-                                    paragraphs = segment_text(text_line)
-                                    for paragraph_text in paragraphs:
-                                        doc.add_paragraph(paragraph_text)
-
-        # If processing multiple files (not from args) and not the last image, add page break
-        if not (input_path_arg and output_path_arg) and image_idx < len(image_files_to_process) - 1:
-            doc.add_page_break()
+    # 所有图片都能从清单复用时不加载模型
+    if files_to_recognize and not use_worker_pool:
+        try:
+            engine.ocr  # 提前初始化模型，初始化失败时直接结束
+        except Exception as e:
+            logger.error(
+                f"Failed to initialize PaddleOCR for layout analysis: {e}", exc_info=True
+            )
+            return
 
+    # 目录扫描模式下可启用跨图片批量识别（命令行参数优先于配置文件）
+    batch_recognition = config.get("batch_recognition", False) if batch_recognition_arg is None else batch_recognition_arg
+    batch_stats = {}
+    pool = None
+    if not files_to_recognize:
+        results = []
+    elif use_worker_pool:
+        if batch_recognition:
+            logger.warning("--batch-rec is ignored when --workers is greater than 1.")
+        from ocr_worker_pool import OCRWorkerPool
+
+        pool = OCRWorkerPool(
+            workers,
+            config_path=os.path.abspath("config.yaml"),
+            task_timeout=config.get("worker_task_timeout", 300),
+            config_overrides=config_overrides,
+        )
+        logger.info(f"Starting {workers} OCR worker processes...")
+        try:
+            pool.start()
+        except Exception as e:
+            logger.error(f"Failed to start OCR worker processes: {e}", exc_info=True)
+            return
+        results = pool.iter_process(files_to_recognize)
+    elif batch_recognition and not input_path_arg:
+        rec_batch_size = rec_batch_size_arg or config.get("rec_batch_size", 32)
+        logger.info(f"Using cross-image batched recognition (batch size {rec_batch_size}).")
+        results = engine.iter_results_batched(files_to_recognize, rec_batch_size, batch_stats)
+    else:
+        results = engine.iter_results(files_to_recognize)
+    if manifest is not None:
+        results = manifest.iter_results(image_files_to_process, results)
+
+    # 指定了输入和输出文件时不加标题；单个多页文档的各页之间仍然分页
+    single_output = bool(input_path_arg and output_path_arg)
+    page_breaks = not single_output or len(image_files_to_process) > 1
+
+    # 流式写入：每张图片的内容写完即落盘，内存不随图片数量增长；可按 volume_size 张图片分卷
+    volume_size = int(config.get("volume_size", 0) if volume_size_arg is None else volume_size_arg)
+    stream_output = config.get("stream_output", False) if stream_arg is None else stream_arg
+    writer = None
+    if write_docx and (stream_output or volume_size):
+        from streaming_docx import StreamingDocxWriter
+
+        recover_interrupted_output(intermediate_docx_path, config, logger)
+        writer = StreamingDocxWriter(
+            intermediate_docx_path,
+            doc,
+            volume_size=volume_size,
+            checkpoint_every=config.get("docx_checkpoint_every", DEFAULT_CHECKPOINT_EVERY),
+            page_breaks=page_breaks,
+            logger=logger,
+        )
+        logger.info(f"Streaming DOCX output to '{intermediate_docx_path}'" + (f" in volumes of {volume_size} image(s)" if volume_size else ""))
+
+    # 按文件名注册的特殊表格处理函数可关闭，全部交给通用表格还原
+    use_special_handlers = config.get("use_special_table_handlers", True)
+    # json/md/txt/原生 PDF 输出与 DOCX 同名（扩展名不同），每张图片处理完即追加写入
+    renderers = []
+    for fmt in text_formats:
+        text_output_path = str(Path(intermediate_docx_path).with_suffix(f".{fmt}"))
+        options = pdf_options(config) if fmt == 'pdf' else {}
+        renderers.append(create_renderer(fmt, text_output_path, headings=not single_output,
+                                         special_handlers=use_special_handlers, **options))
+        logger.info(f"Writing {fmt} output to '{text_output_path}'" + (f" ({options['mode']} mode)" if options else ""))
+    preprocess_totals = {"decode_ms": 0.0, "resize_ms": 0.0}
+    failures = []
+    total_images = len(image_files_to_process)
+    # 文档页面的处理方式：text_layer（PDF 文字层）、ocr、reused（清单中未变化的结果）、failed
+    page_paths = {"text_layer": 0, "ocr": 0, "reused": 0, "failed": 0}
+    processed_images = 0
+    stopped_early = False
+    run_start_time = time.perf_counter()
     try:
-        # Always save as docx first
-        doc.save(intermediate_docx_path)
-        logger.info(f"Intermediate DOCX document saved as '{intermediate_docx_path}'")
+        for image_idx, result in enumerate(results):
+            processed_images += 1
+            if processed_images == 1:
+                # 冷启动耗时：脚本开始（导入、模型加载）到第一张图片识别完成
+                first_result_seconds = time.perf_counter() - SCRIPT_START_TIME
+                metrics.record_stage("first_result", first_result_seconds)
+                logger.info(f"First result ready {first_result_seconds:.2f}s after start")
+            filename = result.name
+            for key in preprocess_totals:
+                preprocess_totals[key] += result.timings.get(key, 0.0)
+            if not result.ok:
+                failures.append((filename, result.error))
+            reused = manifest is not None and manifest.is_reused(image_files_to_process[image_idx])
+            if reused:
+                logger.info(f"[{image_idx + 1}/{total_images}] {filename} unchanged, using stored result")
+            else:
+                logger.info(
+                    f"[{image_idx + 1}/{total_images}] {filename} {'done' if result.ok else 'FAILED'} in {result.elapsed:.2f}s"
+                    + (" (text layer)" if result.text_layer else "")
+                )
+            if result.page_index is not None:
+                page_paths["reused" if reused else "failed" if not result.ok else "text_layer" if result.text_layer else "ocr"] += 1
+            for renderer in renderers:
+                stage_name = "pdf_render" if renderer.output_format == 'pdf' else "text_render"
+                with metrics.stage(stage_name, format=renderer.output_format):
+                    renderer.add_result(result)
+            if not write_docx:
+                continue
+            # 流式写入时每张图片渲染到写入器提供的临时文档，分页符由写入器在图片之间插入
+            target_doc = writer.begin_section() if writer is not None else doc
+            # If processing multiple files (not from args), add heading and page break
+            if not single_output:
+                target_doc.add_heading(f"Content from {filename}", level=1)
+
+            with metrics.stage("docx_build"):
+                render_layout_elements(target_doc, filename, result.page, use_special_handlers)
+
+            if writer is not None:
+                writer.end_section()
+            # If processing multiple files (not from args) and not the last image, add page break
+            elif page_breaks and image_idx < total_images - 1:
+                doc.add_page_break()
+    except KeyboardInterrupt:
+        # Ctrl+C 或 SIGTERM（见脚本入口）：同样保存已完成的部分，流式写入时组装出可直接打开的 .docx
+        logger.warning("Interrupted, saving the images finished so far.")
+        stopped_early = True
+    except Exception as e:
+        # 工作进程超时或崩溃时保存已完成的部分
+        logger.error(f"Processing stopped early, saving the images finished so far: {e}", exc_info=True)
+        stopped_early = True
+    finally:
+        if pool is not None:
+            if stopped_early:
+                pool.terminate()
+            else:
+                pool.close()
+        docx_paths = None
+        if writer is not None:
+            # 中途出错时同样组装已写入的图片
+            try:
+                with metrics.stage("docx_save", streamed="true"):
+                    docx_paths = writer.close()
+            except Exception as e:
+                logger.error(f"Error saving streamed document '{intermediate_docx_path}': {e}", exc_info=True)
+                docx_paths = []
+        for renderer in renderers:
+            # 中途出错时同样保留已写入的图片
+            try:
+                renderer.close()
+                logger.info(f"Content extraction complete. {renderer.output_format} output saved as '{renderer.path}'")
+            except Exception as e:
+                logger.error(f"Error saving {renderer.output_format} output '{renderer.path}': {e}", exc_info=True)
+                renderer.abort()
+        if manifest is not None:
+            # 去掉已删除图片的记录；未处理到的图片记录保留，下次运行继续
+            try:
+                manifest.compact(image_files_to_process)
+            except Exception as e:
+                logger.error(f"Error compacting manifest '{manifest.path}': {e}", exc_info=True)
+
+    run_seconds = time.perf_counter() - run_start_time
+    metrics.record_stage("run", run_seconds, images=processed_images)
+    logger.info(
+        f"Processed {processed_images}/{total_images} image(s) in {run_seconds:.1f}s "
+        f"({processed_images / run_seconds if run_seconds > 0 else 0:.2f} images/sec, {workers if use_worker_pool else 1} process(es))"
+    )
+    if manifest is not None:
+        logger.info(f"Manifest: {manifest.reused} image(s) reused, {manifest.recorded} newly recorded")
+    if document_page_count:
+        logger.info(
+            f"Document pages: {page_paths['text_layer']} from the embedded text layer (OCR skipped), "
+            f"{page_paths['ocr']} recognized by OCR, {page_paths['reused']} reused from the manifest, {page_paths['failed']} failed"
+        )
+    if failures:
+        logger.warning(f"{len(failures)} image(s) failed:")
+        for failed_name, error in failures:
+            logger.warning(f"  {failed_name}: {error}")
+    logger.info(
+        f"Preprocess profile '{engine.preprocess['name']}': total decode {preprocess_totals['decode_ms']:.0f} ms, "
+        f"total resize {preprocess_totals['resize_ms']:.0f} ms"
+    )
+    if engine.adaptive_orientation and not use_worker_pool:
+        orientation_stats = engine.orientation_stats
+        logger.info(
+            f"Angle classifier skipped on {orientation_stats['cls_skipped_pages']}/{orientation_stats['pages']} pages "
+            f"({orientation_stats['cls_skipped_lines']} line runs skipped, {orientation_stats['cls_lines']} run, "
+            f"{orientation_stats['low_confidence_reruns']} low-confidence reruns)"
+        )
+    if engine.table_analyzer is not None and not use_worker_pool:
+        table_stats = engine.table_analyzer.stats
+        logger.info(
+            f"Table recognition: table regions on {table_stats['pages_with_table_regions']}/{table_stats['pages']} pages, "
+            f"{table_stats['tables']} table(s) recognized, {table_stats['ruling_rejected']} region(s) without ruling lines skipped "
+            f"(layout {table_stats['layout_seconds']:.2f}s, table model {table_stats['table_seconds']:.2f}s)"
+        )
+    parse_totals = metrics.registry.stage_totals("html_table_parse")
+    if parse_totals:
+        parsed_tables = sum(count for count, _ in parse_totals.values())
+        parse_seconds = sum(seconds for _, seconds in parse_totals.values())
+        fallbacks = parse_totals.get((("parser", "html.parser"),), (0, 0.0))[0]
+        logger.info(
+            f"HTML table parsing: {parsed_tables} table(s) in {parse_seconds * 1000:.1f} ms "
+            f"({parse_seconds * 1000 / parsed_tables:.2f} ms/table, {fallbacks} BeautifulSoup fallback(s))"
+        )
+    if engine.cache is not None and not use_worker_pool:
+        logger.info(f"OCR cache stats: {engine.cache.stats()}")
 
-        if output_format_arg == 'pdf':
-            if DOCX2PDF_AVAILABLE and final_pdf_path:
-                logger.info(f"Converting '{intermediate_docx_path}' to PDF at '{final_pdf_path}'...")
+    if not write_docx:
+        docx_paths = []
+    elif docx_paths is None:
+        try:
+            # Always save as docx first
+            with metrics.stage("docx_save"):
+                doc.save(intermediate_docx_path)
+            logger.info(f"Intermediate DOCX document saved as '{intermediate_docx_path}'")
+            docx_paths = [intermediate_docx_path]
+        except Exception as e:
+            logger.error(f"Error saving document '{intermediate_docx_path}': {e}", exc_info=True)
+            docx_paths = []
+
+    for docx_path in docx_paths:
+        # 分卷输出时每个分卷各自转换为同名 PDF
+        pdf_path = final_pdf_path if len(docx_paths) == 1 else (str(Path(docx_path).with_suffix('.pdf')) if final_pdf_path else None)
+        if 'pdf' in output_formats and not native_pdf:
+            if DOCX2PDF_AVAILABLE and pdf_path:
+                logger.info(f"Converting '{docx_path}' to PDF at '{pdf_path}'...")
                 try:
-                    convert_docx_to_pdf(intermediate_docx_path, final_pdf_path)
-                    logger.info(f"Successfully converted to PDF: '{final_pdf_path}'")
-                    # Optionally, remove the intermediate docx file
-                    try:
-                        os.remove(intermediate_docx_path)
-                        logger.info(f"Removed intermediate DOCX file: '{intermediate_docx_path}'")
-                    except OSError as e:
-                        logger.warning(f"Could not remove intermediate DOCX file '{intermediate_docx_path}': {e}")
+                    with metrics.stage("docx2pdf"):
+                        convert_docx_to_pdf(docx_path, pdf_path)
+                    logger.info(f"Successfully converted to PDF: '{pdf_path}'")
+                    # 同时要求 docx 输出时保留 DOCX，否则删除中间文件
+                    if 'docx' in output_formats:
+                        logger.info(f"Content extraction complete. Document saved as '{docx_path}'")
+                    else:
+                        try:
+                            os.remove(docx_path)
+                            logger.info(f"Removed intermediate DOCX file: '{docx_path}'")
+                        except OSError as e:
+                            logger.warning(f"Could not remove intermediate DOCX file '{docx_path}': {e}")
                 except Exception as e:
                     logger.error(f"Error converting DOCX to PDF: {e}", exc_info=True)
                     # If PDF conversion fails, the DOCX is still there.
@@ -555,26 +539,46 @@ def main(input_path_arg=None, output_path_arg=None, output_format_arg='docx'): #
                     # For now, we log the error. The script doesn't explicitly return failure here.
             elif not DOCX2PDF_AVAILABLE:
                 logger.error("PDF conversion requested, but docx2pdf library is not available. DOCX file was saved.")
-            elif not final_pdf_path:
+            elif not pdf_path:
                  logger.error("PDF conversion requested, but final PDF path could not be determined. DOCX file was saved.")
 
 
-        elif output_format_arg == 'docx':
-             logger.info(f"Content extraction complete. Document saved as '{intermediate_docx_path}'")
-
-
-    except Exception as e:
-        logger.error(f"Error saving document '{intermediate_docx_path}': {e}", exc_info=True)
+        elif 'docx' in output_formats:
+             logger.info(f"Content extraction complete. Document saved as '{docx_path}'")
 
+    stage_summary = metrics.registry.stage_summary()
+    if stage_summary:
+        # 多进程模式下识别相关阶段在工作进程中计时，只出现在 metrics_file 中
+        logger.info("Stage timings: " + ", ".join(
+            f"{stage_name} {total:.2f}s/{count}" for stage_name, (count, total) in sorted(stage_summary.items(), key=lambda item: -item[1][1])
+        ))
     logger.info("Script finished.")
 
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Extract text and tables from images to DOCX or PDF.")
-    parser.add_argument("input_path", nargs='?', default=None, help="Path to a single input image file.")
+    parser = argparse.ArgumentParser(description="Extract text and tables from images to DOCX, PDF, JSON, Markdown or plain text.")
+    parser.add_argument("input_path", nargs='?', default=None, help="Path to a single input image file, or a multi-page PDF/TIFF document.")
     parser.add_argument("output_path", nargs='?', default=None, help="Path for the output file (e.g., document.docx or document.pdf).")
-    parser.add_argument("--format", choices=['docx', 'pdf'], default='docx', help="Output format (docx or pdf). Default is docx.")
+    parser.add_argument("--format", default='docx', help="Output format: docx, pdf, json, md or txt; comma-separate several to write them from one OCR pass (e.g. docx,json). Default is docx.")
+    parser.add_argument("--pdf-engine", choices=['auto', 'native', 'docx2pdf'], default=None, help="How PDF output is produced: native renderer or docx2pdf via Microsoft Word (default: pdf_engine in config.yaml, or auto = docx2pdf when installed).")
+    parser.add_argument("--pdf-mode", choices=['text', 'image'], default=None, help="Native PDF layout: reflowed text, or the original image with an invisible searchable text layer (default: pdf_mode in config.yaml, or text).")
+    parser.add_argument("--batch-rec", dest="batch_rec", action="store_true", default=None, help="Directory mode: detect per image, then recognize text lines from many images in full batches.")
+    parser.add_argument("--rec-batch-size", type=int, default=None, help="Recognition batch size for --batch-rec (default: rec_batch_size in config.yaml, or 32).")
+    parser.add_argument("--backend", choices=list(OCR_BACKENDS), default=None, help="OCR inference backend (default: ocr_backend in config.yaml, or paddle).")
+    parser.add_argument("--workers", type=int, default=None, help="Directory mode: number of OCR processes, each with its own model (default: workers in config.yaml, or 1).")
+    parser.add_argument("--stream", dest="stream", action="store_true", default=None, help="Write each image to the DOCX as soon as it is processed (flat memory, partial output survives interruptions).")
+    parser.add_argument("--volume-size", type=int, default=None, help="Split the streamed output into volumes of N images (<name>_part001.docx, ...).")
+    parser.add_argument("--full", dest="incremental", action="store_false", default=None, help="Directory mode: ignore the manifest and recognize every image again.")
+    parser.add_argument("--incremental", dest="incremental", action="store_true", default=None, help="Directory mode: only recognize new or changed images, reusing results stored in <output>.manifest.jsonl.")
+    parser.add_argument("--profile", choices=list(PREPROCESS_PROFILES), default=None, help="Image pre-processing profile (default: preprocess_profile in config.yaml, or original).")
+    parser.add_argument("--no-text-layer", dest="text_layer", action="store_false", default=None, help="OCR every PDF page, even pages that already have an embedded text layer (default: pdf_text_layer in config.yaml).")
     
     args = parser.parse_args()
 
-    main(input_path_arg=args.input_path, output_path_arg=args.output_path, output_format_arg=args.format)
+    # SIGTERM 与 Ctrl+C 一样抛出 KeyboardInterrupt，main() 会保存已完成的图片后再退出
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    main(input_path_arg=args.input_path, output_path_arg=args.output_path, output_format_arg=args.format,
+         batch_recognition_arg=args.batch_rec, rec_batch_size_arg=args.rec_batch_size, profile_arg=args.profile,
+         backend_arg=args.backend, workers_arg=args.workers,
+         stream_arg=args.stream, volume_size_arg=args.volume_size, incremental_arg=args.incremental,
+         pdf_engine_arg=args.pdf_engine, pdf_mode_arg=args.pdf_mode, text_layer_arg=args.text_layer)
@@ -1,3 +1,11 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import ConversionJob
+
+
+@admin.register(ConversionJob)
+class ConversionJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'status', 'main_tab', 'output_format', 'merge_output', 'progress_done', 'progress_total', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('status', 'main_tab', 'output_format')
+    search_fields = ('user__username',)
+    readonly_fields = ('created_at', 'started_at', 'heartbeat_at', 'finished_at')
@@ -1,6 +1,35 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ConverterConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "converter"
+
+    def ready(self):
+        # 阶段耗时写入 METRICS_JSONL_PATH，并注册 /metrics/ 端点输出的队列深度和模型预热状态
+        # （后台工作进程中同样注册，由 worker_metrics 的快照汇总到 Web 端）
+        import metrics
+        from .pic_file_converter import get_ocr_execution_mode, models_warm
+
+        metrics.configure_jsonl(getattr(settings, 'METRICS_JSONL_PATH', None), source="web")
+        metrics.registry.gauge("ocr_queue_depth", "Uploaded images waiting for or undergoing OCR in this process.")
+        metrics.registry.set_gauge("ocr_queue_depth", 0)
+        metrics.registry.gauge("conversion_steps", "Per-file conversion steps (OCR scripts, PDF conversions) queued or running in the shared executor, by state.")
+        metrics.registry.gauge(
+            "models_warm",
+            "1 if the OCR models are loaded for the configured execution mode (pool/inprocess), else 0.",
+            callback=lambda: {(("mode", get_ocr_execution_mode()),): models_warm()},
+        )
+        # 数据库队列中排队和执行中的任务数，在 Web 进程中输出时直接查询数据库
+        metrics.registry.gauge(
+            "conversion_jobs",
+            "Conversion jobs in the database queue, by status (queued/running).",
+            callback=_count_active_jobs,
+        )
+
+
+def _count_active_jobs():
+    from .job_queue import count_active_jobs
+
+    return count_active_jobs()
@@ -0,0 +1,613 @@
+"""
+转换任务的处理逻辑（原 process_images_view 中的上传后处理部分）
+- 图片识别、Word/PPT 准备、合并与逐个转换都在 run_conversion 中完成，不依赖 HTTP 请求，
+  由后台任务工作进程（manage.py run_conversion_jobs）或同步模式下的视图调用
+- 提示信息不再写入 Django messages（后台执行时没有请求），随结果一起返回给前端显示
+- 处理过程中通过 on_event 逐个文件报告进度（识别开始/完成、生成、合并、出错），不合并时每个文件生成后立即报告下载地址
+- 各文件互不依赖的步骤（OCR 脚本、PPT 转 PDF、逐个转换 PDF）提交给有界线程池（task_executor）并行执行，
+  结果按上传顺序返回，某个文件出错只影响该文件；合并在全部输入完成后立即开始
+"""
+import importlib.util # 检查可选依赖是否已安装（不导入）
+import logging
+import os
+import random
+import shutil
+import string
+import sys
+import threading
+from concurrent.futures import as_completed
+
+from django.conf import settings
+
+import metrics # 阶段耗时指标（项目根目录的 metrics.py）
+from output_renderers import TEXT_OUTPUT_FORMATS, merge_output_files # JSON/Markdown/纯文本输出（项目根目录）
+from pdf_renderer import resolve_pdf_engine # 原生 PDF 输出（项目根目录，导入时只用标准库）
+
+from .document_merge import merge_docx_files, merge_pdf_files # 合并多个DOCX/PDF
+from .pic_file_converter import process_images_to_files # 导入图片转文件模块
+from .ppt_pdf_converter import convert_pptx_to_pdf # 导入PPT转换模块
+from .task_executor import BoundedExecutor # 逐个文件的步骤并行执行
+
+logger = logging.getLogger('converter')
+
+# PyPDF2 / docx2pdf 只在实际合并或转换 PDF 时才导入，启动时仅检查是否已安装（docx2pdf 在 Windows 下会连带导入 win32com）
+PYPDF2_AVAILABLE = importlib.util.find_spec("PyPDF2") is not None
+if not PYPDF2_AVAILABLE:
+    logger.warning("PyPDF2 library is not installed. Merging multiple PPT/PPTX files into a single PDF will not be available.")
+
+DOCX2PDF_AVAILABLE_IN_VIEW = importlib.util.find_spec("docx2pdf") is not None
+
+# 表示一个文件已处理完（计入进度）的事件阶段
+FILE_FINISHED_STAGES = ('ocr_done', 'converted', 'error')
+
+
+# docx2pdf 通过 Word（COM）转换，同一时间只能有一个转换，并行执行的文件在这里依次转换
+_DOCX2PDF_LOCK = threading.Lock()
+
+
+def convert_docx_to_pdf(docx_path, pdf_path):
+    """调用 docx2pdf 转换（首次调用时导入）；可在线程池中调用，转换之间互斥"""
+    from docx2pdf import convert
+    with _DOCX2PDF_LOCK:
+        if sys.platform == 'win32':
+            # 线程池中的线程需要先初始化 COM
+            import pythoncom
+            pythoncom.CoInitialize()
+            try:
+                convert(docx_path, pdf_path)
+            finally:
+                pythoncom.CoUninitialize()
+        else:
+            convert(docx_path, pdf_path)
+
+
+def user_date_dirs(username, date_str):
+    """用户某一天的上传目录和转换结果目录（his_pic/<用户名>/<YYYYMMDD>/uploads、converted_files），不存在时创建"""
+    user_base_dir = os.path.join(settings.BASE_DIR, 'his_pic', username, date_str)
+    user_upload_dir = os.path.join(user_base_dir, 'uploads')
+    user_converted_dir = os.path.join(user_base_dir, 'converted_files')
+    os.makedirs(user_upload_dir, exist_ok=True)
+    os.makedirs(user_converted_dir, exist_ok=True)
+    return user_upload_dir, user_converted_dir
+
+
+def run_conversion(username, date_str, uploaded_files_info_from_frontend, main_tab, sub_tab, output_format, merge_output, on_event=None):
+    """
+    处理已保存的上传文件：识别或准备各文件，再合并或逐个转换为最终格式
+
+    Args:
+        username: 用户名（结果保存在 his_pic/<用户名>/<date_str>/converted_files）
+        date_str: 上传日期（YYYYMMDD）
+        uploaded_files_info_from_frontend: 上传文件信息列表，每个元素包含 {'name': str, 'status': str, 'path': str}
+        main_tab: 前端主功能页（imgToFile / fileToPdf）
+        sub_tab: 前端子功能（如 wordToPdf、pptToPdf）
+        output_format: 输出格式（docx、pdf、json、md、txt）
+        merge_output: 是否合并为一个文件
+        on_event: 可选回调 on_event(事件字典)，报告处理进度，事件包含 stage、file（原始文件名）、
+            done / total（已完成 / 全部文件数），以及 converted_name、download_url、message 等：
+            ocr_started / ocr_done（图片识别）、converted（单个文件已生成，不合并时含下载地址）、
+            merged（合并文件已生成，含下载地址）、error（该文件出错）
+
+    Returns:
+        tuple: (processed_results, warnings)
+            - processed_results: 每个输出文件（或出错文件）的结果字典列表，与原视图返回给前端的 results 相同
+            - warnings: 需要提示用户的信息（如 PDF 转换失败后保留了 DOCX）
+    """
+    _, user_converted_dir = user_date_dirs(username, date_str)
+    warnings = []
+    total_files = sum(1 for info in uploaded_files_info_from_frontend if info['status'] == 'uploaded')
+    finished_files = set()
+    reported_results = set() # 已通过事件报告过的结果（id）
+
+    def emit(stage, name, **data):
+        if stage in FILE_FINISHED_STAGES and name:
+            finished_files.add(name)
+        if on_event is not None:
+            on_event({'stage': stage, 'file': name, 'done': min(len(finished_files), total_files), 'total': total_files, **data})
+
+    def emit_results(results, stage='converted'):
+        for result in results:
+            reported_results.add(id(result))
+            if result.get('status') == 'success' and result.get('download_url'):
+                emit(stage, result['original_name'], converted_name=result['converted_name'], download_url=result['download_url'])
+            else:
+                emit('error', result.get('original_name', result.get('name')), message=result.get('message') or result.get('status'))
+
+    executor = BoundedExecutor() # 本次转换的步骤最多同时运行 CONVERSION_PER_REQUEST_CONCURRENCY 个
+    processed_results = []
+    temp_files_for_final_processing = [] # Will store paths of files ready for final conversion/merge (docx or original non-image files)
+
+    # 图片转 PDF 是否由原生渲染器直接生成（不经过 DOCX 和 docx2pdf）；合并多个 PDF 需要 PyPDF2，缺少时仍先合并 DOCX
+    native_pdf_images = (
+        main_tab == 'imgToFile' and output_format == 'pdf'
+        and resolve_pdf_engine(getattr(settings, 'PDF_ENGINE', 'auto'), DOCX2PDF_AVAILABLE_IN_VIEW) == 'native'
+        and (not merge_output or PYPDF2_AVAILABLE)
+    )
+
+    if main_tab == 'imgToFile':
+        # 使用新的图片转文件处理模块
+        finalized_files = [] # 不合并时识别完成后立即生成最终文件的条目
+        finalized_results = []
+
+        def on_image_event(stage, name, entry):
+            if stage == 'error':
+                emit_results([entry])
+                return
+            emit(stage, name)
+            if stage == 'ocr_done' and not merge_output:
+                # 不合并时每张图片识别完就生成最终文件并报告下载地址，不等其余图片
+                results = _convert_individual_file(entry, username, date_str, user_converted_dir, output_format, native_pdf_images, warnings)
+                finalized_files.append(entry)
+                finalized_results.extend(results)
+                emit_results(results)
+
+        img_processed_results, img_temp_files = process_images_to_files(uploaded_files_info_from_frontend, user_converted_dir, output_format, native_pdf=native_pdf_images, on_event=on_image_event, executor=executor)
+        processed_results.extend(img_processed_results)
+        processed_results.extend(finalized_results)
+        temp_files_for_final_processing.extend(info for info in img_temp_files if not any(info is done for done in finalized_files))
+    
+    elif main_tab == 'fileToPdf' and sub_tab == 'wordToPdf':
+        logger.info(f"Processing via fileToPdf/wordToPdf (direct DOCX to PDF)")
+        # 直接使用上传的Word文档进行后续处理
+        for up_file_info in uploaded_files_info_from_frontend:
+            if up_file_info['status'] == 'uploaded':
+                original_name = up_file_info['name']
+                # For Word to PDF, the uploaded file itself is the source for conversion or merge.
+                # We need to copy it to user_converted_dir if we intend to merge or convert from there,
+                # or use its path from user_upload_dir directly if not merging before conversion.
+                # For consistency with the merge logic, let's copy to converted_dir first.
+                
+                # Ensure it is a doc/docx file (though frontend should filter)
+                if not (original_name.lower().endswith('.doc') or original_name.lower().endswith('.docx')):
+                    logger.warning(f"Skipping non-Word file {original_name} in wordToPdf mode.")
+                    processed_results.append({
+                        'original_name': original_name, 'status': 'error',
+                        'message': '文件类型不是 Word (.doc/.docx)。'
+                    })
+                    continue
+
+                # Path of the uploaded file in 'uploads' directory
+                source_word_path = up_file_info['path'] 
+                
+                # Define a temporary path in 'converted_files' for this Word file before final PDF conversion
+                # This path will be used by the merging logic or direct conversion logic below.
+                # If not merging, this file will be directly converted to PDF.
+                # If merging, these files will be merged into another DOCX, then that to PDF.
+                temp_word_in_converted_dir_filename = f"{os.path.splitext(original_name)[0]}_prePdf.docx" # Ensure it's .docx for our merge logic
+                temp_word_in_converted_dir_path = os.path.join(user_converted_dir, temp_word_in_converted_dir_filename)
+                
+                try:
+                    # If the source is .doc, we might need to convert to .docx first if merging relies on python-docx strictly for .docx
+                    # For now, assume python-docx can handle .doc for reading, or direct docx2pdf can handle .doc
+                    # Copy the file to the converted_files directory before processing
+                    shutil.copy(source_word_path, temp_word_in_converted_dir_path)
+                    logger.info(f"Copied Word file {original_name} to {temp_word_in_converted_dir_path} for PDF conversion process.")
+                    
+                    temp_files_for_final_processing.append({
+                        'path': temp_word_in_converted_dir_path, # This is the path to the .docx (or copied .doc as .docx)
+                        'original_name': original_name,
+                        'base_filename_no_ext': os.path.splitext(original_name)[0]
+                    })
+                except Exception as e:
+                    logger.exception(f"Error preparing Word file {original_name} for conversion: {e}")
+                    processed_results.append({
+                        'original_name': original_name, 'status': 'error',
+                        'message': f'准备Word文件时出错: {str(e)}'
+                    })
+            else:
+                processed_results.append(up_file_info)
+    elif main_tab == 'fileToPdf' and sub_tab == 'pptToPdf':
+        logger.info(f"Processing via fileToPdf/pptToPdf (direct PPT/PPTX to PDF)")
+        for up_file_info in uploaded_files_info_from_frontend:
+            if up_file_info['status'] == 'uploaded':
+                original_name = up_file_info['name']
+                if not (original_name.lower().endswith('.ppt') or original_name.lower().endswith('.pptx')):
+                    logger.warning(f"Skipping non-PPT file {original_name} in pptToPdf mode.")
+                    processed_results.append({
+                        'original_name': original_name, 'status': 'error',
+                        'message': '文件类型不是 PowerPoint (.ppt/.pptx)。'
+                    })
+                    continue
+
+                source_ppt_path = up_file_info['path']
+                # Determine a temporary name, try to keep original extension for docx2pdf if it matters
+                # However, our merge logic might expect .docx. For direct conversion, original ext is fine.
+                # For consistency, let's assume we might merge ppt/pptx into a docx-compatible format first if such a tool existed,
+                # or more realistically, we convert each ppt to pdf individually or merge pdfs later.
+                # For now, copy with a _prePdf marker, keeping original extension for direct conversion by docx2pdf.
+                temp_ppt_in_converted_dir_filename = f"{os.path.splitext(original_name)[0]}_prePdf{os.path.splitext(original_name)[1]}"
+                temp_ppt_in_converted_dir_path = os.path.join(user_converted_dir, temp_ppt_in_converted_dir_filename)
+                
+                try:
+                    shutil.copy(source_ppt_path, temp_ppt_in_converted_dir_path)
+                    logger.info(f"Copied PPT/PPTX file {original_name} to {temp_ppt_in_converted_dir_path} for PDF conversion process.")
+                    
+                    temp_files_for_final_processing.append({
+                        'path': temp_ppt_in_converted_dir_path, 
+                        'original_name': original_name,
+                        'base_filename_no_ext': os.path.splitext(original_name)[0]
+                    })
+                except Exception as e:
+                    logger.exception(f"Error preparing PPT/PPTX file {original_name} for conversion: {e}")
+                    processed_results.append({
+                        'original_name': original_name, 'status': 'error',
+                        'message': f'准备PPT文件时出错: {str(e)}'
+                    })
+            else:
+                processed_results.append(up_file_info)
+    else:
+        logger.warning(f"Unhandled main_tab '{main_tab}' or sub_tab '{sub_tab}'. Cannot process files.")
+        return [{'original_name': '-', 'status': 'error', 'message': '未实现的处理类型。'}], warnings
+
+    # 第二阶段：处理和合并 (现在 temp_files_for_final_processing 包含了需要处理的文件路径)
+    # This section is largely the same, but operates on temp_files_for_final_processing
+    # which contains paths to .docx files (either from script OCR or copied Word files)
+    
+    if merge_output and temp_files_for_final_processing:
+        logger.debug(f"Attempting to merge {len(temp_files_for_final_processing)} files for date {date_str} (MainTab: {main_tab}, SubTab: {sub_tab}).")
+        random_chars = ''.join(random.choices(string.ascii_lowercase + string.digits, k=8))
+        merged_base_filename = f"{username}_{date_str}_{random_chars}"
+        
+        # Default final output to be PDF if the sub_tab implies it, or if original output_format was PDF
+        # For pptToPdf, the final merged output should be PDF.
+        if main_tab == 'fileToPdf' and sub_tab == 'pptToPdf':
+            final_target_format_for_merge = 'pdf'
+        else: # For imgToFile or wordToPdf, the existing output_format (which could be docx or pdf) is the target.
+            final_target_format_for_merge = output_format
+
+        final_merged_filename = f"{merged_base_filename}.{final_target_format_for_merge}"
+        final_merged_path = os.path.join(user_converted_dir, final_merged_filename)
+
+        if not temp_files_for_final_processing:
+            logger.error("Merge requested but no files available in temp_files_for_final_processing.")
+            return [{'original_name': 'Merge Error', 'status': 'error', 'message': '没有可合并的文件。'}], warnings
+
+        if main_tab == 'fileToPdf' and sub_tab == 'pptToPdf':
+            if not PYPDF2_AVAILABLE:
+                logger.error("Cannot merge PPTs to PDF: PyPDF2 library is not available.")
+                processed_results = [{'original_name': "Merged Document", 'status': 'error', 'message': '无法合并PPT到PDF：缺少必需的PDF处理库(PyPDF2)。请先将各PPT单独转换为PDF。'}]
+                # Fallback: attempt to convert each PPT to PDF individually instead of merging
+                # This part would need to be refactored to call the individual processing logic.
+                # For now, just error out for merge. User can uncheck "merge".
+                # OR, we could try to produce individual PDFs and message the user.
+                # Let's just error for now, it's cleaner than partial success with confusing output.
+            else:
+                logger.info("Merging PPTs to a single PDF using PyPDF2.")
+                temp_individual_pdfs = []
+                conversion_all_individual_ppt_to_pdf_successful = True
+
+                # 各 PPT 同时转换为临时 PDF（有界线程池），全部完成后立即合并；有转换失败时报告每个失败的文件，不合并
+                ppt_futures = []
+                for ppt_info in temp_files_for_final_processing:
+                    individual_ppt_path = ppt_info['path']
+                    individual_pdf_temp_name = f"{os.path.splitext(os.path.basename(individual_ppt_path))[0]}_temp.pdf"
+                    individual_pdf_temp_path = os.path.join(user_converted_dir, individual_pdf_temp_name)
+                    logger.info(f"Converting individual PPT '{individual_ppt_path}' to temporary PDF '{individual_pdf_temp_path}'")
+                    # 使用新的PPT转换函数替代docx2pdf
+                    ppt_futures.append(executor.submit(convert_pptx_to_pdf, individual_ppt_path, individual_pdf_temp_path))
+
+                for ppt_info, ppt_future in zip(temp_files_for_final_processing, ppt_futures):
+                    individual_ppt_path = ppt_info['path']
+                    try:
+                        success, actual_pdf_path, error_msg = ppt_future.result()
+                        if success and actual_pdf_path:
+                            temp_individual_pdfs.append(actual_pdf_path)
+                            logger.info(f"Successfully converted '{individual_ppt_path}' to '{actual_pdf_path}'")
+                            emit('converted', ppt_info['original_name'])
+                        else:
+                            raise Exception(error_msg or "PPT转换失败，未知原因")
+                    except Exception as e_ind_pdf:
+                        logger.error(f"Error converting individual PPT '{individual_ppt_path}' to PDF: {e_ind_pdf}", exc_info=True)
+                        original_filename_str = ppt_info["original_name"]
+                        exception_str = str(e_ind_pdf)
+                        message = f"转换PPT '{original_filename_str}' 到PDF失败: {exception_str}"
+                        processed_results.append({'original_name': ppt_info['original_name'], 
+                                                  'status': 'error', 
+                                                  'message': message})
+                        conversion_all_individual_ppt_to_pdf_successful = False
+
+                if conversion_all_individual_ppt_to_pdf_successful and temp_individual_pdfs:
+                    try:
+                        with metrics.stage("pdf_merge"):
+                            merge_pdf_files(temp_individual_pdfs, final_merged_path)
+                        logger.info(f"Successfully merged temporary PDFs into: {final_merged_path}")
+
+                        # Meta file for merged PDF
+                        meta_file_path_merged = f"{final_merged_path}.meta"
+                        merged_original_names_list = [info['original_name'] for info in temp_files_for_final_processing]
+                        try:
+                            with open(meta_file_path_merged, 'w', encoding='utf-8') as mf:
+                                mf.write(",".join(merged_original_names_list))
+                        except Exception as e_meta: logger.error(f"Error saving .meta file {meta_file_path_merged}: {e_meta}")
+
+                        relative_media_path = os.path.join(username, date_str, 'converted_files', final_merged_filename).replace("\\", "/")
+                        download_url = f"{settings.MEDIA_URL}{relative_media_path}"
+                        processed_results = [{'original_name': ",".join(merged_original_names_list), 'converted_name': final_merged_filename, 'download_url': download_url, 'status': 'success'}]
+                    except Exception as e_merge_pdf:
+                        logger.error(f"Error merging PDFs: {e_merge_pdf}", exc_info=True)
+                        original_names_str = ",".join([info['original_name'] for info in temp_files_for_final_processing]) # Fallback original name
+                        exception_str = str(e_merge_pdf)
+                        message = f"合并PDF时出错 ({original_names_str}): {exception_str}"
+                        processed_results.append({'original_name': "Merged Document", 
+                                              'status': 'error', 
+                                              'message': message})
+                elif not temp_individual_pdfs and conversion_all_individual_ppt_to_pdf_successful : # Should not happen if list was populated
+                     processed_results.append({'original_name': "Merged Document", 
+                                           'status': 'error', 
+                                           'message': '没有PDF文件可供合并。'})
+
+
+                # Cleanup temporary individual PDFs and original PPTs from converted_files
+                for temp_pdf in temp_individual_pdfs:
+                    try: os.remove(temp_pdf); logger.debug(f"Cleaned up temp PDF: {temp_pdf}")
+                    except OSError: pass
+                for ppt_info in temp_files_for_final_processing: # These are the copied PPTs
+                    try: os.remove(ppt_info['path']); logger.debug(f"Cleaned up temp PPT source: {ppt_info['path']}")
+                    except OSError: pass
+        
+        elif final_target_format_for_merge in TEXT_OUTPUT_FORMATS or native_pdf_images: # imgToFile 的 json/md/txt/原生 PDF：按上传顺序拼接
+            merged_original_names_list = [info['original_name'] for info in temp_files_for_final_processing]
+            try:
+                temp_paths = [info['path'] for info in temp_files_for_final_processing]
+                if native_pdf_images:
+                    with metrics.stage("pdf_merge"):
+                        merge_pdf_files(temp_paths, final_merged_path)
+                else:
+                    with metrics.stage("text_merge", format=final_target_format_for_merge):
+                        merge_output_files(final_target_format_for_merge, temp_paths, final_merged_path)
+                logger.info(f"Merged {final_target_format_for_merge} saved successfully: {final_merged_path}")
+                try:
+                    with open(f"{final_merged_path}.meta", 'w', encoding='utf-8') as mf:
+                        mf.write(",".join(merged_original_names_list))
+                except Exception as e_meta: logger.error(f"Error saving .meta file {final_merged_path}.meta: {e_meta}")
+
+                relative_media_path = os.path.join(username, date_str, 'converted_files', final_merged_filename).replace("\\", "/")
+                download_url = f"{settings.MEDIA_URL}{relative_media_path}"
+                processed_results = [{'original_name': ",".join(merged_original_names_list), 'converted_name': final_merged_filename, 'download_url': download_url, 'status': 'success'}]
+            except Exception as e_merge_text:
+                logger.exception(f"Error during {final_target_format_for_merge} merging")
+                message = f"{final_target_format_for_merge.upper()}合并时出错 ({','.join(merged_original_names_list)}): {e_merge_text}"
+                processed_results.append({'original_name': "Merged Document", 'status': 'error', 'message': message})
+            finally:
+                for file_info in temp_files_for_final_processing:
+                    try: os.remove(file_info['path']); logger.debug(f"Cleaned up temp file after {final_target_format_for_merge} merge: {file_info['path']}")
+                    except OSError: pass
+
+        else: # Existing merge logic for DOCX based sources (imgToFile, wordToPdf)
+            merged_docx_path = os.path.join(user_converted_dir, f"{merged_base_filename}.docx") # DOCX is always the intermediate for these
+            logger.debug(f"Merged DOCX (intermediate for non-PPT merge) filename will be: {merged_docx_path}")
+            try:
+                with metrics.stage("docx_merge"):
+                    master_doc = merge_docx_files([doc_info['path'] for doc_info in temp_files_for_final_processing])
+                with metrics.stage("docx_save", merged="true"):
+                    master_doc.save(merged_docx_path)
+                logger.info(f"Merged DOCX (intermediate) saved successfully: {merged_docx_path}")
+
+                for doc_info in temp_files_for_final_processing: # remove individual docx files
+                    try: os.remove(doc_info['path']); logger.debug(f"Cleaned up temp file after DOCX merge: {doc_info['path']}")
+                    except OSError as e: logger.warning(f"Could not clean up temp file {doc_info['path']} after DOCX merge: {e}")
+
+                # Now, if final_target_format_for_merge is 'pdf', convert merged_docx_path to final_merged_path
+                if final_target_format_for_merge == 'pdf':
+                    if DOCX2PDF_AVAILABLE_IN_VIEW:
+                        try:
+                            logger.info(f"Converting merged DOCX '{merged_docx_path}' to PDF '{final_merged_path}'")
+                            with metrics.stage("docx2pdf", merged="true"):
+                                convert_docx_to_pdf(merged_docx_path, final_merged_path)
+                            logger.info(f"Successfully converted merged DOCX to PDF: {final_merged_path}")
+                            try: os.remove(merged_docx_path); logger.debug(f"Removed intermediate merged DOCX: {merged_docx_path}")
+                            except OSError as e: logger.warning(f"Could not remove intermediate merged DOCX {merged_docx_path}: {e}")
+                        except Exception as e_conv_pdf:
+                            logger.error(f"Error converting merged DOCX to PDF: {e_conv_pdf}", exc_info=True)
+                            # Fallback to the DOCX file
+                            final_merged_filename = f"{merged_base_filename}.docx" # Update filename to .docx
+                            final_merged_path = merged_docx_path # Path is already the docx path
+                            warnings.append("合并文件PDF转换失败，已生成DOCX文件。")
+                    else:
+                        logger.error("PDF conversion for merged DOCX requested, but docx2pdf is not available. Serving DOCX.")
+                        final_merged_filename = f"{merged_base_filename}.docx"
+                        final_merged_path = merged_docx_path
+                        warnings.append("PDF转换库不可用，已为合并文件生成DOCX文件。")
+                elif final_target_format_for_merge == 'docx': # merged_docx_path is already final_merged_path essentially if no renaming
+                    if merged_docx_path != final_merged_path: # Should be the case if final_merged_filename was already .docx
+                         shutil.move(merged_docx_path, final_merged_path) # Ensure it's at final_merged_path
+                    logger.info(f"Final merged file is DOCX: {final_merged_path}")
+
+
+                if os.path.exists(final_merged_path):
+                    meta_file_path_merged = f"{final_merged_path}.meta"
+                    merged_original_names_list = [info['original_name'] for info in temp_files_for_final_processing]
+                    try:
+                        with open(meta_file_path_merged, 'w', encoding='utf-8') as mf:
+                            mf.write(",".join(merged_original_names_list))
+                    except Exception as e_meta: logger.error(f"Error saving .meta file {meta_file_path_merged}: {e_meta}")
+                    
+                    relative_media_path = os.path.join(username, date_str, 'converted_files', final_merged_filename).replace("\\", "/")
+                    download_url = f"{settings.MEDIA_URL}{relative_media_path}"
+                    processed_results = [{'original_name': ",".join(merged_original_names_list), 'converted_name': final_merged_filename, 'download_url': download_url, 'status': 'success'}]
+                else:
+                     logger.error(f"Final merged file (from DOCX path) {final_merged_path} not found after processing.")
+                     processed_results = [{'original_name': "Merged Document", 'status': 'error', 'message': '合并后的最终文件未找到 (DOCX path)。'}]
+            except Exception as e_merge_docx:
+                logger.exception("Error during DOCX-based merging or final conversion of merged document")
+                if os.path.exists(merged_docx_path):
+                    try: os.remove(merged_docx_path)
+                    except OSError: pass
+                for doc_info in temp_files_for_final_processing:
+                    if os.path.exists(doc_info['path']): 
+                        try: os.remove(doc_info['path'])
+                        except OSError: pass
+                
+                original_names_str = ",".join([info['original_name'] for info in temp_files_for_final_processing]) # Fallback original name
+                exception_str = str(e_merge_docx)
+                message = f"DOCX合并或转换时出错 ({original_names_str}): {exception_str}"
+                processed_results.append({'original_name': "Merged Document", 'status': 'error', 'message': message})
+
+    elif not merge_output and temp_files_for_final_processing: # Process individual files
+        # 各文件同时转换，先完成的先报告下载地址，结果仍按上传顺序排列
+        futures = {
+            executor.submit(_convert_individual_file, file_info, username, date_str, user_converted_dir, output_format, native_pdf_images, warnings): file_info
+            for file_info in temp_files_for_final_processing
+        }
+        results_by_file = {}
+        for future in as_completed(futures):
+            file_info = futures[future]
+            try:
+                results = future.result()
+            except Exception as e:
+                logger.exception(f"Error converting individual file '{file_info['path']}'")
+                results = [{'original_name': file_info['original_name'], 'status': 'error', 'message': f"转换文件 '{file_info['original_name']}' 时出错: {e}"}]
+            results_by_file[id(file_info)] = results
+            emit_results(results)
+        for file_info in temp_files_for_final_processing:
+            processed_results.extend(results_by_file[id(file_info)])
+
+    elif not temp_files_for_final_processing and any(r['status'] == 'uploaded' for r in uploaded_files_info_from_frontend):
+        logger.warning("No files were successfully prepared for final processing (merge or individual conversion).")
+        # If processed_results already contains specific errors from upload or prep, don't add a generic one.
+        if not processed_results or all(p.get('status') == 'uploaded' for p in processed_results):
+            processed_results.append({
+                'original_name': "Conversion Attempt",
+                'status': 'conversion_error',
+                'message': '没有文件成功准备好进行最终处理。'
+            })
+
+    # 合并结果及其余尚未报告的结果（合并出错、上传失败等）
+    emit_results([result for result in processed_results if id(result) not in reported_results], stage='merged' if merge_output else 'converted')
+    if not merge_output:
+        # 识别出错、上传失败的结果与已生成的结果按上传顺序排列（排序是稳定的，同一文件的多条结果保持原顺序）
+        upload_order = {info['name']: index for index, info in enumerate(uploaded_files_info_from_frontend)}
+        # 上传失败的条目沿用上传信息（只有 name）
+        processed_results.sort(key=lambda result: upload_order.get(result.get('original_name', result.get('name')), len(upload_order)))
+    logger.debug(f"Final processed_results: {processed_results}")
+    return processed_results, warnings
+
+
+def _convert_individual_file(file_info, username, date_str, user_converted_dir, output_format, native_pdf_images, warnings):
+    """
+    不合并时把一个已识别或已准备好的文件转换为最终格式（PDF 转换或重命名），写入 .meta 文件
+
+    Args:
+        file_info: {'path', 'original_name', 'base_filename_no_ext'}，path 为 DOCX / 已是目标格式的中间文件或复制的 Word/PPT 文件
+        warnings: 需要提示用户的信息列表（PDF 转换失败等会追加）
+
+    Returns:
+        list: 该文件的结果字典（PDF 转换失败保留原文件时先有一条 conversion_error_fallback）
+    """
+    results = []
+    # file_info['path'] is the path to the .docx file (from OCR or copied Word file)
+    # file_info['original_name'] is the original uploaded name
+    temp_docx_for_individual_conversion = file_info['path']
+    original_input_name = file_info['original_name']
+    base_filename_no_ext = file_info['base_filename_no_ext']
+
+    final_output_filename = f"{base_filename_no_ext}.{output_format}" # output_format from frontend, should be 'pdf' for wordToPdf
+    final_output_path = os.path.join(user_converted_dir, final_output_filename)
+    conversion_successful = False
+
+    if output_format == 'pdf' and not native_pdf_images:
+        if DOCX2PDF_AVAILABLE_IN_VIEW:
+            try:
+                logger.info(f"Converting individual file '{temp_docx_for_individual_conversion}' to PDF '{final_output_path}'")
+
+                # 根据文件类型选择转换方法
+                if original_input_name.lower().endswith(('.ppt', '.pptx')):
+                    # PPT文件使用专门的转换函数
+                    success, actual_pdf_path, error_msg = convert_pptx_to_pdf(temp_docx_for_individual_conversion, final_output_path)
+                    if not success:
+                        raise Exception(error_msg or "PPT转换失败，未知原因")
+                    if actual_pdf_path != final_output_path:
+                        final_output_path = actual_pdf_path
+                        final_output_filename = os.path.basename(actual_pdf_path)
+                else:
+                    # Word文件使用docx2pdf
+                    with metrics.stage("docx2pdf"):
+                        convert_docx_to_pdf(temp_docx_for_individual_conversion, final_output_path)
+
+                logger.info(f"Successfully converted '{temp_docx_for_individual_conversion}' to PDF: {final_output_path}")
+                try: os.remove(temp_docx_for_individual_conversion); logger.debug(f"Removed temp source after PDF: {temp_docx_for_individual_conversion}")
+                except OSError as e: logger.warning(f"Could not remove temp source {temp_docx_for_individual_conversion}: {e}")
+                conversion_successful = True
+            except Exception as e:
+                logger.error(f"Error converting individual file '{temp_docx_for_individual_conversion}' to PDF: {e}", exc_info=True)
+                # Fallback: keep the source file if PDF fails
+                final_output_filename = os.path.basename(temp_docx_for_individual_conversion) # use its name
+                final_output_path = temp_docx_for_individual_conversion # use its path
+
+                exception_str = str(e)
+                file_type = "PPT" if original_input_name.lower().endswith(('.ppt', '.pptx')) else "Word"
+                message = f"文件 {original_input_name} 的PDF转换失败，保留原始{file_type}文件。错误: {exception_str}"
+                warnings.append(message)
+
+                results.append({ # Add to results so frontend knows about this file
+                    'original_name': original_input_name,
+                    'converted_name': final_output_filename, # The original/fallback filename
+                    'download_url': None, # No download URL if it's a fallback and not in media yet, or construct carefully
+                    'status': 'conversion_error_fallback',
+                    'message': message
+                })
+                # Instead of directly setting conversion_successful = True for fallback,
+                # we handle it via the append above and subsequent logic.
+                # The key is that final_output_path points to the fallback file.
+                # We will still try to create a meta file for this fallback.
+                conversion_successful = True # Mark as successful for the meta file logic to run for the fallback file
+        else: # docx2pdf not available
+            logger.error(f"PDF conversion for {original_input_name} requested, but docx2pdf not available. Serving original format.")
+            final_output_filename = os.path.basename(temp_docx_for_individual_conversion) # use its name
+            final_output_path = temp_docx_for_individual_conversion # use its path
+            file_type = "PPT" if original_input_name.lower().endswith(('.ppt', '.pptx')) else "Word"
+            warnings.append(f"文件 {original_input_name} 的PDF转换库不可用，已保留原始{file_type}格式文件。")
+            conversion_successful = True 
+    elif output_format == 'docx' or output_format in TEXT_OUTPUT_FORMATS or native_pdf_images: # This case is mostly for imgToFile where output_format can be docx/json/md/txt/native pdf
+        # The file is already in the target format (temp_docx_for_individual_conversion), rename/move it if necessary
+        if temp_docx_for_individual_conversion != final_output_path:
+            try:
+                os.rename(temp_docx_for_individual_conversion, final_output_path)
+                logger.info(f"Moved/Renamed {output_format.upper()} from {temp_docx_for_individual_conversion} to {final_output_path}")
+                conversion_successful = True
+            except OSError as e:
+                logger.error(f"Error moving/renaming {temp_docx_for_individual_conversion} to {final_output_path}: {e}")
+                final_output_path = temp_docx_for_individual_conversion 
+                final_output_filename = os.path.basename(temp_docx_for_individual_conversion)
+                conversion_successful = True 
+        else: 
+            conversion_successful = True
+
+    if conversion_successful and os.path.exists(final_output_path):
+        meta_file_path_individual = f"{final_output_path}.meta"
+        try:
+            with open(meta_file_path_individual, 'w', encoding='utf-8') as mf:
+                mf.write(original_input_name)
+            logger.info(f"Saved meta file for individual output: {meta_file_path_individual}")
+        except Exception as e: logger.error(f"Error saving .meta file {meta_file_path_individual}: {e}")
+
+        relative_media_path = os.path.join(username, date_str, 'converted_files', final_output_filename).replace("\\", "/")
+        download_url = f"{settings.MEDIA_URL}{relative_media_path}"
+        results.append({
+            'original_name': original_input_name,
+            'converted_name': final_output_filename,
+            'download_url': download_url,
+            'status': 'success'
+        })
+    elif os.path.exists(temp_docx_for_individual_conversion): # Fallback if final path doesn't exist but temp source does
+         # ... (fallback logic as before)
+         logger.warning(f"Final path {final_output_path} not found, but temp source {temp_docx_for_individual_conversion} exists. Serving temp source.")
+         final_output_filename = os.path.basename(temp_docx_for_individual_conversion)
+         relative_media_path = os.path.join(username, date_str, 'converted_files', final_output_filename).replace("\\", "/")
+         download_url = f"{settings.MEDIA_URL}{relative_media_path}"
+         results.append({
+            'original_name': original_input_name,
+            'converted_name': final_output_filename,
+            'download_url': download_url,
+            'status': 'success' # Or appropriate status
+        })
+    else:
+        # ... (error handling as before) ...
+        logger.error(f"Neither final output '{final_output_path}' nor temp source '{temp_docx_for_individual_conversion}' found for {original_input_name}.")
+        if not results:
+            results.append({
+                'original_name': original_input_name,
+                'status': 'conversion_error',
+                'message': '处理后的文件丢失。'
+            })
+    return results
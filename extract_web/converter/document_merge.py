@@ -0,0 +1,55 @@
+"""
+多个转换结果合并为一个文件
+- DOCX：以第一个文档为主文档，其余文档的正文元素依次追加（文档之间插入分页符）
+- PDF：PyPDF2 的 PdfMerger 按顺序拼接
+不依赖 Django，基准测试（benchmarks/pipeline.py）直接调用同一套函数
+python-docx、PyPDF2 在合并时才导入，不增加 Web 进程的启动耗时
+"""
+
+
+def append_document(source_doc, target_doc):
+    """Appends content of source_doc to target_doc."""
+    for element in source_doc.element.body:
+        target_doc.element.body.append(element)
+
+
+def merge_docx_files(docx_paths):
+    """
+    按顺序合并多个 DOCX 文件
+
+    Args:
+        docx_paths: DOCX 文件路径列表（至少一个）
+
+    Returns:
+        Document: 合并后的文档（尚未保存）
+    """
+    from docx import Document
+
+    master_doc = Document(docx_paths[0])
+    for docx_path in docx_paths[1:]:
+        sub_doc = Document(docx_path)
+        master_doc.add_page_break()
+        append_document(sub_doc, master_doc)
+    return master_doc
+
+
+def merge_pdf_files(pdf_paths, output_path):
+    """
+    按顺序合并多个 PDF 文件
+
+    Args:
+        pdf_paths: PDF 文件路径列表
+        output_path: 合并后的 PDF 路径
+
+    Raises:
+        ImportError: 未安装 PyPDF2
+    """
+    from PyPDF2 import PdfMerger
+
+    pdf_merger = PdfMerger()
+    try:
+        for pdf_path in pdf_paths:
+            pdf_merger.append(pdf_path)
+        pdf_merger.write(output_path)
+    finally:
+        pdf_merger.close()
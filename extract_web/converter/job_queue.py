@@ -0,0 +1,325 @@
+"""
+基于 Django 数据库的转换任务队列（使用现有的 SQLite 数据库，不需要 Redis 等外部消息服务）
+- 视图保存上传文件后调用 enqueue_job 创建 queued 任务，立即返回任务编号
+- 工作进程（manage.py run_conversion_jobs）用带状态条件的 UPDATE 领取任务，多个进程、线程同时领取时只有一个成功
+- 同一用户的任务按提交顺序逐个执行（结果都写入该用户当天的目录，同名文件不会被两个任务同时写），不同用户的任务并行
+- 执行中的任务定期刷新 heartbeat_at；工作进程崩溃或被杀死后，recover_stale_jobs 把心跳超时的任务重新排队，
+  超过最大尝试次数的标记为失败
+- 处理进度（每个文件的上传、识别、生成、合并）写入 ConversionJobEvent，iter_job_events 把新事件以
+  server-sent events 格式推送给浏览器（Web 进程和工作进程之间只通过数据库传递，不需要其他服务）
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, F
+from django.utils import timezone
+
+import metrics # 阶段耗时指标（项目根目录的 metrics.py）
+
+from .conversion_service import run_conversion
+from .models import ConversionJob, ConversionJobEvent
+
+logger = logging.getLogger('converter')
+
+DEFAULT_HEARTBEAT_SECONDS = 15
+DEFAULT_STALE_SECONDS = 120
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_EVENTS_STREAM_SECONDS = 300
+EVENTS_POLL_SECONDS = 0.5
+EVENTS_KEEPALIVE_SECONDS = 15
+ACTIVE_STATUSES = (ConversionJob.STATUS_QUEUED, ConversionJob.STATUS_RUNNING)
+
+
+def default_worker_id():
+    """工作进程标识：主机名:进程号"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_job(user, date_str, files, main_tab, sub_tab, output_format, merge_output):
+    """
+    创建排队中的转换任务
+
+    Args:
+        user: 提交任务的用户
+        date_str: 上传日期（YYYYMMDD），决定结果目录
+        files: 已保存的上传文件信息列表 [{'name', 'status', 'path'}]
+        main_tab / sub_tab / output_format / merge_output: 转换参数
+
+    Returns:
+        ConversionJob: 新建的任务
+    """
+    job = ConversionJob.objects.create(
+        user=user,
+        date_str=date_str,
+        files=files,
+        main_tab=main_tab,
+        sub_tab=sub_tab,
+        output_format=output_format,
+        merge_output=merge_output,
+        progress_total=sum(1 for info in files if info['status'] == 'uploaded'),
+    )
+    ConversionJobEvent.objects.bulk_create([
+        ConversionJobEvent(job=job, stage=ConversionJobEvent.STAGE_UPLOADED, file_name=info['name'], data={'done': 0, 'total': job.progress_total})
+        if info['status'] == 'uploaded' else
+        ConversionJobEvent(job=job, stage='error', file_name=info['name'], data={'message': info.get('message') or info['status']})
+        for info in files
+    ])
+    logger.info(f"Queued conversion job #{job.pk} for {user.username}: {len(files)} file(s), {main_tab}/{sub_tab} -> {output_format}, merge={merge_output}")
+    return job
+
+
+def claim_next_job(worker_id):
+    """
+    领取最早提交的一个可执行任务（该用户没有正在执行的任务）
+
+    领取是一条带 status='queued' 条件的 UPDATE：并发领取同一任务时只有一个更新成功，其余继续尝试下一个。
+
+    Returns:
+        ConversionJob or None: 已标记为 running 的任务；没有可执行的任务时返回 None
+    """
+    busy_users = ConversionJob.objects.filter(status=ConversionJob.STATUS_RUNNING).values('user_id')
+    candidates = (
+        ConversionJob.objects.filter(status=ConversionJob.STATUS_QUEUED)
+        .exclude(user_id__in=busy_users)
+        .order_by('created_at', 'id')
+        .values_list('pk', flat=True)[:20]
+    )
+    for job_id in list(candidates):
+        now = timezone.now()
+        claimed = (
+            ConversionJob.objects.filter(pk=job_id, status=ConversionJob.STATUS_QUEUED)
+            .exclude(user_id__in=ConversionJob.objects.filter(status=ConversionJob.STATUS_RUNNING).values('user_id'))
+            .update(
+                status=ConversionJob.STATUS_RUNNING,
+                worker=worker_id,
+                started_at=now,
+                heartbeat_at=now,
+                attempts=F('attempts') + 1,
+            )
+        )
+        if claimed:
+            return ConversionJob.objects.get(pk=job_id)
+    return None
+
+
+def count_active_jobs():
+    """排队中和执行中的任务数（/metrics/ 端点的 conversion_jobs 指标）
+
+    Returns:
+        dict: {(("status", 状态),): 任务数}
+    """
+    counts = dict(
+        ConversionJob.objects.filter(status__in=ACTIVE_STATUSES)
+        .values_list('status').annotate(count=Count('pk')).values_list('status', 'count')
+    )
+    return {(("status", status),): counts.get(status, 0) for status in ACTIVE_STATUSES}
+
+
+def run_job_inline(job):
+    """同步模式（CONVERSION_JOB_QUEUE = False）：在当前请求中直接执行刚创建的任务，任务记录与后台执行时相同"""
+    now = timezone.now()
+    ConversionJob.objects.filter(pk=job.pk).update(
+        status=ConversionJob.STATUS_RUNNING,
+        worker=f"web:{default_worker_id()}",
+        started_at=now,
+        heartbeat_at=now,
+        attempts=F('attempts') + 1,
+    )
+    job.refresh_from_db()
+    return run_job(job)
+
+
+def recover_stale_jobs(stale_seconds=None, max_attempts=None):
+    """
+    恢复工作进程异常退出后遗留的 running 任务：心跳超过 stale_seconds 未刷新的任务重新排队，
+    已尝试 max_attempts 次的标记为失败（避免反复让工作进程崩溃的任务无限重试）
+
+    Returns:
+        tuple: (重新排队的任务数, 标记为失败的任务数)
+    """
+    stale_seconds = stale_seconds or getattr(settings, 'CONVERSION_JOB_STALE_SECONDS', DEFAULT_STALE_SECONDS)
+    max_attempts = max_attempts or getattr(settings, 'CONVERSION_JOB_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+    stale = ConversionJob.objects.filter(
+        status=ConversionJob.STATUS_RUNNING,
+        heartbeat_at__lt=timezone.now() - timedelta(seconds=stale_seconds),
+    )
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status=ConversionJob.STATUS_FAILED,
+        error=f'任务执行中断（工作进程退出），已重试 {max_attempts} 次。',
+        finished_at=timezone.now(),
+    )
+    requeued = stale.filter(attempts__lt=max_attempts).update(
+        status=ConversionJob.STATUS_QUEUED,
+        worker='',
+        progress_done=0,
+    )
+    if requeued or failed:
+        logger.warning(f"Recovered stale conversion jobs: {requeued} re-queued, {failed} marked as failed")
+    return requeued, failed
+
+
+class _Heartbeat:
+    """在后台线程中定期刷新任务的 heartbeat_at，直到 stop()"""
+
+    def __init__(self, job_id, interval):
+        self.job_id = job_id
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"job-{job_id}-heartbeat", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        from django.db import connection
+
+        try:
+            while not self._stopped.wait(self.interval):
+                # 单次刷新失败（如 SQLite "database is locked"）只记录日志，下一轮继续，
+                # 否则心跳停止后任务会被 recover_stale_jobs 当作中断任务重新排队、被另一个工作进程重复执行
+                try:
+                    ConversionJob.objects.filter(pk=self.job_id, status=ConversionJob.STATUS_RUNNING).update(heartbeat_at=timezone.now())
+                except Exception as e:
+                    logger.warning(f"Heartbeat for conversion job #{self.job_id} failed, retrying in {self.interval}s: {e}")
+                    connection.close()
+        finally:
+            connection.close()
+
+
+def run_job(job, heartbeat_interval=None):
+    """
+    执行一个已领取（running）的任务，把进度和结果写回数据库
+
+    单个文件的错误记录在结果中，任务仍为 succeeded；只有处理过程本身抛出异常时任务为 failed。
+
+    Returns:
+        ConversionJob: 执行完成（succeeded / failed）后的任务
+    """
+    heartbeat_interval = heartbeat_interval or getattr(settings, 'CONVERSION_JOB_HEARTBEAT_SECONDS', DEFAULT_HEARTBEAT_SECONDS)
+    username = job.user.username
+    logger.info(f"Running conversion job #{job.pk} for {username} (attempt {job.attempts})")
+
+    def on_event(event):
+        event = dict(event)
+        stage, file_name = event.pop('stage'), event.pop('file') or ''
+        ConversionJobEvent.objects.create(job_id=job.pk, stage=stage, file_name=file_name, data=event)
+        ConversionJob.objects.filter(pk=job.pk).update(progress_done=event['done'], progress_total=event['total'])
+
+    heartbeat = _Heartbeat(job.pk, heartbeat_interval).start()
+    try:
+        with metrics.stage("conversion_job", main_tab=job.main_tab, format=job.output_format):
+            results, warnings = run_conversion(
+                username, job.date_str, job.files, job.main_tab, job.sub_tab,
+                job.output_format, job.merge_output, on_event=on_event,
+            )
+        job.status = ConversionJob.STATUS_SUCCEEDED
+        job.results = results
+        job.warnings = warnings
+    except Exception as e:
+        logger.exception(f"Conversion job #{job.pk} failed")
+        job.status = ConversionJob.STATUS_FAILED
+        job.error = f'服务器内部错误: {e}'
+        job.results = [{'original_name': info['name'], 'status': 'error', 'message': job.error} for info in job.files]
+    finally:
+        heartbeat.stop()
+    job.finished_at = timezone.now()
+    job.heartbeat_at = job.finished_at
+    job.progress_done = job.progress_total
+    # 只有任务仍归本工作进程所有时才写回结果：心跳超时后被重新排队、由其他工作进程接手的任务不覆盖
+    saved = ConversionJob.objects.filter(pk=job.pk, status=ConversionJob.STATUS_RUNNING, worker=job.worker).update(
+        status=job.status,
+        results=job.results,
+        warnings=job.warnings,
+        error=job.error,
+        finished_at=job.finished_at,
+        heartbeat_at=job.heartbeat_at,
+        progress_done=job.progress_done,
+    )
+    if not saved:
+        logger.warning(f"Conversion job #{job.pk} was taken over by another worker; discarding the result of {job.worker}")
+        job.refresh_from_db()
+        return job
+    logger.info(f"Conversion job #{job.pk} {job.status} in {(job.finished_at - job.started_at).total_seconds():.1f}s")
+    return job
+
+
+def job_to_dict(job, include_results=True):
+    """任务状态接口返回的 JSON：状态、进度、排队位置，完成后包含结果"""
+    data = {
+        'job_id': job.pk,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'progress': {'done': job.progress_done, 'total': job.progress_total},
+        'merge_output': job.merge_output,
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'error': job.error,
+    }
+    if job.status == ConversionJob.STATUS_QUEUED:
+        # 排在该任务之前、尚未开始的任务数
+        data['queue_position'] = ConversionJob.objects.filter(
+            status=ConversionJob.STATUS_QUEUED, created_at__lt=job.created_at,
+        ).count()
+    if include_results and job.is_finished:
+        data['results'] = job.results
+        data['warnings'] = job.warnings
+    return data
+
+
+def _sse(event, data, event_id=None):
+    """一条 server-sent events 消息"""
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event}", f"data: {json.dumps(data, ensure_ascii=False)}"]
+    return "\n".join(lines) + "\n\n"
+
+
+def iter_job_events(job_id, after_id=0, max_seconds=None):
+    """
+    以 server-sent events 格式逐条产出任务的进度事件，任务完成后发送 done 事件（内容同状态接口）并结束
+
+    每条 progress 事件的 id 为事件编号，浏览器断线重连时通过 Last-Event-ID 从下一条继续；
+    连接最长保持 max_seconds（默认 CONVERSION_EVENTS_STREAM_SECONDS），到时结束，由浏览器自动重连，
+    避免一次响应超过代理的超时时间。
+
+    Args:
+        job_id: 任务编号
+        after_id: 只发送编号大于该值的事件
+
+    Yields:
+        str: SSE 消息文本
+    """
+    max_seconds = max_seconds or getattr(settings, 'CONVERSION_EVENTS_STREAM_SECONDS', DEFAULT_EVENTS_STREAM_SECONDS)
+    deadline = time.monotonic() + max_seconds
+    last_sent = time.monotonic()
+    yield "retry: 2000\n\n"
+    while True:
+        events = list(ConversionJobEvent.objects.filter(job_id=job_id, pk__gt=after_id).order_by('pk'))
+        for event in events:
+            after_id = event.pk
+            yield _sse('progress', event.to_dict(), event_id=event.pk)
+        if events:
+            last_sent = time.monotonic()
+        else:
+            # 没有新事件时才检查任务是否完成，保证完成前的事件都已发送
+            job = ConversionJob.objects.get(pk=job_id)
+            if job.is_finished:
+                yield _sse('done', job_to_dict(job))
+                return
+            if time.monotonic() >= deadline:
+                return
+            if time.monotonic() - last_sent >= EVENTS_KEEPALIVE_SECONDS:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+        time.sleep(EVENTS_POLL_SECONDS)
@@ -0,0 +1,79 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+
+import metrics # 阶段耗时指标（项目根目录的 metrics.py）
+from converter import worker_metrics
+from converter.job_queue import claim_next_job, default_worker_id, recover_stale_jobs, run_job
+from converter.models import ConversionJob
+
+
+def _run_claimed_job(job):
+    try:
+        run_job(job)
+    finally:
+        # 每个执行线程使用自己的数据库连接，任务结束后关闭
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Runs queued conversion jobs from the database (start one or more of these next to the web server).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=getattr(settings, 'CONVERSION_WORKER_CONCURRENCY', 1),
+            help='Number of jobs to run at the same time (default: CONVERSION_WORKER_CONCURRENCY).',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=getattr(settings, 'CONVERSION_WORKER_POLL_SECONDS', 1.0),
+            help='Seconds to wait between queue checks when there is nothing to claim.',
+        )
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty instead of waiting for new jobs.')
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        if concurrency < 1:
+            raise CommandError(f"--concurrency must be at least 1, got {concurrency}")
+        poll_interval = max(0.1, options['poll_interval'])
+        worker_id = default_worker_id()
+        metrics.configure_jsonl(getattr(settings, 'METRICS_JSONL_PATH', None), source="job_worker")
+        # 本进程的指标定期写入快照，由 Web 端的 /metrics/ 合并输出
+        snapshot_interval = getattr(settings, 'METRICS_WORKER_SNAPSHOT_SECONDS', worker_metrics.DEFAULT_SNAPSHOT_SECONDS)
+        last_snapshot = 0.0
+
+        # 上次崩溃或被杀死的工作进程留下的任务（心跳已超时）先重新排队
+        requeued, failed = recover_stale_jobs()
+        self.stdout.write(
+            f"Conversion worker {worker_id} started with concurrency {concurrency} "
+            f"(recovered {requeued} stale job(s), {failed} failed after too many attempts)."
+        )
+
+        running = set()
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='conversion-job')
+        try:
+            while True:
+                close_old_connections()
+                if time.monotonic() - last_snapshot >= snapshot_interval:
+                    worker_metrics.publish_snapshot(worker_id)
+                    last_snapshot = time.monotonic()
+                running = {future for future in running if not future.done()}
+                while len(running) < concurrency:
+                    job = claim_next_job(worker_id)
+                    if job is None:
+                        break
+                    self.stdout.write(f"Claimed job #{job.pk} ({job.user.username}, {len(job.files)} file(s)).")
+                    running.add(executor.submit(_run_claimed_job, job))
+
+                if options['once'] and not running and not ConversionJob.objects.filter(status=ConversionJob.STATUS_QUEUED).exists():
+                    break
+                time.sleep(poll_interval)
+                recover_stale_jobs()
+        except KeyboardInterrupt:
+            self.stdout.write(f"Stopping, waiting for {len(running)} running job(s) to finish...")
+        finally:
+            executor.shutdown(wait=True)
+            worker_metrics.remove_snapshot(worker_id)
+        self.stdout.write(self.style.SUCCESS("Conversion worker stopped."))
@@ -1,3 +1,80 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class ConversionJob(models.Model):
+    """一次转换请求（上传的一批文件）对应的后台任务
+
+    视图保存上传文件后创建任务并立即返回任务编号，由 manage.py run_conversion_jobs 工作进程领取执行；
+    任务状态、进度和结果都保存在数据库中，前端轮询状态接口获取。
+    """
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, '排队中'),
+        (STATUS_RUNNING, '处理中'),
+        (STATUS_SUCCEEDED, '已完成'),
+        (STATUS_FAILED, '失败'),
+    ]
+    FINISHED_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED)
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='conversion_jobs')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_index=True)
+
+    # 转换参数（与原 process_images_view 的表单字段相同）
+    main_tab = models.CharField(max_length=32)
+    sub_tab = models.CharField(max_length=32, blank=True, default='')
+    output_format = models.CharField(max_length=8)
+    merge_output = models.BooleanField(default=False)
+    date_str = models.CharField(max_length=8)  # his_pic/<用户名>/<YYYYMMDD> 中的日期
+    files = models.JSONField(default=list)  # 已保存的上传文件 [{'name', 'status', 'path'}]
+
+    # 进度与结果
+    progress_done = models.PositiveIntegerField(default=0)
+    progress_total = models.PositiveIntegerField(default=0)
+    results = models.JSONField(default=list)
+    warnings = models.JSONField(default=list)
+    error = models.TextField(blank=True, default='')
+
+    # 执行信息：worker 为领取任务的工作进程（主机名:进程号），heartbeat_at 由工作进程定期刷新，超时未刷新视为工作进程已退出
+    worker = models.CharField(max_length=128, blank=True, default='')
+    attempts = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    def __str__(self):
+        return f"ConversionJob #{self.pk} ({self.user_id}, {self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in self.FINISHED_STATUSES
+
+
+class ConversionJobEvent(models.Model):
+    """转换任务的进度事件（按 id 递增），由执行任务的工作进程写入，进度推送接口按顺序发送给浏览器"""
+
+    STAGE_UPLOADED = 'uploaded'
+
+    job = models.ForeignKey(ConversionJob, on_delete=models.CASCADE, related_name='events')
+    stage = models.CharField(max_length=16)  # uploaded / ocr_started / ocr_done / converted / merged / error
+    file_name = models.TextField(blank=True, default='')  # 原始文件名；合并事件为逗号分隔的全部文件名
+    data = models.JSONField(default=dict)  # converted_name、download_url、message、done / total 等
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"ConversionJobEvent #{self.pk} (job {self.job_id}, {self.stage}, {self.file_name})"
+
+    def to_dict(self):
+        return {'id': self.pk, 'stage': self.stage, 'file': self.file_name, **self.data}
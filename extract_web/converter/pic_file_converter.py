@@ -1,79 +1,352 @@
 import os
 import subprocess
 import logging
+import threading
+import multiprocessing
+import time
 from django.conf import settings
 
+import metrics
+from document_pages import count_pages, is_document
+from output_renderers import TEXT_OUTPUT_FORMATS
+
+from .task_executor import BoundedExecutor
+
 logger = logging.getLogger('converter')
 
-def process_images_to_files(uploaded_files_info, user_converted_dir):
+# 全局常驻 OCR 进程池（首次使用时启动，Django 进程内共享）
+_ocr_worker_pool = None
+_ocr_worker_pool_lock = threading.Lock()
+# 等待进程池结果时检查进程池是否已被终止的间隔（秒）
+POOL_POLL_SECONDS = 1.0
+
+# 进程内提取引擎（OCR_EXECUTION_MODE = 'inprocess' 时使用）
+_extraction_engine = None
+_extraction_engine_lock = threading.Lock()
+
+
+def get_ocr_execution_mode():
+    """返回配置的 OCR 执行方式：pool / inprocess / subprocess"""
+    return getattr(settings, 'OCR_EXECUTION_MODE', 'subprocess')
+
+
+def get_extraction_engine():
+    """
+    获取 Django 进程内共享的 ExtractionEngine，首次调用时创建
+
+    Returns:
+        ExtractionEngine: 提取引擎实例（OCR 模型在首次识别时加载）
+    """
+    global _extraction_engine
+    with _extraction_engine_lock:
+        if _extraction_engine is None:
+            from extraction_engine import ExtractionEngine
+            from utils import load_config
+            config = load_config(str(getattr(settings, 'OCR_CONFIG_PATH', settings.BASE_DIR / 'config.yaml')))
+            _extraction_engine = ExtractionEngine(config, logger)
+        return _extraction_engine
+
+
+def get_ocr_worker_pool():
+    """
+    获取全局常驻 OCR 进程池，首次调用时启动并预热
+
+    Returns:
+        OCRWorkerPool or None: 进程池实例；未启用或启动失败时返回 None（调用方回退到子进程方式）
+    """
+    global _ocr_worker_pool
+    if get_ocr_execution_mode() != 'pool':
+        return None
+
+    with _ocr_worker_pool_lock:
+        if _ocr_worker_pool is None:
+            try:
+                from ocr_worker_pool import OCRWorkerPool
+                pool = OCRWorkerPool(
+                    pool_size=getattr(settings, 'OCR_WORKER_POOL_SIZE', 2),
+                    config_path=getattr(settings, 'OCR_CONFIG_PATH', settings.BASE_DIR / 'config.yaml'),
+                    task_timeout=getattr(settings, 'OCR_WORKER_TASK_TIMEOUT', 300),
+                )
+                pool.start()
+                _ocr_worker_pool = pool
+            except Exception as e:
+                logger.error(f"Failed to start OCR worker pool, falling back to per-image script execution: {e}", exc_info=True)
+                return None
+        return _ocr_worker_pool
+
+
+def models_warm():
+    """
+    当前执行方式下 OCR 模型是否已加载（/metrics/ 端点的 models_warm 指标）
+
+    Returns:
+        int: 常驻进程池已启动、或进程内引擎已加载模型时为 1，否则为 0（subprocess 方式每次都冷启动）
+    """
+    mode = get_ocr_execution_mode()
+    if mode == 'pool':
+        return int(_ocr_worker_pool is not None and _ocr_worker_pool.is_running)
+    if mode == 'inprocess':
+        return int(_extraction_engine is not None and _extraction_engine._ocr is not None)
+    return 0
+
+
+def reset_ocr_worker_pool(pool):
+    """
+    终止超时的进程池（任务超时或工作进程异常时调用），下次使用时重新启动
+
+    只有 pool 仍是当前的全局进程池时才终止：其他任务已经重置过、之后重新启动的进程池不受影响。
+
+    Args:
+        pool: 出现超时的进程池实例
+    """
+    global _ocr_worker_pool
+    with _ocr_worker_pool_lock:
+        if pool is None or _ocr_worker_pool is not pool:
+            return
+        _ocr_worker_pool.terminate()
+        _ocr_worker_pool = None
+
+
+class OCRWorkerPoolTerminated(RuntimeError):
+    """等待结果期间进程池已被其他任务终止（已提交的任务不会再完成）"""
+
+
+def _wait_pool_result(pool, async_result, timeout):
+    """
+    等待进程池任务的结果，每隔 POOL_POLL_SECONDS 检查一次进程池是否已被终止
+
+    Raises:
+        multiprocessing.TimeoutError: 超过 timeout 仍未完成
+        OCRWorkerPoolTerminated: 进程池已被终止（不再等满超时，调用方立即回退）
+    """
+    deadline = time.monotonic() + timeout
+    while not async_result.ready():
+        if not pool.is_running:
+            raise OCRWorkerPoolTerminated("OCR worker pool was terminated by another job")
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise multiprocessing.TimeoutError()
+        async_result.wait(min(remaining, POOL_POLL_SECONDS))
+    return async_result.get(0)
+
+
+def _pool_task_timeout(input_path, task_timeout):
+    """进程池任务的超时：PDF / TIFF 文档整个作为一个任务，超时按页数放大"""
+    if not is_document(input_path):
+        return task_timeout
+    try:
+        return task_timeout * max(1, count_pages(input_path))
+    except Exception:
+        return task_timeout
+
+
+def _result_error(result):
+    """提取结果（ImageResult，多页文档为各页结果的列表）中的错误信息，全部成功时返回 None"""
+    results = result if isinstance(result, list) else [result]
+    errors = [f"{item.name}: {item.error}" for item in results if not item.ok]
+    return "; ".join(errors) or None
+
+
+def convert_image_by_script(input_image_path, output_docx_path, output_format='docx'):
+    """
+    通过子进程运行 extract_text_from_images.py 将单张图片转换为 DOCX、原生 PDF 或 json/md/txt（回退方案）
+
+    Args:
+        input_image_path: 输入图片路径
+        output_docx_path: 输出文件路径（扩展名与 output_format 一致）
+        output_format: 输出格式，docx、pdf、json、md 或 txt（pdf 使用原生渲染器）
+
+    Returns:
+        tuple: (success: bool, error_message: str or None)
+    """
+    script_path = os.path.join(settings.BASE_DIR.parent, 'extract_text_from_images.py')
+    python_executable = 'python'
+    command = [python_executable, script_path, input_image_path, output_docx_path, '--format', output_format]
+    if output_format == 'pdf':
+        command += ['--pdf-engine', 'native']
+    logger.debug(f"Executing script command: {' '.join(command)}")
+
+    with metrics.stage("ocr_script"):
+        result = subprocess.run(
+            command,
+            capture_output=True,
+            text=True,
+            check=False,
+            encoding='utf-8',
+            errors='replace'
+        )
+
+    if result.returncode == 0 and os.path.exists(output_docx_path):
+        return True, None
+    error_message = result.stderr or result.stdout or "Script execution failed."
+    if not os.path.exists(output_docx_path):
+        error_message += f" Script output {output_format.upper()} file not found."
+    return False, error_message
+
+
+def process_images_to_files(uploaded_files_info, user_converted_dir, output_format='docx', native_pdf=False, on_event=None, executor=None):
     """
     处理图片转文件功能
-    
+
+    按 OCR_EXECUTION_MODE 把图片分发给常驻 OCR 进程池或进程内提取引擎（模型只加载一次），
+    未启用或出错时回退到逐张启动脚本；脚本子进程通过有界线程池（task_executor）并行执行，结果仍按上传顺序收集。
+    json/md/txt 直接由识别结果生成对应文件；PDF 在 native_pdf 为 True 时由原生渲染器直接生成，
+    否则与其余格式一样先生成 DOCX（PDF 由调用方转换）。
+    上传的 PDF / TIFF 文档逐页识别（已有文字层的 PDF 页面不执行 OCR），所有页面写入该文档的一个输出文件。
+
     Args:
         uploaded_files_info: 上传文件信息列表，每个元素包含 {'name': str, 'status': str, 'path': str}
         user_converted_dir: 用户转换文件目录路径
-    
+        output_format: 最终输出格式（docx、pdf、json、md、txt）
+        native_pdf: output_format 为 pdf 时是否直接生成 PDF（不经过 DOCX 和 docx2pdf）
+        on_event: 可选回调 on_event(阶段, 原始文件名, 详情)，按上传顺序报告每个文件的进度：
+            'ocr_started'（开始等待该文件的识别结果）、'ocr_done'（详情为加入 temp_files_for_final_processing 的条目）、
+            'error'（详情为加入 processed_results 的错误条目）
+        executor: 执行脚本子进程的 BoundedExecutor（限制该请求同时运行的子进程数），默认新建一个
+
     Returns:
         tuple: (processed_results, temp_files_for_final_processing)
             - processed_results: 处理结果列表
             - temp_files_for_final_processing: 准备用于最终处理的文件列表
     """
-    logger.info("Processing via imgToFile (script-based OCR to DOCX first)")
-    
+    start_time = time.perf_counter()
+    # 每张图片生成的中间文件格式
+    file_format = output_format if output_format in TEXT_OUTPUT_FORMATS or (output_format == 'pdf' and native_pdf) else 'docx'
+    pool = get_ocr_worker_pool()
+    use_inprocess_engine = get_ocr_execution_mode() == 'inprocess'
+    mode = 'pool' if pool is not None else ('inprocess' if use_inprocess_engine else 'subprocess')
+    if pool is not None:
+        logger.info(f"Processing via imgToFile (OCR worker pool to {file_format.upper()} first)")
+    elif use_inprocess_engine:
+        logger.info(f"Processing via imgToFile (in-process extraction engine to {file_format.upper()} first)")
+    else:
+        logger.info(f"Processing via imgToFile (script-based OCR to {file_format.upper()} first)")
+
     processed_results = []
     temp_files_for_final_processing = []
-    
-    # 调用脚本为每个图片生成单独的 .docx 文件
-    script_path = os.path.join(settings.BASE_DIR.parent, 'extract_text_from_images.py')
-    
+
+    # 先把全部图片提交给进程池并行处理，再按上传顺序收集结果
+    # 排队中的图片数（已上传、尚未完成转换）计入 ocr_queue_depth
+    queued = sum(1 for info in uploaded_files_info if info['status'] == 'uploaded')
+    metrics.add_gauge("ocr_queue_depth", queued)
+    executor = executor or BoundedExecutor()
+
+    def submit_script(job):
+        # 逐张启动脚本的图片提交给有界线程池，多张图片的子进程同时运行
+        if job['script_future'] is None:
+            job['script_future'] = executor.submit(convert_image_by_script, job['info']['path'], job['output_path'], file_format)
+        return job['script_future']
+
+    pending_jobs = []
     for up_file_info in uploaded_files_info:
-        if up_file_info['status'] == 'uploaded':
-            original_name = up_file_info['name']
-            input_image_path = up_file_info['path']
-            temp_script_output_docx_filename = f"{os.path.splitext(original_name)[0]}_tempScriptOutput.docx"
-            temp_script_output_docx_path = os.path.join(user_converted_dir, temp_script_output_docx_filename)
-            
+        if up_file_info['status'] != 'uploaded':
+            pending_jobs.append({'info': up_file_info})
+            continue
+        original_name = up_file_info['name']
+        temp_script_output_docx_filename = f"{os.path.splitext(original_name)[0]}_tempScriptOutput.{file_format}"
+        temp_script_output_docx_path = os.path.join(user_converted_dir, temp_script_output_docx_filename)
+        async_result = None
+        # 进程池已被其他任务终止时不再提交（submit 会重新启动一个不受全局管理的进程池）
+        if pool is not None and pool.is_running:
             try:
-                python_executable = 'python' 
-                command = [python_executable, script_path, input_image_path, temp_script_output_docx_path, '--format', 'docx']
-                logger.debug(f"Executing script command: {' '.join(command)}")
-                
-                result = subprocess.run(
-                    command, 
-                    capture_output=True, 
-                    text=True, 
-                    check=False, 
-                    encoding='utf-8', 
-                    errors='replace'
+                async_result = pool.submit_image_to_outputs(
+                    up_file_info['path'], {file_format: temp_script_output_docx_path}, name=original_name,
                 )
-                
-                if result.returncode == 0 and os.path.exists(temp_script_output_docx_path):
-                    logger.info(f"Script successfully created DOCX: {temp_script_output_docx_path} for {original_name}")
-                    temp_files_for_final_processing.append({
-                        'path': temp_script_output_docx_path, 
-                        'original_name': original_name,
-                        'base_filename_no_ext': os.path.splitext(original_name)[0]
-                    })
-                else: 
-                    error_message = result.stderr or result.stdout or "Script execution failed."
-                    if not os.path.exists(temp_script_output_docx_path):
-                         error_message += " Script output DOCX file not found."
-                    logger.error(f"Error converting {original_name} by script: {error_message}")
-                    processed_results.append({ 
-                        'original_name': original_name,
-                        'converted_name': '',
-                        'download_url': '',
-                        'status': 'conversion_error',
-                        'message': error_message
-                    })
             except Exception as e:
-                logger.exception(f"Exception during script execution for {original_name}")
-                processed_results.append({
-                    'original_name': original_name, 
+                logger.error(f"Failed to dispatch {original_name} to OCR worker pool: {e}")
+        job = {'info': up_file_info, 'output_path': temp_script_output_docx_path, 'async_result': async_result, 'script_future': None}
+        if async_result is None and not use_inprocess_engine:
+            submit_script(job)
+        pending_jobs.append(job)
+
+    task_timeout = getattr(settings, 'OCR_WORKER_TASK_TIMEOUT', 300)
+    pool_broken = False
+
+    def abandon_pool(index):
+        # 其余已提交的任务也无法保证完成，剩余图片走子进程
+        for remaining in pending_jobs[index + 1:]:
+            if remaining.get('async_result') is not None:
+                submit_script(remaining)
+    for index, job in enumerate(pending_jobs):
+        up_file_info = job['info']
+        if up_file_info['status'] != 'uploaded':
+            processed_results.append(up_file_info)
+            continue
+        temp_script_output_docx_path, async_result = job['output_path'], job['async_result']
+
+        original_name = up_file_info['name']
+        input_image_path = up_file_info['path']
+        image_start_time = time.perf_counter()
+        if on_event is not None:
+            on_event('ocr_started', original_name, None)
+        event = None  # 完成后报告的 (阶段, 条目)
+        try:
+            success, error_message = False, None
+            if async_result is not None and not pool_broken:
+                try:
+                    # 图片本身无法识别（解码或 OCR 出错）时直接报告该文件出错，不再回退到子进程
+                    error_message = _result_error(_wait_pool_result(pool, async_result, _pool_task_timeout(input_image_path, task_timeout)))
+                    success = error_message is None and os.path.exists(temp_script_output_docx_path)
+                    if error_message is None and not success:
+                        logger.error(f"OCR worker finished but output {file_format.upper()} file not found for {original_name}, falling back to script execution.")
+                except multiprocessing.TimeoutError:
+                    # 工作进程卡死时重建进程池（只终止本任务使用的进程池），剩余图片走子进程
+                    logger.error(f"OCR worker pool timed out on {original_name}, restarting pool and falling back to script execution.")
+                    reset_ocr_worker_pool(pool)
+                    pool_broken = True
+                    abandon_pool(index)
+                except OCRWorkerPoolTerminated:
+                    logger.warning(f"OCR worker pool was restarted by another job while waiting for {original_name}, falling back to script execution.")
+                    pool_broken = True
+                    abandon_pool(index)
+                except Exception as e:
+                    logger.error(f"OCR worker pool failed on {original_name}, falling back to script execution: {e}")
+            elif use_inprocess_engine:
+                try:
+                    error_message = _result_error(
+                        get_extraction_engine().image_to_outputs(input_image_path, {file_format: temp_script_output_docx_path}, name=original_name)
+                    )
+                    success = error_message is None and os.path.exists(temp_script_output_docx_path)
+                except Exception as e:
+                    logger.error(f"In-process extraction failed on {original_name}, falling back to script execution: {e}", exc_info=True)
+
+            if not success and error_message is None:
+                success, error_message = submit_script(job).result()
+            elif not success and os.path.exists(temp_script_output_docx_path):
+                # 识别失败的图片不保留空的输出文件
+                os.remove(temp_script_output_docx_path)
+
+            if success:
+                logger.info(f"Successfully created {file_format.upper()}: {temp_script_output_docx_path} for {original_name}")
+                event = ('ocr_done', {
+                    'path': temp_script_output_docx_path,
+                    'original_name': original_name,
+                    'base_filename_no_ext': os.path.splitext(original_name)[0]
+                })
+                temp_files_for_final_processing.append(event[1])
+            else:
+                logger.error(f"Error converting {original_name} by script: {error_message}")
+                event = ('error', {
+                    'original_name': original_name,
+                    'converted_name': '',
+                    'download_url': '',
                     'status': 'conversion_error',
-                    'message': f'服务器内部错误: {str(e)}'
+                    'message': error_message
                 })
-        else: 
-            processed_results.append(up_file_info)
-    
-    return processed_results, temp_files_for_final_processing 
\ No newline at end of file
+                processed_results.append(event[1])
+        except Exception as e:
+            logger.exception(f"Exception during script execution for {original_name}")
+            event = ('error', {
+                'original_name': original_name,
+                'status': 'conversion_error',
+                'message': f'服务器内部错误: {str(e)}'
+            })
+            processed_results.append(event[1])
+        finally:
+            metrics.add_gauge("ocr_queue_depth", -1)
+            metrics.record_stage("image_to_docx", time.perf_counter() - image_start_time, mode=mode)
+            if on_event is not None and event is not None:
+                on_event(event[0], original_name, event[1])
+
+    metrics.record_stage("process_images", time.perf_counter() - start_time, mode=mode)
+    return processed_results, temp_files_for_final_processing
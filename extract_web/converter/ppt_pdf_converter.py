@@ -1,10 +1,17 @@
 import subprocess
 import os
 import logging
+import tempfile
+import threading
 from pathlib import Path
 
+import metrics
+
 logger = logging.getLogger('converter')
 
+# PowerPoint（COM）同一时间只能有一个转换；LibreOffice 每次使用独立的用户配置目录，可以同时运行多个
+_POWERPOINT_COM_LOCK = threading.Lock()
+
 def convert_pptx_to_pdf_libreoffice(input_path, output_path):
     """
     使用LibreOffice命令行工具转换PPTX到PDF
@@ -21,24 +28,28 @@ def convert_pptx_to_pdf_libreoffice(input_path, output_path):
         output_dir = os.path.dirname(output_path)
         os.makedirs(output_dir, exist_ok=True)
         
-        # LibreOffice命令
-        cmd = [
-            'soffice',
-            '--headless',
-            '--convert-to', 'pdf',
-            '--outdir', output_dir,
-            input_path
-        ]
-        
-        logger.info(f"Running LibreOffice command: {' '.join(cmd)}")
-        
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=60,  # 60秒超时
-            check=True
-        )
+        # 多个转换同时运行时共用一个用户配置目录会互相锁住，每次转换使用临时配置目录
+        with tempfile.TemporaryDirectory(prefix='lo_profile_') as profile_dir:
+            # LibreOffice命令
+            cmd = [
+                'soffice',
+                f'-env:UserInstallation={Path(profile_dir).as_uri()}',
+                '--headless',
+                '--convert-to', 'pdf',
+                '--outdir', output_dir,
+                input_path
+            ]
+
+            logger.info(f"Running LibreOffice command: {' '.join(cmd)}")
+
+            with metrics.stage("libreoffice"):
+                result = subprocess.run(
+                    cmd,
+                    capture_output=True,
+                    text=True,
+                    timeout=60,  # 60秒超时
+                    check=True
+                )
         
         # LibreOffice会生成与输入文件同名的PDF文件
         input_filename = os.path.basename(input_path)
@@ -86,21 +97,28 @@ def convert_pptx_to_pdf_comtypes(input_path, output_path):
         tuple: (success: bool, actual_output_path: str or None, error_message: str or None)
     """
     try:
+        import comtypes
         import comtypes.client
         
-        # 启动PowerPoint应用程序（headless模式）
-        powerpoint = comtypes.client.CreateObject("PowerPoint.Application")
-        powerpoint.Visible = 0  # 设置为不可见（headless模式）
-        
-        # 打开PPTX文件
-        presentation = powerpoint.Presentations.Open(os.path.abspath(input_path))
-        
-        # 导出为PDF（格式代码32代表PDF）
-        presentation.SaveAs(os.path.abspath(output_path), 32)
-        
-        # 关闭文件和应用程序
-        presentation.Close()
-        powerpoint.Quit()
+        with _POWERPOINT_COM_LOCK, metrics.stage("powerpoint_com"):
+            # 在线程池中调用时需要先初始化 COM
+            comtypes.CoInitialize()
+            try:
+                # 启动PowerPoint应用程序（headless模式）
+                powerpoint = comtypes.client.CreateObject("PowerPoint.Application")
+                powerpoint.Visible = 0  # 设置为不可见（headless模式）
+
+                # 打开PPTX文件
+                presentation = powerpoint.Presentations.Open(os.path.abspath(input_path))
+
+                # 导出为PDF（格式代码32代表PDF）
+                presentation.SaveAs(os.path.abspath(output_path), 32)
+
+                # 关闭文件和应用程序
+                presentation.Close()
+                powerpoint.Quit()
+            finally:
+                comtypes.CoUninitialize()
         
         if os.path.exists(output_path):
             logger.info(f"PowerPoint COM转换成功: {output_path}")
@@ -120,6 +138,20 @@ def convert_pptx_to_pdf_comtypes(input_path, output_path):
         return False, None, error_msg
 
 def convert_pptx_to_pdf(input_path, output_path):
+    """
+    转换PPTX到PDF（记录 pptx_to_pdf 阶段耗时，各方案的耗时分别记为 libreoffice / powerpoint_com）
+    
+    Args:
+        input_path: 输入的PPTX文件路径
+        output_path: 输出的PDF文件路径
+    
+    Returns:
+        tuple: (success: bool, actual_output_path: str or None, error_message: str or None)
+    """
+    with metrics.stage("pptx_to_pdf"):
+        return _convert_pptx_to_pdf(input_path, output_path)
+
+def _convert_pptx_to_pdf(input_path, output_path):
     """
     转换PPTX到PDF的主函数，按优先级尝试不同方案
     
@@ -0,0 +1,96 @@
+"""
+转换过程中逐个文件执行的步骤（OCR 脚本子进程、PPT 转 PDF、单个文件转 PDF）共用的有界线程池
+- 进程内只有一个共享线程池，大小为 CONVERSION_EXECUTOR_MAX_WORKERS，限制整个进程同时运行的转换子进程数
+- 每个请求（后台任务）创建一个 BoundedExecutor，最多同时占用 CONVERSION_PER_REQUEST_CONCURRENCY 个线程，
+  其余步骤在该对象中排队，一个大批量请求不会占满共享线程池，其他请求的文件也能及时开始
+- 提交后返回 Future，调用方按上传顺序取结果；单个文件的异常只出现在该文件的 Future 中
+- 提交给线程池的函数不能再等待同一线程池中的其他任务（等待只在请求或任务线程中进行），避免线程池耗尽后互相等待
+"""
+import collections
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from django.conf import settings
+
+import metrics # 阶段耗时指标（项目根目录的 metrics.py）
+
+logger = logging.getLogger('converter')
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_PER_REQUEST_CONCURRENCY = 1
+
+_shared_executor = None
+_shared_executor_lock = threading.Lock()
+
+
+def get_shared_executor():
+    """进程内共享的转换线程池，首次调用时创建"""
+    global _shared_executor
+    with _shared_executor_lock:
+        if _shared_executor is None:
+            max_workers = max(1, getattr(settings, 'CONVERSION_EXECUTOR_MAX_WORKERS', DEFAULT_MAX_WORKERS))
+            _shared_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='conversion-step')
+            logger.info(f"Started shared conversion executor with {max_workers} thread(s)")
+        return _shared_executor
+
+
+class BoundedExecutor:
+    """一个请求的步骤提交器：最多 limit 个步骤同时在共享线程池中运行，其余按提交顺序排队"""
+
+    def __init__(self, limit=None):
+        """
+        Args:
+            limit: 该请求同时运行的步骤数，默认 CONVERSION_PER_REQUEST_CONCURRENCY
+        """
+        self.limit = max(1, limit or getattr(settings, 'CONVERSION_PER_REQUEST_CONCURRENCY', DEFAULT_PER_REQUEST_CONCURRENCY))
+        self._pending = collections.deque()
+        self._running = 0
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        提交一个步骤，立即返回（不等待空闲线程）
+
+        Returns:
+            concurrent.futures.Future: 步骤的结果或异常
+        """
+        future = Future()
+        with self._lock:
+            self._pending.append((future, fn, args, kwargs))
+        metrics.add_gauge("conversion_steps", 1, state="queued")
+        self._dispatch()
+        return future
+
+    def map(self, fn, items):
+        """对每个元素提交 fn(item)，返回按 items 顺序排列的 Future 列表"""
+        return [self.submit(fn, item) for item in items]
+
+    def _dispatch(self):
+        while True:
+            with self._lock:
+                if self._running >= self.limit or not self._pending:
+                    return
+                future, fn, args, kwargs = self._pending.popleft()
+                self._running += 1
+            metrics.add_gauge("conversion_steps", -1, state="queued")
+            if not future.set_running_or_notify_cancel():
+                self._release()
+                continue
+            metrics.add_gauge("conversion_steps", 1, state="running")
+            inner = get_shared_executor().submit(fn, *args, **kwargs)
+            inner.add_done_callback(lambda inner, future=future: self._finish(future, inner))
+
+    def _finish(self, future, inner):
+        metrics.add_gauge("conversion_steps", -1, state="running")
+        error = inner.exception()
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(inner.result())
+        self._release()
+        self._dispatch()
+
+    def _release(self):
+        with self._lock:
+            self._running -= 1
@@ -1,3 +1,262 @@
-from django.test import TestCase
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import OperationalError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from . import job_queue, pic_file_converter, worker_metrics
+from .models import ConversionJob, ConversionJobEvent
+from .task_executor import BoundedExecutor
+
+
+def make_job(user, **fields):
+    """一个待转换的任务（一个已上传的文件）"""
+    files = [{'name': 'a.jpg', 'status': 'uploaded', 'path': '/tmp/a.jpg'}]
+    return ConversionJob.objects.create(
+        user=user, date_str='20240101', files=files, main_tab='imgToFile', output_format='txt', progress_total=1, **fields,
+    )
+
+
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        self.alice = User.objects.create(username='alice')
+        self.bob = User.objects.create(username='bob')
+
+    def test_claim_runs_one_job_per_user_at_a_time(self):
+        first = make_job(self.alice)
+        second = make_job(self.alice)
+        other = make_job(self.bob)
+
+        claimed = job_queue.claim_next_job('w1')
+        self.assertEqual(claimed.pk, first.pk)
+        self.assertEqual((claimed.status, claimed.worker, claimed.attempts), (ConversionJob.STATUS_RUNNING, 'w1', 1))
+        # alice 的第二个任务要等第一个完成，bob 的任务可以同时执行
+        self.assertEqual(job_queue.claim_next_job('w2').pk, other.pk)
+        self.assertIsNone(job_queue.claim_next_job('w2'))
+
+        ConversionJob.objects.filter(pk=first.pk).update(status=ConversionJob.STATUS_SUCCEEDED)
+        self.assertEqual(job_queue.claim_next_job('w2').pk, second.pk)
+
+    def test_stale_jobs_are_requeued_until_max_attempts(self):
+        old = timezone.now() - timedelta(seconds=600)
+        retry = make_job(self.alice, status=ConversionJob.STATUS_RUNNING, worker='dead:1', heartbeat_at=old, attempts=1)
+        give_up = make_job(self.bob, status=ConversionJob.STATUS_RUNNING, worker='dead:1', heartbeat_at=old, attempts=3)
+        alive = make_job(User.objects.create(username='carol'), status=ConversionJob.STATUS_RUNNING, worker='w1', heartbeat_at=timezone.now(), attempts=1)
+
+        self.assertEqual(job_queue.recover_stale_jobs(stale_seconds=120, max_attempts=3), (1, 1))
+        retry.refresh_from_db()
+        give_up.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual((retry.status, retry.worker), (ConversionJob.STATUS_QUEUED, ''))
+        self.assertEqual(give_up.status, ConversionJob.STATUS_FAILED)
+        self.assertIsNotNone(give_up.finished_at)
+        self.assertEqual((alive.status, alive.worker), (ConversionJob.STATUS_RUNNING, 'w1'))
+        # 重新排队的任务再次领取时计为第二次尝试
+        self.assertEqual(job_queue.claim_next_job('w2').attempts, 2)
+
+    def test_event_stream_resumes_after_last_event_id_and_ends_with_done(self):
+        job = make_job(self.alice, status=ConversionJob.STATUS_SUCCEEDED, results=[{'original_name': 'a.jpg', 'status': 'success'}])
+        events = [
+            ConversionJobEvent.objects.create(job=job, stage=stage, file_name='a.jpg', data={'done': done, 'total': 1})
+            for stage, done in (('uploaded', 0), ('ocr_started', 0), ('converted', 1))
+        ]
+        self.client.force_login(self.alice)
+        response = self.client.get(f'/jobs/{job.pk}/events/', HTTP_LAST_EVENT_ID=str(events[0].pk))
+        self.assertEqual(response['Content-Type'], 'text/event-stream; charset=utf-8')
+        messages = [
+            dict(line.split(': ', 1) for line in block.splitlines())
+            for block in b''.join(response.streaming_content).decode().split('\n\n')
+            if block.startswith(('id:', 'event:'))
+        ]
+        self.assertEqual([message.get('id') for message in messages], [str(events[1].pk), str(events[2].pk), None])
+        self.assertEqual([message['event'] for message in messages], ['progress', 'progress', 'done'])
+        self.assertEqual(json.loads(messages[1]['data'])['stage'], 'converted')
+        done = json.loads(messages[2]['data'])
+        self.assertEqual(done['status'], ConversionJob.STATUS_SUCCEEDED)
+        self.assertEqual(done['results'], [{'original_name': 'a.jpg', 'status': 'success'}])
+
+
+class HeartbeatTests(TestCase):
+
+    def setUp(self):
+        self.job = make_job(User.objects.create(username='alice'), status=ConversionJob.STATUS_RUNNING, worker='w1')
+
+    def test_heartbeat_survives_a_failed_update(self):
+        calls = []
+        real_filter = ConversionJob.objects.filter
+
+        def flaky_filter(*args, **kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                raise OperationalError('database is locked')
+            if len(calls) >= 3:
+                heartbeat._stopped.set()
+            return real_filter(*args, **kwargs)
+
+        heartbeat = job_queue._Heartbeat(self.job.pk, 0.01)
+        with mock.patch.object(ConversionJob.objects, 'filter', side_effect=flaky_filter), \
+                mock.patch('django.db.connection.close'):
+            heartbeat._run()
+        self.assertGreaterEqual(len(calls), 3)
+
+
+class RunJobTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='alice')
+
+    def test_result_is_discarded_after_another_worker_took_the_job_over(self):
+        job = make_job(self.user)
+        job = job_queue.claim_next_job('w1')
+
+        def taken_over(*args, **kwargs):
+            # 心跳超时后任务被重新排队并由 w2 领取
+            ConversionJob.objects.filter(pk=job.pk).update(worker='w2', attempts=2)
+            return [{'original_name': 'a.jpg', 'status': 'success'}], []
+
+        with mock.patch.object(job_queue, 'run_conversion', side_effect=taken_over):
+            result = job_queue.run_job(job, heartbeat_interval=60)
+        self.assertEqual(result.status, ConversionJob.STATUS_RUNNING)
+        self.assertEqual(result.worker, 'w2')
+        self.assertEqual(result.results, [])
+
+    def test_result_is_saved_by_the_owning_worker(self):
+        make_job(self.user)
+        job = job_queue.claim_next_job('w1')
+        with mock.patch.object(job_queue, 'run_conversion', return_value=([{'original_name': 'a.jpg', 'status': 'success'}], ['note'])):
+            job_queue.run_job(job, heartbeat_interval=60)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ConversionJob.STATUS_SUCCEEDED)
+        self.assertEqual(job.results, [{'original_name': 'a.jpg', 'status': 'success'}])
+        self.assertEqual(job.warnings, ['note'])
+        self.assertEqual(job.progress_done, 1)
+
+
+class MetricsTests(TestCase):
+
+    def test_metrics_include_job_counts_and_worker_snapshots(self):
+        user = User.objects.create(username='alice')
+        make_job(user)
+        make_job(user, status=ConversionJob.STATUS_RUNNING, worker='w1')
+        make_job(user, status=ConversionJob.STATUS_SUCCEEDED)
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_WORKER_SNAPSHOT_DIR=directory):
+            worker_metrics.publish_snapshot('host:42')
+            text = self.client.get('/metrics/', REMOTE_ADDR='127.0.0.1').content.decode()
+            worker_metrics.remove_snapshot('host:42')
+            after_exit = self.client.get('/metrics/', REMOTE_ADDR='127.0.0.1').content.decode()
+        self.assertIn('extractdoc_conversion_jobs{status="queued"} 1', text)
+        self.assertIn('extractdoc_conversion_jobs{status="running"} 1', text)
+        self.assertIn('extractdoc_ocr_queue_depth{worker="host:42"} 0', text)
+        self.assertNotIn('conversion_jobs{status="queued",worker=', text)
+        self.assertNotIn('worker="host:42"', after_exit)
+
+
+class FakePool:
+    """OCRWorkerPool 替身：立即写出输出文件并返回成功的结果，记录收到的图片名称"""
+
+    def __init__(self):
+        self.is_running = True
+        self.names = []
+
+    def submit_image_to_outputs(self, image_path, outputs, name=None):
+        self.names.append(name)
+        for output_path in outputs.values():
+            with open(output_path, 'w', encoding='utf-8') as f:
+                f.write('hello')
+        return SimpleNamespace(ready=lambda: True, get=lambda timeout=None: SimpleNamespace(ok=True, error=None, name=name))
+
+    def terminate(self):
+        self.is_running = False
+
+
+class PendingResult:
+    """永远不会完成的 AsyncResult（所属进程池已被终止）"""
+
+    def ready(self):
+        return False
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, 0.01))
+
+
+class OCRWorkerPoolTests(TestCase):
+
+    def tearDown(self):
+        pic_file_converter._ocr_worker_pool = None
+
+    def test_reset_only_terminates_the_pool_that_timed_out(self):
+        stale, current = FakePool(), FakePool()
+        pic_file_converter._ocr_worker_pool = current
+        pic_file_converter.reset_ocr_worker_pool(stale)
+        self.assertIs(pic_file_converter._ocr_worker_pool, current)
+        self.assertTrue(current.is_running)
+
+        pic_file_converter.reset_ocr_worker_pool(current)
+        self.assertIsNone(pic_file_converter._ocr_worker_pool)
+        self.assertFalse(current.is_running)
+        pic_file_converter.reset_ocr_worker_pool(current)
+        pic_file_converter.reset_ocr_worker_pool(None)
+
+    def test_waiter_gives_up_as_soon_as_the_pool_is_terminated(self):
+        pool = FakePool()
+        pool.terminate()
+        start_time = time.monotonic()
+        with self.assertRaises(pic_file_converter.OCRWorkerPoolTerminated):
+            pic_file_converter._wait_pool_result(pool, PendingResult(), timeout=60)
+        self.assertLess(time.monotonic() - start_time, 5)
+        with self.assertRaises(multiprocessing.TimeoutError):
+            pic_file_converter._wait_pool_result(FakePool(), PendingResult(), timeout=0.05)
+
+    def test_pool_receives_the_original_upload_name(self):
+        pool = FakePool()
+        with tempfile.TemporaryDirectory() as directory, mock.patch.object(pic_file_converter, 'get_ocr_worker_pool', return_value=pool):
+            image_path = os.path.join(directory, 'invoice_1.jpg')
+            open(image_path, 'wb').close()
+            files = [{'name': 'invoice.jpg', 'status': 'uploaded', 'path': image_path}]
+            processed, converted = pic_file_converter.process_images_to_files(files, directory, output_format='txt')
+        self.assertEqual(pool.names, ['invoice.jpg'])
+        self.assertEqual(processed, [])
+        self.assertEqual([item['original_name'] for item in converted], ['invoice.jpg'])
+
+
+class BoundedExecutorTests(SimpleTestCase):
+
+    def test_results_keep_submission_order_within_the_request_limit(self):
+        lock = threading.Lock()
+        active = []
+        peak = []
+
+        def step(item):
+            with lock:
+                active.append(item)
+                peak.append(len(active))
+            # 先提交的步骤耗时更长，完成顺序与提交顺序相反
+            time.sleep(0.01 * (6 - item))
+            with lock:
+                active.remove(item)
+            return item * 10
+
+        futures = BoundedExecutor(limit=2).map(step, range(6))
+        self.assertEqual([future.result(timeout=10) for future in futures], [0, 10, 20, 30, 40, 50])
+        self.assertEqual(max(peak), 2)
+
+    def test_exception_is_reported_for_its_own_file_only(self):
+        def step(name):
+            if name == 'broken.ppt':
+                raise ValueError('cannot convert broken.ppt')
+            return name.replace('.ppt', '.pdf')
+
+        futures = BoundedExecutor(limit=1).map(step, ['a.ppt', 'broken.ppt', 'c.ppt'])
+        self.assertEqual(futures[0].result(timeout=10), 'a.pdf')
+        self.assertIsInstance(futures[1].exception(timeout=10), ValueError)
+        self.assertEqual(futures[2].result(timeout=10), 'c.pdf')
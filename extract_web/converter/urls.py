@@ -13,7 +13,11 @@ urlpatterns = [
     path("admin-console/user/delete/<int:user_id>/", views.admin_delete_user, name="admin_delete_user"),
     path("admin/users/edit/<int:user_id>/", views.admin_edit_user, name="admin_edit_user"),
     path("process-images/", views.process_images_view, name="process_images"),
+    path("jobs/<int:job_id>/", views.conversion_job_status_view, name="conversion_job_status"),
+    path("jobs/<int:job_id>/result/", views.conversion_job_result_view, name="conversion_job_result"),
+    path("jobs/<int:job_id>/events/", views.conversion_job_events_view, name="conversion_job_events"),
     path("history/", views.conversion_history_view, name="conversion_history"),
+    path("metrics/", views.metrics_view, name="metrics"),
     path("delete-converted-file/<str:date_str>/<str:filename>/", views.delete_converted_file_view, name="delete_converted_file"),
 ]
 
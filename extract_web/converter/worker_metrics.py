@@ -0,0 +1,91 @@
+"""
+后台转换工作进程的指标快照
+- CONVERSION_JOB_QUEUE = True 时 OCR 和转换都在 manage.py run_conversion_jobs 进程中执行，
+  Web 进程自己的指标（队列深度、模型是否已预热、阶段耗时）反映不到这些工作
+- 工作进程定期把本进程的指标（metrics.snapshot()）写入 METRICS_WORKER_SNAPSHOT_DIR 下的一个 JSON 文件，
+  Web 端的 /metrics/ 读取所有快照，与本进程的指标合并输出，工作进程的样本带 worker 标签
+- 超过 CONVERSION_JOB_STALE_SECONDS 未更新的快照视为工作进程已退出，不再输出
+"""
+import json
+import logging
+import os
+import re
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+import metrics # 阶段耗时指标（项目根目录的 metrics.py）
+
+logger = logging.getLogger('converter')
+
+DEFAULT_SNAPSHOT_SECONDS = 5
+DEFAULT_STALE_SECONDS = 120
+# 由 Web 端直接从数据库统计的指标，工作进程的快照中不重复包含
+WEB_ONLY_METRICS = ("conversion_jobs",)
+
+
+def get_snapshot_dir():
+    """快照目录，METRICS_WORKER_SNAPSHOT_DIR 为 None 时不发布快照"""
+    path = getattr(settings, 'METRICS_WORKER_SNAPSHOT_DIR', settings.BASE_DIR / 'metrics_workers')
+    return Path(path) if path else None
+
+
+def _snapshot_path(directory, worker_id):
+    # 工作进程标识为 主机名:进程号，Windows 文件名中不能有冒号
+    return directory / f"{re.sub(r'[^A-Za-z0-9_.-]', '_', worker_id)}.json"
+
+
+def publish_snapshot(worker_id):
+    """把本进程的指标写入快照文件（先写临时文件再替换，读取方不会读到一半的内容）"""
+    directory = get_snapshot_dir()
+    if directory is None:
+        return
+    path = _snapshot_path(directory, worker_id)
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        data = {'worker': worker_id, 'written_at': time.time(), 'metrics': metrics.snapshot(exclude=WEB_ONLY_METRICS)}
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not write worker metrics snapshot to '{path}': {e}")
+
+
+def remove_snapshot(worker_id):
+    """工作进程退出时删除自己的快照"""
+    directory = get_snapshot_dir()
+    if directory is None:
+        return
+    try:
+        _snapshot_path(directory, worker_id).unlink()
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Could not remove worker metrics snapshot: {e}")
+
+
+def load_snapshots():
+    """
+    读取仍在运行的工作进程的指标快照
+
+    Returns:
+        list: [({'worker': 工作进程标识}, 指标快照)]，可直接传给 metrics.render_prometheus(snapshots=...)
+    """
+    directory = get_snapshot_dir()
+    if directory is None or not directory.is_dir():
+        return []
+    max_age = getattr(settings, 'CONVERSION_JOB_STALE_SECONDS', DEFAULT_STALE_SECONDS)
+    snapshots = []
+    for path in sorted(directory.glob('*.json')):
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Skipping unreadable worker metrics snapshot '{path.name}': {e}")
+            continue
+        if time.time() - data.get('written_at', 0) > max_age:
+            continue
+        snapshots.append(({'worker': data['worker']}, data['metrics']))
+    return snapshots
@@ -10,11 +10,17 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# 项目根目录（extract_text_from_images.py 所在目录），加入 sys.path 以便 converter 直接导入 OCR 模块
+PROJECT_ROOT_DIR = BASE_DIR.parent
+if str(PROJECT_ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT_DIR))
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -78,6 +84,8 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Web 进程和转换任务工作进程同时写入时，等待锁释放的最长时间（秒）
+        "OPTIONS": {"timeout": 20},
     }
 }
 
@@ -130,6 +138,38 @@ LOGOUT_REDIRECT_URL = '/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'his_pic'
 
+# 图片 OCR 执行方式：
+#   'pool'       - 常驻工作进程池（模型只加载一次，多张图片并行）
+#   'inprocess'  - 在 Django 进程内直接调用 ExtractionEngine（单进程部署或调试时使用）
+#   'subprocess' - 每张图片启动一次 extract_text_from_images.py（原有方式）
+# pool/inprocess 出错时会回退到 subprocess 方式
+OCR_EXECUTION_MODE = 'pool'
+OCR_WORKER_POOL_SIZE = 2
+OCR_WORKER_TASK_TIMEOUT = 300  # 单张图片的最长处理时间（秒）
+OCR_CONFIG_PATH = BASE_DIR / 'config.yaml'
+# 图片转 PDF 的生成方式：'auto'（安装了 docx2pdf 时先生成 DOCX 再转换，与早期版本一致；未安装时使用原生渲染器）/
+# 'native'（由识别结果直接生成，不需要 Microsoft Word，版式见 config.yaml 的 pdf_mode）/ 'docx2pdf'
+PDF_ENGINE = 'auto'
+
+# 转换任务队列：上传后创建任务并立即返回任务编号，由 python manage.py run_conversion_jobs 在后台执行
+# （任务保存在上面的数据库中，不需要其他消息服务）；False 时在上传请求中直接执行，不需要启动工作进程
+CONVERSION_JOB_QUEUE = True
+CONVERSION_WORKER_CONCURRENCY = 2  # 每个工作进程同时执行的任务数（同一用户的任务总是按提交顺序逐个执行）
+CONVERSION_JOB_HEARTBEAT_SECONDS = 15  # 执行中的任务刷新心跳的间隔
+CONVERSION_JOB_STALE_SECONDS = 120  # 心跳超过该时间未刷新视为工作进程已退出，任务重新排队
+CONVERSION_JOB_MAX_ATTEMPTS = 3  # 任务最多执行的次数，超过后标记为失败
+CONVERSION_EVENTS_STREAM_SECONDS = 300  # 进度推送（server-sent events）连接的最长保持时间，到时浏览器自动重连
+CONVERSION_EXECUTOR_MAX_WORKERS = 4  # 每个进程共享的转换线程数（同时运行的 OCR 脚本、PPT/Word 转 PDF 步骤总数）
+CONVERSION_PER_REQUEST_CONCURRENCY = 2  # 每个请求（任务）最多同时运行的步骤数，其余排队，避免一个大批量任务占满共享线程
+# 阶段耗时指标：每个处理阶段一行 JSON 追加写入该文件（None 关闭，默认关闭；文件不轮转，开启时如 BASE_DIR / 'metrics.jsonl'）；
+# /metrics/ 端点输出 Prometheus 文本格式，只允许以下地址访问（空列表表示不限制）
+METRICS_JSONL_PATH = None
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+# 后台工作进程（run_conversion_jobs）每隔 METRICS_WORKER_SNAPSHOT_SECONDS 秒把自己的指标写入该目录，
+# /metrics/ 合并输出（None 关闭）；超过 CONVERSION_JOB_STALE_SECONDS 未更新的快照不再输出
+METRICS_WORKER_SNAPSHOT_DIR = BASE_DIR / 'metrics_workers'
+METRICS_WORKER_SNAPSHOT_SECONDS = 5
+
 # Logging Configuration
 LOGGING = {
     'version': 1,
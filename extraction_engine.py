@@ -0,0 +1,1020 @@
+# -*- coding: utf-8 -*-
+"""
+可重入的图片文字提取引擎
+- ExtractionEngine 持有 OCR 实例，不依赖模块级全局状态，可在 Django 视图和其他服务中直接进程内调用
+- 输入支持图片路径、图片字节和 NumPy 数组，每张图片只解码一次，并按预处理配置（preprocess_profile）缩放和增强
+- iter_results 以生成器方式逐张返回结构化结果，每张图片处理完成即可消费
+- 超大图片（如 600 dpi 的 A3 扫描件）自动切分为重叠图块逐块识别，再合并为整页结果
+- 自适应方向分类：页面判断为正向时跳过逐行的方向分类器，只在页面疑似旋转或识别置信度低时运行
+- 表格识别（table_recognition）：版面模型判为表格且有表格线的区域才送入表格模型，结果作为表格元素插入
+- 识别结果由原始结构构建一次列式的 OCRPage，缓存和进程间传递都使用其紧凑的二进制格式
+- 多页文档（PDF、TIFF）按页输入（document_pages.DocumentPage），处理到该页时才渲染；
+  已有文字层的 PDF 页面（pdf_text_layer）直接使用文字层，不渲染也不识别
+"""
+import collections
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+import metrics
+from document_pages import DEFAULT_RENDER_DPI, DEFAULT_TEXT_MIN_CHARS, DocumentPage, iter_document_pages, is_document
+from image_preprocess import EXIF_ROTATIONS, preprocess_image, resolve_profile
+from ocr_backends import get_backend
+from ocr_cache import OCRResultCache, compute_config_fingerprint
+from ocr_page import OCRPage
+from ocr_tiling import iter_tiles, join_tile_lines, merge_tile_boxes, merge_tile_lines, offset_lines
+from table_structure import TableStructureAnalyzer, merge_table_regions
+from text_lines import crop_text_line, sort_text_boxes
+
+
+@dataclass
+class ImageResult:
+    """单张图片的结构化提取结果"""
+
+    name: str  # 图片文件名，用于文档标题和特殊表格处理函数分发
+    page: OCRPage = field(default_factory=OCRPage)  # 列式 OCR 结果（文本框、文字、置信度、表格）
+    source_path: str = None  # 输入为文件路径时的原始路径（多页文档为文档路径）
+    error: str = None  # 图片读取或处理失败时的错误信息
+    elapsed: float = 0.0  # 该图片的处理耗时（秒）
+    timings: dict = field(default_factory=dict)  # 预处理各步骤耗时（毫秒），缓存命中时为空
+    scale: float = 1.0  # 送入 OCR 的图片尺寸 / 原始尺寸（PDF 页面的原始尺寸单位为点）
+    page_index: int = None  # 多页文档（PDF、TIFF）中的页码，从 0 开始；单张图片为 None
+    text_layer: bool = False  # 结果取自 PDF 的文字层，没有执行 OCR
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def elements(self):
+        """OCR 版面元素（PaddleOCR 原始结构），兼容按嵌套列表处理结果的调用方"""
+        return self.page.to_elements()
+
+
+def parse_layout_result(result, logger=None, image_path="<in-memory image>"):
+    """Turn a raw ``PaddleOCR.ocr`` result into the list of page layout elements."""
+    if logger:
+        # Log a snippet of the raw result to understand its structure
+        logger.debug(
+            f"Raw OCR result for {image_path} (layout=True mode): {str(result)[:1500]}"
+        )
+
+    if not result:
+        if logger:
+            logger.warning(f"OCR returned empty result for {image_path}.")
+        return []
+
+    if isinstance(result, list) and len(result) > 0:
+        page_elements = result[0]
+
+        if isinstance(page_elements, list):
+            if logger and page_elements:
+                first_elem_type = (
+                    type(page_elements[0])
+                    if page_elements
+                    else "empty list (page_elements was empty)"
+                )
+                element_count = len(page_elements)
+                logger.debug(
+                    f"Extracted page_elements for {image_path}. Count: {element_count}. Type of first element: {first_elem_type}. Content (first 1000 chars): {str(page_elements)[:1000]}"
+                )
+            elif logger and not page_elements:
+                logger.debug(
+                    f"Extracted page_elements for {image_path} is an empty list."
+                )
+            return page_elements
+        else:
+            if logger:
+                logger.warning(
+                    f"Expected result[0] to be a list of elements for {image_path}, but got {type(page_elements)}. Content: {str(page_elements)[:500]}"
+                )
+            return []
+    else:
+        if logger:
+            logger.warning(
+                f"OCR result for {image_path} is not in the expected list format or is empty. Result: {str(result)[:500]}"
+            )
+        return []
+
+
+def extract_layout_elements(image, ocr_instance, logger=None, image_label=None):
+    """Extract layout elements (text, tables, figures) from an image.
+
+    ``image`` may be a file path or an already decoded BGR NumPy array;
+    ``image_label`` is only used in log messages.
+    """
+    image_path = image_label or (image if isinstance(image, str) else "<in-memory image>")
+    try:
+        result = ocr_instance.ocr(image, cls=True)
+        return parse_layout_result(result, logger, image_path)
+    except Exception as e:
+        if logger:
+            logger.error(
+                f"Error during layout extraction from {image_path}: {e}", exc_info=True
+            )
+        return []
+
+
+def extract_text_from_image(image_path, ocr_instance, logger=None):
+    """Extract text from an image using PaddleOCR."""
+    try:
+        # Perform OCR on the image
+        result = ocr_instance.ocr(image_path, cls=True)
+
+        text_lines = []
+        if result and len(result) > 0 and result[0] is not None:
+            for line in result[0]:
+                if line and len(line) > 1 and line[1] and len(line[1]) > 0:
+                    text_lines.append(line[1][0])
+
+        if not text_lines:
+            if logger:  # Check if logger is initialized
+                logger.warning(f"No text detected in {image_path}")
+            else:  # Fallback if logger somehow not set, though it should be
+                print(f"Warning: No text detected in {image_path}")
+            return "No text detected in this image."
+
+        text = "\n".join(text_lines)
+        return text
+    except Exception as e:
+        if logger:  # Check if logger is initialized
+            logger.error(f"Error processing {image_path}: {e}", exc_info=True)
+        else:
+            print(f"Error processing {image_path}: {e}")
+        return f"Error processing image: {str(e)}"
+
+
+# OCR 缓存条目的格式：(OCRPage, 预处理缩放比例)；写入配置指纹，格式变化后旧条目自动失效
+CACHE_ENTRY_FORMAT = 2
+
+
+class IncompletePageError(Exception):
+    """文本行已识别完成，但表格分析失败
+
+    携带不含表格的页面：调用方仍可输出识别出的文字，但该结果不写入缓存和运行清单，下次运行时重新分析。
+    """
+
+    def __init__(self, message, page, prepared=None):
+        super().__init__(message)
+        self.page = page
+        self.prepared = prepared
+
+
+class _PendingImage:
+    """批量识别模式下尚未完成的图片（只保存检测框和文本行识别结果，不保存整张图片）"""
+
+    __slots__ = (
+        "name", "source_path", "page_index", "text_layer", "cache_key", "boxes", "rec_results", "remaining", "page", "error",
+        "start_time", "timings", "scale", "render_scale", "use_cls", "line_images", "tables", "table_error",
+    )
+
+    def __init__(self, name, source_path, start_time, page_index=None):
+        self.name = name
+        self.source_path = source_path
+        self.page_index = page_index
+        self.text_layer = False
+        self.cache_key = None
+        self.boxes = []
+        self.rec_results = []
+        self.remaining = 0
+        self.page = None
+        self.error = None
+        self.start_time = start_time
+        self.timings = {}
+        self.scale = 1.0
+        self.render_scale = 1.0  # 文档页面的渲染比例（scale 中不属于预处理缩放的部分，不写入缓存）
+        self.use_cls = True  # 是否对该图片的文本行运行方向分类器
+        self.line_images = None  # 跳过方向分类的图片保留文本行图片，置信度低时重新识别
+        self.tables = []  # 检测阶段识别出的表格元素，识别完成后与文本行合并
+        self.table_error = None  # 表格分析失败时的错误信息（文字照常输出，但结果不写入缓存）
+
+
+class ExtractionEngine:
+    """图片文字提取引擎
+
+    每个引擎实例持有一个 OCR 实例（首次使用时创建），所有状态都保存在实例上，
+    多个调用方可以共享同一个引擎：OCR 推理在实例内部串行执行（PaddleOCR 预测器不是线程安全的），
+    图片解码和文档渲染在调用方线程中并行进行。
+    """
+
+    def __init__(self, config=None, logger=None, ocr_instance=None, cache=None):
+        """
+        Args:
+            config: 配置字典（与 config.yaml 相同的键），为 None 时使用空配置
+            logger: 日志记录器，为 None 时使用配置中的 logger_name（默认 ocr_app）
+            ocr_instance: 已创建的 OCR 实例，为 None 时在首次使用时创建
+            cache: OCR 结果缓存，为 None 时按配置（ocr_cache_enabled 等）创建
+        """
+        self.config = dict(config or {})
+        self.logger = logger or logging.getLogger(self.config.get("logger_name", "ocr_app"))
+        # 影响识别结果的 OCR 参数，同时参与缓存键的计算
+        self.ocr_options = {
+            "lang": self.config.get("ocr_lang", "ch"),
+            "use_angle_cls": bool(self.config.get("use_angle_cls", True)),
+            "backend": self.config.get("ocr_backend", "paddle"),
+            # 方向分类策略：always 每行都分类；adaptive 先估计页面方向，正向页面跳过逐行分类
+            "angle_cls_mode": self.config.get("angle_cls_mode", "always"),
+            "angle_cls_sample": int(self.config.get("angle_cls_sample", 8)),
+            "angle_cls_min_confidence": float(self.config.get("angle_cls_min_confidence", 0.8)),
+        }
+        if self.ocr_options["angle_cls_mode"] not in ("always", "adaptive"):
+            raise ValueError(f"未知的方向分类策略 '{self.ocr_options['angle_cls_mode']}'，可选: always, adaptive")
+        # 后端缺少某个模型时（如没有 ONNX 方向分类模型）在计算缓存指纹之前修正参数，缓存键与实际推理一致
+        self.ocr_options = get_backend(self.ocr_options["backend"], self.config, self.logger).resolve_options(self.ocr_options)
+        # 自适应方向分类的统计（页数、跳过/运行分类器的行数、低置信度重新识别次数）
+        self.orientation_stats = {
+            "pages": 0,
+            "cls_skipped_pages": 0,
+            "cls_skipped_lines": 0,
+            "cls_lines": 0,
+            "low_confidence_reruns": 0,
+        }
+        self._stats_lock = threading.Lock()
+        # 图片预处理配置（最长边、灰度、对比度、纠偏），同样影响识别结果
+        self.preprocess = resolve_profile(self.config.get("preprocess_profile"))
+        # 超大图片分块识别：最长边超过 trigger_side 时按 tile_size 切块，相邻图块重叠 overlap 像素
+        self.tiling = {
+            "enabled": bool(self.config.get("ocr_tiling", False)),
+            "trigger_side": int(self.config.get("tile_trigger_side", 4000)),
+            "tile_size": int(self.config.get("tile_size", 1600)),
+            "overlap": int(self.config.get("tile_overlap", 200)),
+        }
+        # 表格识别：先做版面分析，只有表格区域才运行表格模型
+        self.table_analyzer = (
+            TableStructureAnalyzer(self.config, self.logger) if self.config.get("table_recognition", False) else None
+        )
+        # 多页文档：PDF 渲染分辨率；已有文字层（至少 min_text_chars 个字符）的 PDF 页面是否直接使用文字层
+        self.document_options = {
+            "dpi": int(self.config.get("document_render_dpi", DEFAULT_RENDER_DPI)),
+            "use_text_layer": bool(self.config.get("pdf_text_layer", False)),
+            "min_text_chars": int(self.config.get("pdf_text_min_chars", DEFAULT_TEXT_MIN_CHARS)),
+        }
+        self.cache = cache if cache is not None else OCRResultCache.from_config(self.config, self.logger)
+        self._fingerprint = None
+        self._ocr = ocr_instance
+        self._init_lock = threading.Lock()
+        self._inference_lock = threading.Lock()
+
+    @property
+    def ocr(self):
+        """OCR 实例，首次访问时创建（线程安全）"""
+        if self._ocr is None:
+            with self._init_lock:
+                if self._ocr is None:
+                    self._ocr = self._create_ocr()
+        return self._ocr
+
+    def _create_ocr(self):
+        """按配置的推理后端（ocr_backend）创建用于版面分析的 OCR 实例"""
+        backend = get_backend(self.ocr_options["backend"], self.config, self.logger)
+        self.logger.info(
+            f"Initializing PaddleOCR for layout analysis ({self.ocr_options}, layout=True, use_gpu=False, show_log=False)..."
+        )
+        start_time = time.perf_counter()
+        with metrics.stage("model_init", backend=backend.name):
+            ocr = backend.create(self.ocr_options)
+        self.logger.info(
+            f"PaddleOCR initialized successfully for layout analysis (backend={backend.name}, "
+            f"{time.perf_counter() - start_time:.2f}s)."
+        )
+        return ocr
+
+    def warm_up(self):
+        """用一张白底黑条的小图片执行一次推理，使模型和内存分配在第一张真实图片之前就绪"""
+        image = np.full((64, 320, 3), 255, dtype=np.uint8)
+        image[24:40, 16:304] = 0
+        with self._inference_lock:
+            self.ocr.ocr(image, cls=self.ocr_options["use_angle_cls"])
+
+    @property
+    def fingerprint(self):
+        """OCR 配置指纹（语言、方向分类、预处理、分块和表格识别配置、PaddleOCR 版本、模型目录校验和）"""
+        if self._fingerprint is None:
+            options = {**self.ocr_options, "preprocess": self.preprocess, "tiling": self.tiling, "cache_entry": CACHE_ENTRY_FORMAT}
+            if self.table_analyzer is not None:
+                options["tables"] = self.table_analyzer.options
+            self._fingerprint = compute_config_fingerprint(options)
+        return self._fingerprint
+
+    def prepare_image(self, source):
+        """按预处理配置解码图片（JPEG 在解码阶段即按目标尺寸缩小）
+
+        Args:
+            source: 图片文件路径（str 或 os.PathLike）、图片文件字节（bytes）或 BGR NumPy 数组
+
+        Returns:
+            PreprocessedImage: 预处理后的 BGR 数组、缩放比例和解码/缩放耗时
+        """
+        # 需要分块识别的超大图片按原图尺寸判断，不先按预处理配置缩小（否则缩小后不再分块，小字丢失）
+        keep_size_above = self.tiling["trigger_side"] if self.tiling["enabled"] else None
+        prepared = preprocess_image(source, self.preprocess, keep_size_above)
+        # 预处理各步骤（decode_ms、resize_ms 等）计为 decode、resize 等阶段
+        for key, value in prepared.timings.items():
+            metrics.record_stage(key[:-3] if key.endswith("_ms") else key, value / 1000)
+        return prepared
+
+    def load_image(self, source):
+        """把图片路径、图片字节或 NumPy 数组统一解码为 BGR 格式的 NumPy 数组
+
+        Args:
+            source: 图片文件路径（str 或 os.PathLike）、图片文件字节（bytes）或 NumPy 数组
+
+        Returns:
+            np.ndarray: HxWx3 的 uint8 BGR 数组（与 PaddleOCR 读取文件得到的格式一致）
+        """
+        return self.prepare_image(source).image
+
+    @staticmethod
+    def read_source_bytes(source):
+        """读取输入的原始字节，用于计算缓存键
+
+        Args:
+            source: 图片路径、图片字节或 NumPy 数组
+
+        Returns:
+            bytes: 文件内容；NumPy 数组为形状/类型描述加像素数据
+        """
+        if isinstance(source, np.ndarray):
+            header = f"{source.shape}|{source.dtype}|".encode("ascii")
+            return header + np.ascontiguousarray(source).tobytes()
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return bytes(source)
+        with open(source, "rb") as f:
+            return f.read()
+
+    def _should_tile(self, image):
+        """图片最长边超过分块阈值时返回 True（这类图片在预处理时保留原始尺寸，见 prepare_image）"""
+        return self.tiling["enabled"] and max(image.shape[:2]) > self.tiling["trigger_side"]
+
+    def _iter_image_tiles(self, image):
+        """逐个产出 (x0, y0, 图块数组)，每次只复制一个图块"""
+        height, width = image.shape[:2]
+        for x0, y0, x1, y1 in iter_tiles(height, width, self.tiling["tile_size"], self.tiling["overlap"]):
+            yield x0, y0, np.ascontiguousarray(image[y0:y1, x0:x1])
+
+    @property
+    def adaptive_orientation(self):
+        """是否启用自适应方向分类（只在开启方向分类时有意义）"""
+        return self.ocr_options["use_angle_cls"] and self.ocr_options["angle_cls_mode"] == "adaptive"
+
+    def _run_ocr(self, image, exif_orientation=None):
+        """对已解码的图片执行 OCR，返回 PaddleOCR 原始结果（超大图片自动分块）
+
+        Args:
+            image: BGR 图片数组
+            exif_orientation: 原图的 EXIF 方向标记（自适应方向分类时作为页面方向的依据）
+        """
+        if self.adaptive_orientation:
+            return self._run_adaptive_ocr(image, exif_orientation)
+        ocr = self.ocr
+        # PaddleOCR.ocr 内部依次执行检测、方向分类和识别，整体计为一个阶段
+        with metrics.stage("ocr"):
+            if self._should_tile(image):
+                return self._run_tiled_ocr(image)
+            with self._inference_lock:
+                return ocr.ocr(image, cls=self.ocr_options["use_angle_cls"])
+
+    def _detect_tables(self, image):
+        """识别图片中的表格区域，未启用表格识别时返回空列表
+
+        Raises:
+            Exception: 版面或表格模型加载、推理失败（不能当作“没有表格”缓存下来）
+        """
+        if self.table_analyzer is None:
+            return []
+        with self._inference_lock, metrics.stage("tables"):
+            return self.table_analyzer.detect_tables(image)
+
+    @staticmethod
+    def _merge_tables(raw_result, tables):
+        """把表格元素合并进 PaddleOCR 原始结果（表格区域内的文本行归入表格元素）"""
+        if not tables:
+            return raw_result
+        lines = (raw_result[0] if raw_result else None) or []
+        return [merge_table_regions(lines, tables)]
+
+    def _update_orientation_stats(self, line_count, use_cls, rerun=False):
+        """记录一页的方向分类情况（低置信度重新识别的页面计为运行了分类器）"""
+        with self._stats_lock:
+            stats = self.orientation_stats
+            stats["pages"] += 1
+            if rerun:
+                stats["low_confidence_reruns"] += 1
+            if use_cls or rerun:
+                stats["cls_lines"] += line_count
+            else:
+                stats["cls_skipped_pages"] += 1
+                stats["cls_skipped_lines"] += line_count
+
+    def _page_needs_cls(self, boxes, line_images, exif_orientation=None):
+        """估计页面方向，判断是否需要对每一行运行方向分类器
+
+        - 多数检测框为竖长形（高宽比不小于 1.5）时，页面可能旋转了 90 度，需要分类
+        - 否则取最宽的若干行运行一次方向分类器，抽样中有三成以上被判为 180 度时需要分类；
+          EXIF 方向标记只说明拍摄方向，倒放在扫描仪或桌面上的纸张仍需靠抽样发现，因此不跳过抽样
+
+        Args:
+            boxes: 检测框列表
+            line_images: 与 boxes 对应的文本行图片
+            exif_orientation: 原图的 EXIF 方向标记
+
+        Returns:
+            tuple: (needs_cls: bool, reason: str)
+        """
+        points = np.asarray(boxes, dtype=np.float32).reshape(len(boxes), 4, 2)
+        widths = np.linalg.norm(points[:, 0] - points[:, 1], axis=1)
+        heights = np.linalg.norm(points[:, 0] - points[:, 3], axis=1)
+        vertical_ratio = float(np.mean(heights >= widths * 1.5))
+        if vertical_ratio > 0.5:
+            return True, f"{vertical_ratio:.0%} of boxes are vertical"
+        # EXIF 旋转只纠正了拍摄方向，纸张本身仍可能倒置，所以即使已按 EXIF 旋转也照常抽样
+        rotated_by_exif = exif_orientation in EXIF_ROTATIONS
+        note = f", EXIF orientation {exif_orientation} applied" if rotated_by_exif else ""
+
+        ocr = self.ocr
+        sample_indices = np.argsort(-widths)[: self.ocr_options["angle_cls_sample"]]
+        # text_classifier 会原地旋转传入列表中的图片，传入副本
+        sample = [line_images[index] for index in sample_indices]
+        with self._inference_lock, metrics.stage("classify", sampled="true"):
+            _, cls_results, _ = ocr.text_classifier(list(sample))
+        cls_thresh = getattr(ocr.text_classifier, "cls_thresh", 0.9)
+        rotated = sum(1 for label, score in cls_results if "180" in label and score >= cls_thresh)
+        if rotated >= max(1, 0.3 * len(cls_results)):
+            return True, f"{rotated}/{len(cls_results)} sampled lines look upside down{note}"
+        return False, f"{len(cls_results)} sampled lines look upright{note}"
+
+    def _low_confidence(self, rec_results):
+        """识别结果的平均置信度低于阈值时返回 True（可能存在未纠正的倒置文字）"""
+        scores = [score for _, score in rec_results]
+        return bool(scores) and float(np.mean(scores)) < self.ocr_options["angle_cls_min_confidence"]
+
+    def _run_adaptive_ocr(self, image, exif_orientation=None):
+        """自适应方向分类的 OCR：检测 → 估计页面方向 → 识别（必要时逐行分类）
+
+        结果结构与 PaddleOCR.ocr 相同；超大图片的检测按图块进行。
+        """
+        boxes = self._detect(image)
+        if not boxes:
+            self._update_orientation_stats(0, False)
+            return [None]
+        line_images = [crop_text_line(image, box) for box in boxes]
+        use_cls, reason = self._page_needs_cls(boxes, line_images, exif_orientation)
+        rec_results = self._recognize_lines(line_images, use_cls)
+        rerun = False
+        if not use_cls and self._low_confidence(rec_results):
+            rerun = True
+            reason = "low recognition confidence, re-ran with angle classifier"
+            rec_results = self._recognize_lines(line_images, True)
+        self._update_orientation_stats(len(boxes), use_cls, rerun)
+        self.logger.debug(
+            f"Angle classifier {'run' if use_cls or rerun else 'skipped'} for {len(boxes)} lines ({reason})"
+        )
+        return self._assemble_raw_result(boxes, rec_results, getattr(self.ocr, "drop_score", 0.5))
+
+    @staticmethod
+    def _assemble_raw_result(boxes, rec_results, drop_score):
+        """把检测框和识别结果组装为与 PaddleOCR.ocr 相同结构的结果（过滤低于 drop_score 的行）"""
+        if not boxes:
+            return [None]
+        return [[
+            [np.asarray(box).tolist(), (text, score)]
+            for box, (text, score) in zip(boxes, rec_results)
+            if score >= drop_score
+        ]]
+
+    def _run_tiled_ocr(self, image):
+        """把图片切分为重叠图块逐块识别，合并为与整页识别结构相同的结果
+
+        图块按顺序逐个识别，每次推理的内存占用只取决于图块大小；
+        每个图块推理完成后释放推理锁，其他调用方的图片可以穿插执行。
+        """
+        ocr = self.ocr
+        lines = []
+        tile_ids = []
+        tile_count = 0
+        for x0, y0, tile in self._iter_image_tiles(image):
+            with self._inference_lock:
+                result = ocr.ocr(tile, cls=self.ocr_options["use_angle_cls"])
+            del tile
+            if result and result[0]:
+                tile_lines = offset_lines(result[0], x0, y0)
+                lines.extend(tile_lines)
+                tile_ids.extend([tile_count] * len(tile_lines))
+            tile_count += 1
+        # 被图块边缘截断的行先合并为整行，并按整页图片重新识别（识别置信度过低时保留拼接的文字）
+        joined_lines, joined = join_tile_lines(lines, tile_ids)
+        positions = [index for index, flag in enumerate(joined) if flag]
+        if positions:
+            rec_results = self._recognize_lines([crop_text_line(image, joined_lines[index][0]) for index in positions])
+            drop_score = getattr(ocr, "drop_score", 0.5)
+            for index, (text, score) in zip(positions, rec_results):
+                if score >= drop_score:
+                    joined_lines[index] = [joined_lines[index][0], (text, score)]
+        merged = merge_tile_lines(joined_lines)
+        self.logger.info(
+            f"Tiled OCR on {image.shape[1]}x{image.shape[0]} image: {tile_count} tiles of {self.tiling['tile_size']}px, "
+            f"{len(lines)} lines ({len(positions)} joined across tile edges) merged to {len(merged)}"
+        )
+        return [merged] if merged else [None]
+
+    def extract_elements(self, source, name=None):
+        """识别单张图片，返回 OCR 版面元素列表
+
+        启用缓存时先按图片内容和 OCR 配置查询缓存，命中则既不解码也不识别。
+
+        Args:
+            source: 图片路径、图片字节或 NumPy 数组
+            name: 日志中使用的图片名称
+
+        Returns:
+            list: OCR 版面元素，识别失败时为空列表
+        """
+        return self.extract_page(source, name).to_elements()
+
+    def extract_page(self, source, name=None):
+        """识别单张图片，返回列式的 OCRPage
+
+        Args:
+            source: 图片路径、图片字节或 NumPy 数组
+            name: 日志中使用的图片名称
+
+        Returns:
+            OCRPage: 识别结果，识别失败时为空页面
+        """
+        try:
+            return self._extract(source, name)[0]
+        except IncompletePageError as e:
+            self.logger.error(f"{e} for {name or '<in-memory image>'}, returning text lines only", exc_info=True)
+            return e.page
+        except Exception as e:
+            self.logger.error(f"Error during layout extraction from {name or '<in-memory image>'}: {e}", exc_info=True)
+            return OCRPage()
+
+    def _to_page(self, raw_result, label):
+        """把 PaddleOCR 原始结果转换为 OCRPage（已是 OCRPage 时原样返回，如缓存命中）"""
+        if isinstance(raw_result, OCRPage):
+            return raw_result
+        return OCRPage.from_elements(parse_layout_result(raw_result, self.logger, label))
+
+    def _extract(self, source, name=None):
+        """extract_page 的实现，额外返回预处理信息（缓存命中时为 None）和预处理缩放比例（缓存命中时取自缓存）
+
+        解码或识别出错时抛出异常（不写入缓存），由调用方记录为该图片的错误；
+        只有表格分析失败时抛出 IncompletePageError，其中带有已识别的文本行。
+        """
+        label = name or "<in-memory image>"
+        prepared = None
+
+        def prepare():
+            nonlocal prepared
+            prepared = self.prepare_image(source)
+            self.logger.debug(
+                f"Preprocessed {label} with profile '{self.preprocess['name']}': "
+                f"{prepared.original_size[0]}x{prepared.original_size[1]} -> "
+                f"{prepared.image.shape[1]}x{prepared.image.shape[0]}, "
+                + ", ".join(f"{key}={value:.1f}" for key, value in prepared.timings.items())
+                + (f", skew {prepared.skew_angle:.1f} deg" if prepared.skew_angle is not None else "")
+            )
+
+        def run():
+            raw_result = self._run_ocr(prepared.image, prepared.exif_orientation)
+            try:
+                tables = self._detect_tables(prepared.image)
+            except Exception as e:
+                raise IncompletePageError(f"表格识别失败: {e}", self._to_page(raw_result, label), prepared) from e
+            return self._to_page(self._merge_tables(raw_result, tables), label)
+
+        def compute():
+            prepare()
+            return run(), prepared.scale
+
+        if self.cache is None:
+            prepare()
+            return run(), prepared, prepared.scale
+
+        if not isinstance(source, np.ndarray):
+            # 只读取一次文件，缓存键和解码都使用同一份字节
+            source = self.read_source_bytes(source)
+        key = self.cache.build_key(self.read_source_bytes(source), self.fingerprint)
+        (page, scale), hit = self.cache.get_or_compute(key, compute)
+        self.logger.debug(f"OCR cache {'hit' if hit else 'miss'} for {label} (key={key[:12]})")
+        return self._to_page(page, label), prepared, scale
+
+    def process(self, source, name=None):
+        """处理单张图片并返回结构化结果，读取或识别异常不会抛出而是记录在结果的 error 中
+
+        Args:
+            source: 图片路径、图片字节、NumPy 数组或多页文档的一页（DocumentPage）
+            name: 图片名称，为 None 时使用路径的文件名（DocumentPage 为 "文件名#page=页码"）
+
+        Returns:
+            ImageResult: 提取结果
+        """
+        name, source_path, page_index = self._describe_source(source, name)
+        self.logger.info(f"Processing {name}...")
+        start_time = time.perf_counter()
+        prepared = None
+        scale = 1.0
+        text_layer, render_scale = False, 1.0
+        try:
+            if page_index is not None:
+                text_page, source, render_scale = self._load_document_page(source)
+                text_layer = text_page is not None
+            if text_layer:
+                page = text_page
+            else:
+                page, prepared, scale = self._extract(source, name)
+            error = None
+        except IncompletePageError as e:
+            # 保留识别出的文字，但结果记为失败：不写入缓存和清单
+            self.logger.error(f"Error processing {name}: {e}", exc_info=True)
+            page, prepared, error = e.page, e.prepared, str(e)
+            scale = prepared.scale
+        except Exception as e:
+            self.logger.error(f"Error processing {name}: {e}", exc_info=True)
+            page, error = OCRPage(), str(e)
+        result = ImageResult(
+            name=name,
+            page=page,
+            source_path=source_path,
+            error=error,
+            elapsed=time.perf_counter() - start_time,
+            timings=prepared.timings if prepared else {},
+            scale=scale * render_scale,
+            page_index=page_index,
+            text_layer=text_layer,
+        )
+        self._record_image(result)
+        return result
+
+    @staticmethod
+    def _describe_source(source, name=None):
+        """输入的 (名称, 文件路径, 页码)：名称为 None 时使用文件名，页码只有多页文档的页面才有"""
+        if isinstance(source, DocumentPage):
+            return name or source.name, source.path, source.index
+        source_path = str(source) if isinstance(source, (str, os.PathLike)) else None
+        if name is None:
+            name = os.path.basename(source_path) if source_path else "image"
+        return name, source_path, None
+
+    def _load_document_page(self, document_page):
+        """读取多页文档的一页
+
+        Returns:
+            tuple: (文字层 OCRPage 或 None, BGR NumPy 数组或 None, 渲染比例)；使用文字层时不渲染
+        """
+        options = self.document_options
+        with metrics.stage("page_load", kind="pdf" if document_page.is_pdf else "tiff"):
+            text_page, image, render_scale = document_page.load(options["dpi"], options["use_text_layer"], options["min_text_chars"])
+        if text_page is not None:
+            self.logger.debug(f"Using the embedded text layer of {document_page.name} ({len(text_page)} lines), OCR skipped")
+            return text_page, None, 1.0
+        # Pillow 为 RGB，OCR 使用 BGR（与读取图片文件得到的格式一致）
+        return None, np.ascontiguousarray(np.asarray(image)[:, :, ::-1]), render_scale
+
+    @staticmethod
+    def _record_image(result):
+        """记录一张图片的总耗时和处理结果；多页文档的页面同时按处理方式（文字层 / OCR）计数"""
+        metrics.record_stage("image", result.elapsed)
+        metrics.inc("images_total", status="ok" if result.ok else "failed")
+        if result.page_index is not None:
+            metrics.inc("document_pages_total", path="text_layer" if result.text_layer else "ocr")
+
+    def iter_results(self, sources):
+        """逐张处理图片，每张图片完成后立即产出结果
+
+        Args:
+            sources: 可迭代对象，元素为图片路径、图片字节、NumPy 数组、DocumentPage，或 (名称, 图片) 二元组
+
+        Yields:
+            ImageResult: 每张图片的提取结果，顺序与输入一致
+        """
+        for item in sources:
+            name, source = self._split_source(item)
+            yield self.process(source, name)
+
+    @staticmethod
+    def _split_source(item):
+        """把 iter_results 的输入元素拆分为 (名称, 图片)，名称为 None 时由 process 推断"""
+        if isinstance(item, tuple) and len(item) == 2:
+            return item
+        return None, item
+
+    def _detect(self, image):
+        """只执行文本检测，返回按阅读顺序排序的检测框列表（超大图片逐块检测后去重合并）"""
+        with metrics.stage("detect"):
+            return self._detect_boxes(image)
+
+    def _detect_boxes(self, image):
+        ocr = self.ocr
+        if self._should_tile(image):
+            boxes = []
+            tile_ids = []
+            for tile_index, (x0, y0, tile) in enumerate(self._iter_image_tiles(image)):
+                with self._inference_lock:
+                    dt_boxes, _ = ocr.text_detector(tile)
+                if dt_boxes is not None and len(dt_boxes) > 0:
+                    boxes.extend(np.asarray(dt_boxes, dtype=np.float32) + np.float32([x0, y0]))
+                    tile_ids.extend([tile_index] * len(dt_boxes))
+            # 截断的片段合并为整行的框，之后按整页图片裁剪识别
+            return merge_tile_boxes(boxes, tile_ids)
+        with self._inference_lock:
+            dt_boxes, _ = ocr.text_detector(image)
+        if dt_boxes is None or len(dt_boxes) == 0:
+            return []
+        return sort_text_boxes(dt_boxes)
+
+    def _recognize_lines(self, line_images, use_cls=None):
+        """对一批文本行图片执行方向分类（如启用）和识别
+
+        Args:
+            line_images: 文本行图片列表
+            use_cls: 是否运行方向分类器；可以是整体的布尔值，也可以是与 line_images 等长的布尔列表，
+                为 None 时按 use_angle_cls 配置
+
+        Returns:
+            list: 与输入顺序一致的 (text, score) 列表
+        """
+        if use_cls is None:
+            use_cls = self.ocr_options["use_angle_cls"]
+        if isinstance(use_cls, bool):
+            cls_positions = list(range(len(line_images))) if use_cls else []
+        else:
+            cls_positions = [position for position, flag in enumerate(use_cls) if flag]
+        line_images = list(line_images)
+        ocr = self.ocr
+        with self._inference_lock:
+            if cls_positions:
+                with metrics.stage("classify"):
+                    rotated, _, _ = ocr.text_classifier([line_images[position] for position in cls_positions])
+                for position, line_image in zip(cls_positions, rotated):
+                    line_images[position] = line_image
+            with metrics.stage("recognize"):
+                rec_results, _ = ocr.text_recognizer(line_images)
+        return rec_results
+
+    def _finish_pending(self, pending, drop_score):
+        """把批量模式中已全部识别完成的图片组装为与 PaddleOCR.ocr 相同结构的结果"""
+        if pending.error is None and pending.page is None:
+            rerun = False
+            if pending.line_images is not None and self._low_confidence(pending.rec_results):
+                # 跳过方向分类的图片识别置信度低，带方向分类重新识别
+                rerun = True
+                try:
+                    pending.rec_results = self._recognize_lines(pending.line_images, True)
+                except Exception as e:
+                    self.logger.error(f"Re-recognition of {pending.name} failed: {e}", exc_info=True)
+            if self.adaptive_orientation:
+                self._update_orientation_stats(len(pending.boxes), pending.use_cls, rerun)
+            pending.line_images = None
+            pending.page = self._to_page(
+                self._merge_tables(self._assemble_raw_result(pending.boxes, pending.rec_results, drop_score), pending.tables),
+                pending.name,
+            )
+            pending.tables = []
+            if self.cache is not None and pending.cache_key and pending.table_error is None:
+                self.cache.put(pending.cache_key, (pending.page, pending.scale / pending.render_scale))
+        page = OCRPage() if pending.error else self._to_page(pending.page, pending.name)
+        result = ImageResult(
+            name=pending.name,
+            page=page,
+            source_path=pending.source_path,
+            error=pending.error or pending.table_error,
+            elapsed=time.perf_counter() - pending.start_time,
+            timings=pending.timings,
+            scale=pending.scale,
+            page_index=pending.page_index,
+            text_layer=pending.text_layer,
+        )
+        self._record_image(result)
+        return result
+
+    def iter_results_batched(self, sources, batch_size=None, stats=None):
+        """跨图片批量识别：逐张检测，再把多张图片的文本行合并成满批次送入识别模型
+
+        结果按输入顺序逐张产出：某张图片的全部文本行识别完成且它之前的图片都已产出时立即返回。
+
+        Args:
+            sources: 与 iter_results 相同的输入
+            batch_size: 识别批大小，为 None 时使用配置 rec_batch_size（默认 32）
+            stats: 可选字典，结束时写入 lines / batches / recognition_seconds / lines_per_second
+
+        Yields:
+            ImageResult: 每张图片的提取结果，顺序与输入一致
+        """
+        batch_size = max(1, int(batch_size or self.config.get("rec_batch_size", 32)))
+        drop_score = getattr(self.ocr, "drop_score", 0.5)
+        stats = stats if stats is not None else {}
+        stats.update(lines=0, batches=0, recognition_seconds=0.0, lines_per_second=0.0)
+        pending_images = collections.deque()  # 按输入顺序排列的未产出图片
+        line_queue = []  # 等待识别的 (图片, 行序号, 文本行图片)
+
+        def run_batch():
+            batch = line_queue[:batch_size]
+            del line_queue[:batch_size]
+            start_time = time.perf_counter()
+            try:
+                rec_results = self._recognize_lines(
+                    [line_image for _, _, line_image in batch],
+                    [pending.use_cls for pending, _, _ in batch],
+                )
+            except Exception as e:
+                self.logger.error(f"Batched recognition failed: {e}", exc_info=True)
+                rec_results = None
+            stats["recognition_seconds"] += time.perf_counter() - start_time
+            stats["batches"] += 1
+            stats["lines"] += len(batch)
+            for position, (pending, line_index, _) in enumerate(batch):
+                if rec_results is None:
+                    pending.error = pending.error or "文本行批量识别失败"
+                else:
+                    pending.rec_results[line_index] = rec_results[position]
+                pending.remaining -= 1
+
+        def pop_finished():
+            finished = []
+            while pending_images and pending_images[0].remaining == 0:
+                finished.append(self._finish_pending(pending_images.popleft(), drop_score))
+            return finished
+
+        for item in sources:
+            name, source = self._split_source(item)
+            name, source_path, page_index = self._describe_source(source, name)
+            self.logger.info(f"Detecting text lines in {name}...")
+            pending = _PendingImage(name, source_path, time.perf_counter(), page_index)
+            try:
+                render_scale = 1.0
+                if page_index is not None:
+                    # 文字层页面不渲染，直接作为已完成的页面
+                    pending.page, source, render_scale = self._load_document_page(source)
+                    pending.text_layer = pending.page is not None
+                    pending.scale = pending.render_scale = render_scale
+                if pending.page is None and not isinstance(source, np.ndarray):
+                    source = self.read_source_bytes(source)
+                if pending.page is None and self.cache is not None:
+                    pending.cache_key = self.cache.build_key(self.read_source_bytes(source), self.fingerprint)
+                    cached = self.cache.get(pending.cache_key)
+                    if cached is not None:
+                        pending.page, cached_scale = cached
+                        pending.scale = cached_scale * render_scale
+                if pending.page is None:
+                    prepared = self.prepare_image(source)
+                    image = prepared.image
+                    pending.timings, pending.scale = prepared.timings, prepared.scale * render_scale
+                    pending.boxes = self._detect(image)
+                    try:
+                        pending.tables = self._detect_tables(image)
+                    except Exception as e:
+                        self.logger.error(f"Table recognition failed for {name}, keeping plain text lines: {e}", exc_info=True)
+                        pending.table_error = f"表格识别失败: {e}"
+                    pending.rec_results = [None] * len(pending.boxes)
+                    pending.remaining = len(pending.boxes)
+                    line_images = [crop_text_line(image, box) for box in pending.boxes]
+                    pending.use_cls = self.ocr_options["use_angle_cls"]
+                    if self.adaptive_orientation and pending.boxes:
+                        pending.use_cls, reason = self._page_needs_cls(pending.boxes, line_images, prepared.exif_orientation)
+                        self.logger.debug(f"Angle classifier {'run' if pending.use_cls else 'skipped'} for {name} ({reason})")
+                        if not pending.use_cls:
+                            pending.line_images = line_images
+                    for line_index, line_image in enumerate(line_images):
+                        line_queue.append((pending, line_index, line_image))
+                    del line_images
+                    del image, prepared
+            except Exception as e:
+                self.logger.error(f"Error processing {name}: {e}", exc_info=True)
+                pending.error = str(e)
+                pending.remaining = 0
+            pending_images.append(pending)
+
+            while len(line_queue) >= batch_size:
+                run_batch()
+            yield from pop_finished()
+
+        while line_queue:
+            run_batch()
+        yield from pop_finished()
+
+        if stats["recognition_seconds"] > 0:
+            stats["lines_per_second"] = stats["lines"] / stats["recognition_seconds"]
+        self.logger.info(
+            f"Batched recognition: {stats['lines']} lines in {stats['batches']} batches (batch size {batch_size}), "
+            f"{stats['recognition_seconds']:.2f}s, {stats['lines_per_second']:.1f} lines/sec"
+        )
+
+    def image_to_docx(self, source, output_path, name=None):
+        """识别单张图片并保存为独立的 DOCX 文件（不加标题和分页）
+
+        Args:
+            source: 图片路径、图片字节或 NumPy 数组
+            output_path: 输出 DOCX 路径
+            name: 图片名称，为 None 时使用路径的文件名
+
+        Returns:
+            ImageResult: 提取结果
+        """
+        return self.image_to_outputs(source, {"docx": output_path}, name)
+
+    def image_to_outputs(self, source, outputs, name=None):
+        """识别单张图片一次，保存为一个或多个独立的输出文件（不加标题和分页）
+
+        PDF、TIFF 文档路径逐页处理，各页依次写入同一组输出文件（见 document_to_outputs）。
+
+        Args:
+            source: 图片路径、图片字节、NumPy 数组，或 PDF / TIFF 文档路径
+            outputs: {输出格式: 输出路径}，格式为 docx、json、md、txt、pdf（原生 PDF，pdf_mode 等配置见 pdf_renderer）
+            name: 图片名称，为 None 时使用路径的文件名
+
+        Returns:
+            ImageResult: 提取结果；文档为各页结果的列表
+        """
+        if is_document(source):
+            return self.document_to_outputs(source, outputs)
+        result = self.process(source, name)
+        special_handlers = self.config.get("use_special_table_handlers", True)
+        for output_format, output_path in outputs.items():
+            if output_format == "docx":
+                # python-docx 只在生成 DOCX 时导入，只做识别的工作进程不加载
+                from docx_renderer import create_document, render_layout_elements
+
+                with metrics.stage("docx_build"):
+                    doc = create_document(self.config)
+                    render_layout_elements(doc, result.name, result.page, special_handlers)
+                with metrics.stage("docx_save"):
+                    doc.save(output_path)
+            elif output_format == "pdf":
+                from output_renderers import write_result
+                from pdf_renderer import pdf_options
+
+                with metrics.stage("pdf_render", mode=self.config.get("pdf_mode", "text")):
+                    write_result(result, output_format, output_path, special_handlers, **pdf_options(self.config))
+            else:
+                from output_renderers import write_result
+
+                with metrics.stage("text_render", format=output_format):
+                    write_result(result, output_format, output_path, special_handlers)
+        return result
+
+    def document_to_outputs(self, document_path, outputs):
+        """逐页识别多页文档（PDF、TIFF），各页依次写入同一组输出文件（不加标题，页之间分页）
+
+        每次只渲染和识别一页，写入输出后即释放。
+
+        Args:
+            document_path: 文档路径
+            outputs: {输出格式: 输出路径}，与 image_to_outputs 相同
+
+        Returns:
+            list: 各页的 ImageResult
+        """
+        special_handlers = self.config.get("use_special_table_handlers", True)
+        doc = None
+        renderers = []
+        results = []
+        try:
+            for output_format, output_path in outputs.items():
+                if output_format == "docx":
+                    from docx_renderer import create_document
+
+                    doc = create_document(self.config)
+                else:
+                    from output_renderers import create_renderer
+                    from pdf_renderer import pdf_options
+
+                    options = pdf_options(self.config) if output_format == "pdf" else {}
+                    renderers.append(create_renderer(output_format, output_path, headings=False, special_handlers=special_handlers, **options))
+            for document_page in iter_document_pages(document_path):
+                result = self.process(document_page)
+                if doc is not None:
+                    from docx_renderer import render_layout_elements
+
+                    with metrics.stage("docx_build"):
+                        if results:
+                            doc.add_page_break()
+                        render_layout_elements(doc, result.name, result.page, special_handlers)
+                for renderer in renderers:
+                    if renderer.output_format == "pdf":
+                        with metrics.stage("pdf_render", mode=self.config.get("pdf_mode", "text")):
+                            renderer.add_result(result)
+                    else:
+                        with metrics.stage("text_render", format=renderer.output_format):
+                            renderer.add_result(result)
+                results.append(result)
+            if doc is not None:
+                with metrics.stage("docx_save"):
+                    doc.save(outputs["docx"])
+            for renderer in renderers:
+                renderer.close()
+        except BaseException:
+            for renderer in renderers:
+                renderer.abort()
+            raise
+        text_pages = sum(1 for result in results if result.text_layer)
+        self.logger.info(
+            f"{os.path.basename(str(document_path))}: {len(results)} page(s), {text_pages} from the embedded text layer, "
+            f"{len(results) - text_pages} recognized by OCR"
+        )
+        return results
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+HTML 表格单遍解析
+- 用 lxml 的事件式（target）HTML 解析器只遍历一次 HTML，遇到单元格即确定其网格位置，
+  跨行（rowspan）/跨列（colspan）在同一次遍历中处理，直接得到 TableGrid
+- 不构建 DOM 树，也不需要先扫描一遍统计列数；lxml 解析失败时退回 BeautifulSoup（html.parser）
+- 单元格文字与 BeautifulSoup 的 get_text(separator="\\n", strip=True) 一致：各文本节点去除首尾空白后用换行连接
+- 只解析第一个表格；<thead> 中或全部由 <th> 组成的开头几行作为表头行
+- 解析耗时计入 metrics 的 html_table_parse 阶段（parser 标签区分 lxml / html.parser），模块本身不保存状态，可在多线程中调用
+"""
+import logging
+import time
+
+import metrics
+from table_grid import TableCell, TableGrid
+
+logger = logging.getLogger("ocr_app")
+
+
+def _span(value):
+    """rowspan/colspan 属性值，缺失或不是正整数时为 1"""
+    if value is None:
+        return 1
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        return 1
+
+
+class _GridBuilder:
+    """按 HTML 出现顺序接收行和单元格，边接收边确定单元格在网格中的位置"""
+
+    def __init__(self):
+        self.cells = []
+        self.n_rows = 0
+        self.n_cols = 0
+        self.header_rows = 0
+        self._header_open = True  # 仍在开头的表头行中
+        self._covered_until = []  # 每列被上方跨行单元格占用到的行号（不含）
+        self._cursor = 0
+        self._row_all_th = True
+        self._row_in_thead = False
+
+    def start_row(self, in_thead=False):
+        self.n_rows += 1
+        self._cursor = 0
+        self._row_all_th = True
+        self._row_in_thead = in_thead
+
+    def end_row(self, has_cells):
+        if self._header_open and has_cells and (self._row_in_thead or self._row_all_th):
+            self.header_rows = self.n_rows
+        else:
+            self._header_open = False
+
+    def add_cell(self, text, rowspan, colspan, is_th=False):
+        if not self.n_rows:
+            self.start_row()
+        row = self.n_rows - 1
+        covered = self._covered_until
+        col = self._cursor
+        # 跳过被上方跨行单元格占用的位置
+        while col < len(covered) and covered[col] > row:
+            col += 1
+        end = col + colspan
+        if end > len(covered):
+            covered.extend([0] * (end - len(covered)))
+        covered[col:end] = [row + rowspan] * colspan
+        self.cells.append(TableCell(row, col, text, rowspan, colspan))
+        self.n_cols = max(self.n_cols, end)
+        self._cursor = end
+        self._row_all_th = self._row_all_th and is_th
+
+    def finish(self):
+        # 超出表格最后一行的跨行单元格截断
+        for cell in self.cells:
+            if cell.row + cell.rowspan > self.n_rows:
+                cell.rowspan = self.n_rows - cell.row
+        return TableGrid(n_rows=self.n_rows, n_cols=self.n_cols, cells=self.cells, header_rows=self.header_rows)
+
+
+class _TableTarget:
+    """lxml 解析事件接收器：只处理第一个 <table>，嵌套表格的文字计入所在单元格"""
+
+    def __init__(self):
+        self.builder = _GridBuilder()
+        self.found = False
+        self._depth = 0  # 当前所在的 <table> 嵌套层数
+        self._done = False
+        self._in_thead = False
+        self._row_cells = 0
+        self._cell = None  # 当前单元格 [是否为 th, rowspan, colspan, 文本片段列表]
+        self._chunk = []
+
+    def _flush_chunk(self):
+        # 每个标签边界结束一个文本节点
+        if self._cell is not None and self._chunk:
+            text = "".join(self._chunk).strip()
+            if text:
+                self._cell[3].append(text)
+        self._chunk = []
+
+    def start(self, tag, attrib):
+        if self._done:
+            return
+        self._flush_chunk()
+        if tag == "table":
+            self._depth += 1
+            self.found = True
+            return
+        if self._depth != 1:
+            return
+        if tag == "thead":
+            self._in_thead = True
+        elif tag == "tr":
+            self.builder.start_row(self._in_thead)
+            self._row_cells = 0
+        elif tag in ("td", "th") and self._cell is None:
+            rowspan = colspan = 1
+            if attrib:
+                rowspan, colspan = _span(attrib.get("rowspan")), _span(attrib.get("colspan"))
+            self._cell = [tag == "th", rowspan, colspan, []]
+
+    def end(self, tag):
+        if self._done:
+            return
+        self._flush_chunk()
+        if tag == "table":
+            self._depth -= 1
+            if self._depth == 0 and self.found:
+                self._done = True
+            return
+        if self._depth != 1:
+            return
+        if tag == "thead":
+            self._in_thead = False
+        elif tag in ("td", "th") and self._cell is not None:
+            is_th, rowspan, colspan, texts = self._cell
+            self.builder.add_cell("\n".join(texts), rowspan, colspan, is_th)
+            self._row_cells += 1
+            self._cell = None
+        elif tag == "tr":
+            self.builder.end_row(self._row_cells > 0)
+
+    def data(self, data):
+        if not self._done and self._cell is not None:
+            self._chunk.append(data)
+
+    def close(self):
+        return self.builder.finish() if self.found else None
+
+
+def _parse_with_lxml(html_content):
+    from lxml import etree
+
+    parser = etree.HTMLParser(target=_TableTarget())
+    parser.feed(html_content)
+    return parser.close()
+
+
+def _parse_with_beautifulsoup(html_content):
+    from bs4 import BeautifulSoup
+
+    table_tag = BeautifulSoup(html_content, "html.parser").find("table")
+    if not table_tag:
+        return None
+    builder = _GridBuilder()
+    # 与 lxml 路径一致：嵌套表格的行和单元格不单独计入，其文字属于外层单元格
+    for html_row in table_tag.find_all("tr"):
+        if html_row.find_parent("table") is not table_tag:
+            continue
+        builder.start_row(html_row.find_parent("thead") is not None)
+        html_cells = [cell for cell in html_row.find_all(["td", "th"]) if cell.find_parent("tr") is html_row]
+        for cell in html_cells:
+            builder.add_cell(
+                cell.get_text(separator="\n", strip=True),
+                _span(cell.get("rowspan")),
+                _span(cell.get("colspan")),
+                cell.name == "th",
+            )
+        builder.end_row(bool(html_cells))
+    return builder.finish()
+
+
+def parse_html_table(html_content):
+    """解析 HTML 中的第一个表格
+
+    Args:
+        html_content: 包含 <table> 的 HTML 字符串（如表格模型输出的 res["html"]）
+
+    Returns:
+        TableGrid or None: 没有 <table> 时返回 None；表格没有行或单元格时 n_rows / n_cols 为 0
+    """
+    start_time = time.perf_counter()
+    parser_name = "lxml"
+    try:
+        grid = _parse_with_lxml(html_content)
+    except Exception as e:
+        logger.debug(f"lxml could not parse table HTML ({e}), falling back to BeautifulSoup")
+        parser_name = "html.parser"
+        grid = _parse_with_beautifulsoup(html_content)
+    elapsed = time.perf_counter() - start_time
+    metrics.record_stage("html_table_parse", elapsed, parser=parser_name)
+    if grid is not None:
+        logger.debug(f"Parsed HTML table {grid.n_rows}x{grid.n_cols} ({len(grid.cells)} cells) with {parser_name} in {elapsed * 1000:.2f} ms")
+    return grid
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+图片预处理配置（profile）
+- fast / balanced / accurate 三档预设，控制最长边、灰度化、对比度归一化、锐化和纠偏
+- JPEG 使用 Pillow 的 draft 模式在解码阶段按 1/2、1/4、1/8 缩小，避免以原始分辨率解码手机大图
+- 输出交给 OCR 的内存数组（BGR），并记录每张图片的解码、缩放等耗时
+- NumPy / Pillow 在处理图片时才导入，命令行脚本解析参数时只需要 PREPROCESS_PROFILES
+"""
+import io
+import os
+import time
+
+# 预设参数：
+#   max_side           - 送入 OCR 的图片最长边（像素），None 表示不缩放
+#   grayscale          - 是否转为灰度
+#   normalize_contrast - 是否做自动对比度拉伸
+#   contrast_factor    - 额外的对比度增强倍数（1.0 表示不增强）
+#   sharpen            - 是否做 USM 锐化
+#   deskew             - 是否估计并纠正小角度倾斜
+PREPROCESS_PROFILES = {
+    "original": {
+        "max_side": None,
+        "grayscale": False,
+        "normalize_contrast": False,
+        "contrast_factor": 1.0,
+        "sharpen": False,
+        "deskew": False,
+    },
+    "fast": {
+        "max_side": 1600,
+        "grayscale": True,
+        "normalize_contrast": False,
+        "contrast_factor": 1.0,
+        "sharpen": False,
+        "deskew": False,
+    },
+    "balanced": {
+        "max_side": 2400,
+        "grayscale": False,
+        "normalize_contrast": True,
+        "contrast_factor": 1.0,
+        "sharpen": False,
+        "deskew": False,
+    },
+    "accurate": {
+        "max_side": 3600,
+        "grayscale": False,
+        "normalize_contrast": True,
+        "contrast_factor": 1.2,
+        "sharpen": True,
+        "deskew": True,
+    },
+}
+
+DEFAULT_PROFILE = "original"
+
+# 表示图片被旋转过的 EXIF 方向值（3：180 度，6：顺时针 90 度，8：逆时针 90 度）；1 为正常方向
+EXIF_ROTATIONS = (3, 6, 8)
+
+
+class PreprocessedImage:
+    """预处理后的图片及其元信息"""
+
+    __slots__ = ("image", "scale", "original_size", "timings", "exif_orientation", "skew_angle")
+
+    def __init__(self, image, scale, original_size, timings, exif_orientation=None, skew_angle=None):
+        self.image = image  # HxWx3 uint8 BGR 数组
+        self.scale = scale  # 缩放后尺寸 / 原始尺寸（纠偏旋转前，用于把检测框映射回原图坐标）
+        self.original_size = original_size  # 原始 (宽, 高)，已按 EXIF 方向校正
+        self.timings = timings  # 各步骤耗时（毫秒）
+        self.exif_orientation = exif_orientation  # 原图 EXIF 方向标记（已按其旋转），没有时为 None
+        self.skew_angle = skew_angle  # 纠偏估计的倾斜角度（度），未启用纠偏时为 None
+
+
+def resolve_profile(profile):
+    """把配置中的 profile 名称或参数字典解析为完整的参数字典
+
+    Args:
+        profile: 预设名称（fast/balanced/accurate/original）、参数字典或 None
+
+    Returns:
+        dict: 包含 name 和全部预处理参数的字典
+
+    Raises:
+        ValueError: 预设名称不存在
+    """
+    if profile is None:
+        profile = DEFAULT_PROFILE
+    if isinstance(profile, dict):
+        base = PREPROCESS_PROFILES[profile.get("base", DEFAULT_PROFILE)]
+        return {"name": "custom", **base, **{k: v for k, v in profile.items() if k != "base"}}
+    if profile not in PREPROCESS_PROFILES:
+        raise ValueError(f"未知的预处理配置 '{profile}'，可选: {', '.join(PREPROCESS_PROFILES)}")
+    return {"name": profile, **PREPROCESS_PROFILES[profile]}
+
+
+def estimate_skew_angle(image, max_angle=5.0, step=0.5):
+    """用投影轮廓法估计文字行的倾斜角度
+
+    在缩小的二值图上尝试 [-max_angle, max_angle] 内的旋转角度，
+    文字行水平时各行像素的行投影方差最大。
+
+    Args:
+        image: PIL 图片
+        max_angle: 最大搜索角度（度）
+        step: 搜索步长（度）
+
+    Returns:
+        float: 需要旋转的角度（度，逆时针为正）
+    """
+    import numpy as np
+    from PIL import Image
+
+    small = image.convert("L")
+    small.thumbnail((800, 800))
+    # 文字为前景（255），背景为 0
+    binary = small.point([255] * 128 + [0] * 128)
+    best_angle, best_score = 0.0, -1.0
+    for angle in np.arange(-max_angle, max_angle + step / 2, step):
+        rotated = np.asarray(binary.rotate(float(angle), resample=Image.NEAREST, fillcolor=0), dtype=np.float32)
+        score = float(np.var(rotated.sum(axis=1)))
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+
+def _open_source(source):
+    """打开图片输入，返回 PIL 图片（NumPy 数组按 BGR 处理）"""
+    import numpy as np
+    from PIL import Image
+
+    if isinstance(source, np.ndarray):
+        if source.ndim == 2:
+            return Image.fromarray(source)
+        return Image.fromarray(np.ascontiguousarray(source[:, :, ::-1]))
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return Image.open(io.BytesIO(source))
+    if isinstance(source, (str, os.PathLike)):
+        return Image.open(source)
+    raise TypeError(f"不支持的图片输入类型: {type(source)}")
+
+
+def preprocess_image(source, profile=None, keep_size_above=None):
+    """按预处理配置解码并处理图片
+
+    Args:
+        source: 图片路径、图片字节或 BGR NumPy 数组
+        profile: 预设名称或 resolve_profile 返回的参数字典
+        keep_size_above: 原图最长边超过该值时不按 max_side 缩小（这类图片分块识别，保留小字的分辨率），None 表示总是缩小
+
+    Returns:
+        PreprocessedImage: 处理后的图片（BGR 数组）、缩放比例、原始尺寸和耗时
+    """
+    import numpy as np
+    from PIL import Image, ImageEnhance, ImageFilter, ImageOps
+
+    params = profile if isinstance(profile, dict) and "name" in profile else resolve_profile(profile)
+    max_side = params.get("max_side")
+    timings = {}
+
+    if isinstance(source, np.ndarray) and source.ndim == 3 and params["name"] == "original":
+        # 已解码的数组且无需任何处理，直接交给 OCR
+        height, width = source.shape[:2]
+        return PreprocessedImage(source, 1.0, (width, height), {"decode_ms": 0.0, "resize_ms": 0.0})
+
+    start_time = time.perf_counter()
+    image = _open_source(source)
+    stored_size = image.size
+    if keep_size_above and max(stored_size) > keep_size_above:
+        max_side = None
+    if max_side and image.format == "JPEG" and max(stored_size) > max_side:
+        # draft 模式让 JPEG 解码器直接输出 1/2、1/4 或 1/8 尺寸（不小于请求尺寸）
+        ratio = max_side / max(stored_size)
+        image.draft("RGB", (int(stored_size[0] * ratio), int(stored_size[1] * ratio)))
+    image.load()
+    decoded_size = image.size
+    exif_orientation = image.getexif().get(0x0112)
+    # 与 cv2.imread 一致：按 EXIF 方向信息旋转图片
+    image = ImageOps.exif_transpose(image)
+    image = image.convert("L" if params.get("grayscale") else "RGB")
+    timings["decode_ms"] = (time.perf_counter() - start_time) * 1000
+
+    # draft 缩放后的尺寸与原始尺寸之比
+    draft_ratio = decoded_size[0] / stored_size[0]
+    original_size = (round(image.size[0] / draft_ratio), round(image.size[1] / draft_ratio))
+
+    start_time = time.perf_counter()
+    if max_side and max(image.size) > max_side:
+        image.thumbnail((max_side, max_side), Image.BICUBIC)
+    timings["resize_ms"] = (time.perf_counter() - start_time) * 1000
+
+    start_time = time.perf_counter()
+    if params.get("normalize_contrast"):
+        image = ImageOps.autocontrast(image, cutoff=1)
+    if params.get("contrast_factor", 1.0) != 1.0:
+        image = ImageEnhance.Contrast(image).enhance(params["contrast_factor"])
+    if params.get("sharpen"):
+        image = image.filter(ImageFilter.UnsharpMask(radius=2, percent=80, threshold=3))
+    timings["enhance_ms"] = (time.perf_counter() - start_time) * 1000
+    scale = image.size[0] / original_size[0] if original_size[0] else 1.0
+
+    skew_angle = None
+    if params.get("deskew"):
+        start_time = time.perf_counter()
+        skew_angle = estimate_skew_angle(image)
+        if abs(skew_angle) >= 0.3:
+            fill = 255 if image.mode == "L" else (255, 255, 255)
+            image = image.rotate(skew_angle, resample=Image.BICUBIC, expand=True, fillcolor=fill)
+        timings["deskew_ms"] = (time.perf_counter() - start_time) * 1000
+
+    array = np.asarray(image)
+    if array.ndim == 2:
+        array = np.repeat(array[:, :, None], 3, axis=2)
+    else:
+        array = np.ascontiguousarray(array[:, :, ::-1])
+    return PreprocessedImage(array, scale, original_size, timings, exif_orientation, skew_angle)
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""
+阶段耗时与吞吐量指标
+- stage("detect") 上下文管理器记录一个处理阶段（模型加载、解码、检测、方向分类、识别、表格、DOCX 生成与保存、
+  PDF 转换、合并等）的耗时，累计到进程内的直方图，并可按 JSON Lines 追加写入文件（每个阶段一行）
+- 计数器（处理的图片数等）和 gauge（队列深度、模型是否已预热，可注册为按需计算的回调）
+- render_prometheus() 输出 Prometheus 文本格式，供 Django 的 /metrics/ 端点使用；不依赖 prometheus_client
+- 命令行脚本、提取引擎、OCR 工作进程和 Web 端共用同一套指标名称；指标只在各自进程内累计，
+  snapshot() 导出为 JSON 后可由另一个进程合并输出（后台转换工作进程的指标由 Web 端的 /metrics/ 一并输出）
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("ocr_app")
+
+METRIC_PREFIX = "extractdoc"
+# 直方图桶上限（秒），覆盖单行识别到整批 PDF 转换的耗时范围
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + (list(extra) if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in items) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, bucket_count):
+        self.counts = [0] * bucket_count
+        self.total = 0.0
+        self.count = 0
+
+
+class MetricsRegistry:
+    """进程内的指标注册表（线程安全）"""
+
+    def __init__(self, prefix=METRIC_PREFIX):
+        self.prefix = prefix
+        self._lock = threading.RLock()
+        self._metrics = {}  # 名称 -> {"type", "help", "buckets", "values": {标签元组: 值}, "callback"}
+        self._jsonl_path = None
+        self._jsonl_fields = {}
+        self._jsonl_lock = threading.Lock()
+
+    # ---- 定义 ----
+
+    def _define(self, name, metric_type, help_text, buckets=None, callback=None):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = {"type": metric_type, "help": help_text, "buckets": buckets, "values": {}, "callback": None}
+            if callback is not None:
+                metric["callback"] = callback
+            return metric
+
+    def counter(self, name, help_text):
+        self._define(name, "counter", help_text)
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self._define(name, "histogram", help_text, buckets=tuple(buckets))
+
+    def gauge(self, name, help_text, callback=None):
+        """定义 gauge；callback 为无参函数时在输出时调用，返回值或 {标签元组: 值} 字典"""
+        self._define(name, "gauge", help_text, callback=callback)
+
+    # ---- 记录 ----
+
+    def _metric(self, name, metric_type):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._define(name, metric_type, name.replace("_", " "), buckets=DEFAULT_BUCKETS if metric_type == "histogram" else None)
+        return metric
+
+    def inc(self, name, amount=1, **labels):
+        """计数器加 amount"""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            values = self._metric(name, "counter")["values"]
+            values[key] = values.get(key, 0) + amount
+
+    def stage_totals(self, stage_name):
+        """某个阶段按标签分开的次数和总耗时 {标签字典的元组: (次数, 秒)}"""
+        with self._lock:
+            metric = self._metrics.get("stage_seconds")
+            return {
+                tuple((label, value) for label, value in key if label != "stage"): (histogram.count, histogram.total)
+                for key, histogram in (metric["values"].items() if metric else ())
+                if dict(key).get("stage") == stage_name
+            }
+
+    def add_gauge(self, name, delta, **labels):
+        """gauge 加减 delta（如排队中的图片数）"""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            values = self._metric(name, "gauge")["values"]
+            values[key] = values.get(key, 0) + delta
+
+    def set_gauge(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._metric(name, "gauge")["values"][key] = value
+
+    def observe(self, name, value, **labels):
+        """直方图记录一个观测值"""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            metric = self._metric(name, "histogram")
+            histogram = metric["values"].get(key)
+            if histogram is None:
+                histogram = metric["values"][key] = _Histogram(len(metric["buckets"]))
+            for index, upper in enumerate(metric["buckets"]):
+                if value <= upper:
+                    histogram.counts[index] += 1
+                    break
+            histogram.total += value
+            histogram.count += 1
+
+    def record_stage(self, stage_name, seconds, **labels):
+        """记录一个已测得耗时的阶段（直方图 + JSON Lines）"""
+        self.observe("stage_seconds", seconds, stage=stage_name, **labels)
+        self.write_event(stage_name, seconds, **labels)
+
+    @contextmanager
+    def stage(self, stage_name, **labels):
+        """计时一个处理阶段；阶段内抛出异常时同时计入 stage_errors_total
+
+        Args:
+            stage_name: 阶段名称（detect、recognize、docx_save 等）
+            **labels: 附加标签（如 mode="pool"），同时写入 JSON Lines 记录
+        """
+        start_time = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.inc("stage_errors_total", stage=stage_name)
+            self.record_stage(stage_name, time.perf_counter() - start_time, status="error", **labels)
+            raise
+        self.record_stage(stage_name, time.perf_counter() - start_time, **labels)
+
+    # ---- JSON Lines ----
+
+    def configure_jsonl(self, path, **fields):
+        """设置 JSON Lines 输出文件（None 或空字符串关闭），fields 写入每一行（如 source="cli"）"""
+        self._jsonl_path = os.fspath(path) if path else None
+        self._jsonl_fields = dict(fields)
+
+    def write_event(self, stage_name, seconds, **labels):
+        if not self._jsonl_path:
+            return
+        record = {"ts": round(time.time(), 3), "pid": os.getpid(), **self._jsonl_fields, "stage": stage_name, "seconds": round(seconds, 6), **labels}
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        try:
+            # 追加模式写入单行，多个进程写同一文件时各行保持完整
+            with self._jsonl_lock, open(self._jsonl_path, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError as e:
+            logger.warning(f"Could not write metrics to '{self._jsonl_path}', disabling JSON lines output: {e}")
+            self._jsonl_path = None
+
+    # ---- 输出 ----
+
+    def stage_summary(self):
+        """各阶段的次数和总耗时 {阶段: (次数, 秒)}（跨标签合并）"""
+        summary = {}
+        with self._lock:
+            metric = self._metrics.get("stage_seconds")
+            for key, histogram in (metric["values"].items() if metric else ()):
+                stage_name = dict(key).get("stage")
+                count, total = summary.get(stage_name, (0, 0.0))
+                summary[stage_name] = (count + histogram.count, total + histogram.total)
+        return summary
+
+    def _collect(self, exclude=()):
+        """[(名称, 类型, 说明, [(标签元组, 值, 桶)])]，gauge 回调在此计算"""
+        with self._lock:
+            metrics = [(name, dict(metric, values=dict(metric["values"]))) for name, metric in sorted(self._metrics.items()) if name not in exclude]
+        collected = []
+        for name, metric in metrics:
+            values = metric["values"]
+            if metric["callback"] is not None:
+                try:
+                    computed = metric["callback"]()
+                    values = computed if isinstance(computed, dict) else {(): computed}
+                except Exception as e:
+                    logger.warning(f"Metric callback for {self.prefix}_{name} failed: {e}")
+                    continue
+            collected.append((name, metric["type"], metric["help"], [(labels, value, metric["buckets"]) for labels, value in values.items()]))
+        return collected
+
+    def snapshot(self, exclude=()):
+        """当前所有指标的值（gauge 回调已计算）转换为可 JSON 序列化的字典，供其他进程合并输出（见 render_prometheus）
+
+        Args:
+            exclude: 不包含的指标名称
+        """
+        snapshot = []
+        for name, metric_type, help_text, samples in self._collect(exclude):
+            snapshot.append({
+                "name": name,
+                "type": metric_type,
+                "help": help_text,
+                "samples": [
+                    [
+                        [list(item) for item in labels],
+                        {"counts": value.counts, "total": value.total, "count": value.count} if metric_type == "histogram" else value,
+                        list(buckets) if buckets else None,
+                    ]
+                    for labels, value, buckets in samples
+                ],
+            })
+        return snapshot
+
+    @staticmethod
+    def _load_snapshot(snapshot, extra_labels):
+        """snapshot() 的结果还原为 _collect() 的格式，每个样本加上 extra_labels"""
+        collected = []
+        for metric in snapshot:
+            samples = []
+            for labels, value, buckets in metric["samples"]:
+                labels = tuple(sorted([tuple(item) for item in labels] + list(extra_labels)))
+                if metric["type"] == "histogram":
+                    histogram = _Histogram(len(buckets))
+                    histogram.counts, histogram.total, histogram.count = list(value["counts"]), value["total"], value["count"]
+                    value = histogram
+                samples.append((labels, value, tuple(buckets) if buckets else None))
+            collected.append((metric["name"], metric["type"], metric["help"], samples))
+        return collected
+
+    def render_prometheus(self, snapshots=()):
+        """输出 Prometheus 文本格式（text/plain; version=0.0.4）
+
+        Args:
+            snapshots: 其他进程的指标 [(附加标签字典, snapshot() 的结果)]，同名指标合并输出，
+                样本加上附加标签（如 worker="主机名:进程号"）以区分来源
+        """
+        families = {}
+        sources = [self._collect()] + [self._load_snapshot(snapshot, sorted(labels.items())) for labels, snapshot in snapshots]
+        for collected in sources:
+            for name, metric_type, help_text, samples in collected:
+                family = families.setdefault(name, (metric_type, help_text, []))
+                if family[0] == metric_type:
+                    family[2].extend(samples)
+        lines = []
+        for name, (metric_type, help_text, samples) in sorted(families.items()):
+            full_name = f"{self.prefix}_{name}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {metric_type}")
+            for labels, value, buckets in sorted(samples, key=lambda sample: sample[0]):
+                if metric_type != "histogram":
+                    lines.append(f"{full_name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                cumulative = 0
+                for upper, count in zip(buckets, value.counts):
+                    cumulative += count
+                    lines.append(f"{full_name}_bucket{_format_labels(labels, [('le', _format_value(float(upper)))])} {cumulative}")
+                lines.append(f"{full_name}_bucket{_format_labels(labels, [('le', '+Inf')])} {value.count}")
+                lines.append(f"{full_name}_sum{_format_labels(labels)} {_format_value(value.total)}")
+                lines.append(f"{full_name}_count{_format_labels(labels)} {value.count}")
+        return "\n".join(lines) + "\n"
+
+
+# 进程内共享的默认注册表
+registry = MetricsRegistry()
+registry.histogram("stage_seconds", "Time spent in each processing stage in seconds.")
+registry.counter("stage_errors_total", "Processing stages that raised an exception.")
+registry.counter("images_total", "Images processed, by status.")
+registry.counter("document_pages_total", "PDF/TIFF pages processed, by path (embedded text layer or OCR).")
+
+stage = registry.stage
+record_stage = registry.record_stage
+inc = registry.inc
+add_gauge = registry.add_gauge
+configure_jsonl = registry.configure_jsonl
+snapshot = registry.snapshot
+render_prometheus = registry.render_prometheus
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+OCR 推理后端
+- 显式加载项目自带的 models/ 目录（det_model_ch、rec_model_ch 等），不再由 PaddleOCR 按语言自动下载模型
+- paddle：Paddle Inference 推理（默认）
+- onnx：ONNX Runtime CPU 推理，模型需先用 convert_models_to_onnx.py 离线转换到 models/onnx/；
+  仍通过 PaddleOCR 的 use_onnx 模式运行，paddlepaddle 依然是必需依赖
+- 两种后端返回同一个 PaddleOCR 对象接口（ocr / text_detector / text_recognizer / text_classifier），
+  上层的版面元素格式完全相同
+"""
+import importlib.util
+import logging
+from pathlib import Path
+
+from ocr_cache import DEFAULT_MODEL_ROOT
+
+# 模型子目录名（相对于 models/）
+MODEL_DIR_NAMES = {
+    "det": "det_model_ch",
+    "rec": "rec_model_ch",
+    "cls": "cls_model_ch",
+    "table": "table_model_ch",
+    "layout": "layout_model",
+}
+
+# ONNX 模型目录（相对于 models/），由 convert_models_to_onnx.py 生成
+ONNX_DIR_NAME = "onnx"
+
+
+def resolve_model_dirs(config=None, model_root=DEFAULT_MODEL_ROOT):
+    """确定各模型的本地目录，配置中的 det_model_dir 等键优先
+
+    Args:
+        config: 配置字典
+        model_root: 模型根目录
+
+    Returns:
+        dict: {"det": Path or None, ...}，目录不存在时为 None
+    """
+    config = config or {}
+    model_dirs = {}
+    for kind, dir_name in MODEL_DIR_NAMES.items():
+        configured = config.get(f"{kind}_model_dir")
+        path = Path(configured) if configured else Path(model_root) / dir_name
+        model_dirs[kind] = path if path.exists() else None
+    return model_dirs
+
+
+def onnx_model_path(kind, model_root=DEFAULT_MODEL_ROOT):
+    """返回某个模型转换后的 ONNX 文件路径（如 models/onnx/det_model_ch.onnx）"""
+    return Path(model_root) / ONNX_DIR_NAME / f"{MODEL_DIR_NAMES[kind]}.onnx"
+
+
+class PaddleBackend:
+    """Paddle Inference 后端，使用 models/ 下的 Paddle 推理模型"""
+
+    name = "paddle"
+
+    def __init__(self, config=None, logger=None, model_root=DEFAULT_MODEL_ROOT):
+        self.config = config or {}
+        self.logger = logger or logging.getLogger("ocr_app")
+        self.model_root = Path(model_root)
+
+    def model_paths(self):
+        """返回传给 PaddleOCR 的模型路径参数"""
+        model_dirs = resolve_model_dirs(self.config, self.model_root)
+        paths = {}
+        for kind in ("det", "rec", "cls"):
+            if model_dirs[kind] is not None:
+                paths[f"{kind}_model_dir"] = str(model_dirs[kind])
+        return paths
+
+    def is_available(self):
+        return importlib.util.find_spec("paddleocr") is not None
+
+    def resolve_options(self, ocr_options):
+        """按本后端实际可用的模型修正 OCR 参数（在计算缓存指纹之前调用，使缓存键与实际推理一致）
+
+        Args:
+            ocr_options: OCR 参数（lang、use_angle_cls 等）
+
+        Returns:
+            dict: 修正后的参数（不修改传入的字典）
+        """
+        return dict(ocr_options)
+
+    def create(self, ocr_options):
+        """创建 PaddleOCR 实例
+
+        Args:
+            ocr_options: OCR 参数（lang、use_angle_cls）
+
+        Returns:
+            PaddleOCR: OCR 实例
+        """
+        from paddleocr import PaddleOCR
+
+        model_paths = self.model_paths()
+        for kind in ("det", "rec"):
+            if f"{kind}_model_dir" not in model_paths:
+                self.logger.warning(f"Local {kind} model not found under {self.model_root}, PaddleOCR will use its default model.")
+        if ocr_options["use_angle_cls"] and "cls_model_dir" not in model_paths:
+            self.logger.warning(f"Local cls model not found under {self.model_root}, PaddleOCR will use its default model.")
+        self.logger.info(f"Creating OCR backend '{self.name}' with models: {model_paths}")
+        return PaddleOCR(
+            use_angle_cls=ocr_options["use_angle_cls"],
+            lang=ocr_options["lang"],
+            layout=True,
+            use_gpu=False,
+            show_log=False,
+            rec_batch_num=int(self.config.get("rec_batch_size", 32)),
+            **model_paths,
+            **self.extra_options(),
+        )
+
+    def extra_options(self):
+        return {}
+
+
+class OnnxBackend(PaddleBackend):
+    """ONNX Runtime CPU 后端
+
+    检测/识别/方向分类模型使用 convert_models_to_onnx.py 转换后的 .onnx 文件，
+    由 PaddleOCR 的 use_onnx 模式调用 onnxruntime 推理，前后处理与 Paddle 后端完全相同。
+    PaddleOCR 在导入时仍会加载 paddle，因此该后端同样需要安装 paddlepaddle，节省的是推理耗时而不是依赖。
+    """
+
+    name = "onnx"
+
+    def model_paths(self):
+        paths = {}
+        for kind in ("det", "rec", "cls"):
+            path = onnx_model_path(kind, self.model_root)
+            if path.exists():
+                paths[f"{kind}_model_dir"] = str(path)
+        return paths
+
+    def is_available(self):
+        return super().is_available() and importlib.util.find_spec("onnxruntime") is not None
+
+    def resolve_options(self, ocr_options):
+        """没有 ONNX 方向分类模型（models/ 下没有 cls_model_ch 时转换脚本会跳过它）时关闭方向分类"""
+        ocr_options = dict(ocr_options)
+        if ocr_options["use_angle_cls"] and not onnx_model_path("cls", self.model_root).exists():
+            self.logger.warning(
+                f"ONNX cls model {onnx_model_path('cls', self.model_root)} not found, "
+                f"running the onnx backend without the angle classifier."
+            )
+            ocr_options["use_angle_cls"] = False
+        return ocr_options
+
+    def create(self, ocr_options):
+        """创建 use_onnx 模式的 PaddleOCR 实例（没有 ONNX 方向分类模型时不加载方向分类器）
+
+        Args:
+            ocr_options: OCR 参数（lang、use_angle_cls）
+
+        Returns:
+            PaddleOCR: OCR 实例
+
+        Raises:
+            RuntimeError: 未安装 onnxruntime 或缺少检测/识别 ONNX 模型
+        """
+        if importlib.util.find_spec("onnxruntime") is None:
+            raise RuntimeError("ONNX 后端需要安装 onnxruntime：pip install onnxruntime")
+        model_paths = self.model_paths()
+        missing = [kind for kind in ("det", "rec") if f"{kind}_model_dir" not in model_paths]
+        if missing:
+            raise RuntimeError(
+                f"缺少 ONNX 模型 {', '.join(str(onnx_model_path(kind, self.model_root)) for kind in missing)}，"
+                f"请先运行 python convert_models_to_onnx.py"
+            )
+        # ExtractionEngine 已在计算指纹前调用过 resolve_options；直接创建实例的调用方在这里修正
+        return super().create(self.resolve_options(ocr_options))
+
+    def extra_options(self):
+        return {"use_onnx": True}
+
+
+OCR_BACKENDS = {
+    PaddleBackend.name: PaddleBackend,
+    OnnxBackend.name: OnnxBackend,
+}
+
+
+def get_backend(name, config=None, logger=None, model_root=DEFAULT_MODEL_ROOT):
+    """按名称创建推理后端
+
+    Args:
+        name: 后端名称（paddle / onnx）
+        config: 配置字典
+        logger: 日志记录器
+        model_root: 模型根目录
+
+    Returns:
+        PaddleBackend or OnnxBackend
+
+    Raises:
+        ValueError: 后端名称不存在
+    """
+    if name not in OCR_BACKENDS:
+        raise ValueError(f"未知的 OCR 后端 '{name}'，可选: {', '.join(OCR_BACKENDS)}")
+    return OCR_BACKENDS[name](config, logger, model_root)
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+"""
+OCR 结果磁盘缓存
+- 缓存键 = SHA-256(图片字节 + OCR 配置指纹)，配置指纹包含语言、方向分类开关、PaddleOCR 版本和模型目录校验和
+- 缓存总大小有上限，超过上限时按最近使用时间（LRU）淘汰
+- 记录命中/未命中/淘汰次数
+- 同一张图片的并发请求会被合并：进程内用事件等待，跨进程（如 OCR 工作进程池）用锁文件等待，只执行一次 OCR
+"""
+import functools
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+from pathlib import Path
+
+# 项目自带模型目录（models/det_model_ch 等）
+DEFAULT_MODEL_ROOT = Path(__file__).resolve().parent / "models"
+
+
+@functools.lru_cache(maxsize=8)
+def checksum_model_dirs(model_root):
+    """计算模型目录下所有文件内容的 SHA-256 校验和（同一进程内只计算一次）
+
+    Args:
+        model_root: 模型根目录路径
+
+    Returns:
+        str: 十六进制校验和；目录不存在时返回 "missing"
+    """
+    root = Path(model_root)
+    if not root.is_dir():
+        return "missing"
+    digest = hashlib.sha256()
+    for file_path in sorted(p for p in root.rglob("*") if p.is_file()):
+        digest.update(str(file_path.relative_to(root)).replace("\\", "/").encode("utf-8"))
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def compute_config_fingerprint(ocr_options, model_root=DEFAULT_MODEL_ROOT):
+    """计算 OCR 配置指纹，配置或模型变化后旧缓存自动失效
+
+    Args:
+        ocr_options: 影响识别结果的 OCR 参数字典（如 lang、use_angle_cls）
+        model_root: 模型根目录
+
+    Returns:
+        str: 指纹字符串（JSON）
+    """
+    try:
+        from importlib.metadata import version
+        paddleocr_version = version("paddleocr")
+    except Exception:
+        paddleocr_version = "unknown"
+    return json.dumps(
+        {
+            "options": ocr_options,
+            "paddleocr": paddleocr_version,
+            "models": checksum_model_dirs(str(model_root)),
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+
+
+class OCRResultCache:
+    """基于文件系统的 OCR 结果缓存（多进程共享同一目录）"""
+
+    def __init__(self, cache_dir, max_bytes, lock_timeout=600, logger=None):
+        """
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 缓存总大小上限（字节）
+            lock_timeout: 跨进程锁文件的过期时间（秒），超过后视为持有者已崩溃
+            logger: 日志记录器
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.lock_timeout = lock_timeout
+        self.logger = logger or logging.getLogger("ocr_app")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+        self._total_bytes = None
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config, logger=None):
+        """根据配置创建缓存，未启用时返回 None
+
+        Args:
+            config: 配置字典（ocr_cache_enabled / ocr_cache_dir / ocr_cache_max_mb）
+            logger: 日志记录器
+
+        Returns:
+            OCRResultCache or None
+        """
+        if not config.get("ocr_cache_enabled", True):
+            return None
+        return cls(
+            config.get("ocr_cache_dir", "ocr_cache"),
+            int(config.get("ocr_cache_max_mb", 1024)) * 1024 * 1024,
+            logger=logger,
+        )
+
+    @staticmethod
+    def build_key(image_bytes, fingerprint):
+        """根据图片字节和配置指纹生成缓存键"""
+        digest = hashlib.sha256(image_bytes)
+        digest.update(b"\0")
+        digest.update(fingerprint.encode("utf-8"))
+        return digest.hexdigest()
+
+    def stats(self):
+        """返回缓存计数器"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "coalesced": self.coalesced,
+            }
+
+    def _entry_path(self, key):
+        return self.cache_dir / key[:2] / f"{key}.pkl"
+
+    def _lock_path(self, key):
+        return self.cache_dir / key[:2] / f"{key}.lock"
+
+    def _read(self, key):
+        """读取缓存条目并刷新其修改时间（用作 LRU 的最近使用时间），不存在或损坏时返回 None"""
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.warning(f"Discarding unreadable OCR cache entry {entry_path}: {e}")
+            try:
+                entry_path.unlink()
+            except OSError:
+                pass
+            return None
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return value
+
+    def get(self, key):
+        """查询缓存，命中时返回缓存的 OCR 结果，否则返回 None"""
+        value = self._read(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """写入缓存（先写临时文件再原子替换），必要时淘汰最久未使用的条目"""
+        entry_path = self._entry_path(key)
+        entry_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = entry_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        # 覆盖已有条目时总大小只增加差值
+        try:
+            replaced_bytes = entry_path.stat().st_size
+        except FileNotFoundError:
+            replaced_bytes = 0
+        os.replace(temp_path, entry_path)
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_total_bytes()
+            else:
+                self._total_bytes += len(data) - replaced_bytes
+            over_limit = self._total_bytes > self.max_bytes
+        if over_limit:
+            self._evict()
+
+    def _iter_entries(self):
+        for sub_dir in self.cache_dir.iterdir():
+            if not sub_dir.is_dir():
+                continue
+            for entry in os.scandir(sub_dir):
+                if entry.name.endswith(".pkl"):
+                    yield entry
+
+    def _scan_total_bytes(self):
+        return sum(entry.stat().st_size for entry in self._iter_entries())
+
+    def _evict(self):
+        """按修改时间从旧到新删除条目，直到总大小降到上限的 90% 以下"""
+        entries = []
+        for entry in self._iter_entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        total_bytes = sum(size for _, size, _ in entries)
+        target_bytes = int(self.max_bytes * 0.9)
+        removed = 0
+        for _, size, path in entries:
+            if total_bytes <= target_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_bytes -= size
+            removed += 1
+        with self._lock:
+            self._total_bytes = total_bytes
+            self.evictions += removed
+        if removed:
+            self.logger.info(f"OCR cache evicted {removed} entries, size now {total_bytes / 1024 / 1024:.1f} MB")
+
+    def _acquire_file_lock(self, key):
+        """尝试创建跨进程锁文件，成功返回 True；锁已被其他进程持有时返回 False"""
+        lock_path = self._lock_path(key)
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                if time.time() - lock_path.stat().st_mtime > self.lock_timeout:
+                    # 持有锁的进程已崩溃，清理过期锁后重试
+                    lock_path.unlink()
+                    return self._acquire_file_lock(key)
+            except FileNotFoundError:
+                return self._acquire_file_lock(key)
+            return False
+        os.write(fd, str(os.getpid()).encode("ascii"))
+        os.close(fd)
+        return True
+
+    def _release_file_lock(self, key):
+        try:
+            self._lock_path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def get_or_compute(self, key, compute):
+        """查询缓存，未命中时调用 compute 计算并写入缓存
+
+        同一个键同时只会有一个调用方执行 compute，其他调用方等待其结果。
+
+        Args:
+            key: 缓存键
+            compute: 无参数函数，返回需要缓存的 OCR 结果
+
+        Returns:
+            tuple: (value, hit) - hit 为 True 表示结果来自缓存（包括等待其他调用方计算的结果）
+        """
+        value = self.get(key)
+        if value is not None:
+            return value, True
+        return self._compute_once(key, compute)
+
+    def _compute_once(self, key, compute):
+        """未命中后的计算：同一个键只有一个调用方执行 compute，其他调用方等待并读取其结果
+
+        计算方失败（没有写入缓存）时等待方重新竞争计算权，只通过 _read 重试，不再计为一次未命中。
+        """
+        while True:
+            # 进程内合并：同一个键只允许一个线程进入计算
+            with self._lock:
+                event = self._inflight.get(key)
+                is_owner = event is None
+                if is_owner:
+                    event = threading.Event()
+                    self._inflight[key] = event
+            if is_owner:
+                break
+            event.wait()
+            value = self._read(key)
+            if value is not None:
+                with self._lock:
+                    self.coalesced += 1
+                return value, True
+
+        try:
+            # 跨进程合并：其他进程正在计算同一个键时等待其写入缓存
+            while not self._acquire_file_lock(key):
+                time.sleep(0.1)
+                value = self._read(key)
+                if value is not None:
+                    with self._lock:
+                        self.coalesced += 1
+                    return value, True
+            try:
+                # 拿到锁后再检查一次，避免等待期间其他进程已经写入
+                value = self._read(key)
+                if value is not None:
+                    with self._lock:
+                        self.coalesced += 1
+                    return value, True
+                value = compute()
+                if value is not None:
+                    self.put(key, value)
+                return value, False
+            finally:
+                self._release_file_lock(key)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
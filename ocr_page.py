@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+列式 OCR 页面结构
+- OCRPage 用 (N, 4, 2) float32 数组保存文本框、float32 数组保存置信度、列表保存文字，由 PaddleOCR 原始结果构建一次
+- 表格等非文本行元素保存为 blocks（记录在第几行文本之前出现），表格区域内的文本行通过 table_index 指向所属表格
+- 提供向量化的几何工具（中心点、外接矩形、按位置排序），渲染和特殊表格处理函数不再逐层遍历嵌套列表
+- 紧凑的二进制序列化（to_bytes / from_bytes），pickle 时自动使用，用于进程间传递和结果缓存
+"""
+import json
+import struct
+
+import numpy as np
+
+_MAGIC = b"OCRP"
+_VERSION = 1
+# 魔数、版本、文本行数、文字字节数、blocks JSON 字节数
+_HEADER = struct.Struct("<4sBIII")
+
+
+def _is_text_line(element):
+    """是否为 PaddleOCR 文本行 [box, (text, score)]"""
+    return (
+        isinstance(element, (list, tuple))
+        and len(element) == 2
+        and isinstance(element[1], (list, tuple))
+        and len(element[1]) == 2
+        and isinstance(element[1][0], str)
+    )
+
+
+class OCRPage:
+    """单页 OCR 结果的列式表示"""
+
+    __slots__ = ("boxes", "scores", "texts", "table_index", "blocks")
+
+    def __init__(self, boxes=None, scores=None, texts=None, table_index=None, blocks=None):
+        """
+        Args:
+            boxes: (N, 4, 2) 文本框四点坐标
+            scores: (N,) 识别置信度
+            texts: 长度为 N 的文字列表
+            table_index: (N,) 文本行所属的 blocks 下标，不属于任何表格时为 -1
+            blocks: 非文本行元素（表格等）字典列表，"anchor" 为其在第几行文本之前出现
+        """
+        self.texts = list(texts or [])
+        count = len(self.texts)
+        self.boxes = np.zeros((0, 4, 2), np.float32) if boxes is None else np.asarray(boxes, np.float32).reshape(count, 4, 2)
+        self.scores = np.zeros(count, np.float32) if scores is None else np.asarray(scores, np.float32).reshape(count)
+        self.table_index = np.full(count, -1, np.int32) if table_index is None else np.asarray(table_index, np.int32).reshape(count)
+        self.blocks = list(blocks or [])
+
+    @classmethod
+    def from_elements(cls, elements):
+        """由 PaddleOCR 版面元素（文本行和表格等字典元素）构建
+
+        Args:
+            elements: parse_layout_result 的返回值
+
+        Returns:
+            OCRPage
+        """
+        boxes, scores, texts, table_index, blocks = [], [], [], [], []
+
+        def add_line(line, owner):
+            boxes.append(line[0])
+            texts.append(line[1][0])
+            scores.append(line[1][1])
+            table_index.append(owner)
+
+        for element in elements or []:
+            if isinstance(element, dict):
+                # 经 JSON 规范化（元组变为列表），与二进制反序列化后的结果一致
+                block = json.loads(json.dumps({key: value for key, value in element.items() if key != "lines"}, ensure_ascii=False))
+                block["anchor"] = len(texts)
+                blocks.append(block)
+                for line in element.get("lines", []):
+                    if _is_text_line(line):
+                        add_line(line, len(blocks) - 1)
+            elif _is_text_line(element):
+                add_line(element, -1)
+        return cls(boxes if boxes else None, scores, texts, table_index, blocks)
+
+    @classmethod
+    def coerce(cls, value):
+        """OCRPage 原样返回，版面元素列表则转换为 OCRPage"""
+        return value if isinstance(value, cls) else cls.from_elements(value)
+
+    def to_elements(self):
+        """转换回 PaddleOCR 版面元素格式（文本行为 [box, (text, score)]，表格元素的区域内文本行在 "lines" 中）"""
+        blocks = [{key: value for key, value in block.items() if key != "anchor"} for block in self.blocks]
+        for block in blocks:
+            if block.get("type") == "table":
+                block["lines"] = []
+        anchors = self._blocks_by_anchor()
+        boxes = self.boxes.tolist()
+        scores = self.scores.tolist()
+        elements = []
+        for index in range(len(self.texts) + 1):
+            for block_index in anchors.get(index, ()):
+                elements.append(blocks[block_index])
+            if index == len(self.texts):
+                break
+            line = [boxes[index], (self.texts[index], scores[index])]
+            owner = int(self.table_index[index])
+            if owner >= 0 and "lines" in blocks[owner]:
+                blocks[owner]["lines"].append(line)
+            else:
+                elements.append(line)
+        return elements
+
+    def _blocks_by_anchor(self):
+        anchors = {}
+        for block_index, block in enumerate(self.blocks):
+            anchors.setdefault(block["anchor"], []).append(block_index)
+        return anchors
+
+    def iter_items(self):
+        """按版面顺序产出 ("block", block) 和 ("line", 行下标)，表格区域内的文本行同样产出"""
+        anchors = self._blocks_by_anchor()
+        for index in range(len(self.texts) + 1):
+            for block_index in anchors.get(index, ()):
+                yield "block", block_index
+            if index < len(self.texts):
+                yield "line", index
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __repr__(self):
+        return f"OCRPage(lines={len(self.texts)}, blocks={len(self.blocks)})"
+
+    def __eq__(self, other):
+        if not isinstance(other, OCRPage):
+            return NotImplemented
+        return (
+            self.texts == other.texts
+            and np.array_equal(self.boxes, other.boxes)
+            and np.array_equal(self.scores, other.scores)
+            and np.array_equal(self.table_index, other.table_index)
+            and self.blocks == other.blocks
+        )
+
+    # ---- 向量化几何工具 ----
+
+    def centers(self):
+        """(N, 2) 文本框中心点"""
+        return self.boxes.mean(axis=1)
+
+    def bounding_rects(self):
+        """(N, 4) 文本框外接矩形 x1, y1, x2, y2"""
+        return np.concatenate([self.boxes.min(axis=1), self.boxes.max(axis=1)], axis=1)
+
+    def heights(self):
+        """(N,) 文本框外接矩形高度"""
+        return self.boxes[:, :, 1].max(axis=1) - self.boxes[:, :, 1].min(axis=1)
+
+    def order_by_y(self):
+        """按中心点纵坐标排序的行下标（纵坐标相同时保持原顺序）"""
+        return np.argsort(self.centers()[:, 1], kind="stable")
+
+    def reading_order(self, line_tolerance=0.5):
+        """按阅读顺序（从上到下、同一行内从左到右）排序的行下标
+
+        中心点纵坐标相差小于 line_tolerance × 文本框高度中位数的文本框视为同一行。
+        """
+        if not len(self.texts):
+            return np.zeros(0, np.int64)
+        centers = self.centers()
+        by_y = np.argsort(centers[:, 1], kind="stable")
+        tolerance = max(1.0, float(np.median(self.heights())) * line_tolerance)
+        # 与上一个文本框的纵向间距超过阈值时开始新的一行
+        row_starts = np.concatenate([[True], np.diff(centers[by_y, 1]) > tolerance])
+        row_ids = np.empty(len(by_y), np.int64)
+        row_ids[by_y] = np.cumsum(row_starts) - 1
+        return np.lexsort((centers[:, 0], row_ids))
+
+    # ---- 二进制序列化 ----
+
+    def to_bytes(self):
+        """序列化为紧凑的二进制格式"""
+        encoded = [text.encode("utf-8") for text in self.texts]
+        text_lengths = np.fromiter((len(item) for item in encoded), np.uint32, len(encoded))
+        text_blob = b"".join(encoded)
+        blocks_blob = json.dumps(self.blocks, ensure_ascii=False).encode("utf-8") if self.blocks else b""
+        return b"".join((
+            _HEADER.pack(_MAGIC, _VERSION, len(self.texts), len(text_blob), len(blocks_blob)),
+            np.ascontiguousarray(self.boxes, "<f4").tobytes(),
+            np.ascontiguousarray(self.scores, "<f4").tobytes(),
+            np.ascontiguousarray(self.table_index, "<i4").tobytes(),
+            text_lengths.astype("<u4").tobytes(),
+            text_blob,
+            blocks_blob,
+        ))
+
+    @classmethod
+    def from_bytes(cls, data):
+        """从 to_bytes 的结果还原
+
+        Raises:
+            ValueError: 数据不是 OCRPage 序列化格式或版本不支持
+        """
+        data = memoryview(data)
+        magic, version, count, text_size, blocks_size = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("不是有效的 OCRPage 序列化数据")
+        offset = _HEADER.size
+
+        def take(dtype, shape):
+            nonlocal offset
+            array = np.frombuffer(data, dtype, int(np.prod(shape)), offset).reshape(shape).copy()
+            offset += array.nbytes
+            return array
+
+        boxes = take("<f4", (count, 4, 2))
+        scores = take("<f4", (count,))
+        table_index = take("<i4", (count,))
+        text_lengths = take("<u4", (count,))
+        text_blob = bytes(data[offset:offset + text_size])
+        offset += text_size
+        ends = np.cumsum(text_lengths, dtype=np.int64).tolist()
+        starts = [0] + ends[:-1]
+        texts = [text_blob[start:end].decode("utf-8") for start, end in zip(starts, ends)]
+        blocks = json.loads(bytes(data[offset:offset + blocks_size]).decode("utf-8")) if blocks_size else []
+        page = cls.__new__(cls)
+        page.boxes = boxes.astype(np.float32, copy=False)
+        page.scores = scores.astype(np.float32, copy=False)
+        page.table_index = table_index.astype(np.int32, copy=False)
+        page.texts = texts
+        page.blocks = blocks
+        return page
+
+    def __reduce__(self):
+        # pickle（进程池传递结果、磁盘缓存）时使用紧凑的二进制格式
+        return OCRPage.from_bytes, (self.to_bytes(),)
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+超大图片分块 OCR
+- 把超过阈值的图片切分为相互重叠的图块，逐块执行 OCR，单次推理的内存只与图块大小有关
+- 图块内的检测框按图块偏移映射回整页坐标
+- 被图块边缘截断的文本行：不同图块中同一基线上、在重叠区域内相互重叠的片段先合并为一个框（文字按重叠部分拼接，
+  引擎再对合并后的整行重新识别）
+- 之后重叠区域内重复识别的文本行按重叠比例去重，保留最完整的一条，结果与整页识别的元素格式一致
+"""
+import numpy as np
+
+from text_lines import sort_text_boxes
+
+
+def iter_tiles(height, width, tile_size, overlap):
+    """按行优先顺序生成覆盖整张图片的重叠图块
+
+    Args:
+        height: 图片高度
+        width: 图片宽度
+        tile_size: 图块边长（像素）
+        overlap: 相邻图块的重叠宽度（像素），应大于一行文字的高度
+
+    Yields:
+        tuple: 图块范围 (x0, y0, x1, y1)，最后一行/列的图块与图片边缘对齐
+    """
+    if overlap >= tile_size:
+        raise ValueError(f"图块重叠宽度 ({overlap}) 必须小于图块边长 ({tile_size})")
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        step = tile_size - overlap
+        positions = list(range(0, length - tile_size, step))
+        positions.append(length - tile_size)
+        return positions
+
+    for y0 in starts(height):
+        for x0 in starts(width):
+            yield x0, y0, min(x0 + tile_size, width), min(y0 + tile_size, height)
+
+
+def offset_lines(lines, x0, y0):
+    """把图块内的 OCR 文本行 [box, (text, score)] 平移到整页坐标"""
+    return [
+        [[[point[0] + x0, point[1] + y0] for point in box], rec]
+        for box, rec in lines
+    ]
+
+
+def _box_bounds(boxes):
+    points = np.asarray(boxes, dtype=np.float32).reshape(len(boxes), 4, 2)
+    return points[:, :, 0].min(axis=1), points[:, :, 1].min(axis=1), points[:, :, 0].max(axis=1), points[:, :, 1].max(axis=1)
+
+
+def join_line_fragments(boxes, tile_ids, min_vertical_overlap=0.6):
+    """找出被图块边缘截断的同一行文字的各个片段
+
+    来自不同图块、位于同一基线（纵向重叠不少于较矮一段高度的 min_vertical_overlap）且横向相互重叠的两个框
+    属于同一行：行被图块边缘截断时，相邻图块在重叠区域中各自识别出该行的一部分。跨越多个图块的行按传递关系合并。
+
+    Args:
+        boxes: 整页坐标的四边形检测框列表
+        tile_ids: 与 boxes 对应的图块编号
+        min_vertical_overlap: 判定为同一基线的纵向重叠比例
+
+    Returns:
+        list: 分组（输入下标列表，组内从左到右排列），不需要合并的框单独成组；按组内最小下标排序
+    """
+    count = len(boxes)
+    if count == 0:
+        return []
+    x_min, y_min, x_max, y_max = _box_bounds(boxes)
+    heights = y_max - y_min
+    tile_ids = np.asarray(tile_ids)
+    parent = list(range(count))
+
+    def find(index):
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    for index in range(count - 1):
+        rest = slice(index + 1, None)
+        vertical = np.minimum(y_max[index], y_max[rest]) - np.maximum(y_min[index], y_min[rest])
+        horizontal = np.minimum(x_max[index], x_max[rest]) - np.maximum(x_min[index], x_min[rest])
+        same_line = (
+            (tile_ids[rest] != tile_ids[index])
+            & (horizontal > 0)
+            & (vertical >= min_vertical_overlap * np.minimum(heights[index], heights[rest]))
+        )
+        for other in np.nonzero(same_line)[0] + index + 1:
+            parent[find(int(other))] = find(index)
+
+    groups = {}
+    for index in range(count):
+        groups.setdefault(find(index), []).append(index)
+    return sorted((sorted(group, key=lambda i: (x_min[i], i)) for group in groups.values()), key=min)
+
+
+def _union_box(boxes):
+    """多个框的外接矩形（四点，左上起顺时针）"""
+    x_min, y_min, x_max, y_max = _box_bounds(boxes)
+    x0, y0, x1, y1 = float(x_min.min()), float(y_min.min()), float(x_max.max()), float(y_max.max())
+    return [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]
+
+
+def stitch_text(texts):
+    """按从左到右的顺序拼接同一行的片段文字，去掉前一段结尾与后一段开头重复的部分（重叠区域中识别了两次的文字）"""
+    stitched = ""
+    for text in texts:
+        overlap = next((size for size in range(min(len(stitched), len(text)), 0, -1) if stitched.endswith(text[:size])), 0)
+        stitched += text[overlap:]
+    return stitched
+
+
+def join_tile_lines(lines, tile_ids):
+    """合并被图块边缘截断的文本行片段（在去重之前调用）
+
+    Args:
+        lines: 整页坐标的 [box, (text, score)] 列表
+        tile_ids: 与 lines 对应的图块编号
+
+    Returns:
+        tuple: (文本行列表, joined) - joined[i] 为 True 表示第 i 行由多个片段合并而成，
+            框为各片段的外接矩形，文字为拼接结果（调用方可按新框重新识别）
+    """
+    joined_lines, joined = [], []
+    for group in join_line_fragments([box for box, _ in lines], tile_ids):
+        if len(group) == 1:
+            joined_lines.append(lines[group[0]])
+            joined.append(False)
+            continue
+        texts = [lines[index][1][0] for index in group]
+        score = float(np.mean([lines[index][1][1] for index in group]))
+        joined_lines.append([_union_box([lines[index][0] for index in group]), (stitch_text(texts), score)])
+        joined.append(True)
+    return joined_lines, joined
+
+
+def dedupe_boxes(boxes, scores=None, threshold=0.5):
+    """去除重叠区域中重复检测的文本框
+
+    两个框的交集面积占较小框面积的比例超过 threshold 时视为同一行文字，
+    保留面积较大（被图块边缘截断得更少）的那一个，面积相同时保留得分较高的。
+
+    Args:
+        boxes: 四边形检测框列表，每个为 (4, 2) 的坐标
+        scores: 可选的识别得分列表
+        threshold: 判定为重复的重叠比例
+
+    Returns:
+        list: 保留的框在输入中的下标（按输入顺序）
+    """
+    if len(boxes) == 0:
+        return []
+    x_min, y_min, x_max, y_max = _box_bounds(boxes)
+    areas = np.maximum(x_max - x_min, 0) * np.maximum(y_max - y_min, 0)
+    score_array = np.zeros(len(boxes)) if scores is None else np.asarray(scores, dtype=np.float32)
+    # 面积降序、得分降序
+    order = np.lexsort((-score_array, -areas))
+
+    keep = []
+    suppressed = np.zeros(len(boxes), dtype=bool)
+    for index in order:
+        if suppressed[index]:
+            continue
+        keep.append(index)
+        inter_w = np.minimum(x_max[index], x_max) - np.maximum(x_min[index], x_min)
+        inter_h = np.minimum(y_max[index], y_max) - np.maximum(y_min[index], y_min)
+        inter = np.maximum(inter_w, 0) * np.maximum(inter_h, 0)
+        ratio = inter / np.maximum(np.minimum(areas[index], areas), 1e-6)
+        suppressed |= ratio > threshold
+    return sorted(int(index) for index in keep)
+
+
+def merge_tile_lines(lines, threshold=0.5):
+    """合并各图块（已映射到整页坐标）的 OCR 文本行：去重并按阅读顺序排序
+
+    被截断的行应先用 join_tile_lines 合并。
+
+    Args:
+        lines: [box, (text, score)] 列表
+        threshold: 判定为重复的重叠比例
+
+    Returns:
+        list: 与 PaddleOCR 单页结果 result[0] 相同结构的文本行列表
+    """
+    if not lines:
+        return []
+    keep = dedupe_boxes([box for box, _ in lines], [rec[1] for _, rec in lines], threshold)
+    kept = [lines[index] for index in keep]
+    boxes = [np.asarray(box, dtype=np.float32) for box, _ in kept]
+    # sort_text_boxes 返回排序后的框对象，按对象身份找回对应的文本
+    index_of = {id(box): i for i, box in enumerate(boxes)}
+    return [kept[index_of[id(box)]] for box in sort_text_boxes(boxes)]
+
+
+def merge_tile_boxes(boxes, tile_ids=None, threshold=0.5):
+    """合并各图块的检测框（只有检测结果、之后按整页裁剪识别时使用）：合并截断的片段、去重并按阅读顺序排序
+
+    Args:
+        boxes: 整页坐标的检测框列表
+        tile_ids: 与 boxes 对应的图块编号，为 None 时不合并片段
+        threshold: 判定为重复的重叠比例
+
+    Returns:
+        list: 排序后的检测框列表
+    """
+    if tile_ids is not None and len(boxes):
+        boxes = [
+            np.asarray(boxes[group[0]] if len(group) == 1 else _union_box([boxes[index] for index in group]), dtype=np.float32)
+            for group in join_line_fragments(boxes, tile_ids)
+        ]
+    keep = dedupe_boxes(boxes, threshold=threshold)
+    return sort_text_boxes([np.asarray(boxes[index], dtype=np.float32) for index in keep])
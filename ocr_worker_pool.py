@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+常驻 OCR 工作进程池
+- 每个工作进程只加载一次 PaddleOCR 模型（det/cls/rec），启动时用空白图片预热
+- 任务通过 multiprocessing 的本地管道（IPC）分发给工作进程，避免每张图片都启动新的 Python 解释器
+- 供 Django 视图（converter/pic_file_converter.py）和命令行脚本的多进程目录模式（--workers）复用
+"""
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+import metrics
+
+logger = logging.getLogger("converter")
+
+# 以下变量只在工作进程中使用，由 _init_worker 在进程启动时赋值
+_worker_engine = None
+
+
+def _init_worker(config_path, warmup, ready_queue, config_overrides=None):
+    """工作进程初始化：加载配置、日志和 OCR 模型，并执行一次预热推理
+
+    Args:
+        config_path: OCR 配置文件路径（与命令行脚本使用的 config.yaml 格式相同）
+        warmup: 是否使用空白图片执行一次预热推理
+        ready_queue: 初始化完成后写入进程号，通知主进程该工作进程已就绪
+        config_overrides: 覆盖配置文件的键值（如命令行指定的预处理配置、推理后端）
+    """
+    global _worker_engine
+
+    try:
+        from extraction_engine import ExtractionEngine
+        from utils import load_config, setup_logging
+
+        config = load_config(config_path)
+        config.update(config_overrides or {})
+        worker_logger = setup_logging(
+            config.get("log_file", "app.log"),
+            config.get("logger_name", "ocr_app"),
+        )
+        metrics.configure_jsonl(config.get("metrics_file"), source="worker")
+
+        start_time = time.perf_counter()
+        _worker_engine = ExtractionEngine(config, worker_logger)
+        _worker_engine.ocr  # 加载模型
+        if warmup:
+            try:
+                _worker_engine.warm_up()
+            except Exception as e:
+                worker_logger.warning(f"OCR worker warm-up failed (pid={os.getpid()}): {e}")
+        worker_logger.info(
+            f"OCR worker ready (pid={os.getpid()}), model load and warm-up took {time.perf_counter() - start_time:.2f}s"
+        )
+    except Exception as e:
+        # 通知主进程初始化失败，避免主进程一直等待到超时
+        ready_queue.put((os.getpid(), str(e)))
+        raise
+    ready_queue.put((os.getpid(), None))
+
+
+def _worker_image_to_docx(image_path, output_path):
+    """在工作进程中识别单张图片并保存为 DOCX
+
+    Args:
+        image_path: 输入图片路径
+        output_path: 输出 DOCX 路径
+
+    Returns:
+        ImageResult: 该图片的提取结果
+    """
+    return _worker_engine.image_to_docx(image_path, output_path)
+
+
+def _worker_image_to_outputs(image_path, outputs, name=None):
+    """在工作进程中识别单张图片一次，保存为一个或多个输出文件
+
+    Args:
+        image_path: 输入图片路径，或 PDF / TIFF 文档路径（逐页识别，写入同一组输出文件）
+        outputs: {输出格式: 输出路径}
+        name: 图片名称（特殊表格处理按名称分派），为 None 时使用路径的文件名
+
+    Returns:
+        ImageResult: 该图片的提取结果
+    """
+    return _worker_engine.image_to_outputs(image_path, outputs, name=name)
+
+
+def _worker_process(item):
+    """在工作进程中识别单张图片，返回结构化结果（不生成文档）
+
+    Args:
+        item: 图片路径、多页文档的一页（DocumentPage，由工作进程渲染），或 (名称, 图片路径) 二元组
+
+    Returns:
+        ImageResult: 该图片的提取结果
+    """
+    name, source = item if isinstance(item, tuple) else (None, item)
+    return _worker_engine.process(source, name)
+
+
+class OCRWorkerPool:
+    """常驻 OCR 工作进程池
+
+    进程池在 start() 时一次性启动全部工作进程，每个进程加载并预热一份 OCR 模型，
+    之后的任务复用这些进程，不再重复加载模型。
+    """
+
+    def __init__(self, pool_size, config_path="config.yaml", warmup=True, task_timeout=300, config_overrides=None):
+        """
+        Args:
+            pool_size: 工作进程数量
+            config_path: 传给工作进程的 OCR 配置文件路径
+            warmup: 启动时是否执行预热推理
+            task_timeout: 单个任务的最长等待时间（秒）
+            config_overrides: 工作进程加载配置文件后再覆盖的键值
+        """
+        if pool_size < 1:
+            raise ValueError(f"OCR 工作进程数量必须大于 0，当前为 {pool_size}")
+        self.pool_size = pool_size
+        self.config_path = str(config_path)
+        self.warmup = warmup
+        self.task_timeout = task_timeout
+        self.config_overrides = dict(config_overrides or {})
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_running(self):
+        return self._pool is not None
+
+    def start(self):
+        """启动工作进程并等待全部进程完成模型加载与预热"""
+        with self._lock:
+            if self._pool is not None:
+                return
+            # 使用 spawn 启动方式，避免 fork 继承 Django 进程中的线程和数据库连接
+            context = multiprocessing.get_context("spawn")
+            start_time = time.perf_counter()
+            ready_queue = context.Queue()
+            pool = context.Pool(
+                processes=self.pool_size,
+                initializer=_init_worker,
+                initargs=(self.config_path, self.warmup, ready_queue, self.config_overrides),
+            )
+            try:
+                # 每个工作进程加载并预热模型后写入一次进程号，全部到齐才算启动完成
+                for _ in range(self.pool_size):
+                    pid, error = ready_queue.get(timeout=self.task_timeout)
+                    if error:
+                        raise RuntimeError(f"OCR 工作进程 {pid} 初始化失败: {error}")
+            except Exception:
+                pool.terminate()
+                raise
+            self._pool = pool
+            logger.info(
+                f"OCR worker pool started with {self.pool_size} process(es) in {time.perf_counter() - start_time:.2f}s"
+            )
+
+    def submit_image_to_docx(self, image_path, output_path):
+        """异步提交一个图片转 DOCX 任务
+
+        Args:
+            image_path: 输入图片路径
+            output_path: 输出 DOCX 路径
+
+        Returns:
+            multiprocessing.pool.AsyncResult: 任务句柄，通过 get(timeout) 获取结果
+        """
+        if self._pool is None:
+            self.start()
+        return self._pool.apply_async(_worker_image_to_docx, (image_path, output_path))
+
+    def submit_image_to_outputs(self, image_path, outputs, name=None):
+        """异步提交一个图片转多种格式的任务（每张图片只识别一次）
+
+        Args:
+            image_path: 输入图片路径，或 PDF / TIFF 文档路径（整个文档为一个任务）
+            outputs: {输出格式: 输出路径}，格式为 docx、json、md、txt、pdf
+            name: 图片名称（如上传时的原始文件名），为 None 时使用路径的文件名
+
+        Returns:
+            multiprocessing.pool.AsyncResult: 任务句柄，通过 get(timeout) 获取结果
+        """
+        if self._pool is None:
+            self.start()
+        return self._pool.apply_async(_worker_image_to_outputs, (image_path, outputs, name))
+
+    def iter_process(self, sources):
+        """把多张图片分发给全部工作进程识别，按输入顺序逐张产出结果
+
+        先完成的图片在主进程中排队等待，保证产出顺序与输入顺序一致。
+
+        Args:
+            sources: 图片路径、DocumentPage 或 (名称, 图片路径) 二元组的列表
+
+        Yields:
+            ImageResult: 每张图片的提取结果
+
+        Raises:
+            multiprocessing.TimeoutError: 某张图片超过 task_timeout 仍未完成
+        """
+        if self._pool is None:
+            self.start()
+        results = self._pool.imap(_worker_process, sources, chunksize=1)
+        for _ in range(len(sources)):
+            yield results.next(timeout=self.task_timeout)
+
+    def close(self):
+        """关闭进程池，等待正在执行的任务结束"""
+        with self._lock:
+            if self._pool is None:
+                return
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+            logger.info("OCR worker pool stopped.")
+
+    def terminate(self):
+        """立即终止全部工作进程（用于任务超时或进程池异常后的重建）"""
+        with self._lock:
+            if self._pool is None:
+                return
+            self._pool.terminate()
+            self._pool = None
+            logger.warning("OCR worker pool terminated.")
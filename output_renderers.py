@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""
+轻量输出格式：JSON、Markdown、纯文本
+- 与 Word 输出共用 page_content 生成的段落和表格序列，一次识别的结果可同时交给多个输出（如 docx + json），不重复识别
+- 每张图片处理完即追加写入，内存不随图片数量增长；写入 <输出文件>.tmp，close() 时再替换为最终文件
+- JSON 包含每个文本行的文字、置信度、文本框四点坐标（原图坐标），以及按版面顺序的段落和表格（行列结构含合并单元格）
+- 不依赖 python-docx，只需要文字的调用方不必生成和压缩 Word 文档；page_content（NumPy）在写入时才导入，
+  Web 视图只用格式常量时不增加启动耗时
+"""
+import json
+import os
+import re
+
+TEXT_OUTPUT_FORMATS = ("json", "md", "txt")
+OUTPUT_FORMATS = ("docx", "pdf") + TEXT_OUTPUT_FORMATS
+JSON_FORMAT_VERSION = 2
+
+# Markdown 中会被解释为标题、引用、列表、分隔线的行首（有序列表只需转义数字后的点或括号）
+_MD_BLOCK_MARKER = re.compile(r"^(\s*)(?:(#|>|[*+-](?=\s|$)|=+\s*$)|(\d+)([.)])(?=\s|$))")
+_MD_INLINE_SPECIAL = re.compile(r"([\\`*_\[\]<>|])")
+
+
+def parse_output_formats(value):
+    """把 "docx,json" 或 ["docx", "json"] 解析为去重后的格式列表
+
+    Raises:
+        ValueError: 包含不支持的格式
+    """
+    items = value.split(",") if isinstance(value, str) else list(value or [])
+    formats = []
+    for item in items:
+        item = item.strip().lower()
+        if not item:
+            continue
+        if item not in OUTPUT_FORMATS:
+            raise ValueError(f"不支持的输出格式 '{item}'，可选: {', '.join(OUTPUT_FORMATS)}")
+        if item not in formats:
+            formats.append(item)
+    return formats or ["docx"]
+
+
+def _md_escape(text):
+    """转义 Markdown 行内标记和行首块标记，OCR 文字按原样显示"""
+    text = _MD_INLINE_SPECIAL.sub(r"\\\1", text)
+    match = _MD_BLOCK_MARKER.match(text)
+    if match is None:
+        return text
+    if match.group(3):
+        return f"{match.group(1)}{match.group(3)}\\{match.group(4)}{text[match.end():]}"
+    return f"{match.group(1)}\\{text[len(match.group(1)):]}"
+
+
+def grid_to_markdown(grid):
+    """TableGrid 转换为 Markdown：没有合并单元格时为管道表格（第一行作表头），否则输出 HTML 表格以保留合并关系"""
+    if any(cell.rowspan > 1 or cell.colspan > 1 for cell in grid.cells):
+        return grid.to_html()
+    rows = [["" if text is None else _md_escape(text).replace("\n", "<br>") for text in row] for row in grid.to_matrix()]
+    lines = ["| " + " | ".join(rows[0]) + " |", "|" + "---|" * grid.n_cols]
+    lines.extend("| " + " | ".join(row) + " |" for row in rows[1:])
+    return "\n".join(lines)
+
+
+def grid_to_text(grid):
+    """TableGrid 转换为制表符分隔的文本行，合并单元格的文字只出现在左上角"""
+    return "\n".join(
+        "\t".join("" if text is None else text.replace("\n", " ").replace("\t", " ") for text in row)
+        for row in grid.to_matrix()
+    )
+
+
+def grid_to_dict(grid):
+    return {
+        "n_rows": grid.n_rows,
+        "n_cols": grid.n_cols,
+        "header_rows": grid.header_rows,
+        "cells": [
+            {"row": cell.row, "col": cell.col, "rowspan": cell.rowspan, "colspan": cell.colspan, "text": cell.text}
+            for cell in grid.cells
+        ],
+    }
+
+
+def result_to_dict(result, name=None, special_handlers=True):
+    """一张图片的提取结果（ImageResult）转换为可 JSON 序列化的字典
+
+    OCRPage 的坐标属于预处理（缩放）后的图片，输出时除以 result.scale 映射回原图像素
+    （多页文档为页面的点坐标）；启用纠偏时为纠偏旋转后的坐标。
+    """
+    from page_content import PARAGRAPH, iter_page_content
+
+    name = name or result.name
+    page = result.page
+    scale = result.scale or 1.0
+    blocks = []
+    for block in page.blocks:
+        block = {key: value for key, value in block.items() if key not in ("res", "anchor")}
+        if "bbox" in block:
+            block["bbox"] = [round(float(value) / scale, 1) for value in block["bbox"]]
+        blocks.append(block)
+    lines = [
+        {
+            "text": text,
+            "confidence": round(float(score), 4),
+            "box": [[round(float(x) / scale, 1), round(float(y) / scale, 1)] for x, y in box],
+            "block": int(block) if block >= 0 else None,
+        }
+        for text, score, box, block in zip(page.texts, page.scores, page.boxes, page.table_index)
+    ]
+    content = []
+    for kind, value in iter_page_content(name, page, special_handlers):
+        if kind == PARAGRAPH:
+            if value.strip():
+                content.append({"type": "paragraph", "text": value.strip()})
+        else:
+            content.append({"type": "table", **grid_to_dict(value)})
+    return {
+        "name": name,
+        "source_path": result.source_path,
+        "error": result.error,
+        "elapsed_seconds": round(result.elapsed, 3),
+        "scale": round(result.scale, 6),
+        "lines": lines,
+        "blocks": blocks,
+        "content": content,
+    }
+
+
+class _OutputRenderer:
+    """逐张图片追加写入的输出文件"""
+
+    output_format = None
+
+    def __init__(self, output_path, headings=True, special_handlers=True):
+        """
+        Args:
+            output_path: 输出文件路径
+            headings: 是否在每张图片前输出 "Content from <文件名>" 标题（与目录模式的 Word 输出一致）
+            special_handlers: 是否使用按文件名注册的特殊表格内容函数
+        """
+        self.path = str(output_path)
+        self.headings = headings
+        self.special_handlers = special_handlers
+        self.count = 0
+        self._temp_path = f"{self.path}.tmp"
+        self._file = open(self._temp_path, "w", encoding="utf-8", newline="\n")
+        self._begin()
+
+    def add_result(self, result, name=None):
+        """写入一张图片的提取结果"""
+        self._write_result(result, name or result.name)
+        self.count += 1
+
+    def close(self):
+        """结束写入并替换为最终文件，返回输出路径"""
+        if self._file is None:
+            return self.path
+        self._end()
+        self._file.close()
+        self._file = None
+        os.replace(self._temp_path, self.path)
+        return self.path
+
+    def abort(self):
+        """放弃写入，删除临时文件"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            try:
+                os.remove(self._temp_path)
+            except OSError:
+                pass
+
+    def _begin(self):
+        pass
+
+    def _end(self):
+        pass
+
+    def _write_result(self, result, name):
+        raise NotImplementedError
+
+
+class JsonRenderer(_OutputRenderer):
+    """{"version": 1, "images": [...]}，每张图片一行"""
+
+    output_format = "json"
+
+    def _begin(self):
+        self._file.write(f'{{"version": {JSON_FORMAT_VERSION}, "images": [\n')
+
+    def _write_result(self, result, name):
+        if self.count:
+            self._file.write(",\n")
+        self._file.write(json.dumps(result_to_dict(result, name, self.special_handlers), ensure_ascii=False))
+
+    def _end(self):
+        self._file.write("\n]}\n")
+
+
+class _BlockTextRenderer(_OutputRenderer):
+    """按段落和表格输出文本块，块之间空一行，图片之间写入 separator"""
+
+    separator = ""
+
+    def _write_result(self, result, name):
+        from page_content import PARAGRAPH, iter_page_content
+
+        if self.count:
+            self._file.write(self.separator)
+        blocks = [self._heading(name)] if self.headings else []
+        for kind, value in iter_page_content(name, result.page, self.special_handlers):
+            if kind == PARAGRAPH:
+                if value.strip():
+                    blocks.append(self._paragraph(value.strip()))
+            else:
+                blocks.append(self._table(value))
+        self._file.write("\n\n".join(blocks) + "\n")
+
+
+class MarkdownRenderer(_BlockTextRenderer):
+    output_format = "md"
+    separator = "\n---\n\n"
+
+    def _heading(self, name):
+        return f"# Content from {_md_escape(name)}"
+
+    def _paragraph(self, text):
+        return _md_escape(text)
+
+    def _table(self, grid):
+        return grid_to_markdown(grid)
+
+
+class TextRenderer(_BlockTextRenderer):
+    output_format = "txt"
+    separator = "\n\f\n"  # 换页符，对应 Word 输出中图片之间的分页
+
+    def _heading(self, name):
+        return f"Content from {name}"
+
+    def _paragraph(self, text):
+        return text
+
+    def _table(self, grid):
+        return grid_to_text(grid)
+
+
+RENDERERS = {"json": JsonRenderer, "md": MarkdownRenderer, "txt": TextRenderer}
+
+
+def create_renderer(output_format, output_path, headings=True, special_handlers=True, **options):
+    """创建 json / md / txt 输出，或原生 PDF 输出（options 为 pdf_renderer.PdfRenderer 的 mode、font_path 等参数）"""
+    if output_format == "pdf":
+        from pdf_renderer import PdfRenderer
+
+        return PdfRenderer(output_path, headings=headings, special_handlers=special_handlers, **options)
+    return RENDERERS[output_format](output_path, headings=headings, special_handlers=special_handlers)
+
+
+def write_result(result, output_format, output_path, special_handlers=True, **options):
+    """把一张图片的提取结果写为单独的 json / md / txt / pdf 文件（不加标题）"""
+    renderer = create_renderer(output_format, output_path, headings=False, special_handlers=special_handlers, **options)
+    try:
+        renderer.add_result(result)
+    except BaseException:
+        renderer.abort()
+        raise
+    return renderer.close()
+
+
+def merge_output_files(output_format, paths, output_path):
+    """按顺序合并多个 write_result 生成的 json / md / txt 文件（与合并 DOCX 一样不加标题，图片之间写入分隔）"""
+    temp_path = f"{output_path}.tmp"
+    with open(temp_path, "w", encoding="utf-8", newline="\n") as f:
+        if output_format == "json":
+            f.write(f'{{"version": {JSON_FORMAT_VERSION}, "images": [\n')
+            for index, path in enumerate(paths):
+                with open(path, encoding="utf-8") as source:
+                    images = json.load(source).get("images", [])
+                f.write(",\n".join(json.dumps(image, ensure_ascii=False) for image in images))
+                if images and index < len(paths) - 1:
+                    f.write(",\n")
+            f.write("\n]}\n")
+        else:
+            for index, path in enumerate(paths):
+                if index:
+                    f.write(RENDERERS[output_format].separator)
+                with open(path, encoding="utf-8") as source:
+                    f.write(source.read())
+    os.replace(temp_path, output_path)
+    return output_path
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+与输出格式无关的页面内容
+- 把一张图片的 OCR 结果（OCRPage）按版面顺序转换为段落和表格（TableGrid）序列，
+  Word、Markdown、纯文本等输出都消费同一个序列，表格结构只解析或重建一次
+- 表格来源：表格模型输出的 HTML（html_table_parser）、没有结构时按文本框位置重建（table_reconstruction）
+- 特殊表格图片通过 special_content_handlers 注册表分发到定制的内容函数（handler(page) -> 内容序列）
+"""
+import logging
+
+from html_table_parser import parse_html_table
+from ocr_page import OCRPage
+from table_grid import TableCell, TableGrid
+from table_reconstruction import reconstruct_page_table
+
+logger = logging.getLogger("ocr_app")
+
+# 内容序列的元素：("paragraph", 文字) 或 ("table", TableGrid)
+PARAGRAPH = "paragraph"
+TABLE = "table"
+
+
+def segment_text(text):
+    """Segment the extracted text into paragraphs."""
+    paragraphs = [p.strip() for p in text.split("\n") if p.strip()]
+    if not paragraphs:
+        return [text]
+    return paragraphs
+
+
+def text_paragraphs(text):
+    """把一段 OCR 文字按换行拆分为段落"""
+    if text.strip():
+        for paragraph_text in segment_text(text):
+            yield PARAGRAPH, paragraph_text
+
+
+def html_table_content(html_content):
+    """HTML 表格的内容：解析为 TableGrid；没有表格结构时输出与原 Word 渲染相同的提示段落"""
+    grid = parse_html_table(html_content)
+    if grid is None:
+        logger.warning("No <table> tag found in the HTML content provided for table extraction.")
+        yield PARAGRAPH, "[Warning: Could not find table structure in provided HTML]"
+        return
+    if grid.n_cols == 0 and not grid.n_rows:
+        logger.info("HTML table has no rows or columns.")
+        yield PARAGRAPH, "[Empty Table]"
+        return
+    if grid.n_cols == 0:
+        logger.warning("HTML table has rows but no discernible columns. Adding as simple list.")
+        for r_idx in range(grid.n_rows):
+            yield PARAGRAPH, f"Row {r_idx+1}: "
+        return
+    yield TABLE, grid
+
+
+# ====== 特殊表格内容函数注册表及实现 ======
+def table_6jpg_content(page):
+    page = OCRPage.coerce(page)
+    # 1. 先输出"15."和"材料1"为段落（按文本框中心点纵坐标取最上面两行）
+    top_indices = page.order_by_y()[:2]
+    for idx in top_indices:
+        yield PARAGRAPH, page.texts[idx]
+    # 2. 遍历OCR结果，找到"西汉""唐代""北宋"各自的索引
+    ocr_texts = page.texts
+    dynasty_indices = []
+    for dynasty in ["西汉", "唐代", "北宋"]:
+        try:
+            idx = ocr_texts.index(dynasty)
+            dynasty_indices.append(idx)
+        except ValueError:
+            pass
+    # 3. 构造表头两行
+    cells = [
+        # 第一行
+        TableCell(0, 0, ""),
+        TableCell(0, 1, "南方", colspan=2),
+        TableCell(0, 3, "北方", colspan=2),
+        # 第二行
+        TableCell(1, 0, "朝代"),
+        TableCell(1, 1, "人口（户）"),
+        TableCell(1, 2, "占全国户口数比例"),
+        TableCell(1, 3, "人口（户）"),
+        TableCell(1, 4, "占全国户口数比例"),
+    ]
+    # 4. 依次填入三行数据
+    for row, idx in enumerate(dynasty_indices):
+        row_cells = ocr_texts[idx : idx + 6]  # 朝代+5个数据
+        for col in range(min(len(row_cells), 5)):
+            cells.append(TableCell(2 + row, col, row_cells[col]))
+    yield TABLE, TableGrid(n_rows=2 + len(dynasty_indices), n_cols=5, cells=cells, header_rows=2)
+    yield PARAGRAPH, ""
+    # 5. 只输出表格最后一个数据单元格（如'37.1%'）之后的内容为段落
+    try:
+        last_table_idx = ocr_texts.index("37.1%")
+    except ValueError:
+        last_table_idx = (
+            max(idx + 5 for idx in dynasty_indices) if dynasty_indices else -1
+        )
+    for text in ocr_texts[last_table_idx + 1:]:
+        yield PARAGRAPH, text
+
+
+special_content_handlers = {
+    "6.jpg": table_6jpg_content,
+    # 未来可继续添加更多特殊表格图片
+}
+
+
+def iter_page_content(filename, layout_elements, special_handlers=True):
+    """按版面顺序产出一张图片的段落和表格
+
+    Args:
+        filename: 图片文件名（用于特殊表格分发和日志）
+        layout_elements: OCRPage 或 PaddleOCR 版面元素列表
+        special_handlers: 为 False 时不使用 special_content_handlers，全部走通用表格还原
+
+    Yields:
+        tuple: ("paragraph", 文字) 或 ("table", TableGrid)；表格之后跟一个空段落
+    """
+    page = OCRPage.coerce(layout_elements)
+    if not len(page) and not page.blocks:
+        logger.warning(f"No content elements extracted from {filename}.")
+        yield PARAGRAPH, f"[No content could be extracted from {filename}]\n"
+    elif special_handlers and filename in special_content_handlers:
+        yield from special_content_handlers[filename](page)
+    else:  # Generic table/text processing
+        rendered_tables = set()  # 已还原为表格的 blocks 下标，区域内的文本行不再输出
+        for kind, index in page.iter_items():
+            if kind == "block":
+                content, is_table = _block_content(filename, page, index)
+                if is_table:
+                    rendered_tables.add(index)
+                yield from content
+            elif int(page.table_index[index]) not in rendered_tables:
+                yield from text_paragraphs(page.texts[index])
+
+
+def _block_content(filename, page, block_index):
+    """一个非文本行版面元素的内容
+
+    Returns:
+        tuple: (内容列表, 是否已还原为表格)；还原为表格时内容以空段落结尾，区域内的文本行不再输出
+    """
+    block = page.blocks[block_index]
+    element_type = block.get("type", "").lower()
+    if element_type == "table":
+        html_content = block.get("res", {}).get("html")
+        if html_content:
+            logger.info(f"检测到通用表格，自动还原为表格: {filename}")
+            return [*html_table_content(html_content), (PARAGRAPH, "")], True
+        # 没有表格结构（几何重建模式或表格模型未输出结构）：按文本框位置重建
+        grid = reconstruct_page_table(page, block_index)
+        if grid is not None:
+            logger.info(f"检测到通用表格，按文本位置重建为 {grid.n_rows}x{grid.n_cols} 的表格: {filename}")
+            return [(TABLE, grid), (PARAGRAPH, "")], True
+    elif element_type == "text":
+        text_content_list = block.get("res")
+        extracted_lines = []
+        if isinstance(text_content_list, list):
+            for item in text_content_list:
+                if isinstance(item, (tuple, list)) and len(item) == 2:
+                    if isinstance(item[1], (tuple, list)) and len(item[1]) == 2:
+                        extracted_lines.append(item[1][0])
+                    elif isinstance(item[0], str):
+                        extracted_lines.append(item[0])
+                elif isinstance(item, str):
+                    extracted_lines.append(item)
+        elif (
+            isinstance(text_content_list, tuple)
+            and len(text_content_list) == 2
+            and isinstance(text_content_list[0], str)
+        ):
+            extracted_lines.append(text_content_list[0])
+        if extracted_lines:
+            return list(text_paragraphs("\n".join(extracted_lines))), False
+    return [], False
@@ -0,0 +1,759 @@
+# -*- coding: utf-8 -*-
+"""
+原生 PDF 输出（不经过 DOCX 和 docx2pdf，不需要 Microsoft Word）
+- text 模式：按版面顺序重排段落和表格（page_content 的内容序列），A4 页面自动换行、分页；
+  表格逐个单元格绘制边框（含合并单元格），被跨行单元格连在一起的行不拆到两页，跨页时重复表头
+- image 模式（可搜索图片）：每张图片一页，原图作为页面背景（JPEG 原样嵌入、不重新编码；PDF/TIFF 输入的页面重新渲染），
+  OCR 文字按文本框坐标以不可见文字（渲染模式 3）叠加，可选中、复制和搜索
+- 中文字体：pdf_font_path 指定或在常见位置找到的 TrueType 字体（.ttf / .ttc）只保留用到的字形后嵌入（子集化）；
+  找不到可用字体时使用 PDF 阅读器内置的 STSong-Light（不嵌入）
+- 每页写完即写入文件，内存只保留当前页的内容和已用字形集合；字体子集在关闭时写入
+只依赖标准库；image 模式读取图片时才导入 Pillow
+"""
+import bisect
+import hashlib
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import zlib
+
+logger = logging.getLogger("ocr_app")
+
+PDF_MODES = ("text", "image")
+PDF_ENGINES = ("auto", "native", "docx2pdf")
+
+A4_WIDTH, A4_HEIGHT = 595.28, 841.89
+MARGIN = 56.7  # 2 厘米
+LINE_SPACING = 1.5  # 行距（字号的倍数）
+PARAGRAPH_SPACING = 0.4  # 段后间距（字号的倍数）
+HEADING_RATIO = 1.45  # 图片标题字号 / 正文字号
+CELL_PADDING = 3.0
+DOCUMENT_IMAGE_DPI = 150  # image 模式下 PDF 输入页面作为背景时的渲染分辨率
+
+# 常见系统中的中文 TrueType 字体（CFF 轮廓的 OpenType 字体无法按字形子集化，不在列表中）
+FONT_CANDIDATES = (
+    "C:/Windows/Fonts/simsun.ttc",
+    "C:/Windows/Fonts/simhei.ttf",
+    "C:/Windows/Fonts/msyh.ttc",
+    "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",
+    "/usr/share/fonts/wqy-microhei/wqy-microhei.ttc",
+    "/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc",
+    "/usr/share/fonts/wqy-zenhei/wqy-zenhei.ttc",
+    "/usr/share/fonts/truetype/arphic/uming.ttc",
+    "/usr/share/fonts/truetype/droid/DroidSansFallbackFull.ttf",
+    "/System/Library/Fonts/STHeiti Light.ttc",
+    "/Library/Fonts/Arial Unicode.ttf",
+)
+
+# 换行时按单个字符断开的字符（中日韩文字及全角标点），其余连续的非空白字符作为一个词
+_TOKEN = re.compile(r"\s+|[\u2e80-\U0010ffff]|[^\s\u2e80-\U0010ffff]+")
+_CONTROL = re.compile(r"[\x00-\x1f\x7f]")
+# 子集化时保留的 TrueType 表（hinting 相关表按原样保留）
+_SUBSET_TABLES = ("head", "hhea", "maxp", "hmtx", "cvt ", "fpgm", "prep")
+
+
+def resolve_pdf_engine(engine, docx2pdf_available):
+    """确定 PDF 的生成方式
+
+    Args:
+        engine: auto、native 或 docx2pdf
+        docx2pdf_available: 是否已安装 docx2pdf
+
+    Returns:
+        str: native 或 docx2pdf；auto 在安装了 docx2pdf 时沿用 docx2pdf，指定 docx2pdf 但未安装时改用 native
+
+    Raises:
+        ValueError: 不支持的生成方式
+    """
+    if engine not in PDF_ENGINES:
+        raise ValueError(f"不支持的 PDF 生成方式 '{engine}'，可选: {', '.join(PDF_ENGINES)}")
+    if engine == "native" or not docx2pdf_available:
+        return "native"
+    return "docx2pdf"
+
+
+def pdf_options(config):
+    """由配置生成 PdfRenderer 的参数"""
+    return {
+        "mode": config.get("pdf_mode", "text"),
+        "font_path": config.get("pdf_font_path") or None,
+        "font_size": config.get("font_size", 11),
+    }
+
+
+def _clean_text(text):
+    return _CONTROL.sub(" ", text or "")
+
+
+class _PdfFile:
+    """顺序写入 PDF 对象，记录偏移量，关闭时写入交叉引用表"""
+
+    def __init__(self, path):
+        self._file = open(path, "wb")
+        self._offsets = {}
+        self._next_id = 1
+        self._file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def reserve(self):
+        """预留一个对象编号（对象可以在之后任意时刻写入）"""
+        obj_id = self._next_id
+        self._next_id += 1
+        return obj_id
+
+    def write_object(self, obj_id, body):
+        self._offsets[obj_id] = self._file.tell()
+        self._file.write(f"{obj_id} 0 obj\n".encode("ascii") + body.encode("latin-1") + b"\nendobj\n")
+
+    def write_stream(self, obj_id, data, entries="", compress=True):
+        if compress:
+            data = zlib.compress(data, 6)
+            entries += " /Filter /FlateDecode"
+        self._offsets[obj_id] = self._file.tell()
+        self._file.write(f"{obj_id} 0 obj\n<< /Length {len(data)}{entries} >>\nstream\n".encode("latin-1"))
+        self._file.write(data)
+        self._file.write(b"\nendstream\nendobj\n")
+
+    def close(self, root_id):
+        xref_offset = self._file.tell()
+        lines = [f"xref\n0 {self._next_id}\n", "0000000000 65535 f \n"]
+        lines.extend(f"{self._offsets[obj_id]:010d} 00000 n \n" for obj_id in range(1, self._next_id))
+        lines.append(f"trailer\n<< /Size {self._next_id} /Root {root_id} 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n")
+        self._file.write("".join(lines).encode("ascii"))
+        self._file.close()
+
+    def discard(self):
+        self._file.close()
+
+
+class TrueTypeFont:
+    """嵌入的 TrueType 字体：以 Identity-H 编码输出字形编号，关闭时只嵌入用到的字形"""
+
+    def __init__(self, path, index=0):
+        """
+        Args:
+            path: .ttf 或 .ttc 文件路径
+            index: .ttc 字体集中的字体序号
+
+        Raises:
+            ValueError: 不是 TrueType 轮廓字体或文件结构不完整
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._parse(index)
+        except (struct.error, IndexError, KeyError) as e:
+            self.close()
+            raise ValueError(f"字体文件结构不完整: {e}") from e
+        except ValueError:
+            self.close()
+            raise
+        self._gid_cache = {}
+        self._advance_cache = {}
+        self.used = {}  # 字形编号 -> 对应的字符（写入 ToUnicode）
+
+    def _parse(self, index):
+        data = self._data
+        offset = 0
+        if data[:4] == b"ttcf":
+            count = struct.unpack_from(">I", data, 8)[0]
+            if index >= count:
+                raise ValueError(f"字体集只有 {count} 个字体")
+            offset = struct.unpack_from(">I", data, 12 + 4 * index)[0]
+        num_tables = struct.unpack_from(">H", data, offset + 4)[0]
+        self._tables = {}
+        for i in range(num_tables):
+            tag, _, table_offset, length = struct.unpack_from(">4sIII", data, offset + 12 + 16 * i)
+            self._tables[tag.decode("latin-1")] = (table_offset, length)
+        missing = [tag for tag in ("head", "hhea", "maxp", "hmtx", "cmap", "loca", "glyf") if tag not in self._tables]
+        if missing:
+            raise ValueError(f"缺少 {', '.join(missing)} 表（CFF 轮廓字体无法子集化嵌入）")
+        head = self._tables["head"][0]
+        self.units_per_em = struct.unpack_from(">H", data, head + 18)[0]
+        self.bbox = struct.unpack_from(">4h", data, head + 36)
+        self._long_loca = struct.unpack_from(">h", data, head + 50)[0] == 1
+        hhea = self._tables["hhea"][0]
+        self.ascent, self.descent = struct.unpack_from(">hh", data, hhea + 4)
+        self._num_hmetrics = struct.unpack_from(">H", data, hhea + 34)[0]
+        self.num_glyphs = struct.unpack_from(">H", data, self._tables["maxp"][0] + 4)[0]
+        self.cap_height = self.ascent
+        if "OS/2" in self._tables:
+            os2, length = self._tables["OS/2"]
+            if struct.unpack_from(">H", data, os2)[0] >= 2 and length >= 90:
+                self.cap_height = struct.unpack_from(">h", data, os2 + 88)[0]
+        base_name = self._postscript_name() or os.path.splitext(os.path.basename(self.path))[0]
+        self.name = re.sub(r"[^A-Za-z0-9-]", "", base_name) or "Font"
+        self._read_cmap()
+
+    def _table_bytes(self, tag):
+        offset, length = self._tables[tag]
+        return self._data[offset:offset + length]
+
+    def _postscript_name(self):
+        if "name" not in self._tables:
+            return None
+        base = self._tables["name"][0]
+        count, string_offset = struct.unpack_from(">HH", self._data, base + 2)
+        for i in range(count):
+            platform, _, _, name_id, length, offset = struct.unpack_from(">6H", self._data, base + 6 + 12 * i)
+            if name_id != 6:
+                continue
+            raw = self._data[base + string_offset + offset:base + string_offset + offset + length]
+            return raw.decode("utf-16-be" if platform in (0, 3) else "latin-1", errors="ignore")
+        return None
+
+    def _read_cmap(self):
+        """选择 Unicode cmap 子表（优先 format 12，其次 format 4）"""
+        data = self._data
+        base = self._tables["cmap"][0]
+        best = None
+        for i in range(struct.unpack_from(">H", data, base + 2)[0]):
+            platform, encoding, sub_offset = struct.unpack_from(">HHI", data, base + 4 + 8 * i)
+            if platform not in (0, 3) or (platform == 3 and encoding not in (1, 10)):
+                continue
+            fmt = struct.unpack_from(">H", data, base + sub_offset)[0]
+            priority = {12: 0, 4: 1}.get(fmt)
+            if priority is not None and (best is None or priority < best[0]):
+                best = (priority, fmt, base + sub_offset)
+        if best is None:
+            raise ValueError("没有 Unicode 字符映射表")
+        _, self._cmap_format, sub = best
+        if self._cmap_format == 12:
+            count = struct.unpack_from(">I", data, sub + 12)[0]
+            groups = struct.unpack_from(f">{3 * count}I", data, sub + 16)
+            self._starts, self._ends, self._start_gids = groups[0::3], groups[1::3], groups[2::3]
+        else:
+            seg_count = struct.unpack_from(">H", data, sub + 6)[0] // 2
+            ends_at = sub + 14
+            starts_at = ends_at + 2 * seg_count + 2
+            deltas_at = starts_at + 2 * seg_count
+            self._range_offsets_at = deltas_at + 2 * seg_count
+            self._ends = struct.unpack_from(f">{seg_count}H", data, ends_at)
+            self._starts = struct.unpack_from(f">{seg_count}H", data, starts_at)
+            self._deltas = struct.unpack_from(f">{seg_count}h", data, deltas_at)
+            self._range_offsets = struct.unpack_from(f">{seg_count}H", data, self._range_offsets_at)
+
+    def glyph_id(self, char):
+        code = ord(char)
+        gid = self._gid_cache.get(code)
+        if gid is not None:
+            return gid
+        gid = 0
+        if self._cmap_format == 12:
+            i = bisect.bisect_right(self._starts, code) - 1
+            if i >= 0 and code <= self._ends[i]:
+                gid = self._start_gids[i] + code - self._starts[i]
+        elif code <= 0xFFFF:
+            i = bisect.bisect_left(self._ends, code)
+            if i < len(self._ends) and self._starts[i] <= code:
+                range_offset = self._range_offsets[i]
+                if range_offset == 0:
+                    gid = (code + self._deltas[i]) & 0xFFFF
+                else:
+                    address = self._range_offsets_at + 2 * i + range_offset + 2 * (code - self._starts[i])
+                    gid = struct.unpack_from(">H", self._data, address)[0]
+                    if gid:
+                        gid = (gid + self._deltas[i]) & 0xFFFF
+        if gid >= self.num_glyphs:
+            gid = 0
+        self._gid_cache[code] = gid
+        return gid
+
+    def _advance(self, gid):
+        advance = self._advance_cache.get(gid)
+        if advance is None:
+            hmtx = self._tables["hmtx"][0]
+            advance = struct.unpack_from(">H", self._data, hmtx + 4 * min(gid, self._num_hmetrics - 1))[0]
+            self._advance_cache[gid] = advance
+        return advance
+
+    def text_width(self, text, size):
+        return sum(self._advance(self.glyph_id(char)) for char in text) * size / self.units_per_em
+
+    def encode(self, text):
+        """文字转换为内容流中的十六进制字符串（两字节字形编号），并记录用到的字形"""
+        codes = []
+        for char in text:
+            gid = self.glyph_id(char)
+            self.used.setdefault(gid, char)
+            codes.append(f"{gid:04X}")
+        return "".join(codes)
+
+    def _glyph_data(self, gid):
+        loca = self._tables["loca"][0]
+        if self._long_loca:
+            start, end = struct.unpack_from(">II", self._data, loca + 4 * gid)
+        else:
+            start, end = (2 * value for value in struct.unpack_from(">HH", self._data, loca + 2 * gid))
+        glyf = self._tables["glyf"][0]
+        return self._data[glyf + start:glyf + end]
+
+    def _subset(self):
+        """只保留用到的字形（含复合字形引用的部件），字形编号不变，其余字形置空"""
+        glyphs = {0} | set(self.used)
+        pending = list(glyphs)
+        while pending:
+            data = self._glyph_data(pending.pop())
+            if len(data) < 10 or struct.unpack_from(">h", data, 0)[0] >= 0:
+                continue
+            position = 10
+            while True:
+                flags, component = struct.unpack_from(">HH", data, position)
+                position += 4 + (4 if flags & 0x1 else 2)
+                position += 2 if flags & 0x8 else 4 if flags & 0x40 else 8 if flags & 0x80 else 0
+                if component not in glyphs:
+                    glyphs.add(component)
+                    pending.append(component)
+                if not flags & 0x20:
+                    break
+        num_glyphs = max(glyphs) + 1
+        glyf_parts, loca, position = [], [0], 0
+        for gid in range(num_glyphs):
+            data = self._glyph_data(gid) if gid in glyphs else b""
+            data += b"\0" * (-len(data) % 4)
+            glyf_parts.append(data)
+            position += len(data)
+            loca.append(position)
+        tables = {tag: bytearray(self._table_bytes(tag)) for tag in _SUBSET_TABLES if tag in self._tables}
+        struct.pack_into(">I", tables["head"], 8, 0)  # checkSumAdjustment
+        struct.pack_into(">h", tables["head"], 50, 1)  # 长格式 loca
+        struct.pack_into(">H", tables["maxp"], 4, num_glyphs)
+        num_hmetrics = min(self._num_hmetrics, num_glyphs)
+        struct.pack_into(">H", tables["hhea"], 34, num_hmetrics)
+        tables["hmtx"] = tables["hmtx"][:4 * num_hmetrics + 2 * (num_glyphs - num_hmetrics)]
+        tables["loca"] = struct.pack(f">{num_glyphs + 1}I", *loca)
+        tables["glyf"] = b"".join(glyf_parts)
+        return _build_sfnt(tables)
+
+    def write(self, pdf, font_id):
+        """写入 Type0 字体及其子集化的字体文件"""
+        cid_font_id, descriptor_id, font_file_id, to_unicode_id = (pdf.reserve() for _ in range(4))
+        font_file = self._subset()
+        pdf.write_stream(font_file_id, font_file, f" /Length1 {len(font_file)}")
+        digest = hashlib.md5(repr(sorted(self.used)).encode("ascii")).digest()
+        base_font = "".join(chr(65 + byte % 26) for byte in digest[:6]) + "+" + self.name
+        scale = 1000 / self.units_per_em
+        bbox = " ".join(str(round(value * scale)) for value in self.bbox)
+        pdf.write_object(descriptor_id, (
+            f"<< /Type /FontDescriptor /FontName /{base_font} /Flags 4 /FontBBox [{bbox}] /ItalicAngle 0 "
+            f"/Ascent {round(self.ascent * scale)} /Descent {round(self.descent * scale)} "
+            f"/CapHeight {round(self.cap_height * scale)} /StemV 80 /FontFile2 {font_file_id} 0 R >>"
+        ))
+        widths = " ".join(f"{gid} [{round(self._advance(gid) * scale)}]" for gid in sorted(self.used))
+        pdf.write_object(cid_font_id, (
+            f"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /{base_font} "
+            f"/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> "
+            f"/FontDescriptor {descriptor_id} 0 R /DW 1000 /W [{widths}] /CIDToGIDMap /Identity >>"
+        ))
+        mappings = [f"<{gid:04X}> <{char.encode('utf-16-be').hex().upper()}>" for gid, char in sorted(self.used.items()) if gid]
+        pdf.write_stream(to_unicode_id, _to_unicode_cmap(mappings).encode("ascii"))
+        pdf.write_object(font_id, (
+            f"<< /Type /Font /Subtype /Type0 /BaseFont /{base_font} /Encoding /Identity-H "
+            f"/DescendantFonts [{cid_font_id} 0 R] /ToUnicode {to_unicode_id} 0 R >>"
+        ))
+
+    def close(self):
+        self._data.close()
+
+
+class StandardCJKFont:
+    """PDF 阅读器内置的 STSong-Light（Adobe-GB1，UTF-16 编码），不嵌入字体文件"""
+
+    name = "STSong-Light"
+    path = None
+
+    def text_width(self, text, size):
+        # 与 /W 中的宽度一致：ASCII 半角，其余全角
+        return sum(500 if ord(char) < 0x7F else 1000 for char in text) * size / 1000
+
+    def encode(self, text):
+        return text.encode("utf-16-be").hex().upper()
+
+    def write(self, pdf, font_id):
+        cid_font_id, descriptor_id, to_unicode_id = pdf.reserve(), pdf.reserve(), pdf.reserve()
+        pdf.write_object(descriptor_id, (
+            "<< /Type /FontDescriptor /FontName /STSong-Light /Flags 6 /FontBBox [-25 -254 1000 880] "
+            "/ItalicAngle 0 /Ascent 880 /Descent -120 /CapHeight 880 /StemV 93 >>"
+        ))
+        pdf.write_object(cid_font_id, (
+            "<< /Type /Font /Subtype /CIDFontType0 /BaseFont /STSong-Light "
+            "/CIDSystemInfo << /Registry (Adobe) /Ordering (GB1) /Supplement 4 >> "
+            f"/FontDescriptor {descriptor_id} 0 R /DW 1000 /W [1 95 500] >>"
+        ))
+        # 编码本身就是 UTF-16，ToUnicode 为恒等映射（不识别预定义 CMap 的阅读器也能提取文字）
+        ranges = [f"<{high:02X}00> <{high:02X}FF> <{high:02X}00>" for high in range(256) if not 0xD8 <= high <= 0xDF]
+        pdf.write_stream(to_unicode_id, _to_unicode_cmap(ranges=ranges).encode("ascii"))
+        pdf.write_object(font_id, (
+            "<< /Type /Font /Subtype /Type0 /BaseFont /STSong-Light /Encoding /UniGB-UTF16-H "
+            f"/DescendantFonts [{cid_font_id} 0 R] /ToUnicode {to_unicode_id} 0 R >>"
+        ))
+
+    def close(self):
+        pass
+
+
+def _build_sfnt(tables):
+    tags = sorted(tables)
+    entry_selector = int(math.log2(len(tags)))
+    search_range = 16 * 2 ** entry_selector
+    header = struct.pack(">IHHHH", 0x00010000, len(tags), search_range, entry_selector, 16 * len(tags) - search_range)
+    offset = 12 + 16 * len(tags)
+    directory, body = [], []
+    for tag in tags:
+        data = bytes(tables[tag])
+        padded = data + b"\0" * (-len(data) % 4)
+        checksum = sum(struct.unpack(f">{len(padded) // 4}I", padded)) & 0xFFFFFFFF
+        directory.append(struct.pack(">4sIII", tag.encode("latin-1"), checksum, offset, len(data)))
+        body.append(padded)
+        offset += len(padded)
+    return header + b"".join(directory) + b"".join(body)
+
+
+def _to_unicode_cmap(mappings=(), ranges=()):
+    """ToUnicode CMap：mappings 为 "<编码> <UTF-16>" 单字符映射，ranges 为 "<起> <止> <UTF-16>" 区间映射（每段最多 100 条）"""
+    chunks = [
+        f"{len(entries[i:i + 100])} begin{kind}\n" + "\n".join(entries[i:i + 100]) + f"\nend{kind}\n"
+        for kind, entries in (("bfchar", list(mappings)), ("bfrange", list(ranges)))
+        for i in range(0, len(entries), 100)
+    ]
+    return (
+        "/CIDInit /ProcSet findresource begin\n12 dict begin\nbegincmap\n"
+        "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def\n"
+        "/CMapName /Adobe-Identity-UCS def\n/CMapType 2 def\n"
+        "1 begincodespacerange\n<0000> <FFFF>\nendcodespacerange\n"
+        + "".join(chunks)
+        + "endcmap\nCMapName currentdict /CMap defineresource pop\nend\nend\n"
+    )
+
+
+def load_font(font_path=None):
+    """加载嵌入用的中文字体
+
+    Args:
+        font_path: TrueType 字体路径，为空时依次尝试 FONT_CANDIDATES
+
+    Returns:
+        TrueTypeFont 或 StandardCJKFont（没有可用的 TrueType 字体时）
+    """
+    paths = [font_path] if font_path else [path for path in FONT_CANDIDATES if os.path.isfile(path)]
+    for path in paths:
+        try:
+            return TrueTypeFont(path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Cannot embed font '{path}', trying the next one: {e}")
+    logger.debug("No embeddable TrueType font found, using the viewer's built-in STSong-Light.")
+    return StandardCJKFont()
+
+
+def _load_page_image(path, page_index=None):
+    """读取页面背景图片：(数据, 过滤器, (宽, 高), 颜色空间, 图片像素 / 原始尺寸)；没有 EXIF 旋转的 JPEG 原样嵌入
+
+    page_index 不为 None 时 path 为多页文档（PDF、TIFF），读取其中一页。
+    """
+    from PIL import Image, ImageOps
+
+    if page_index is not None:
+        from document_pages import DocumentPage
+
+        image, render_scale = DocumentPage(path, page_index).render(DOCUMENT_IMAGE_DPI)
+        return zlib.compress(image.tobytes(), 6), "FlateDecode", image.size, "DeviceRGB", render_scale
+    with Image.open(path) as image:
+        orientation = image.getexif().get(0x0112, 1)
+        if image.format == "JPEG" and image.mode in ("L", "RGB") and orientation in (None, 1):
+            with open(path, "rb") as f:
+                data = f.read()
+            return data, "DCTDecode", image.size, "DeviceGray" if image.mode == "L" else "DeviceRGB", 1.0
+        # 与 OCR 预处理一致按 EXIF 方向旋转，文本框坐标才能对齐
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("L" if image.mode in ("1", "L", "LA", "I", "I;16") else "RGB")
+        return zlib.compress(image.tobytes(), 6), "FlateDecode", image.size, "DeviceGray" if image.mode == "L" else "DeviceRGB", 1.0
+
+
+class PdfRenderer:
+    """逐张图片追加写入的原生 PDF 输出，接口与 output_renderers 中的输出相同"""
+
+    output_format = "pdf"
+
+    def __init__(self, output_path, headings=True, special_handlers=True, mode="text", font_path=None, font_size=11):
+        """
+        Args:
+            output_path: 输出 PDF 路径
+            headings: 是否在每张图片前输出 "Content from <文件名>" 标题（text 模式）
+            special_handlers: 是否使用按文件名注册的特殊表格内容函数（text 模式）
+            mode: text（重排文字）或 image（原图 + 不可见文字层）
+            font_path: 嵌入的 TrueType 字体路径，为空时自动查找
+            font_size: 正文字号（磅）
+
+        Raises:
+            ValueError: 不支持的模式
+        """
+        if mode not in PDF_MODES:
+            raise ValueError(f"不支持的 PDF 模式 '{mode}'，可选: {', '.join(PDF_MODES)}")
+        self.path = str(output_path)
+        self.headings = headings
+        self.special_handlers = special_handlers
+        self.mode = mode
+        self.font_size = float(font_size)
+        self.count = 0
+        self._font = load_font(font_path)
+        self._temp_path = f"{self.path}.tmp"
+        self._pdf = _PdfFile(self._temp_path)
+        self._pages_id = self._pdf.reserve()
+        self._font_id = self._pdf.reserve()
+        self._page_ids = []
+        self._content = None  # 当前页的内容流（写完一页即写入文件）
+        self._page_size = (A4_WIDTH, A4_HEIGHT)
+        self._page_image_id = None
+        self._y = 0.0
+
+    def add_result(self, result, name=None):
+        """写入一张图片的提取结果（每张图片从新的一页开始）"""
+        name = name or result.name
+        if not (self.mode == "image" and self._write_image_page(result, name)):
+            self._write_text_pages(result, name)
+        self.count += 1
+
+    def close(self):
+        """写入字体子集、页面树和交叉引用表，替换为最终文件，返回输出路径"""
+        if self._pdf is None:
+            return self.path
+        if self._content is None and not self._page_ids:
+            self._begin_page()  # 没有任何图片时输出一个空白页
+        self._finish_page()
+        self._font.write(self._pdf, self._font_id)
+        kids = " ".join(f"{page_id} 0 R" for page_id in self._page_ids)
+        self._pdf.write_object(self._pages_id, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>")
+        catalog_id = self._pdf.reserve()
+        self._pdf.write_object(catalog_id, f"<< /Type /Catalog /Pages {self._pages_id} 0 R >>")
+        self._pdf.close(catalog_id)
+        self._pdf = None
+        self._font.close()
+        os.replace(self._temp_path, self.path)
+        return self.path
+
+    def abort(self):
+        """放弃写入，删除临时文件"""
+        if self._pdf is not None:
+            self._pdf.discard()
+            self._pdf = None
+            self._font.close()
+            try:
+                os.remove(self._temp_path)
+            except OSError:
+                pass
+
+    # ====== 页面 ======
+    def _begin_page(self, size=(A4_WIDTH, A4_HEIGHT)):
+        self._finish_page()
+        self._content = ["0.5 w"]
+        self._page_size = size
+        self._page_image_id = None
+        self._y = size[1] - MARGIN
+
+    def _finish_page(self):
+        if self._content is None:
+            return
+        content_id, page_id = self._pdf.reserve(), self._pdf.reserve()
+        self._pdf.write_stream(content_id, "\n".join(self._content).encode("latin-1"))
+        xobject = f" /XObject << /Im0 {self._page_image_id} 0 R >>" if self._page_image_id else ""
+        width, height = self._page_size
+        self._pdf.write_object(page_id, (
+            f"<< /Type /Page /Parent {self._pages_id} 0 R /MediaBox [0 0 {width:.2f} {height:.2f}] "
+            f"/Resources << /Font << /F1 {self._font_id} 0 R >>{xobject} >> /Contents {content_id} 0 R >>"
+        ))
+        self._page_ids.append(page_id)
+        self._content = None
+
+    def _draw_text(self, x, y, text, size):
+        self._content.append(f"BT /F1 {size:.2f} Tf {x:.2f} {y:.2f} Td <{self._font.encode(text)}> Tj ET")
+
+    # ====== text 模式 ======
+    def _write_text_pages(self, result, name):
+        from page_content import PARAGRAPH, iter_page_content
+
+        self._begin_page()
+        if self.headings:
+            self._paragraph(f"Content from {name}", self.font_size * HEADING_RATIO)
+        for kind, value in iter_page_content(name, result.page, self.special_handlers):
+            if kind == PARAGRAPH:
+                self._paragraph(value, self.font_size)
+            else:
+                self._table(value)
+
+    def _wrap(self, text, width, size):
+        """按宽度折行：中文按字符断开，其余按词断开，过长的词按字符断开"""
+        lines, current, current_width = [], "", 0.0
+        for token in _TOKEN.findall(_clean_text(text)):
+            token_width = self._font.text_width(token, size)
+            if current and current_width + token_width > width:
+                lines.append(current.rstrip())
+                current, current_width = "", 0.0
+                if token.isspace():
+                    continue
+            if token_width > width:
+                for char in token:
+                    char_width = self._font.text_width(char, size)
+                    if current and current_width + char_width > width:
+                        lines.append(current)
+                        current, current_width = "", 0.0
+                    current += char
+                    current_width += char_width
+                continue
+            current += token
+            current_width += token_width
+        if current.strip() or not lines:
+            lines.append(current.rstrip())
+        return lines
+
+    def _paragraph(self, text, size):
+        leading = size * LINE_SPACING
+        width = self._page_size[0] - 2 * MARGIN
+        for raw_line in text.split("\n"):
+            for line in self._wrap(raw_line, width, size):
+                if self._y - leading < MARGIN:
+                    self._begin_page()
+                self._y -= leading
+                if line:
+                    self._draw_text(MARGIN, self._y + (leading - size) / 2 + size * 0.2, line, size)
+        self._y -= size * PARAGRAPH_SPACING
+
+    def _column_widths(self, grid, size):
+        """列宽：按不跨列单元格的文字宽度分配，总宽度为版心宽度（窄列保持自然宽度，宽列平分剩余宽度）"""
+        available = self._page_size[0] - 2 * MARGIN
+        minimum = 2 * CELL_PADDING + 2 * size
+        natural = [minimum] * grid.n_cols
+        for cell in grid.cells:
+            if cell.colspan == 1 and cell.col < grid.n_cols:
+                text_width = max(self._font.text_width(_clean_text(line), size) for line in (cell.text or "").split("\n"))
+                natural[cell.col] = max(natural[cell.col], text_width + 2 * CELL_PADDING)
+        total = sum(natural)
+        if total <= available:
+            return [width * available / total for width in natural]
+        widths = [0.0] * grid.n_cols
+        remaining = available
+        order = sorted(range(grid.n_cols), key=lambda col: natural[col])
+        for index, col in enumerate(order):
+            widths[col] = min(natural[col], remaining / (grid.n_cols - index))
+            remaining -= widths[col]
+        return widths
+
+    def _table(self, grid):
+        if not grid.n_rows or not grid.n_cols:
+            return
+        size = self.font_size
+        leading = size * 1.3
+        widths = self._column_widths(grid, size)
+        xs = [MARGIN]
+        for width in widths:
+            xs.append(xs[-1] + width)
+
+        # 单元格折行与行高（跨行单元格不够高时加高其最后一行）
+        heights = [leading + 2 * CELL_PADDING] * grid.n_rows
+        span_end = list(range(grid.n_rows))
+        rows, cell_lines, spanning = {}, {}, []
+        for cell in grid.cells:
+            last_row = min(cell.row + cell.rowspan, grid.n_rows) - 1
+            last_col = min(cell.col + cell.colspan, grid.n_cols)
+            lines = []
+            for raw_line in (cell.text or "").split("\n"):
+                lines.extend(self._wrap(raw_line, xs[last_col] - xs[cell.col] - 2 * CELL_PADDING, size))
+            cell_lines[id(cell)] = lines
+            rows.setdefault(cell.row, []).append(cell)
+            needed = len(lines) * leading + 2 * CELL_PADDING
+            if last_row == cell.row:
+                heights[cell.row] = max(heights[cell.row], needed)
+            else:
+                spanning.append((cell.row, last_row, needed))
+                span_end[cell.row] = max(span_end[cell.row], last_row)
+        for first_row, last_row, needed in spanning:
+            shortfall = needed - sum(heights[first_row:last_row + 1])
+            if shortfall > 0:
+                heights[last_row] += shortfall
+
+        # 被跨行单元格连在一起的行作为一组，不拆到两页
+        groups, row = [], 0
+        while row < grid.n_rows:
+            end, scan = span_end[row], row
+            while scan <= end:
+                end = max(end, span_end[scan])
+                scan += 1
+            groups.append((row, end))
+            row = end + 1
+        header = next(((0, end) for start, end in groups if end == grid.header_rows - 1), None) if grid.header_rows else None
+
+        page_top = self._page_size[1] - MARGIN
+        for first_row, last_row in groups:
+            group_height = sum(heights[first_row:last_row + 1])
+            if self._y - group_height < MARGIN and self._y < page_top:
+                self._begin_page()
+                if header is not None and first_row > header[1]:
+                    self._draw_rows(header, rows, heights, xs, cell_lines, size, leading)
+            self._draw_rows((first_row, last_row), rows, heights, xs, cell_lines, size, leading)
+
+    def _draw_rows(self, group, rows, heights, xs, cell_lines, size, leading):
+        first_row, last_row = group
+        top = self._y
+        for row in range(first_row, last_row + 1):
+            row_top = top - sum(heights[first_row:row])
+            for cell in rows.get(row, []):
+                x = xs[cell.col]
+                width = xs[min(cell.col + cell.colspan, len(xs) - 1)] - x
+                height = sum(heights[row:min(row + cell.rowspan, last_row + 1)])
+                self._content.append(f"{x:.2f} {row_top - height:.2f} {width:.2f} {height:.2f} re S")
+                for index, line in enumerate(cell_lines[id(cell)]):
+                    if line:
+                        baseline = row_top - CELL_PADDING - (index + 1) * leading + (leading - size) / 2 + size * 0.2
+                        self._draw_text(x + CELL_PADDING, baseline, line, size)
+        self._y = top - sum(heights[first_row:last_row + 1])
+
+    # ====== image 模式 ======
+    def _write_image_page(self, result, name):
+        """原图一页，OCR 文字按文本框位置作为不可见文字叠加；没有可读的原图时返回 False（改用 text 模式）"""
+        if not result.source_path or not os.path.isfile(result.source_path):
+            logger.warning(f"Source image of {name} is not available, writing reflowed text instead.")
+            return False
+        try:
+            data, image_filter, (width, height), color_space, render_scale = _load_page_image(result.source_path, result.page_index)
+        except Exception as e:
+            logger.warning(f"Cannot read source image of {name}, writing reflowed text instead: {e}")
+            return False
+
+        # 页面宽度为 A4 宽度，高度按图片宽高比
+        ratio = A4_WIDTH / width
+        page_width, page_height = A4_WIDTH, height * ratio
+        self._begin_page((page_width, page_height))
+        self._page_image_id = self._pdf.reserve()
+        self._pdf.write_stream(self._page_image_id, data, (
+            f" /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+            f"/ColorSpace /{color_space} /BitsPerComponent 8 /Filter /{image_filter}"
+        ), compress=False)
+        self._content.append(f"q {page_width:.2f} 0 0 {page_height:.2f} 0 0 cm /Im0 Do Q")
+
+        # 文本框为送入 OCR 的图片坐标（可能已缩小），换算回原图（PDF 输入为点）再换算为页面坐标（原点在左下角）
+        factor = ratio * render_scale / (result.scale or 1.0)
+        self._content.append("BT 3 Tr")
+        for text, box in zip(result.page.texts, result.page.boxes):
+            text = _clean_text(text).strip()
+            if not text:
+                continue
+            (x0, y0), (x1, y1), (x2, y2), (x3, y3) = ((float(x) * factor, page_height - float(y) * factor) for x, y in box)
+            length = math.hypot(x2 - x3, y2 - y3)
+            box_height = math.hypot(x0 - x3, y0 - y3)
+            if length < 1 or box_height < 1:
+                continue
+            size = box_height * 0.85
+            natural_width = self._font.text_width(text, size)
+            if natural_width <= 0:
+                continue
+            cos, sin = (x2 - x3) / length, (y2 - y3) / length
+            # 基线略高于文本框底边；Tz 横向缩放使文字宽度与文本框一致，选中区域与图片中的文字重合
+            baseline_x, baseline_y = x3 - sin * box_height * 0.15, y3 + cos * box_height * 0.15
+            self._content.append(
+                f"/F1 {size:.2f} Tf {100 * length / natural_width:.2f} Tz "
+                f"{cos:.4f} {sin:.4f} {-sin:.4f} {cos:.4f} {baseline_x:.2f} {baseline_y:.2f} Tm <{self._font.encode(text)}> Tj"
+            )
+        self._content.append("ET")
+        return True
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""
+目录处理清单（manifest）
+- 与输出文件放在一起的 JSON Lines 文件，记录每张输入图片的大小、修改时间、SHA-256 和提取结果
+  （OCRPage 的二进制序列化，Base64 编码）
+- 重新运行时只识别新增或内容变化的图片，已删除的图片不再输出；每张图片完成后立即追加一行，
+  中断的运行可以从最后完成的图片继续
+- 输出文档由清单中保存的结果重新生成，不需要再次执行 OCR
+- OCR 配置指纹变化后清单中的旧结果全部失效
+- 多页文档（PDF、TIFF）按页记录（名称为 "文件名#page=页码"），大小、修改时间和 SHA-256 为整个文档的
+"""
+import base64
+import hashlib
+import json
+import logging
+import os
+
+from document_pages import DocumentPage, source_file, source_name
+from extraction_engine import ImageResult
+from ocr_page import OCRPage
+
+MANIFEST_VERSION = 3
+# 清单文件后缀，放在输出文件旁边：extracted_text.docx.manifest.jsonl
+MANIFEST_SUFFIX = ".manifest.jsonl"
+
+
+def file_sha256(path):
+    """计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class RunManifest:
+    """按图片文件名记录提取结果的增量处理清单"""
+
+    def __init__(self, path, fingerprint, logger=None):
+        """
+        Args:
+            path: 清单文件路径（通常为 <输出文件>.manifest.jsonl）
+            fingerprint: 当前 OCR 配置指纹，与清单中记录的不同时旧结果全部失效
+            logger: 日志记录器
+        """
+        self.path = str(path)
+        self.fingerprint = fingerprint
+        self.logger = logger or logging.getLogger("ocr_app")
+        self.entries = {}
+        self._file_hashes = {}  # 本次运行中已计算的文件 SHA-256（多页文档各页共用）
+        self._stored_results = {}
+        self._file = None
+        self.recorded = 0
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        header = None
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 中断时最后一行可能只写了一半
+                    self.logger.warning(f"Ignoring unreadable manifest line {line_number} in '{self.path}'")
+                    continue
+                if "fingerprint" in record and "name" not in record:
+                    header = record
+                    continue
+                self.entries[record["name"]] = record
+        if header is None or header.get("fingerprint") != self.fingerprint or header.get("version") != MANIFEST_VERSION:
+            if self.entries:
+                self.logger.info(f"OCR configuration changed since '{self.path}' was written, all images will be processed again.")
+            self.entries = {}
+        else:
+            self.logger.info(f"Loaded {len(self.entries)} finished image(s) from manifest '{self.path}'")
+
+    def _sha256(self, path):
+        if path not in self._file_hashes:
+            self._file_hashes[path] = file_sha256(path)
+        return self._file_hashes[path]
+
+    def lookup(self, image_path):
+        """返回图片（或文档的一页）已保存的提取结果；图片为新增或内容有变化时返回 None
+
+        大小和修改时间都未变时直接复用；否则计算 SHA-256，内容未变（如只是被复制或 touch）时同样复用。
+
+        Args:
+            image_path: 图片路径或 DocumentPage
+        """
+        name = source_name(image_path)
+        path = source_file(image_path)
+        entry = self.entries.get(name)
+        stat = os.stat(path)
+        if entry is not None and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return self._to_result(entry, image_path)
+        sha256 = self._sha256(path)
+        if entry is not None and entry["sha256"] == sha256:
+            entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            self._append(entry)
+            return self._to_result(entry, image_path)
+        return None
+
+    def split(self, image_paths):
+        """把输入图片分为可直接复用结果的和需要识别的
+
+        Args:
+            image_paths: 本次运行的全部输入图片路径和文档页面（DocumentPage，已排序）
+
+        Returns:
+            list: 需要执行 OCR 的图片路径（保持原顺序）
+        """
+        pending = []
+        for path in image_paths:
+            stored = self.lookup(path)
+            if stored is None:
+                pending.append(path)
+            else:
+                self._stored_results[path] = stored
+        return pending
+
+    @property
+    def reused(self):
+        """本次运行中直接复用结果的图片数"""
+        return len(self._stored_results)
+
+    def is_reused(self, image_path):
+        return image_path in self._stored_results
+
+    def iter_results(self, image_paths, fresh_results):
+        """按原顺序合并复用的结果和新识别的结果，新结果识别完成后立即写入清单
+
+        Args:
+            image_paths: split() 时传入的全部图片路径
+            fresh_results: split() 返回的图片依次对应的 ImageResult 迭代器
+
+        Yields:
+            ImageResult: 每张图片的提取结果
+        """
+        fresh_results = iter(fresh_results)
+        for path in image_paths:
+            stored = self._stored_results.get(path)
+            if stored is not None:
+                yield stored
+                continue
+            result = next(fresh_results, None)
+            if result is None:
+                raise RuntimeError(f"{path} 没有对应的识别结果")
+            self.record(path, result)
+            yield result
+
+    @staticmethod
+    def _to_result(entry, image_path):
+        return ImageResult(
+            name=entry["name"],
+            page=OCRPage.from_bytes(base64.b64decode(entry["page"])),
+            source_path=source_file(image_path),
+            scale=entry.get("scale", 1.0),
+            page_index=image_path.index if isinstance(image_path, DocumentPage) else None,
+            text_layer=entry.get("text_layer", False),
+        )
+
+    def record(self, image_path, result):
+        """追加一张图片的提取结果（识别失败的图片不记录，下次运行时重试）"""
+        if not result.ok:
+            return
+        name = source_name(image_path)
+        path = source_file(image_path)
+        stat = os.stat(path)
+        entry = {
+            "name": name,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": self._sha256(path),
+            "page": base64.b64encode(result.page.to_bytes()).decode("ascii"),
+            # 页面坐标为预处理（缩放、文档渲染）后的图片坐标，复用时 JSON 输出和原生 PDF 的图片模式按它映射回原图
+            "scale": result.scale,
+        }
+        if isinstance(image_path, DocumentPage):
+            entry.update(text_layer=result.text_layer)
+        self.entries[name] = entry
+        self._append(entry)
+        self.recorded += 1
+
+    def _header(self):
+        return {"version": MANIFEST_VERSION, "fingerprint": self.fingerprint}
+
+    def _append(self, entry):
+        if self._file is None:
+            is_new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0 or not self._has_valid_header()
+            if is_new:
+                # 配置指纹变化或首次运行：重新开始一个清单文件
+                with open(self.path, "w", encoding="utf-8") as f:
+                    f.write(json.dumps(self._header(), ensure_ascii=False) + "\n")
+            else:
+                self._terminate_partial_line()
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def _terminate_partial_line(self):
+        """中断时最后一行可能没有写完，先补上换行，避免新记录接在残缺行后面"""
+        with open(self.path, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+
+    def _has_valid_header(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            try:
+                header = json.loads(f.readline())
+            except json.JSONDecodeError:
+                return False
+        return header.get("fingerprint") == self.fingerprint and header.get("version") == MANIFEST_VERSION
+
+    def compact(self, present_image_paths):
+        """重写清单，只保留仍然存在的图片（去掉已删除图片和同一图片的历史记录）
+
+        Args:
+            present_image_paths: 本次运行的全部输入图片路径和文档页面
+        """
+        self.close()
+        present_names = {source_name(path) for path in present_image_paths}
+        removed = [name for name in self.entries if name not in present_names]
+        for name in removed:
+            del self.entries[name]
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(self._header(), ensure_ascii=False) + "\n")
+            for entry in self.entries.values():
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(temp_path, self.path)
+        if removed:
+            self.logger.info(f"Removed {len(removed)} deleted image(s) from manifest: {', '.join(removed[:10])}")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
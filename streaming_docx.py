@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+流式 DOCX 写入
+- 每张图片的内容先渲染到一个可复用的临时 python-docx 文档，再序列化为 <w:body> 下的 XML 片段，
+  立即追加到磁盘上的正文片段文件并刷新，内存占用不随图片数量增长
+- 关闭（或到达检查点）时把模板包的其他部件与正文片段流式写入 .docx，正文不会整体载入内存
+- 运行中断时正文片段文件保留在磁盘上，可用 recover_partial_docx 组装出已完成部分的文档
+- 可按每 N 张图片拆分为多个分卷文件
+"""
+import io
+import logging
+import os
+import zipfile
+from pathlib import Path
+
+from docx.oxml.ns import qn
+from lxml import etree
+
+DOCUMENT_PART = "word/document.xml"
+# 正文片段文件和片段结束位置索引文件的后缀
+BODY_SUFFIX = ".body.part"
+INDEX_SUFFIX = ".body.idx"
+
+
+def _template_parts(template_doc):
+    """把模板文档拆分为：包字节、document.xml 中正文之前/之后的 XML 文本"""
+    buffer = io.BytesIO()
+    template_doc.save(buffer)
+    package_bytes = buffer.getvalue()
+
+    with zipfile.ZipFile(io.BytesIO(package_bytes)) as package:
+        root = etree.fromstring(package.read(DOCUMENT_PART))
+    body = root.find(qn("w:body"))
+    sect_pr = body.find(qn("w:sectPr"))
+    for child in list(body):
+        body.remove(child)
+    # 用注释占位，序列化后在此处切分出正文前后两部分
+    body.append(etree.Comment("streaming-body"))
+    placeholder = "<!--streaming-body-->"
+    document_xml = etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True).decode("utf-8")
+    head, tail = document_xml.split(placeholder)
+    if sect_pr is not None:
+        tail = etree.tostring(sect_pr, encoding="unicode") + tail
+    return package_bytes, head, tail
+
+
+def _write_package(output_path, package_bytes, head, tail, body_path, body_length):
+    """用模板包的其他部件和磁盘上的正文片段组装 .docx（先写临时文件再原子替换）"""
+    temp_path = f"{output_path}.tmp"
+    with zipfile.ZipFile(io.BytesIO(package_bytes)) as template, \
+            zipfile.ZipFile(temp_path, "w", compression=zipfile.ZIP_DEFLATED) as package:
+        for item in template.infolist():
+            if item.filename != DOCUMENT_PART:
+                package.writestr(item, template.read(item.filename))
+        with package.open(DOCUMENT_PART, "w", force_zip64=True) as document_stream:
+            document_stream.write(head.encode("utf-8"))
+            if body_length:
+                with open(body_path, "rb") as body_file:
+                    remaining = body_length
+                    while remaining > 0:
+                        chunk = body_file.read(min(1024 * 1024, remaining))
+                        if not chunk:
+                            break
+                        document_stream.write(chunk)
+                        remaining -= len(chunk)
+            document_stream.write(tail.encode("utf-8"))
+    os.replace(temp_path, output_path)
+
+
+def _complete_body_length(body_path, index_path):
+    """返回正文片段文件中最后一个完整片段的结束位置（索引文件中最后一个有效偏移）"""
+    if not os.path.exists(index_path):
+        return 0
+    length = 0
+    with open(index_path, "r", encoding="ascii") as index_file:
+        for line in index_file:
+            line = line.strip()
+            if line.isdigit():
+                length = int(line)
+    body_size = os.path.getsize(body_path) if os.path.exists(body_path) else 0
+    return min(length, body_size)
+
+
+def recover_partial_docx(output_path, template_doc, recovered_path=None):
+    """把中断运行留下的正文片段组装为可打开的 .docx
+
+    Args:
+        output_path: 中断时正在写入的输出路径（片段文件为 output_path + BODY_SUFFIX）
+        template_doc: 与原运行相同的模板文档（create_document(config) 的结果）
+        recovered_path: 组装结果路径，为 None 时写入 output_path
+
+    Returns:
+        str or None: 组装出的文件路径；没有可恢复的片段时返回 None
+    """
+    body_path = f"{output_path}{BODY_SUFFIX}"
+    index_path = f"{output_path}{INDEX_SUFFIX}"
+    body_length = _complete_body_length(body_path, index_path)
+    if not body_length:
+        return None
+    package_bytes, head, tail = _template_parts(template_doc)
+    recovered_path = str(recovered_path or output_path)
+    _write_package(recovered_path, package_bytes, head, tail, body_path, body_length)
+    for path in (body_path, index_path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    return recovered_path
+
+
+class StreamingDocxWriter:
+    """逐节写入的 DOCX 写入器
+
+    用法：
+        writer = StreamingDocxWriter("out.docx", create_document(config))
+        doc = writer.begin_section()
+        doc.add_heading("Content from 1.jpg", level=1)
+        render_layout_elements(doc, "1.jpg", elements)
+        writer.end_section()
+        writer.close()
+    """
+
+    def __init__(self, output_path, template_doc, volume_size=0, checkpoint_every=0, page_breaks=True, logger=None):
+        """
+        Args:
+            output_path: 输出路径；分卷时为 <stem>_part001.docx、<stem>_part002.docx ...
+            template_doc: 模板文档（样式、字体、页面设置），正文内容会被忽略
+            volume_size: 每个分卷包含的节数（图片数），0 表示不分卷
+            checkpoint_every: 当前分卷写入 N、2N、4N……节时重新组装一次（中途也能打开），0 表示只在关闭时组装；
+                间隔按倍数增长，每次检查点都要重新压缩整个分卷，固定间隔会使总写入量随图片数平方增长
+            page_breaks: 同一分卷内相邻两节之间是否插入分页符
+            logger: 日志记录器
+        """
+        self.output_path = Path(output_path)
+        self.volume_size = max(0, int(volume_size or 0))
+        self.checkpoint_every = max(0, int(checkpoint_every or 0))
+        self.page_breaks = page_breaks
+        self.logger = logger or logging.getLogger("ocr_app")
+        self.paths = []  # 已开始写入的分卷路径
+        self.section_count = 0
+
+        self._package_bytes, self._head, self._tail = _template_parts(template_doc)
+        # 临时文档：每节渲染前清空正文，复用同一个对象避免反复解析模板
+        self._scratch = template_doc
+        self._scratch_body = template_doc.element.body
+        self._clear_scratch()
+        self._page_break = self._make_page_break(template_doc)
+
+        self._volume_path = None
+        self._volume_sections = 0
+        self._next_checkpoint = self.checkpoint_every
+        self._body_file = None
+        self._index_file = None
+        self._in_section = False
+
+    @staticmethod
+    def _make_page_break(template_doc):
+        """生成与 doc.add_page_break() 相同的分页段落 XML"""
+        paragraph = template_doc.add_page_break()
+        xml = etree.tostring(paragraph._p, encoding="unicode")
+        paragraph._p.getparent().remove(paragraph._p)
+        return xml
+
+    def _clear_scratch(self):
+        for child in list(self._scratch_body):
+            if child.tag != qn("w:sectPr"):
+                self._scratch_body.remove(child)
+
+    def _volume_file_path(self, volume_index):
+        if not self.volume_size:
+            return self.output_path
+        return self.output_path.with_name(f"{self.output_path.stem}_part{volume_index:03d}{self.output_path.suffix}")
+
+    def _open_volume(self):
+        self._volume_path = self._volume_file_path(len(self.paths) + 1)
+        self.paths.append(str(self._volume_path))
+        self._volume_sections = 0
+        self._next_checkpoint = self.checkpoint_every
+        # 以新建方式打开，覆盖同名的旧片段文件
+        self._body_file = open(f"{self._volume_path}{BODY_SUFFIX}", "wb")
+        self._index_file = open(f"{self._volume_path}{INDEX_SUFFIX}", "w", encoding="ascii")
+
+    def _finish_volume(self):
+        """组装当前分卷并删除片段文件"""
+        if self._body_file is None:
+            return
+        body_path = self._body_file.name
+        index_path = self._index_file.name
+        body_length = self._body_file.tell()
+        self._body_file.close()
+        self._index_file.close()
+        self._body_file = self._index_file = None
+        _write_package(str(self._volume_path), self._package_bytes, self._head, self._tail, body_path, body_length)
+        os.remove(body_path)
+        os.remove(index_path)
+        self.logger.info(f"Streaming DOCX volume saved as '{self._volume_path}' ({self._volume_sections} section(s))")
+
+    def begin_section(self):
+        """开始新的一节，返回清空后的临时文档，调用方向其中渲染本节内容"""
+        if self._in_section:
+            raise RuntimeError("上一节尚未调用 end_section()")
+        self._clear_scratch()
+        self._in_section = True
+        return self._scratch
+
+    def end_section(self):
+        """把临时文档中的本节内容序列化并追加到当前分卷的正文片段文件"""
+        if not self._in_section:
+            raise RuntimeError("没有进行中的节，请先调用 begin_section()")
+        self._in_section = False
+        if self._body_file is None or (self.volume_size and self._volume_sections >= self.volume_size):
+            self._finish_volume()
+            self._open_volume()
+
+        fragments = []
+        if self.page_breaks and self._volume_sections > 0:
+            fragments.append(self._page_break)
+        for child in self._scratch_body:
+            if child.tag != qn("w:sectPr"):
+                fragments.append(etree.tostring(child, encoding="unicode"))
+        self._clear_scratch()
+
+        self._body_file.write("".join(fragments).encode("utf-8"))
+        self._body_file.flush()
+        # 记录完整片段的结束位置，恢复时只使用完整写入的节
+        self._index_file.write(f"{self._body_file.tell()}\n")
+        self._index_file.flush()
+        self._volume_sections += 1
+        self.section_count += 1
+
+        if self.checkpoint_every and self._volume_sections >= self._next_checkpoint:
+            self.checkpoint()
+            self._next_checkpoint *= 2
+
+    def checkpoint(self):
+        """把当前分卷已写入的内容组装为 .docx（片段文件保留，继续追加）"""
+        if self._body_file is None:
+            return
+        _write_package(
+            str(self._volume_path), self._package_bytes, self._head, self._tail,
+            self._body_file.name, self._body_file.tell(),
+        )
+        self.logger.debug(f"Streaming DOCX checkpoint written to '{self._volume_path}' ({self._volume_sections} section(s))")
+
+    def close(self):
+        """组装最后一个分卷；没有写入任何节时生成一个空文档
+
+        Returns:
+            list: 全部分卷文件路径
+        """
+        if self._body_file is None and not self.paths:
+            self._open_volume()
+        self._finish_volume()
+        return list(self.paths)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # 出现异常时也组装已完成的节，保证输出可以打开
+        self._in_section = False
+        self.close()
+        return False
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+表格网格模型
+- TableGrid 描述一个表格的行数、列数和单元格（含跨行/跨列的合并单元格）
+- 由几何表格重建（table_reconstruction）、HTML 表格解析等来源生成，统一交给 Word 表格写入
+"""
+from dataclasses import dataclass, field
+from html import escape
+
+
+@dataclass
+class TableCell:
+    """表格中的一个（可能合并的）单元格，row/col 为左上角所在的行列"""
+
+    row: int
+    col: int
+    text: str = ""
+    rowspan: int = 1
+    colspan: int = 1
+
+
+@dataclass
+class TableGrid:
+    """表格网格：n_rows × n_cols，cells 按 (row, col) 排序，被合并单元格覆盖的位置没有单元格"""
+
+    n_rows: int
+    n_cols: int
+    cells: list = field(default_factory=list)
+    header_rows: int = 0  # 表头行数（从第一行开始、包含合并单元格的连续行）
+
+    def to_matrix(self):
+        """返回 n_rows × n_cols 的文字矩阵，合并单元格只在左上角位置有文字，被覆盖的位置为 None"""
+        matrix = [[""] * self.n_cols for _ in range(self.n_rows)]
+        for cell in self.cells:
+            for row in range(cell.row, min(cell.row + cell.rowspan, self.n_rows)):
+                for col in range(cell.col, min(cell.col + cell.colspan, self.n_cols)):
+                    matrix[row][col] = None
+            matrix[cell.row][cell.col] = cell.text
+        return matrix
+
+    def to_html(self):
+        """转换为 HTML 表格"""
+        rows = [[] for _ in range(self.n_rows)]
+        for cell in self.cells:
+            attributes = ""
+            if cell.rowspan > 1:
+                attributes += f' rowspan="{cell.rowspan}"'
+            if cell.colspan > 1:
+                attributes += f' colspan="{cell.colspan}"'
+            text = escape(cell.text).replace("\n", "<br>")
+            rows[cell.row].append(f"<td{attributes}>{text}</td>")
+        return "<table>" + "".join(f"<tr>{''.join(row)}</tr>" for row in rows) + "</table>"
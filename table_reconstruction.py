@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+基于几何位置的通用表格重建
+- 不依赖图片文件名或表格中的具体文字，只根据 OCR 文本框的位置把文本聚类为行和列
+- 行：按文本框中心点附近的纵向区间排序后合并重叠区间；列：用单元格最多的几行的横向区间合并得到列区间
+- 排序 + 累计最大值的区间合并和 searchsorted 列分配都是向量化的 O(n log n) 实现，数千个单元格只需几毫秒
+- 合并表头检测：横跨多个列区间（或居中落在两列之间空隙）的文本为跨列单元格；
+  夹在两行之间、与上下两行占用的列互不重叠的文本为跨行单元格
+"""
+import numpy as np
+
+from table_grid import TableCell, TableGrid
+
+# 行聚类时每个文本框取中心点上下 ROW_BAND × 高度的纵向区间，避免相邻两行因文本框相接而合并
+ROW_BAND = 0.3
+# 单元格数不少于最多单元格行的该比例时，该行参与列区间的计算
+FULL_ROW_RATIO = 0.75
+
+
+def merge_intervals(starts, ends):
+    """合并重叠的一维区间
+
+    Args:
+        starts: (N,) 区间起点
+        ends: (N,) 区间终点
+
+    Returns:
+        tuple: (每个区间所属组号 (N,), 各组起点 (G,), 各组终点 (G,))，组号按起点从小到大编号
+    """
+    order = np.argsort(starts, kind="stable")
+    sorted_starts = starts[order]
+    sorted_ends = ends[order]
+    # 按起点排序后，起点超过之前所有区间终点的最大值即开始新的一组
+    running_end = np.maximum.accumulate(sorted_ends)
+    breaks = np.ones(len(order), bool)
+    breaks[1:] = sorted_starts[1:] > running_end[:-1]
+    group_sorted = np.cumsum(breaks) - 1
+    groups = np.empty(len(order), np.int64)
+    groups[order] = group_sorted
+    first = np.flatnonzero(breaks)
+    return groups, sorted_starts[first], np.maximum.reduceat(sorted_ends, first)
+
+
+def _assign_columns(rects, col_starts, col_ends, sparse_rows):
+    """把文本框分配到列区间，返回每个文本框的起始列和结束列（含）"""
+    x1, x2 = rects[:, 0], rects[:, 2]
+    # 与文本框横向重叠的第一列和最后一列
+    first = np.searchsorted(col_ends, x1, side="right")
+    last = np.searchsorted(col_starts, x2, side="left") - 1
+    in_gap = first > last
+    if in_gap.any():
+        # 完全落在两列之间空隙中的文本框：稀疏行（如表头）中视为居中横跨左右两列，否则归入最近的列
+        left = np.clip(last, 0, len(col_starts) - 1)
+        right = np.clip(first, 0, len(col_starts) - 1)
+        centers = (x1 + x2) / 2
+        nearer_left = (centers - col_ends[left]) <= (col_starts[right] - centers)
+        spanning = in_gap & sparse_rows & (last >= 0) & (first < len(col_starts))
+        nearest = np.where(nearer_left, left, right)
+        first = np.where(in_gap, np.where(spanning, left, nearest), first)
+        last = np.where(in_gap, np.where(spanning, right, nearest), last)
+    return first, last
+
+
+def reconstruct_table(boxes, texts):
+    """根据文本框位置重建表格网格
+
+    Args:
+        boxes: (N, 4, 2) 文本框四点坐标（如 OCRPage.boxes 中某个表格区域内的行）
+        texts: 长度为 N 的文字列表
+
+    Returns:
+        TableGrid or None: 无法形成至少 2 行 2 列的表格时返回 None
+    """
+    boxes = np.asarray(boxes, np.float32).reshape(-1, 4, 2)
+    count = len(boxes)
+    if count < 4:
+        return None
+    rects = np.concatenate([boxes.min(axis=1), boxes.max(axis=1)], axis=1)
+    heights = np.maximum(rects[:, 3] - rects[:, 1], 1.0)
+    center_y = (rects[:, 1] + rects[:, 3]) / 2
+
+    # 1. 行聚类
+    rows, _, _ = merge_intervals(center_y - heights * ROW_BAND, center_y + heights * ROW_BAND)
+    n_rows = int(rows.max()) + 1
+    row_sizes = np.bincount(rows, minlength=n_rows)
+    max_size = int(row_sizes.max())
+    if n_rows < 2 or max_size < 2:
+        return None
+
+    # 2. 列区间：只用单元格较多的行计算，跨列的表头不会把相邻列合并
+    full_rows = row_sizes >= max(2, int(np.ceil(max_size * FULL_ROW_RATIO)))
+    in_full_row = full_rows[rows]
+    _, col_starts, col_ends = merge_intervals(rects[in_full_row, 0], rects[in_full_row, 2])
+    n_cols = len(col_starts)
+    if n_cols < 2:
+        return None
+    first, last = _assign_columns(rects, col_starts, col_ends, ~in_full_row)
+
+    # 3. 跨行单元格：某行占用的列与上下两行都不重叠，且上下两行的间距接近一个正常行距，
+    #    说明该行的文字是上下两行共用的合并单元格（文字垂直居中）
+    # 每行占用的列：差分数组标记列范围的起止，再沿列方向累加
+    span_marks = np.zeros((n_rows, n_cols + 1), np.int32)
+    np.add.at(span_marks, (rows, first), 1)
+    np.add.at(span_marks, (rows, last + 1), -1)
+    occupancy = np.cumsum(span_marks[:, :-1], axis=1) > 0
+    row_center = np.bincount(rows, weights=center_y, minlength=n_rows) / row_sizes
+    pitch = float(np.median(np.diff(row_center[full_rows]))) if full_rows.sum() > 1 else float(np.median(heights)) * 2
+    candidates = np.zeros(n_rows, bool)
+    if n_rows > 2:
+        candidates[1:-1] = (
+            ~(occupancy[1:-1] & occupancy[:-2]).any(axis=1)
+            & ~(occupancy[1:-1] & occupancy[2:]).any(axis=1)
+            & (row_center[2:] - row_center[:-2] < pitch * 1.5)
+        )
+    row_target = np.arange(n_rows)  # 每行合并后归入的行
+    rowspan_of_row = np.ones(n_rows, np.int64)
+    for row in np.flatnonzero(candidates).tolist():
+        # 上一行已经并入更上面的行时不再合并（避免连续三行串成一个单元格）
+        if row_target[row - 1] == row - 1:
+            row_target[row] = row - 1
+            rowspan_of_row[row] = 2
+    kept_rows = np.flatnonzero(row_target == np.arange(n_rows))
+    new_index = np.full(n_rows, -1, np.int64)
+    new_index[kept_rows] = np.arange(len(kept_rows))
+    cell_rows = new_index[row_target[rows]]
+    cell_rowspans = rowspan_of_row[rows]
+
+    # 4. 组装单元格：同一行内列范围重叠的文本合并为一个单元格（文字按从上到下、从左到右连接）
+    order = np.lexsort((rects[:, 0], rects[:, 1], first, cell_rows))
+    sorted_rows, sorted_first, sorted_last = cell_rows[order], first[order], last[order]
+    # 行内列范围的累计最大值：加上行号偏移后做全局累计最大值，行号递增保证不会跨行
+    row_offset = sorted_rows * (n_cols + 1)
+    running_last = np.maximum.accumulate(row_offset + sorted_last) - row_offset
+    starts = np.ones(len(order), bool)
+    starts[1:] = (sorted_rows[1:] != sorted_rows[:-1]) | (sorted_first[1:] > running_last[:-1])
+    cell_starts = np.flatnonzero(starts)
+    cell_ends = np.append(cell_starts[1:], len(order))
+    cell_last = np.maximum.reduceat(sorted_last, cell_starts)
+    cell_rowspan = np.maximum.reduceat(cell_rowspans[order], cell_starts)
+
+    n_grid_rows = len(kept_rows)
+    if n_grid_rows < 2:
+        return None
+    order_list = order.tolist()
+    table_cells = []
+    for start, end, row, col, col_end, rowspan in zip(
+        cell_starts.tolist(), cell_ends.tolist(), sorted_rows[cell_starts].tolist(),
+        sorted_first[cell_starts].tolist(), cell_last.tolist(), cell_rowspan.tolist(),
+    ):
+        text = texts[order_list[start]] if end - start == 1 else "\n".join(texts[i] for i in order_list[start:end])
+        table_cells.append(TableCell(row, col, text, min(rowspan, n_grid_rows - row), col_end - col + 1))
+    header_rows = 0
+    merged_rows = {cell.row for cell in table_cells if cell.rowspan > 1 or cell.colspan > 1}
+    # 表头：从第一行开始连续包含合并单元格的行，以及跨行单元格覆盖到的行
+    while header_rows in merged_rows:
+        header_rows = max(
+            [header_rows + 1] + [cell.row + cell.rowspan for cell in table_cells if cell.row == header_rows]
+        )
+    return TableGrid(n_rows=n_grid_rows, n_cols=n_cols, cells=table_cells, header_rows=header_rows)
+
+
+def reconstruct_page_table(page, block_index=None):
+    """用 OCRPage 中的文本行重建表格
+
+    Args:
+        page: OCRPage
+        block_index: 表格元素在 page.blocks 中的下标，只使用该表格区域内的文本行；为 None 时使用整页
+
+    Returns:
+        TableGrid or None
+    """
+    if block_index is None:
+        indices = np.arange(len(page))
+    else:
+        indices = np.flatnonzero(page.table_index == block_index)
+    return reconstruct_table(page.boxes[indices], [page.texts[i] for i in indices.tolist()])
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+版面分析门控的表格识别
+- 先用 models/layout_model 做版面分析，只有被分类为表格的区域才进入表格结构识别
+- 表格区域再经过一次廉价的 NumPy 表格线检查（至少两条贯穿区域的横线或竖线），排除误检
+- 通过检查的区域送入 models/table_model_ch，输出的 HTML 由 add_table_from_html_to_docx 还原为 Word 表格；
+  table_engine 为 geometry 时不运行表格模型，由渲染阶段按文本框位置重建表格（table_reconstruction）
+- 没有表格区域的纯文本页面完全不调用表格模型
+- 落在表格区域内的文本行归入对应的表格元素（"lines"），其余文本行按原顺序保留
+"""
+import importlib.util
+import logging
+import time
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+from ocr_backends import resolve_model_dirs
+from ocr_cache import DEFAULT_MODEL_ROOT
+
+TABLE_LABEL = "table"
+
+
+def _count_runs(mask):
+    """统计一维布尔数组中连续 True 段的数量"""
+    if mask.size == 0:
+        return 0
+    return int(mask[0]) + int(np.count_nonzero(np.diff(mask.astype(np.int8)) == 1))
+
+
+def count_ruling_lines(image, min_length_ratio=0.5, dark_threshold=128):
+    """统计图片中贯穿大部分宽度/高度的横线和竖线数量
+
+    相邻 3 行（列）按位或后再统计深色像素比例，容忍轻微倾斜和断续的表格线。
+
+    Args:
+        image: BGR 或灰度 NumPy 数组
+        min_length_ratio: 一行（列）中深色像素占比达到该值才算作表格线
+        dark_threshold: 灰度低于该值的像素视为深色
+
+    Returns:
+        tuple: (横线数量, 竖线数量)
+    """
+    if image.ndim == 3:
+        # 取三个通道的最小值近似灰度，避免浮点运算
+        gray = image.min(axis=2)
+    else:
+        gray = image
+    dark = gray < dark_threshold
+    if dark.shape[0] < 3 or dark.shape[1] < 3:
+        return 0, 0
+    rows = dark[:-2] | dark[1:-1] | dark[2:]
+    cols = dark[:, :-2] | dark[:, 1:-1] | dark[:, 2:]
+    horizontal = _count_runs(rows.mean(axis=1) >= min_length_ratio)
+    vertical = _count_runs(cols.mean(axis=0) >= min_length_ratio)
+    return horizontal, vertical
+
+
+def has_ruling_lines(image, min_lines=2, **kwargs):
+    """区域内是否有表格线（横线或竖线至少 min_lines 条，三线表只有横线）"""
+    horizontal, vertical = count_ruling_lines(image, **kwargs)
+    return horizontal >= min_lines or vertical >= min_lines
+
+
+def merge_table_regions(lines, tables):
+    """把中心点落在表格区域内的文本行归入表格元素，表格元素放在其第一行文本的位置
+
+    Args:
+        lines: OCR 文本行 [[box, (text, score)], ...]（已按阅读顺序排列）
+        tables: detect_tables 返回的表格元素
+
+    Returns:
+        list: 版面元素（文本行和表格元素）
+    """
+    if not tables:
+        return lines
+    bboxes = np.array([table["bbox"] for table in tables], dtype=np.float32)
+    if lines:
+        centers = np.array([line[0] for line in lines], dtype=np.float32).mean(axis=1)
+        inside = (
+            (centers[:, None, 0] >= bboxes[None, :, 0]) & (centers[:, None, 0] <= bboxes[None, :, 2])
+            & (centers[:, None, 1] >= bboxes[None, :, 1]) & (centers[:, None, 1] <= bboxes[None, :, 3])
+        )
+        owners = np.where(inside.any(axis=1), inside.argmax(axis=1), -1)
+    else:
+        owners = np.empty(0, dtype=np.int64)
+
+    elements = []
+    placed = set()
+    for line, owner in zip(lines, owners.tolist()):
+        if owner < 0:
+            elements.append(line)
+            continue
+        tables[owner]["lines"].append(line)
+        if owner not in placed:
+            placed.add(owner)
+            elements.append(tables[owner])
+    # 区域内没有文本行的表格按顶部坐标插入
+    for index, table in enumerate(tables):
+        if index in placed:
+            continue
+        top = table["bbox"][1]
+        position = next(
+            (i for i, element in enumerate(elements)
+             if not isinstance(element, dict) and min(point[1] for point in element[0]) > top),
+            len(elements),
+        )
+        elements.insert(position, table)
+    return elements
+
+
+class TableStructureAnalyzer:
+    """版面分析 + 表格结构识别（PP-Structure 的版面和表格预测器，首次使用时加载）"""
+
+    def __init__(self, config=None, logger=None, model_root=DEFAULT_MODEL_ROOT):
+        """
+        Args:
+            config: 配置字典（table_layout_score、table_require_ruling_lines 等）
+            logger: 日志记录器
+            model_root: 模型根目录
+        """
+        self.config = config or {}
+        self.logger = logger or logging.getLogger("ocr_app")
+        self.model_root = Path(model_root)
+        # 影响识别结果的参数，参与缓存键的计算
+        self.options = {
+            "layout_score": float(self.config.get("table_layout_score", 0.5)),
+            "require_ruling_lines": bool(self.config.get("table_require_ruling_lines", True)),
+            # model：表格模型输出 HTML 结构；geometry：只标记表格区域，按文本框位置重建
+            "engine": self.config.get("table_engine", "model"),
+        }
+        if self.options["engine"] not in ("model", "geometry"):
+            raise ValueError(f"未知的表格识别方式 '{self.options['engine']}'，可选: model, geometry")
+        self.stats = {
+            "pages": 0,
+            "pages_with_table_regions": 0,
+            "table_regions": 0,
+            "ruling_rejected": 0,
+            "tables": 0,
+            "layout_seconds": 0.0,
+            "table_seconds": 0.0,
+        }
+        self._structure = None
+        self._load_error = None  # 模型加载失败的错误信息，之后不再重试
+
+    def _layout_dict_path(self, layout_dir):
+        """在 PaddleOCR 自带的版面标签字典中找到与 layout_model/infer_cfg.yml 的 label_list 一致的那个"""
+        config_path = Path(layout_dir) / "infer_cfg.yml"
+        if not config_path.exists():
+            return None
+        with open(config_path, "r", encoding="utf-8") as f:
+            labels = (yaml.safe_load(f) or {}).get("label_list")
+        spec = importlib.util.find_spec("paddleocr")
+        if not labels or spec is None or not spec.origin:
+            return None
+        dict_dir = Path(spec.origin).parent / "ppocr" / "utils" / "dict" / "layout_dict"
+        for path in sorted(dict_dir.glob("*.txt")):
+            if path.read_text(encoding="utf-8").split() == labels:
+                return str(path)
+        self.logger.warning(f"No PaddleOCR layout dictionary matches labels {labels}, using the default one.")
+        return None
+
+    def _create_structure(self):
+        from paddleocr import PPStructure
+
+        model_dirs = resolve_model_dirs(self.config, self.model_root)
+        missing = [kind for kind in ("layout", "table") if model_dirs[kind] is None]
+        if missing:
+            raise RuntimeError(f"缺少 {', '.join(missing)} 模型目录（{self.model_root}），无法进行表格识别")
+        options = {
+            "layout_model_dir": str(model_dirs["layout"]),
+            "table_model_dir": str(model_dirs["table"]),
+        }
+        layout_dict_path = self._layout_dict_path(model_dirs["layout"])
+        if layout_dict_path:
+            options["layout_dict_path"] = layout_dict_path
+        # 表格预测器内部用于单元格文字识别的检测/识别模型同样使用本地模型
+        for kind in ("det", "rec"):
+            if model_dirs[kind] is not None:
+                options[f"{kind}_model_dir"] = str(model_dirs[kind])
+        self.logger.info(f"Initializing layout and table models: {options}")
+        start_time = time.perf_counter()
+        structure = PPStructure(
+            layout=True,
+            table=True,
+            ocr=False,
+            lang=self.config.get("ocr_lang", "ch"),
+            use_gpu=False,
+            show_log=False,
+            **options,
+        )
+        self.logger.info(f"Layout and table models initialized ({time.perf_counter() - start_time:.2f}s).")
+        return structure
+
+    @property
+    def structure(self):
+        """PP-Structure 实例（只使用其中的 layout_predictor 和 table_system），首次访问时创建"""
+        if self._structure is None:
+            self._structure = self._create_structure()
+        return self._structure
+
+    def detect_tables(self, image):
+        """识别图片中的表格
+
+        Args:
+            image: BGR NumPy 数组（与文本行识别使用同一张预处理后的图片，坐标一致）
+
+        Returns:
+            list: 表格元素 {"type": "table", "bbox": [x1, y1, x2, y2], "score": float, "res": {"html": str}, "lines": []}
+                  （几何重建模式或表格模型没有输出结构时 res 为空字典）
+
+        Raises:
+            RuntimeError: 版面/表格模型加载失败（只尝试加载一次，之后每页都抛出同样的错误）
+        """
+        if self._load_error is not None:
+            raise RuntimeError(self._load_error)
+        try:
+            structure = self.structure
+        except Exception as e:
+            self._load_error = f"版面/表格模型加载失败: {e}"
+            self.logger.error(f"Table recognition disabled, could not load layout/table models: {e}", exc_info=True)
+            raise RuntimeError(self._load_error) from e
+
+        self.stats["pages"] += 1
+        start_time = time.perf_counter()
+        layout_regions, _ = structure.layout_predictor(image)
+        self.stats["layout_seconds"] += time.perf_counter() - start_time
+
+        height, width = image.shape[:2]
+        tables = []
+        for region in layout_regions:
+            if region.get("label") != TABLE_LABEL or region.get("score", 1.0) < self.options["layout_score"]:
+                continue
+            x1, y1, x2, y2 = (int(round(value)) for value in region["bbox"])
+            x1, y1 = max(0, x1), max(0, y1)
+            x2, y2 = min(width, x2), min(height, y2)
+            if x2 - x1 < 8 or y2 - y1 < 8:
+                continue
+            self.stats["table_regions"] += 1
+            region_image = image[y1:y2, x1:x2]
+            if self.options["require_ruling_lines"] and not has_ruling_lines(region_image):
+                self.stats["ruling_rejected"] += 1
+                self.logger.debug(f"Table region {[x1, y1, x2, y2]} has no ruling lines, kept as text")
+                continue
+            res = {}
+            if self.options["engine"] == "model":
+                start_time = time.perf_counter()
+                table_result, _ = structure.table_system(region_image)
+                self.stats["table_seconds"] += time.perf_counter() - start_time
+                html = (table_result or {}).get("html")
+                if html:
+                    res["html"] = html
+            tables.append({
+                "type": TABLE_LABEL,
+                "bbox": [x1, y1, x2, y2],
+                "score": float(region.get("score", 1.0)),
+                "res": res,
+                "lines": [],
+            })
+        if any(region.get("label") == TABLE_LABEL for region in layout_regions):
+            self.stats["pages_with_table_regions"] += 1
+        self.stats["tables"] += len(tables)
+        return tables
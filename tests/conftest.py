@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+测试公共部分
+- 项目根目录加入 sys.path（命令行脚本和引擎模块都在根目录）
+- FakeOCR：替代 PaddleOCR 实例，检测、方向分类和识别结果都由测试指定，不需要安装 paddle 和模型文件
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+
+class FakeClassifier:
+    """方向分类器：labels 为每行的方向标签（"0" / "180"），默认全部正向"""
+
+    cls_thresh = 0.9
+
+    def __init__(self):
+        self.labels = None
+        self.calls = 0
+
+    def __call__(self, images):
+        self.calls += 1
+        labels = self.labels or ["0"] * len(images)
+        return images, [(labels[index % len(labels)], 0.99) for index in range(len(images))], 0.0
+
+
+class FakeOCR:
+    """与 PaddleOCR 接口相同的 OCR 替身
+
+    Args:
+        boxes: text_detector 返回的检测框（4 个点），默认一行横向文本
+        text: 每行的识别文字
+        fail: 为异常实例时识别阶段抛出该异常
+    """
+
+    drop_score = 0.5
+
+    def __init__(self, boxes=None, text="hello", score=0.95, fail=None):
+        self.boxes = boxes if boxes is not None else [[[10, 10], [300, 10], [300, 40], [10, 40]]]
+        self.text = text
+        self.score = score
+        self.fail = fail
+        self.text_classifier = FakeClassifier()
+
+    def text_detector(self, image):
+        return np.asarray(self.boxes, dtype=np.float32), 0.0
+
+    def text_recognizer(self, images):
+        if self.fail is not None:
+            raise self.fail
+        return [(self.text, self.score)] * len(images), 0.0
+
+    def ocr(self, image, cls=True):
+        if self.fail is not None:
+            raise self.fail
+        return [[[np.asarray(box).tolist(), (self.text, self.score)] for box in self.boxes]]
+
+
+def write_jpeg(path, size=(320, 64), orientation=None):
+    """生成一张白底黑条的 JPEG 图片，orientation 不为 None 时写入 EXIF 方向标记"""
+    from PIL import Image
+
+    image = Image.new("RGB", size, "white")
+    image.paste((0, 0, 0), (16, size[1] // 3, size[0] - 16, 2 * size[1] // 3))
+    exif = Image.Exif()
+    if orientation is not None:
+        exif[0x0112] = orientation
+    image.save(path, "JPEG", exif=exif)
+    return str(path)
+
+
+@pytest.fixture
+def fake_ocr():
+    return FakeOCR()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+import queue
+
+import docx
+import pytest
+import yaml
+
+import extract_text_from_images
+import ocr_worker_pool
+from conftest import FakeOCR, write_jpeg
+from extraction_engine import ExtractionEngine
+
+
+class WideImageFailOCR(FakeOCR):
+    """宽度超过 400 像素的图片在识别时抛出 failure（为 None 时不抛出），其余图片正常识别"""
+
+    failure = RuntimeError("recognizer crashed")
+
+    def ocr(self, image, cls=True):
+        if self.failure is not None and image.shape[1] > 400:
+            raise self.failure
+        return super().ocr(image, cls)
+
+
+class InProcessWorkerPool(ocr_worker_pool.OCRWorkerPool):
+    """在当前进程中执行工作进程的初始化和任务函数，不启动子进程也不需要 paddle"""
+
+    def start(self):
+        ocr_worker_pool._init_worker(self.config_path, False, queue.Queue(), self.config_overrides)
+        self._pool = True
+
+    def iter_process(self, sources):
+        if self._pool is None:
+            self.start()
+        for source in sources:
+            yield ocr_worker_pool._worker_process(source)
+
+    def close(self):
+        self._pool = None
+
+    terminate = close
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """临时项目目录：config.yaml、his_pic/ 输入目录，OCR 模型替换为 WideImageFailOCR"""
+    (tmp_path / "his_pic").mkdir()
+    config = {
+        "input_directory": "his_pic",
+        "output_filename": "extracted_text.docx",
+        "log_file": "app.log",
+        "ocr_cache_enabled": False,
+    }
+    (tmp_path / "config.yaml").write_text(yaml.safe_dump(config), encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ExtractionEngine, "_create_ocr", lambda self: WideImageFailOCR())
+    monkeypatch.setattr(ocr_worker_pool, "OCRWorkerPool", InProcessWorkerPool)
+    return tmp_path
+
+
+def test_worker_mode_counts_ocr_failures(project):
+    write_jpeg(project / "his_pic" / "1.jpg")
+    write_jpeg(project / "his_pic" / "2.jpg", size=(480, 64))
+    write_jpeg(project / "his_pic" / "3.jpg", size=(480, 64))
+    extract_text_from_images.main(output_format_arg="txt", workers_arg=2)
+
+    log = (project / "app.log").read_text(encoding="utf-8")
+    assert "2 process(es)" in log
+    assert "2 image(s) failed" in log
+    assert "2.jpg: recognizer crashed" in log
+    assert "3.jpg: recognizer crashed" in log
+    assert "1.jpg: recognizer crashed" not in log
+
+
+def test_interrupted_streaming_run_leaves_readable_docx(project, monkeypatch):
+    monkeypatch.setattr(WideImageFailOCR, "failure", KeyboardInterrupt())
+    write_jpeg(project / "his_pic" / "1.jpg")
+    write_jpeg(project / "his_pic" / "2.jpg")
+    write_jpeg(project / "his_pic" / "3.jpg", size=(480, 64))
+    extract_text_from_images.main(output_format_arg="docx", stream_arg=True)
+
+    document = docx.Document(str(project / "extracted_text.docx"))
+    headings = [paragraph.text for paragraph in document.paragraphs if paragraph.text.startswith("Content from")]
+    assert headings == ["Content from 1.jpg", "Content from 2.jpg"]
+    assert not list(project.glob("*.body.part"))
+
+
+def test_failed_image_is_retried_on_next_incremental_run(project, monkeypatch):
+    write_jpeg(project / "his_pic" / "1.jpg")
+    write_jpeg(project / "his_pic" / "2.jpg", size=(480, 64))
+    extract_text_from_images.main(output_format_arg="txt", incremental_arg=True)
+    log = (project / "app.log").read_text(encoding="utf-8")
+    assert "1 image(s) failed" in log
+    assert "Manifest: 0 image(s) reused, 1 newly recorded" in log
+
+    monkeypatch.setattr(WideImageFailOCR, "failure", None)
+    extract_text_from_images.main(output_format_arg="txt", incremental_arg=True)
+    log = (project / "app.log").read_text(encoding="utf-8")
+    assert "1 unchanged image(s) reused, 1 new or changed image(s) to recognize" in log
+    assert "Manifest: 1 image(s) reused, 1 newly recorded" in log
+    assert (project / "extracted_text.txt").read_text(encoding="utf-8").count("hello") == 2
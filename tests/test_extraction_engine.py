@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+import os
+import threading
+import time
+
+import pytest
+
+from conftest import FakeOCR, write_jpeg
+from extraction_engine import ExtractionEngine
+
+
+def make_engine(tmp_path, ocr, cache=True, **config):
+    """使用 OCR 替身的引擎，缓存目录位于测试的临时目录"""
+    return ExtractionEngine({"ocr_cache_enabled": cache, "ocr_cache_dir": str(tmp_path / "ocr_cache"), **config}, ocr_instance=ocr)
+
+
+@pytest.mark.parametrize("cache", [True, False])
+def test_corrupt_image_is_reported_as_failed(tmp_path, cache):
+    path = tmp_path / "broken.jpg"
+    path.write_bytes(b"\xff\xd8\xff\xe0 not really a jpeg")
+    result = make_engine(tmp_path, FakeOCR(), cache).process(str(path))
+    assert not result.ok
+    assert result.error
+
+
+@pytest.mark.parametrize("cache", [True, False])
+def test_ocr_error_is_reported_and_not_cached(tmp_path, cache):
+    path = write_jpeg(tmp_path / "1.jpg")
+    ocr = FakeOCR(fail=RuntimeError("recognizer crashed"))
+    engine = make_engine(tmp_path, ocr, cache)
+    result = engine.process(path)
+    assert not result.ok
+    assert "recognizer crashed" in result.error
+    assert len(result.page) == 0
+
+    # 故障排除后重新识别，而不是取出缓存的空结果
+    ocr.fail = None
+    result = engine.process(path)
+    assert result.ok
+    assert result.page.texts == ["hello"]
+
+
+def test_extract_page_returns_empty_page_on_error(tmp_path):
+    engine = make_engine(tmp_path, FakeOCR(fail=RuntimeError("boom")), cache=False)
+    assert len(engine.extract_page(write_jpeg(tmp_path / "1.jpg"))) == 0
+
+
+class SizeRecordingOCR(FakeOCR):
+    """记录 ocr() 收到的每个图块的尺寸"""
+
+    def __init__(self):
+        super().__init__()
+        self.shapes = []
+
+    def ocr(self, image, cls=True):
+        self.shapes.append(image.shape[:2])
+        return super().ocr(image, cls)
+
+
+def test_large_scan_is_tiled_at_full_resolution(tmp_path):
+    path = write_jpeg(tmp_path / "scan.jpg", size=(5000, 1200))
+    ocr = SizeRecordingOCR()
+    engine = make_engine(tmp_path, ocr, cache=False, preprocess_profile="balanced", ocr_tiling=True, tile_trigger_side=4000, tile_size=1600, tile_overlap=200)
+    result = engine.process(path)
+    assert result.ok
+    assert result.scale == 1.0
+    assert len(ocr.shapes) > 1
+    assert all(max(shape) <= 1600 for shape in ocr.shapes)
+
+
+def test_profile_still_downscales_below_tiling_threshold(tmp_path):
+    path = write_jpeg(tmp_path / "photo.jpg", size=(3000, 800))
+    ocr = SizeRecordingOCR()
+    engine = make_engine(tmp_path, ocr, cache=False, preprocess_profile="balanced", ocr_tiling=True, tile_trigger_side=4000)
+    engine.process(path)
+    assert ocr.shapes == [(640, 2400)]
+
+
+@pytest.mark.parametrize("orientation", [None, 1, 3])
+def test_upside_down_page_runs_angle_classifier_despite_exif(tmp_path, orientation):
+    path = write_jpeg(tmp_path / "1.jpg", orientation=orientation)
+    ocr = FakeOCR()
+    ocr.text_classifier.labels = ["180"]
+    engine = make_engine(tmp_path, ocr, cache=False, angle_cls_mode="adaptive")
+    result = engine.process(path)
+    assert result.ok
+    assert ocr.text_classifier.calls >= 1
+    assert engine.orientation_stats["cls_skipped_pages"] == 0
+
+
+class FlakyTableAnalyzer:
+    """第一次调用时抛出异常（模拟版面模型的临时故障），之后正常返回没有表格"""
+
+    options = {}
+
+    def __init__(self):
+        self.calls = 0
+
+    def detect_tables(self, image):
+        self.calls += 1
+        if self.calls == 1:
+            raise RuntimeError("layout model crashed")
+        return []
+
+
+@pytest.mark.parametrize("batched", [False, True])
+def test_table_failure_keeps_text_but_is_not_cached(tmp_path, batched):
+    path = write_jpeg(tmp_path / "1.jpg")
+    engine = make_engine(tmp_path, FakeOCR())
+    engine.table_analyzer = FlakyTableAnalyzer()
+    run = engine.iter_results_batched if batched else engine.iter_results
+    result = next(run([path]))
+    assert not result.ok
+    assert "layout model crashed" in result.error
+    assert result.page.texts == ["hello"]
+
+    result = next(run([path]))
+    assert result.ok
+    assert engine.table_analyzer.calls == 2
+    assert engine.cache.stats()["hits"] == 0
+
+
+def test_tiling_is_off_by_default(tmp_path):
+    path = write_jpeg(tmp_path / "photo.jpg", size=(5000, 1200))
+    ocr = SizeRecordingOCR()
+    make_engine(tmp_path, ocr, cache=False, preprocess_profile="balanced").process(path)
+    assert ocr.shapes == [(576, 2400)]
+
+
+class ConcurrencyRecordingOCR(FakeOCR):
+    """记录同时进入 ocr() 的调用数，PaddleOCR 预测器不允许并发推理"""
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+
+    def ocr(self, image, cls=True):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.005)
+        with self._lock:
+            self.active -= 1
+        return super().ocr(image, cls)
+
+
+def test_engine_can_be_shared_between_threads(tmp_path):
+    ocr = ConcurrencyRecordingOCR()
+    engine = make_engine(tmp_path, ocr, cache=False)
+    paths = [write_jpeg(tmp_path / f"{index}.jpg") for index in range(8)]
+    errors = []
+
+    def convert(chunk):
+        try:
+            for path in chunk:
+                result = engine.image_to_outputs(path, {"txt": path + ".txt", "docx": path + ".docx"})
+                assert result.ok, result.error
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=convert, args=(paths[offset::2],)) for offset in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert ocr.max_active == 1
+    for path in paths:
+        assert "hello" in open(path + ".txt", encoding="utf-8").read()
+        assert os.path.getsize(path + ".docx") > 0
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from concurrent.futures import ThreadPoolExecutor
+
+import html_table_parser
+import metrics
+from html_table_parser import parse_html_table
+
+TABLE_HTML = (
+    "<html><body><table><thead><tr><th colspan='2'>项目</th></tr></thead>"
+    "<tr><td rowspan='2'>a</td><td>b</td></tr><tr><td>c</td></tr></table></body></html>"
+)
+
+
+def test_parse_spans():
+    grid = parse_html_table(TABLE_HTML)
+    assert (grid.n_rows, grid.n_cols, grid.header_rows) == (3, 2, 1)
+    assert [(cell.row, cell.col, cell.text, cell.rowspan, cell.colspan) for cell in grid.cells] == [
+        (0, 0, "项目", 1, 2), (1, 0, "a", 2, 1), (1, 1, "b", 1, 1), (2, 1, "c", 1, 1),
+    ]
+
+
+def test_parse_is_stateless_and_counted_in_metrics():
+    assert not hasattr(html_table_parser, "parse_stats")
+    before = sum(count for count, _ in metrics.registry.stage_totals("html_table_parse").values())
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        grids = list(executor.map(parse_html_table, [TABLE_HTML] * 40))
+    assert all(grid.n_rows == 3 for grid in grids)
+    after = sum(count for count, _ in metrics.registry.stage_totals("html_table_parse").values())
+    assert after - before == 40
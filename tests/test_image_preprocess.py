@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+import metrics
+from conftest import FakeOCR, write_jpeg
+from extraction_engine import ExtractionEngine
+from image_preprocess import preprocess_image
+
+
+def test_skew_angle_is_kept_out_of_timings(tmp_path):
+    path = write_jpeg(tmp_path / "1.jpg", size=(640, 200))
+    prepared = preprocess_image(path, "accurate")
+    assert isinstance(prepared.skew_angle, float)
+    assert "deskew_ms" in prepared.timings
+    assert all(key.endswith("_ms") for key in prepared.timings)
+    assert preprocess_image(path, "original").skew_angle is None
+
+
+def test_prepare_image_records_only_durations_as_stages(tmp_path):
+    path = write_jpeg(tmp_path / "1.jpg", size=(640, 200))
+    engine = ExtractionEngine({"ocr_cache_enabled": False, "preprocess_profile": "accurate"}, ocr_instance=FakeOCR())
+    engine.prepare_image(path)
+    assert metrics.registry.stage_totals("deskew")
+    assert not metrics.registry.stage_totals("skew_angle")
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+import json
+
+from metrics import MetricsRegistry
+
+
+def test_snapshot_from_another_process_is_merged_with_worker_label():
+    worker = MetricsRegistry()
+    worker.gauge("models_warm", "Models loaded.", callback=lambda: {(("mode", "pool"),): 1})
+    worker.set_gauge("ocr_queue_depth", 3)
+    worker.record_stage("detect", 0.02)
+    worker.gauge("conversion_jobs", "Jobs.", callback=lambda: 7)
+    # 快照经过 JSON 文件在进程之间传递
+    snapshot = json.loads(json.dumps(worker.snapshot(exclude=("conversion_jobs",))))
+
+    web = MetricsRegistry()
+    web.histogram("stage_seconds", "Stage time.")
+    web.set_gauge("ocr_queue_depth", 0)
+    web.record_stage("detect", 0.2)
+    text = web.render_prometheus(snapshots=[({"worker": "host:1"}, snapshot)])
+
+    assert text.count("# TYPE extractdoc_ocr_queue_depth gauge") == 1
+    assert "extractdoc_ocr_queue_depth 0" in text
+    assert 'extractdoc_ocr_queue_depth{worker="host:1"} 3' in text
+    assert 'extractdoc_models_warm{mode="pool",worker="host:1"} 1' in text
+    assert 'extractdoc_stage_seconds_count{stage="detect"} 1' in text
+    assert 'extractdoc_stage_seconds_count{stage="detect",worker="host:1"} 1' in text
+    assert 'extractdoc_stage_seconds_bucket{stage="detect",worker="host:1",le="0.025"} 1' in text
+    assert "conversion_jobs" not in text
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+import ocr_backends
+from extraction_engine import ExtractionEngine
+from ocr_backends import OnnxBackend, PaddleBackend, onnx_model_path
+
+
+@pytest.fixture
+def onnx_root(tmp_path, monkeypatch):
+    """只有检测和识别 ONNX 模型的模型目录，onnxruntime 视为已安装，PaddleOCR 的创建被替换为记录参数"""
+    for kind in ("det", "rec"):
+        path = onnx_model_path(kind, tmp_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"onnx")
+    monkeypatch.setattr(ocr_backends.importlib.util, "find_spec", lambda name: object())
+    created = []
+    monkeypatch.setattr(PaddleBackend, "create", lambda self, options: created.append(dict(options)) or options)
+    return tmp_path, created
+
+
+def test_onnx_backend_runs_without_cls_model(onnx_root):
+    model_root, created = onnx_root
+    options = {"lang": "ch", "use_angle_cls": True}
+    OnnxBackend(model_root=model_root).create(options)
+    assert created == [{"lang": "ch", "use_angle_cls": False}]
+    assert options["use_angle_cls"] is True
+
+
+def test_engine_fingerprint_reflects_onnx_cls_fallback():
+    # 项目自带的 models/ 没有 ONNX 方向分类模型：指纹在创建 OCR 实例之前就应记录关闭的方向分类
+    engine = ExtractionEngine({"ocr_backend": "onnx", "ocr_cache_enabled": False})
+    assert engine.ocr_options["use_angle_cls"] is False
+    assert json.loads(engine.fingerprint)["options"]["use_angle_cls"] is False
+
+
+def test_onnx_backend_requires_det_and_rec(onnx_root):
+    model_root, _ = onnx_root
+    onnx_model_path("rec", model_root).unlink()
+    with pytest.raises(RuntimeError, match="rec_model_ch"):
+        OnnxBackend(model_root=model_root).create({"lang": "ch", "use_angle_cls": False})
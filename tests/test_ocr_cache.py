@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+from ocr_cache import OCRResultCache
+
+
+def test_overwrite_does_not_inflate_total_bytes(tmp_path):
+    cache = OCRResultCache(tmp_path, max_bytes=1024 * 1024)
+    cache.put("a", "x" * 100)
+    total = cache._total_bytes
+    cache.put("a", "x" * 100)
+    cache.put("a", "x" * 100)
+    assert cache._total_bytes == total == cache._scan_total_bytes()
+
+
+def test_waiter_retries_after_failed_owner_without_second_miss(tmp_path):
+    cache = OCRResultCache(tmp_path, max_bytes=1024 * 1024)
+    owner_started = threading.Event()
+    release_owner = threading.Event()
+
+    def failing_compute():
+        owner_started.set()
+        release_owner.wait()
+        return None
+
+    results = {}
+    owner = threading.Thread(target=lambda: results.setdefault("owner", cache.get_or_compute("k", failing_compute)))
+    owner.start()
+    owner_started.wait()
+    waiter = threading.Thread(target=lambda: results.setdefault("waiter", cache.get_or_compute("k", lambda: "value")))
+    waiter.start()
+    while cache.stats()["misses"] < 2:
+        time.sleep(0.01)
+    release_owner.set()
+    owner.join()
+    waiter.join()
+
+    assert results["owner"] == (None, False)
+    assert results["waiter"] == ("value", False)
+    assert cache.stats()["misses"] == 2
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import pickle
+
+import numpy as np
+import pytest
+
+from ocr_page import OCRPage
+
+
+def line(x, y, text, score=0.9):
+    return [[[x, y], [x + 40, y], [x + 40, y + 10], [x, y + 10]], (text, score)]
+
+
+def test_empty_page_round_trip():
+    page = OCRPage()
+    restored = OCRPage.from_bytes(page.to_bytes())
+    assert restored == page
+    assert len(restored) == 0
+    assert restored.boxes.shape == (0, 4, 2)
+    assert restored.blocks == []
+
+
+def test_round_trip_keeps_tables_blocks_and_table_index():
+    elements = [
+        line(0, 0, "标题"),
+        {
+            "type": "table",
+            "bbox": [0, 20, 200, 80],
+            "html": "<table><tr><td>单元格</td></tr></table>",
+            "lines": [line(5, 25, "单元格", 0.8), line(60, 25, "cell", 0.7)],
+        },
+        line(0, 90, "正文 text"),
+        {"type": "figure", "bbox": [0, 100, 50, 150]},
+    ]
+    page = OCRPage.from_elements(elements)
+    assert page.table_index.tolist() == [-1, 0, 0, -1]
+    assert [block["anchor"] for block in page.blocks] == [1, 4]
+
+    restored = OCRPage.from_bytes(page.to_bytes())
+    assert restored == page
+    assert restored.texts == ["标题", "单元格", "cell", "正文 text"]
+    assert restored.table_index.dtype == np.int32
+    assert restored.table_index.tolist() == [-1, 0, 0, -1]
+    assert restored.blocks == page.blocks
+    np.testing.assert_array_equal(restored.boxes, page.boxes)
+    np.testing.assert_array_equal(restored.scores, page.scores)
+    assert restored.to_elements() == page.to_elements()
+    assert pickle.loads(pickle.dumps(page)) == page
+
+
+def test_from_bytes_rejects_foreign_data():
+    data = bytearray(OCRPage().to_bytes())
+    data[:4] = b"XXXX"
+    with pytest.raises(ValueError):
+        OCRPage.from_bytes(bytes(data))
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from conftest import FakeOCR, write_jpeg
+from extraction_engine import ExtractionEngine
+from ocr_tiling import join_tile_lines, merge_tile_boxes, merge_tile_lines, stitch_text
+
+
+def rect(x0, y0, x1, y1):
+    return [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]
+
+
+def test_line_cut_by_tile_edge_is_joined_once():
+    # 一行文字横跨两个图块（重叠区域 1400-1600），两个图块各识别出其中一段
+    lines = [
+        [rect(1000, 100, 1600, 130), ("合同编号：HT-2023", 0.9)],
+        [rect(1400, 101, 2000, 131), ("2023-0815号", 0.9)],
+        [rect(100, 300, 900, 330), ("下一行", 0.95)],
+    ]
+    joined_lines, joined = join_tile_lines(lines, [0, 1, 0])
+    assert joined == [True, False]
+    assert joined_lines[0][0] == rect(1000, 100, 2000, 131)
+    assert joined_lines[0][1][0] == "合同编号：HT-2023-0815号"
+    assert [text for _, (text, _) in merge_tile_lines(joined_lines)] == ["合同编号：HT-2023-0815号", "下一行"]
+
+
+def test_fragments_in_the_same_tile_or_on_other_lines_are_kept_apart():
+    lines = [
+        [rect(0, 100, 500, 130), ("左", 0.9)],
+        [rect(400, 100, 900, 130), ("右", 0.9)],  # 同一图块内的两个框不合并
+        [rect(400, 200, 900, 230), ("另一行", 0.9)],  # 不同图块但不在同一基线
+    ]
+    _, joined = join_tile_lines(lines, [0, 0, 1])
+    assert joined == [False, False, False]
+
+
+def test_merge_tile_boxes_unions_fragments():
+    boxes = [np.float32(rect(1000, 100, 1600, 130)), np.float32(rect(1400, 100, 2000, 130))]
+    merged = merge_tile_boxes(boxes, [0, 1])
+    assert len(merged) == 1
+    assert merged[0].tolist() == rect(1000, 100, 2000, 130)
+
+
+def test_stitch_text_removes_repeated_overlap():
+    assert stitch_text(["abcdef", "defgh", "ghij"]) == "abcdefghij"
+    assert stitch_text(["abc", "xyz"]) == "abcxyz"
+
+
+class BarOCR(FakeOCR):
+    """把图块中的深色区域识别为一行文字；识别器（按整页裁剪的整行）返回完整的一行"""
+
+    def ocr(self, image, cls=True):
+        ys, xs = np.nonzero(image.min(axis=2) < 128)
+        if len(xs) == 0:
+            return [None]
+        return [[[rect(int(xs.min()), int(ys.min()), int(xs.max()), int(ys.max())), ("fragment", 0.9)]]]
+
+    def text_recognizer(self, images):
+        return [("whole line", 0.95)] * len(images), 0.0
+
+
+def test_tiled_ocr_rerecognizes_lines_cut_by_tile_edges(tmp_path):
+    path = write_jpeg(tmp_path / "wide.jpg", size=(5000, 300))
+    engine = ExtractionEngine(
+        {"ocr_cache_enabled": False, "ocr_tiling": True, "tile_trigger_side": 4000, "tile_size": 1600, "tile_overlap": 200}, ocr_instance=BarOCR()
+    )
+    result = engine.process(path)
+    assert result.page.texts == ["whole line"]
+    x_min, _, x_max, _ = result.page.bounding_rects()[0]
+    assert x_min < 100 and x_max > 4900
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from conftest import FakeOCR, write_jpeg
+from extraction_engine import ExtractionEngine
+from output_renderers import result_to_dict
+
+
+@pytest.mark.parametrize("batched", [False, True])
+def test_json_boxes_are_in_source_coordinates_on_cache_hits(tmp_path, batched):
+    # balanced 把 3000 像素宽的图片缩小到 2400（scale 0.8），检测框属于缩小后的图片
+    path = write_jpeg(tmp_path / "1.jpg", size=(3000, 800))
+    ocr = FakeOCR(boxes=[[[240, 80], [1200, 80], [1200, 160], [240, 160]]])
+    engine = ExtractionEngine(
+        {"ocr_cache_dir": str(tmp_path / "ocr_cache"), "preprocess_profile": "balanced"}, ocr_instance=ocr
+    )
+    run = engine.iter_results_batched if batched else engine.iter_results
+    first = next(run([path]))
+    second = next(run([path]))
+    assert engine.cache.stats()["hits"] == 1
+    assert first.scale == second.scale == pytest.approx(0.8)
+    box = result_to_dict(second)["lines"][0]["box"]
+    assert box == [[300.0, 100.0], [1500.0, 100.0], [1500.0, 200.0], [300.0, 200.0]]
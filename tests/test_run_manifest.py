@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from conftest import FakeOCR, write_jpeg
+from extraction_engine import ExtractionEngine
+from run_manifest import RunManifest
+
+
+def run(engine, manifest_path, paths):
+    """与命令行目录模式相同：清单中没有的图片才识别，结果按原顺序产出"""
+    manifest = RunManifest(manifest_path, engine.fingerprint)
+    pending = manifest.split(paths)
+    results = list(manifest.iter_results(paths, engine.iter_results(pending)))
+    manifest.close()
+    return manifest, pending, results
+
+
+def test_failed_image_is_not_recorded_and_is_retried(tmp_path):
+    good = write_jpeg(tmp_path / "1.jpg")
+    junk = tmp_path / "3.jpg"
+    junk.write_bytes(b"not an image")
+    engine = ExtractionEngine({"ocr_cache_enabled": False}, ocr_instance=FakeOCR())
+    manifest_path = tmp_path / "out.docx.manifest.jsonl"
+
+    manifest, pending, results = run(engine, manifest_path, [good, str(junk)])
+    assert [result.ok for result in results] == [True, False]
+    assert manifest.recorded == 1
+
+    manifest, pending, results = run(engine, manifest_path, [good, str(junk)])
+    assert pending == [str(junk)]
+    assert manifest.reused == 1
+    assert manifest.recorded == 0
+
+    write_jpeg(junk)
+    manifest, pending, results = run(engine, manifest_path, [good, str(junk)])
+    assert pending == [str(junk)]
+    assert all(result.ok for result in results)
+    assert manifest.recorded == 1
+
+
+def test_reused_result_keeps_preprocess_scale(tmp_path):
+    path = write_jpeg(tmp_path / "1.jpg", size=(3000, 800))
+    engine = ExtractionEngine({"ocr_cache_enabled": False, "preprocess_profile": "balanced"}, ocr_instance=FakeOCR())
+    manifest_path = tmp_path / "out.docx.manifest.jsonl"
+    run(engine, manifest_path, [path])
+    manifest, pending, results = run(engine, manifest_path, [path])
+    assert pending == []
+    assert results[0].scale == 0.8
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+import docx
+
+from docx_renderer import create_document
+from streaming_docx import StreamingDocxWriter
+
+
+def write_sections(writer, count):
+    for index in range(count):
+        writer.begin_section().add_paragraph(f"section {index}")
+        writer.end_section()
+
+
+def test_checkpoint_interval_doubles(tmp_path, monkeypatch):
+    writer = StreamingDocxWriter(tmp_path / "out.docx", create_document({}), checkpoint_every=2)
+    checkpoints = []
+    original = writer.checkpoint
+    monkeypatch.setattr(writer, "checkpoint", lambda: checkpoints.append(writer.section_count) or original())
+    write_sections(writer, 20)
+    assert checkpoints == [2, 4, 8, 16]
+    assert len(docx.Document(str(tmp_path / "out.docx")).paragraphs) >= 16
+    writer.close()
+    texts = [paragraph.text for paragraph in docx.Document(str(tmp_path / "out.docx")).paragraphs if paragraph.text]
+    assert texts == [f"section {index}" for index in range(20)]
+
+
+def test_checkpoint_interval_restarts_for_each_volume(tmp_path, monkeypatch):
+    writer = StreamingDocxWriter(tmp_path / "out.docx", create_document({}), volume_size=3, checkpoint_every=1)
+    checkpoints = []
+    original = writer.checkpoint
+    monkeypatch.setattr(writer, "checkpoint", lambda: checkpoints.append(writer.section_count) or original())
+    write_sections(writer, 6)
+    assert checkpoints == [1, 2, 4, 5]
+    assert len(writer.close()) == 2
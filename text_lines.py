@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+文本行几何工具
+- 检测框阅读顺序排序（与 PaddleOCR 的 sorted_boxes 规则一致）
+- 按四边形检测框透视裁剪文本行图片（与 PaddleOCR 的 get_rotate_crop_image 一致）
+供拆分检测/识别步骤的流水线（批量识别、方向自适应等）使用，保证与 PaddleOCR 整体调用的结果一致。
+"""
+import numpy as np
+
+
+def sort_text_boxes(dt_boxes):
+    """按从上到下、从左到右的阅读顺序排序检测框
+
+    Args:
+        dt_boxes: 检测框数组，形状为 (N, 4, 2)
+
+    Returns:
+        list: 排序后的检测框列表（每个元素为 (4, 2) 数组）
+    """
+    boxes = sorted(dt_boxes, key=lambda box: (box[0][1], box[0][0]))
+    # 纵坐标相差不足 10 像素的视为同一行，按横坐标重新排序
+    for i in range(len(boxes) - 1):
+        for j in range(i, -1, -1):
+            if abs(boxes[j + 1][0][1] - boxes[j][0][1]) < 10 and boxes[j + 1][0][0] < boxes[j][0][0]:
+                boxes[j], boxes[j + 1] = boxes[j + 1], boxes[j]
+            else:
+                break
+    return boxes
+
+
+def crop_text_line(image, box):
+    """按四边形检测框从图片中透视裁剪出水平的文本行图片
+
+    Args:
+        image: BGR 图片数组
+        box: 四个顶点坐标，形状为 (4, 2)
+
+    Returns:
+        np.ndarray: 文本行图片；高宽比不小于 1.5 时旋转 90 度（竖排文字）
+    """
+    import cv2
+
+    points = np.asarray(box, dtype=np.float32)
+    crop_width = int(max(np.linalg.norm(points[0] - points[1]), np.linalg.norm(points[2] - points[3])))
+    crop_height = int(max(np.linalg.norm(points[0] - points[3]), np.linalg.norm(points[1] - points[2])))
+    crop_width, crop_height = max(crop_width, 1), max(crop_height, 1)
+    target_points = np.float32([[0, 0], [crop_width, 0], [crop_width, crop_height], [0, crop_height]])
+    matrix = cv2.getPerspectiveTransform(points, target_points)
+    crop = cv2.warpPerspective(
+        image,
+        matrix,
+        (crop_width, crop_height),
+        borderMode=cv2.BORDER_REPLICATE,
+        flags=cv2.INTER_CUBIC,
+    )
+    if crop.shape[0] * 1.0 / crop.shape[1] >= 1.5:
+        crop = np.rot90(crop)
+    return crop